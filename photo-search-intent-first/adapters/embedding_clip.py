@@ -3,6 +3,7 @@ from typing import List, Optional, Sequence, Tuple, Union, Callable, Literal
 import concurrent.futures as _fut
 import logging
 import os
+import queue as _queue
 import time
 from functools import lru_cache
 
@@ -31,7 +32,46 @@ def _cached_sentence_transformer(name: str, device: Optional[str]) -> SentenceTr
     return SentenceTransformer(name, device=device)
 
 
+class _ByteBudget:
+    """Counting semaphore over bytes of decoded images held in flight."""
+
+    def __init__(self, limit: int, abort: threading.Event) -> None:
+        self.limit = max(1, int(limit))
+        self.used = 0
+        self.waiters = 0
+        self._abort = abort
+        self._cond = threading.Condition()
+
+    def acquire(self, n: int) -> bool:
+        with self._cond:
+            # A single oversized image is admitted when nothing else is held
+            while self.used > 0 and self.used + n > self.limit and not self._abort.is_set():
+                self.waiters += 1
+                self._cond.wait(0.1)
+                self.waiters -= 1
+            if self._abort.is_set():
+                return False
+            self.used += n
+            return True
+
+    def release(self, n: int) -> None:
+        with self._cond:
+            self.used = max(0, self.used - n)
+            self._cond.notify_all()
+
+
+def _default_inflight_mb() -> int:
+    try:
+        return max(1, int(os.getenv("PS_EMBED_INFLIGHT_MB", "512")))
+    except ValueError:
+        return 512
+
+
 class ClipEmbedding:
+    # Decoded images are downscaled so their short side is at most this many
+    # pixels before queuing; CLIP preprocessors resize to 224-336 anyway.
+    decode_min_side: int = 336
+
     def __init__(self, model_name: str = "clip-ViT-B-32", device: Optional[str] = None) -> None:
         # Honor offline mode and local cache directory if provided
         offline = os.getenv("OFFLINE_MODE", "").lower() in ("1", "true", "yes")
@@ -134,6 +174,143 @@ class ClipEmbedding:
                 images.append(img)
         return images, valid_idx
 
+    def _prepare(self, img: Image.Image) -> Image.Image:
+        if img.mode != 'RGB':
+            img = img.convert('RGB')
+        w, h = img.size
+        side = min(w, h)
+        if side > self.decode_min_side:
+            scale = self.decode_min_side / float(side)
+            img = img.resize((max(1, round(w * scale)), max(1, round(h * scale))), Image.BICUBIC)
+        return img
+
+    def _resolve_workers(self, num_workers: Optional[int]) -> int:
+        if num_workers is None:
+            cpu = os.cpu_count() or 1
+            # prefer I/O parallelism for CPU, keep low for GPU to avoid dispatch contention
+            if 'cuda' in self.device or 'mps' in self.device:
+                return min(2, max(0, cpu - 1))
+            return max(1, min(4, cpu // 2))
+        return max(0, num_workers)
+
+    def _stream_encode(
+        self,
+        path_list: list[Path],
+        eff_bs: int,
+        eff_workers: int,
+        normalize: bool,
+        stop_event: Optional[threading.Event],
+        progress_cb: Optional[Callable[[dict], None]],
+        max_inflight_mb: Optional[int],
+    ) -> Tuple[Optional[np.ndarray], list[int], bool]:
+        """Decode on worker threads while the caller thread encodes micro-batches.
+
+        Decoded, downscaled images wait in a queue whose total pixel bytes are
+        capped by ``max_inflight_mb``; when the cap is hit the pending partial
+        batch is encoded early so decoding can continue. Returns
+        ``(embeddings, valid_idx, cancelled)``; ``embeddings`` is None when
+        nothing was encoded.
+        """
+        total = len(path_list)
+        abort = threading.Event()
+        budget = _ByteBudget((max_inflight_mb or _default_inflight_mb()) * 1024 * 1024, abort)
+        ready: "_queue.Queue[tuple[int, Optional[Image.Image], int]]" = _queue.Queue()
+
+        def _stopped() -> bool:
+            return abort.is_set() or bool(stop_event and stop_event.is_set())
+
+        def _load(i: int, p: Path) -> None:
+            img = None
+            nbytes = 0
+            try:
+                if not _stopped():
+                    opened = safe_open_image(p, target_size=self.decode_min_side)
+                    if opened is not None:
+                        img = self._prepare(opened)
+                        nbytes = img.width * img.height * 3
+                        if not budget.acquire(nbytes):
+                            img, nbytes = None, 0
+            except Exception:
+                img, nbytes = None, 0
+            ready.put((i, img, nbytes))
+
+        chunks: list[np.ndarray] = []
+        valid_idx: list[int] = []
+        batch: list[Image.Image] = []
+        batch_idx: list[int] = []
+        batch_bytes = 0
+        started = False
+
+        def _flush() -> None:
+            nonlocal batch, batch_idx, batch_bytes, started
+            if not batch:
+                return
+            if not started and progress_cb:
+                progress_cb(
+                    {
+                        "phase": "encode_start",
+                        "valid": len(valid_idx) + len(batch),
+                        "total": total,
+                        "batch_size": eff_bs,
+                        "workers": eff_workers,
+                    }
+                )
+            started = True
+            try:
+                embs = self.model.encode(
+                    batch,
+                    batch_size=len(batch),
+                    convert_to_numpy=True,
+                    show_progress_bar=False,
+                    normalize_embeddings=normalize,
+                    num_workers=eff_workers,
+                )
+            finally:
+                budget.release(batch_bytes)
+            chunks.append(np.asarray(embs, dtype=np.float32))
+            valid_idx.extend(batch_idx)
+            batch, batch_idx, batch_bytes = [], [], 0
+
+        ex = _fut.ThreadPoolExecutor(max_workers=max(1, eff_workers))
+        cancelled = False
+        loaded = 0
+        try:
+            for i, p in enumerate(path_list):
+                ex.submit(_load, i, p)
+            received = 0
+            while received < total:
+                if stop_event and stop_event.is_set():
+                    cancelled = True
+                    break
+                try:
+                    i, img, nbytes = ready.get(timeout=0.05)
+                except _queue.Empty:
+                    # Decoders are blocked on the memory cap: encode what we have
+                    if batch and budget.waiters:
+                        _flush()
+                    continue
+                received += 1
+                if img is None:
+                    continue
+                batch.append(img)
+                batch_idx.append(i)
+                batch_bytes += nbytes
+                loaded += 1
+                if progress_cb:
+                    progress_cb({"phase": "load", "done": loaded, "total": total})
+                if len(batch) >= eff_bs:
+                    _flush()
+            if not cancelled:
+                _flush()
+        finally:
+            abort.set()
+            ex.shutdown(wait=False, cancel_futures=True)
+        if cancelled and progress_cb:
+            progress_cb({"phase": "encode_skipped", "valid": loaded, "total": total})
+        if not chunks:
+            return None, [], cancelled
+        return np.concatenate(chunks, axis=0), valid_idx, cancelled
+
     def embed_images(
         self,
         paths: Sequence[Union[Path, str]],
@@ -143,123 +320,33 @@ class ClipEmbedding:
         stop_event: Optional[threading.Event] = None,
         progress_cb: Optional[Callable[[dict], None]] = None,
         out_dtype: Literal["float32", "float16"] = "float32",
+        max_inflight_mb: Optional[int] = None,
     ) -> np.ndarray:
         # Normalize input and decide batch size
         path_list: list[Path] = [Path(p) for p in paths]
         eff_bs = self._auto_batch_size(len(path_list)) if batch_size is None else batch_size
-        if num_workers is None:
-            cpu = os.cpu_count() or 1
-            # prefer I/O parallelism for CPU, keep low for GPU to avoid dispatch contention
-            if 'cuda' in self.device or 'mps' in self.device:
-                eff_workers = min(2, max(0, cpu - 1))
-            else:
-                eff_workers = max(1, min(4, cpu // 2))
-        else:
-            eff_workers = max(0, num_workers)
+        eff_workers = self._resolve_workers(num_workers)
 
         total = len(path_list)
         if progress_cb:
             progress_cb({"phase": "load_start", "total": total})
 
-        images: list[Image.Image] = []
-        valid_idx: list[int] = []
-        if eff_workers <= 0:
-            for i, p in enumerate(path_list):
-                if stop_event and stop_event.is_set():
-                    break
-                img = safe_open_image(p)
-                if img is not None:
-                    try:
-                        if img.mode != 'RGB':
-                            img = img.convert('RGB')
-                        images.append(img)
-                        valid_idx.append(i)
-                    except Exception:
-                        pass
-                if progress_cb:
-                    progress_cb({"phase": "load", "done": len(valid_idx), "total": total})
-        else:
-            def _load(i_p: tuple[int, Path]):
-                i, p = i_p
-                if stop_event and stop_event.is_set():
-                    return None
-                img = safe_open_image(p)
-                if img is None:
-                    return None
-                try:
-                    if img.mode != 'RGB':
-                        img = img.convert('RGB')
-                    return (i, img)
-                except Exception:
-                    return None
-            with _fut.ThreadPoolExecutor(max_workers=eff_workers) as ex:
-                for res in ex.map(_load, enumerate(path_list)):
-                    if stop_event and stop_event.is_set():
-                        break
-                    if res is None:
-                        continue
-                    i, img = res
-                    valid_idx.append(i)
-                    images.append(img)
-                    if progress_cb:
-                        progress_cb(
-                            {
-                                "phase": "load",
-                                "done": len(valid_idx),
-                                "total": total,
-                            }
-                        )
-
-        if stop_event and stop_event.is_set():
-            if not images:
-                return np.zeros((len(paths), self.dim), dtype=np.float32)
-            if progress_cb:
-                progress_cb(
-                    {
-                        "phase": "encode_skipped",
-                        "valid": len(images),
-                        "total": total,
-                    }
-                )
-            return np.zeros((len(paths), self.dim), dtype=np.float32)
-
-        if progress_cb:
-            progress_cb(
-                {
-                    "phase": "encode_start",
-                    "valid": len(images),
-                    "total": total,
-                    "batch_size": eff_bs,
-                    "workers": eff_workers,
-                }
-            )
-
-        embs = self.model.encode(
-            images,
-            batch_size=eff_bs,
-            convert_to_numpy=True,
-            show_progress_bar=False,
-            normalize_embeddings=normalize,
-            num_workers=eff_workers,
+        embs, valid_idx, cancelled = self._stream_encode(
+            path_list, eff_bs, eff_workers, normalize, stop_event, progress_cb, max_inflight_mb
         )
+        if cancelled:
+            return np.zeros((len(paths), self.dim), dtype=np.float32)
 
         if progress_cb:
-            progress_cb({"phase": "encode_done", "valid": len(images)})
-        if embs.dtype != np.float32:
-            embs = embs.astype(np.float32, copy=False)
+            progress_cb({"phase": "encode_done", "valid": len(valid_idx)})
 
-        result = np.zeros((len(paths), embs.shape[1]), dtype=np.float32)
-        for j, i in enumerate(valid_idx):
-            result[i] = embs[j]
+        dim = embs.shape[1] if embs is not None else self.dim
+        result = np.zeros((len(paths), dim), dtype=np.float32)
+        if embs is not None:
+            result[np.asarray(valid_idx, dtype=np.int64)] = embs
 
         if out_dtype == "float16":
             result = result.astype(np.float16, copy=False)
-
-        # timing (debug):
-        # print(
-        #     f"embed_images: n={len(paths)} valid={len(valid_idx)} bs={eff_bs} "
-        #     f"workers={eff_workers} took={time.perf_counter()-t0:.3f}s"
-        # )
         return result
 
     def embed_images_compact(
@@ -271,83 +358,27 @@ class ClipEmbedding:
         stop_event: Optional[threading.Event] = None,
         progress_cb: Optional[Callable[[dict], None]] = None,
         out_dtype: Literal["float32", "float16"] = "float32",
+        max_inflight_mb: Optional[int] = None,
     ) -> Tuple[np.ndarray, list[int]]:
         """Return embeddings only for successfully opened images, plus their original indices.
         Useful to avoid allocating a full zero-padded matrix when most inputs are valid.
+        On cancellation the rows encoded so far are returned.
         """
         path_list: list[Path] = [Path(p) for p in paths]
         eff_bs = self._auto_batch_size(len(path_list)) if batch_size is None else batch_size
-        if num_workers is None:
-            cpu = os.cpu_count() or 1
-            # prefer I/O parallelism for CPU, keep low for GPU to avoid dispatch contention
-            if 'cuda' in self.device or 'mps' in self.device:
-                eff_workers = min(2, max(0, cpu - 1))
-            else:
-                eff_workers = max(1, min(4, cpu // 2))
-        else:
-            eff_workers = max(0, num_workers)
+        eff_workers = self._resolve_workers(num_workers)
 
         total = len(path_list)
         if progress_cb:
             progress_cb({"phase": "load_start", "total": total})
 
-        images: list[Image.Image] = []
-        valid_idx: list[int] = []
-        if eff_workers <= 0:
-            for i, p in enumerate(path_list):
-                if stop_event and stop_event.is_set():
-                    break
-                img = safe_open_image(p)
-                if img is not None:
-                    try:
-                        if img.mode != 'RGB':
-                            img = img.convert('RGB')
-                        images.append(img)
-                        valid_idx.append(i)
-                    except Exception:
-                        pass
-                if progress_cb:
-                    progress_cb({"phase": "load", "done": len(valid_idx), "total": total})
-        else:
-            def _load(i_p: tuple[int, Path]):
-                i, p = i_p
-                if stop_event and stop_event.is_set():
-                    return None
-                img = safe_open_image(p)
-                if img is None:
-                    return None
-                try:
-                    if img.mode != 'RGB':
-                        img = img.convert('RGB')
-                    return (i, img)
-                except Exception:
-                    return None
-            with _fut.ThreadPoolExecutor(max_workers=eff_workers) as ex:
-                for res in ex.map(_load, enumerate(path_list)):
-                    if stop_event and stop_event.is_set():
-                        break
-                    if res is None:
-                        continue
-                    i, img = res
-                    valid_idx.append(i)
-                    images.append(img)
-                    if progress_cb:
-                        progress_cb({"phase": "load", "done": len(valid_idx), "total": total})
-
-        if not images:
-            return np.zeros((0, self.dim), dtype=np.float32), []
-        embs = self.model.encode(
-            images,
-            batch_size=eff_bs,
-            convert_to_numpy=True,
-            show_progress_bar=False,
-            normalize_embeddings=normalize,
-            num_workers=eff_workers,
+        embs, valid_idx, _ = self._stream_encode(
+            path_list, eff_bs, eff_workers, normalize, stop_event, progress_cb, max_inflight_mb
         )
+        if embs is None:
+            return np.zeros((0, self.dim), dtype=np.float32), []
         if progress_cb:
-            progress_cb({"phase": "encode_done", "valid": len(images)})
-        if embs.dtype != np.float32:
-            embs = embs.astype(np.float32, copy=False)
+            progress_cb({"phase": "encode_done", "valid": len(valid_idx)})
         if out_dtype == "float16":
             embs = embs.astype(np.float16, copy=False)
         return embs, valid_idx
@@ -22,6 +22,9 @@ def _auto_device():
 
 
 class TransformersClipEmbedding:
+    # Short side to decode at; the CLIP processor resizes to 224 afterwards
+    decode_min_side: int = 336
+
     def __init__(self, model_name: str = "openai/clip-vit-base-patch32", device: Optional[str] = None) -> None:
         self.device = torch.device(device) if device else _auto_device()
 
@@ -149,7 +152,7 @@ class TransformersClipEmbedding:
         images: list[Image.Image] = []
         valid_idx: list[int] = []
         for i, p in enumerate(paths):
-            img = safe_open_image(p)
+            img = safe_open_image(p, target_size=self.decode_min_side)
             if img is not None:
                 images.append(img)
                 valid_idx.append(i)
@@ -93,9 +93,39 @@ def list_photos(root: Path) -> List[Photo]:
     return items
 
 
-def safe_open_image(path: Path) -> Optional[Image.Image]:
+# Largest integer shrink applied after decoding non-JPEG formats
+_MAX_REDUCE = 8
+
+
+def _reduce_for_target(img: Image.Image, target_size: int) -> Image.Image:
+    """Decode ``img`` at the smallest resolution whose shorter side is >= target_size.
+
+    JPEG uses DCT scaling via ``Image.draft`` (1/2, 1/4 or 1/8 of the pixels are
+    never decoded). Other formats have no reduced decode, so they are shrunk by
+    an integer factor with ``Image.reduce`` right after loading, which is far
+    cheaper than a filtered resize of the full frame.
+    """
+    factor = min(img.size) // max(1, target_size)
+    if factor < 2:
+        return img
+    if img.format == "JPEG":
+        img.draft("RGB", (target_size, target_size))
+        return img
+    if img.mode not in ("RGB", "RGBA", "L", "LA", "I", "F"):
+        img = img.convert("RGB")
+    return img.reduce(min(factor, _MAX_REDUCE))
+
+
+def safe_open_image(path: Path, target_size: Optional[int] = None) -> Optional[Image.Image]:
+    """Open ``path`` as an RGB image, or None if it cannot be read.
+
+    When ``target_size`` is given the image may come back downscaled, but its
+    shorter side is never smaller than ``target_size`` (or the original size).
+    """
     try:
         img = Image.open(path)
+        if target_size:
+            img = _reduce_for_target(img, int(target_size))
         if img.mode != "RGB":
             img = img.convert("RGB")
         return img
@@ -4,6 +4,8 @@ from typing import Optional
 import os
 from pathlib import Path
 
+from adapters.provider_pool import provider_pool
+
 
 def get_provider(
     name: str,
@@ -14,7 +16,14 @@ def get_provider(
     hf_model: Optional[str] = None,
     openai_caption_model: Optional[str] = None,
     openai_embed_model: Optional[str] = None,
+    device: Optional[str] = None,
 ):
+    """Return an embedding provider by name.
+
+    Local model providers come from the process-wide pool (see
+    adapters.provider_pool), so their weights are loaded once per
+    (provider, model, device); remote API providers are constructed per call.
+    """
     name = (name or "").lower()
     
     # Check for offline mode
@@ -35,11 +44,14 @@ def get_provider(
                     model_path = bundled_dir / "clip-vit-b-32"
                 if model_path.exists():
                     model_name = str(model_path)
-        return TransformersClipEmbedding(model_name=model_name)
+        return provider_pool.get(
+            "transformers", model_name, device,
+            lambda: TransformersClipEmbedding(model_name=model_name, device=device),
+        )
     if name in ("local-compat", "clip", "clip-local"):
         # Import heavy ML library only when needed, not at module load time
         from adapters.embedding_clip import ClipEmbedding
-        return ClipEmbedding(model_name=st_model or "clip-ViT-B-32")
+        return _pooled_clip(ClipEmbedding, st_model or "clip-ViT-B-32", device)
     if name in ("hf", "huggingface"):
         from adapters.embedding_hf_api import HfClipAPI
         return HfClipAPI(model=hf_model or "sentence-transformers/clip-ViT-B-32", token=hf_token)
@@ -51,7 +63,11 @@ def get_provider(
         return OpenAICaptionEmbed(api_key=openai_api_key, caption_model=openai_caption_model or "gpt-4o-mini", embed_model=openai_embed_model or "text-embedding-3-small")
     # default - import heavy ML library only when needed
     from adapters.embedding_clip import ClipEmbedding
-    return ClipEmbedding(model_name=st_model or "clip-ViT-B-32")
+    return _pooled_clip(ClipEmbedding, st_model or "clip-ViT-B-32", device)
+
+
+def _pooled_clip(cls, model_name: str, device: Optional[str]):
+    return provider_pool.get("clip", model_name, device, lambda: cls(model_name=model_name, device=device))
 
 
 def _find_bundled_model_dir() -> Path | None:
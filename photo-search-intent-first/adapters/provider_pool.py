@@ -0,0 +1,169 @@
+"""Process-wide pool of loaded local embedding providers.
+
+Intent:
+  ``get_provider("local")`` used to construct a new ``TransformersClipEmbedding``
+  per request, re-reading the CLIP processor and weights from disk each time.
+  The pool keeps one instance per (kind, model, device), loads it once (a
+  second concurrent request for the same key waits for that load instead of
+  starting its own) and can pre-warm the configured models at startup.
+
+Contract:
+  - provider_pool.get(kind, model, device, factory) -> shared provider
+  - provider_pool.warm_up(specs) runs one dummy forward pass per provider
+  - provider_pool.unload(kind=None, model=None) -> number of providers dropped
+  - provider_pool.stats() -> per-provider load time, resident bytes and uses
+
+Only local model providers are pooled; remote API clients are cheap to build
+and are keyed by credentials, so ``get_provider`` keeps constructing those.
+"""
+from __future__ import annotations
+
+import gc
+import logging
+import threading
+import time
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_Key = Tuple[str, str, str]
+
+
+def _resident_bytes(provider: Any) -> int:
+    """Bytes held by the provider's torch parameters and buffers (0 if unknown)."""
+    model = getattr(provider, "model", None)
+    total = 0
+    for attr in ("parameters", "buffers"):
+        fn = getattr(model, attr, None)
+        if not callable(fn):
+            continue
+        try:
+            total += sum(int(t.numel()) * int(t.element_size()) for t in fn())
+        except Exception:
+            return 0
+    return total
+
+
+@dataclass
+class _Entry:
+    provider: Any = None
+    load_seconds: float = 0.0
+    nbytes: int = 0
+    loaded_at: float = 0.0
+    uses: int = 0
+    warmed: bool = False
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+
+class ProviderPool:
+    """Thread-safe cache of loaded embedding providers keyed by (kind, model, device)."""
+
+    def __init__(self) -> None:
+        self._entries: Dict[_Key, _Entry] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(kind: str, model: str, device: Optional[str]) -> _Key:
+        return (kind, model, device or "auto")
+
+    def get(self, kind: str, model: str, device: Optional[str], factory: Callable[[], Any]) -> Any:
+        key = self._key(kind, model, device)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = _Entry()
+        with entry.lock:
+            if entry.provider is None:
+                t0 = time.perf_counter()
+                provider = factory()
+                entry.load_seconds = time.perf_counter() - t0
+                entry.nbytes = _resident_bytes(provider)
+                entry.loaded_at = time.time()
+                entry.provider = provider
+                logger.info("Loaded provider %s/%s in %.2fs", kind, model, entry.load_seconds)
+            entry.uses += 1
+            return entry.provider
+
+    def warm_up(self, providers: Iterable[Any]) -> List[Dict[str, Any]]:
+        """Run a dummy forward pass through each provider so first requests are fast."""
+        out: List[Dict[str, Any]] = []
+        for provider in providers:
+            t0 = time.perf_counter()
+            ok = True
+            try:
+                provider.embed_text("warm up")
+            except Exception as e:
+                ok = False
+                logger.warning("Provider warm-up failed: %s", e)
+            with self._lock:
+                for entry in self._entries.values():
+                    if entry.provider is provider:
+                        entry.warmed = ok
+            out.append({"index_id": getattr(provider, "index_id", None), "ok": ok, "seconds": time.perf_counter() - t0})
+        return out
+
+    def unload(self, kind: Optional[str] = None, model: Optional[str] = None) -> int:
+        """Drop pooled providers (all of them by default) and release their memory."""
+        with self._lock:
+            victims = [k for k in self._entries if (kind is None or k[0] == kind) and (model is None or k[1] == model)]
+            for k in victims:
+                self._entries.pop(k, None)
+        if victims:
+            try:
+                from adapters.embedding_clip import _cached_sentence_transformer
+                _cached_sentence_transformer.cache_clear()
+            except Exception:
+                pass
+            gc.collect()
+            try:
+                import sys
+                torch = sys.modules.get("torch")
+                if torch is not None and torch.cuda.is_available():
+                    torch.cuda.empty_cache()
+            except Exception:
+                pass
+        return len(victims)
+
+    def stats(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            items = list(self._entries.items())
+        return [
+            {
+                "kind": k[0],
+                "model": k[1],
+                "device": k[2],
+                "loaded": e.provider is not None,
+                "warmed": e.warmed,
+                "load_seconds": round(e.load_seconds, 3),
+                "resident_bytes": e.nbytes,
+                "uses": e.uses,
+                "loaded_at": e.loaded_at,
+            }
+            for k, e in items
+        ]
+
+
+provider_pool = ProviderPool()
+
+
+def warm_configured_providers(spec: str) -> List[Dict[str, Any]]:
+    """Load and warm the providers named in ``spec`` ("local,clip:clip-ViT-B-32").
+
+    Each item is a ``get_provider`` name with an optional ``:model``.
+    """
+    from adapters.provider_factory import get_provider
+
+    providers = []
+    for item in (s.strip() for s in (spec or "").split(",")):
+        if not item:
+            continue
+        name, _, model = item.partition(":")
+        try:
+            providers.append(get_provider(name, st_model=model or None, tf_model=model or None))
+        except Exception as e:
+            logger.warning("Could not load provider %s for warm-up: %s", item, e)
+    return provider_pool.warm_up(providers)
+
+
+__all__ = ["ProviderPool", "provider_pool", "warm_configured_providers"]
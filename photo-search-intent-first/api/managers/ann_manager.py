@@ -125,7 +125,8 @@ class ANNManager:
         if index_type == ANNIndexType.HNSW:
             index_info['index'] = self._create_hnsw_index(dimension, **kwargs)
         elif index_type == ANNIndexType.FAISS:
-            index_info['index'] = self._create_faiss_index(dimension, **kwargs)
+            index_info['parameters']['factory'] = self._faiss_spec(dimension, **kwargs)
+            index_info['index'] = self._create_faiss_index(dimension, **index_info['parameters'])
         elif index_type == ANNIndexType.ANNOY:
             index_info['index'] = self._create_annoy_index(dimension, **kwargs)
         elif index_type == ANNIndexType.BRUTE_FORCE:
@@ -149,13 +150,31 @@ class ANNManager:
 
         return index
 
+    def _faiss_spec(self, dimension: int, **kwargs) -> str:
+        """FAISS index_factory string for the requested parameters.
+
+        ``factory`` wins; otherwise an IVF-Flat with ``nlist`` lists when that
+        is given, else the structure ``infra.faiss_factory`` picks for
+        ``expected_size`` vectors.
+        """
+        from infra import faiss_factory
+
+        if kwargs.get('factory'):
+            return str(kwargs['factory'])
+        if 'nlist' in kwargs:
+            return f"IVF{int(kwargs['nlist'])},Flat"
+        return faiss_factory.choose_factory(int(kwargs.get('expected_size', 10000)), dimension)
+
     def _create_faiss_index(self, dimension: int, **kwargs) -> Any:
-        """Create a FAISS index."""
+        """Create a FAISS index (trained later, in ``_add_faiss_items``)."""
         import faiss
+        from infra import faiss_factory
 
-        nlist = kwargs.get('nlist', 100)
-        quantizer = faiss.IndexFlatIP(dimension)  # Inner product (cosine similarity)
-        index = faiss.IndexIVFFlat(quantizer, dimension, nlist)
+        spec = self._faiss_spec(dimension, **kwargs)
+        index = faiss.index_factory(dimension, spec, faiss.METRIC_INNER_PRODUCT)
+        # IVF indexes take ids natively; wrap the rest so add_with_ids works
+        if faiss_factory.family(spec) != 'ivf':
+            index = faiss.IndexIDMap2(index)
 
         return index
 
@@ -218,32 +237,45 @@ class ANNManager:
 
     def _add_faiss_items(self, index_info: Dict[str, Any], vectors: np.ndarray, ids: Optional[List[int]] = None):
         """Add items to FAISS index."""
+        from infra import faiss_factory
+
         index = index_info['index']
-        # FAISS requires training before adding items
-        if not index_info.get('trained', False):
-            if len(vectors) >= index.nlist:
-                index.train(vectors)
-                index_info['trained'] = True
-            else:
-                # Not enough vectors to train, store for later
-                if 'pending_vectors' not in index_info:
-                    index_info['pending_vectors'] = []
-                    index_info['pending_ids'] = []
-                index_info['pending_vectors'].append(vectors)
-                index_info['pending_ids'].append(ids or list(range(len(vectors))))
+        vectors = np.ascontiguousarray(vectors, dtype='float32')
+        if ids is None:
+            ids = list(range(index_info.get('current_size', 0), index_info.get('current_size', 0) + len(vectors)))
+        index_info['current_size'] = index_info.get('current_size', 0) + len(vectors)
+
+        # IVF/PQ indexes need training before adding items; buffer until the
+        # sample is large enough
+        if not index.is_trained:
+            index_info.setdefault('pending_vectors', []).append(vectors)
+            index_info.setdefault('pending_ids', []).append(list(ids))
+            buffered = sum(len(v) for v in index_info['pending_vectors'])
+            if buffered < faiss_factory.min_training_points(index_info['parameters'].get('factory', '')):
                 return
+            self._train_faiss(index_info)
+            return
 
-        # Add any pending vectors
-        if 'pending_vectors' in index_info:
-            for pending_vectors, pending_ids in zip(index_info['pending_vectors'], index_info['pending_ids']):
-                index.add_with_ids(pending_vectors, np.array(pending_ids))
-            del index_info['pending_vectors']
-            del index_info['pending_ids']
+        index.add_with_ids(vectors, np.array(ids, dtype='int64'))
 
-        # Add current vectors
-        if ids is None:
-            ids = list(range(index.ntotal, index.ntotal + len(vectors)))
-        index.add_with_ids(vectors, np.array(ids))
+    def _train_faiss(self, index_info: Dict[str, Any]):
+        """Train on the buffered vectors, then add them."""
+        from infra import faiss_factory
+
+        index = index_info['index']
+        pending = index_info.pop('pending_vectors', [])
+        pending_ids = index_info.pop('pending_ids', [])
+        if not pending:
+            return
+        data = np.vstack(pending)
+        spec = index_info['parameters'].get('factory', '')
+        rows = max(1, min(len(data), faiss_factory.training_size(spec, len(data))))
+        sample = np.random.default_rng(0).choice(len(data), size=rows, replace=False)
+        t0 = time.time()
+        index.train(data[np.sort(sample)])
+        index_info['train_seconds'] = time.time() - t0
+        index_info['trained'] = True
+        index.add_with_ids(data, np.array([i for chunk in pending_ids for i in chunk], dtype='int64'))
 
     def _add_annoy_items(self, index_info: Dict[str, Any], vectors: np.ndarray, ids: Optional[List[int]] = None):
         """Add items to Annoy index."""
@@ -253,10 +285,73 @@ class ANNManager:
         if ids is None:
             ids = list(range(index_info.get('current_size', 0), index_info.get('current_size', 0) + len(vectors)))
 
+        if annoy_data['built']:
+            # A built Annoy index is read-only: keep new vectors in a delta
+            # that is searched exactly until the next build
+            delta = annoy_data.setdefault('delta', {})
+            for vector, vector_id in zip(vectors, ids):
+                delta[int(vector_id)] = np.asarray(vector, dtype='float32')
+                annoy_data.get('deleted', set()).discard(int(vector_id))
+            index_info['current_size'] = index_info.get('current_size', 0) + len(ids)
+            return
+
         for i, (vector, vector_id) in enumerate(zip(vectors, ids)):
             index.add_item(vector_id, vector)
 
-        index_info['current_size'] = len(ids)
+        index_info['current_size'] = index_info.get('current_size', 0) + len(ids)
+
+    def remove_items(self, index_id: str, ids: List[int]) -> int:
+        """
+        Remove vectors from an index without rebuilding it.
+
+        HNSW marks the labels deleted, FAISS removes the ids, brute force drops
+        the rows and Annoy (immutable once built) filters them at search time.
+
+        Returns:
+            Number of ids handed to the backend
+        """
+        if index_id not in self.indexes:
+            raise ValueError(f"Index '{index_id}' not found")
+
+        index_info = self.indexes[index_id]
+        index_type = index_info['type']
+        ids = [int(i) for i in ids]
+
+        if index_type == ANNIndexType.HNSW:
+            for i in ids:
+                try:
+                    index_info['index'].mark_deleted(i)
+                except RuntimeError:
+                    pass  # unknown or already deleted label
+        elif index_type == ANNIndexType.FAISS:
+            if not index_info['index'].is_trained:
+                # Still buffering the training sample
+                drop = set(ids)
+                pending = list(zip(index_info.pop('pending_vectors', []), index_info.pop('pending_ids', [])))
+                for chunk_vectors, chunk_ids in pending:
+                    keep = [j for j, i in enumerate(chunk_ids) if i not in drop]
+                    if keep:
+                        index_info.setdefault('pending_vectors', []).append(chunk_vectors[keep])
+                        index_info.setdefault('pending_ids', []).append([chunk_ids[j] for j in keep])
+            else:
+                index_info['index'].remove_ids(np.array(ids, dtype='int64'))
+        elif index_type == ANNIndexType.ANNOY:
+            annoy_data = index_info['index']
+            deleted = annoy_data.setdefault('deleted', set())
+            for i in ids:
+                if annoy_data.get('delta', {}).pop(i, None) is None:
+                    deleted.add(i)
+        elif index_type == ANNIndexType.BRUTE_FORCE:
+            index_data = index_info['index']
+            row_ids = index_data.setdefault('ids', list(range(len(index_data['vectors']))))
+            drop = set(ids)
+            keep = [j for j, i in enumerate(row_ids) if i not in drop]
+            index_data['vectors'] = [index_data['vectors'][j] for j in keep]
+            index_data['ids'] = [row_ids[j] for j in keep]
+            index_info['current_size'] = len(index_data['vectors'])
+
+        self.logger.info(f"Removed {len(ids)} vectors from index '{index_id}'")
+        return len(ids)
 
     def _add_brute_force_items(self, index_info: Dict[str, Any], vectors: np.ndarray, ids: Optional[List[int]] = None):
         """Add items to brute force index."""
@@ -264,6 +359,8 @@ class ANNManager:
             ids = list(range(index_info.get('current_size', 0), index_info.get('current_size', 0) + len(vectors)))
 
         index_data = index_info['index']
+        if 'ids' in index_data:
+            index_data['ids'].extend(int(i) for i in ids)
         index_data['vectors'].extend(vectors.tolist())
         index_info['current_size'] = len(index_data['vectors'])
 
@@ -288,12 +385,14 @@ class ANNManager:
                 # HNSW doesn't need explicit building
                 pass
             elif index_type == ANNIndexType.FAISS:
-                # FAISS was built during add_items
-                pass
+                # Train on whatever was buffered if the sample never filled up
+                if not index_info['index'].is_trained:
+                    self._train_faiss(index_info)
             elif index_type == ANNIndexType.ANNOY:
                 annoy_data = index_info['index']
-                annoy_data['index'].build(annoy_data['n_trees'])
-                annoy_data['built'] = True
+                if not annoy_data['built']:
+                    annoy_data['index'].build(annoy_data['n_trees'])
+                    annoy_data['built'] = True
             elif index_type == ANNIndexType.BRUTE_FORCE:
                 # Brute force doesn't need building
                 pass
@@ -363,9 +462,18 @@ class ANNManager:
 
     def _search_faiss(self, index_info: Dict[str, Any], query_vector: np.ndarray, k: int, **kwargs) -> List[Tuple[int, float]]:
         """Search FAISS index."""
+        import faiss
+        from infra import faiss_factory
+
         index = index_info['index']
         query_vector = query_vector.reshape(1, -1).astype('float32')
 
+        params = {}
+        if kwargs.get('nprobe'):
+            params['nprobe'] = int(kwargs['nprobe'])
+        if kwargs.get('ef_search'):
+            params['efSearch'] = int(kwargs['ef_search'])
+        faiss_factory.set_search_params(faiss, index, params)
         distances, ids = index.search(query_vector, k)
 
         # Convert to list of tuples
@@ -386,16 +494,26 @@ class ANNManager:
         if not annoy_data['built']:
             raise ValueError("Annoy index not built")
 
-        ids = index.get_nns_by_vector(query_vector, k, include_distances=True)
+        deleted = annoy_data.get('deleted', set())
+        ids = index.get_nns_by_vector(query_vector, k + len(deleted), include_distances=True)
 
         # Convert distances to similarities
         results = []
         for id_idx, distance in zip(ids[0], ids[1]):
+            if id_idx in deleted:
+                continue
             # Angular distance to cosine similarity
             similarity = 1.0 - (distance ** 2) / 2.0
             results.append((id_idx, similarity))
 
-        return results
+        # Vectors added after the build, scored exactly
+        q = np.asarray(query_vector, dtype='float32')
+        norm = float(np.linalg.norm(q)) or 1.0
+        for id_idx, vector in annoy_data.get('delta', {}).items():
+            results.append((id_idx, float(vector @ q) / (norm * (float(np.linalg.norm(vector)) or 1.0))))
+
+        results.sort(key=lambda r: -r[1])
+        return results[:k]
 
     def _search_brute_force(self, index_info: Dict[str, Any], query_vector: np.ndarray, k: int, **kwargs) -> List[Tuple[int, float]]:
         """Search brute force index."""
@@ -407,8 +525,9 @@ class ANNManager:
 
         # Get top-k results
         top_k_indices = np.argsort(similarities)[::-1][:k]
+        row_ids = index_data.get('ids')
 
-        return [(idx, float(similarities[idx])) for idx in top_k_indices]
+        return [(row_ids[idx] if row_ids is not None else idx, float(similarities[idx])) for idx in top_k_indices]
 
     def save_index(self, index_id: str, filepath: Optional[Path] = None):
         """
@@ -613,9 +732,15 @@ class ANNManager:
             })
         elif index_info['type'] == ANNIndexType.FAISS:
             index = index_info['index']
+            import faiss
+            try:
+                nlist = faiss.extract_index_ivf(index).nlist
+            except Exception:
+                nlist = None  # HNSW/Flat factories have no inverted lists
             stats.update({
                 'current_size': index.ntotal,
-                'nlist': index.nlist
+                'factory': index_info.get('parameters', {}).get('factory'),
+                'nlist': nlist
             })
         elif index_info['type'] == ANNIndexType.ANNOY:
             annoy_data = index_info['index']
@@ -13,6 +13,8 @@ from dataclasses import dataclass
 from enum import Enum
 import hashlib
 
+from infra.text_index import TextIndex
+
 logger = logging.getLogger(__name__)
 
 
@@ -55,6 +57,8 @@ class CaptionManager:
 
         self.logger = logging.getLogger(__name__)
 
+        self._index: Optional[TextIndex] = None
+
         # Initialize VLM library conditionally
         self._initialize_vlm_library()
 
@@ -246,6 +250,10 @@ class CaptionManager:
             with open(cache_file, 'w') as f:
                 json.dump(data, f, indent=2)
 
+            self._text_index().update(
+                "caption", {result.photo_id: result.caption}, confidence={result.photo_id: result.confidence}
+            )
+
         except Exception as e:
             self.logger.warning(f"Failed to cache caption for {result.photo_id}: {e}")
 
@@ -293,41 +301,38 @@ class CaptionManager:
         if not self.is_available():
             return []
 
-        matches = []
-        query_lower = query.lower()
-
-        # Search through cached captions
-        for cache_file in self.caption_cache_dir.glob("*.json"):
-            if cache_file.name == ".gitkeep":
-                continue
-
-            try:
-                with open(cache_file, 'r') as f:
-                    data = json.load(f)
-
-                # Filter by photo IDs if specified
-                if photo_ids and data['photo_id'] not in photo_ids:
-                    continue
-
-                # Check confidence threshold
-                if data['confidence'] < min_confidence:
-                    continue
-
-                # Check if query matches caption
-                caption = data['caption'].lower()
-                if query_lower in caption:
-                    # Calculate relevance score based on text coverage and confidence
-                    text_coverage = len(query_lower) / max(len(caption), 1)
-                    relevance_score = text_coverage * data['confidence']
-                    matches.append((data['photo_id'], relevance_score))
-
-            except Exception as e:
-                self.logger.warning(f"Failed to search caption cache file {cache_file}: {e}")
-
-        # Sort by relevance score
-        matches.sort(key=lambda x: x[1], reverse=True)
+        # Word-prefix match ranked by BM25 over the persistent FTS index
+        try:
+            return self._text_index().search(
+                query,
+                fields=["caption"],
+                paths=photo_ids or None,
+                min_confidence=min_confidence,
+            )
+        except Exception as e:
+            self.logger.warning(f"Caption text index search failed: {e}")
+            return []
 
-        return matches
+    def _text_index(self) -> TextIndex:
+        """FTS index over cached captions, backfilled once from the per-photo cache files."""
+        if self._index is not None:
+            return self._index
+        index = TextIndex(self.caption_dir)
+        if index.count() == 0:
+            texts: Dict[str, str] = {}
+            confidence: Dict[str, float] = {}
+            for cache_file in self.caption_cache_dir.glob("*.json"):
+                try:
+                    with open(cache_file, 'r') as f:
+                        data = json.load(f)
+                    texts[data['photo_id']] = data['caption']
+                    confidence[data['photo_id']] = float(data['confidence'])
+                except Exception as e:
+                    self.logger.warning(f"Skipping unreadable caption cache file {cache_file}: {e}")
+            if texts:
+                index.update("caption", texts, confidence=confidence)
+        self._index = index
+        return index
 
     def get_similar_captions(self, photo_id: str, top_k: int = 5) -> List[Tuple[str, float]]:
         """
@@ -463,6 +468,7 @@ class CaptionManager:
                 if file_path.exists():
                     file_path.unlink()
 
+            self._text_index().remove([photo_id])
             self.logger.info(f"Cleared caption cache for photo {photo_id}")
         else:
             # Clear all cache
@@ -471,6 +477,7 @@ class CaptionManager:
                     if cache_file.is_file():
                         cache_file.unlink()
 
+            self._text_index().clear()
             self.logger.info("Cleared all caption cache")
 
     def get_processing_queue(self) -> List[str]:
@@ -13,6 +13,8 @@ from dataclasses import dataclass
 from enum import Enum
 import hashlib
 
+from infra.text_index import TextIndex
+
 logger = logging.getLogger(__name__)
 
 
@@ -54,6 +56,8 @@ class OCRManager:
 
         self.logger = logging.getLogger(__name__)
 
+        self._index: Optional[TextIndex] = None
+
         # Initialize OCR library conditionally
         self._initialize_ocr_library()
 
@@ -244,6 +248,10 @@ class OCRManager:
             with open(cache_file, 'w') as f:
                 json.dump(data, f, indent=2)
 
+            self._text_index().update(
+                "ocr", {result.photo_id: result.text}, confidence={result.photo_id: result.confidence}
+            )
+
         except Exception as e:
             self.logger.warning(f"Failed to cache OCR result for {result.photo_id}: {e}")
 
@@ -291,41 +299,38 @@ class OCRManager:
         if not self.is_available():
             return []
 
-        matches = []
-        query_lower = query.lower()
-
-        # Search through cached results
-        for cache_file in self.text_cache_dir.glob("*.json"):
-            if cache_file.name == ".gitkeep":
-                continue
-
-            try:
-                with open(cache_file, 'r') as f:
-                    data = json.load(f)
-
-                # Filter by photo IDs if specified
-                if photo_ids and data['photo_id'] not in photo_ids:
-                    continue
-
-                # Check confidence threshold
-                if data['confidence'] < min_confidence:
-                    continue
-
-                # Check if query matches extracted text
-                extracted_text = data['text'].lower()
-                if query_lower in extracted_text:
-                    # Calculate relevance score based on text coverage and confidence
-                    text_coverage = len(query_lower) / max(len(extracted_text), 1)
-                    relevance_score = text_coverage * data['confidence']
-                    matches.append((data['photo_id'], relevance_score))
-
-            except Exception as e:
-                self.logger.warning(f"Failed to search OCR cache file {cache_file}: {e}")
-
-        # Sort by relevance score
-        matches.sort(key=lambda x: x[1], reverse=True)
+        # Word-prefix match ranked by BM25 over the persistent FTS index
+        try:
+            return self._text_index().search(
+                query,
+                fields=["ocr"],
+                paths=photo_ids or None,
+                min_confidence=min_confidence,
+            )
+        except Exception as e:
+            self.logger.warning(f"OCR text index search failed: {e}")
+            return []
 
-        return matches
+    def _text_index(self) -> TextIndex:
+        """FTS index over cached OCR texts, backfilled once from the per-photo cache files."""
+        if self._index is not None:
+            return self._index
+        index = TextIndex(self.ocr_dir)
+        if index.count() == 0:
+            texts: Dict[str, str] = {}
+            confidence: Dict[str, float] = {}
+            for cache_file in self.text_cache_dir.glob("*.json"):
+                try:
+                    with open(cache_file, 'r') as f:
+                        data = json.load(f)
+                    texts[data['photo_id']] = data['text']
+                    confidence[data['photo_id']] = float(data['confidence'])
+                except Exception as e:
+                    self.logger.warning(f"Skipping unreadable OCR cache file {cache_file}: {e}")
+            if texts:
+                index.update("ocr", texts, confidence=confidence)
+        self._index = index
+        return index
 
     def get_statistics(self) -> Dict[str, Any]:
         """Get OCR processing statistics."""
@@ -398,6 +403,7 @@ class OCRManager:
                 if file_path.exists():
                     file_path.unlink()
 
+            self._text_index().remove([photo_id])
             self.logger.info(f"Cleared OCR cache for photo {photo_id}")
         else:
             # Clear all cache
@@ -406,6 +412,7 @@ class OCRManager:
                     if cache_file.is_file():
                         cache_file.unlink()
 
+            self._text_index().clear()
             self.logger.info("Cleared all OCR cache")
 
     def get_processing_queue(self) -> List[str]:
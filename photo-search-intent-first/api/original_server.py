@@ -55,11 +55,20 @@ from api.routers.indexing import router as indexing_router
 from api.routers.config import router as config_router
 from api.attention import router as attention_router  # NEW: adaptive attention (scaffold)
 from infra.analytics import log_search, _analytics_file, _write_event as _write_event_infra
-from infra.collections import load_collections, save_collections, load_smart_collections, save_smart_collections
+from infra.collections import (
+    add_to_collection,
+    collection_paths,
+    delete_collection,
+    load_collections,
+    load_smart_collections,
+    remove_from_collection,
+    save_smart_collections,
+    set_collection,
+)
 from infra.config import config
 from infra.index_store import IndexStore
 from infra.fast_index import FastIndexManager
-from infra.tags import load_tags, save_tags, all_tags
+from infra.tags import add_tags, all_tags, load_tags, remove_tags, save_tags, set_tags, tags_for
 from infra.trips import build_trips as _build_trips, load_trips as _load_trips
 from infra.faces import (
     build_faces as _build_faces,
@@ -958,7 +967,7 @@ def api_auth_check() -> Dict[str, Any]:
 # Watchers (optional)
 from infra.watcher import WatchManager
 _WATCH = WatchManager()
-from domain.models import SUPPORTED_EXTS, SUPPORTED_VIDEO_EXTS, SearchResult
+from domain.models import SUPPORTED_EXTS, SUPPORTED_VIDEO_EXTS
 
 @app.get("/watch/status")
 def api_watch_status() -> Dict[str, Any]:
@@ -1951,99 +1960,22 @@ def api_search_workspace(
     if not folder.exists():
         raise HTTPException(400, "Folder not found")
     emb = _emb(req.provider, req.hf_token, req.openai_key)
-    primary = IndexStore(folder, index_key=getattr(emb, 'index_id', None))
-    primary.load()
+    from infra.index_registry import get_index_store
+    index_key = getattr(emb, 'index_id', None)
+    primary = get_index_store(folder, index_key=index_key)
     stores: List[IndexStore] = [primary]
     for f in load_workspace():
         p = Path(f)
         if p.exists() and str(p.resolve()) != str(folder.resolve()):
-            s = IndexStore(p, index_key=getattr(emb, 'index_id', None))
-            s.load()
-            stores.append(s)
+            stores.append(get_index_store(p, index_key=index_key))
     try:
         qv = emb.embed_text(req.query)
     except Exception:
         raise HTTPException(500, "Embedding failed")
-    import numpy as np
-    E_list = []
-    paths: List[str] = []
-    for s in stores:
-        if s.state.embeddings is not None and len(s.state.embeddings) > 0:
-            E_list.append(s.state.embeddings)
-            paths.extend(s.state.paths)
-    if not E_list:
-        return {"search_id": None, "results": []}
-    E = np.vstack(E_list).astype('float32')
-    sims = (E @ qv).astype(float)
-    k = max(1, min(req.top_k, len(sims)))
-    idx = np.argpartition(-sims, k - 1)[:k]
-    idx = idx[np.argsort(-sims[idx])]
-    out = [SearchResult(path=Path(paths[i]), score=float(sims[i])) for i in idx]
-
-    if req.favorites_only:
-        favset = set()
-        for s in stores:
-            coll = load_collections(s.index_dir)
-            favset.update(coll.get('Favorites', []))
-        out = [r for r in out if str(r.path) in favset]
-    if req.tags:
-        req_set = set(req.tags)
-        tmap: Dict[str, List[str]] = {}
-        for s in stores:
-            for k, v in load_tags(s.index_dir).items():
-                tmap[k] = v
-        out = [r for r in out if req_set.issubset(set(tmap.get(str(r.path), [])))]
-    if req.date_from is not None and req.date_to is not None:
-        mmap: Dict[str, float] = {}
-        for s in stores:
-            mmap.update({sp: float(mt) for sp, mt in zip(s.state.paths or [], s.state.mtimes or [])})
-        out = [r for r in out if req.date_from <= mmap.get(str(r.path), 0.0) <= req.date_to]
-    try:
-        if req.persons:
-            sets: List[set] = []
-            for nm in req.persons:
-                pp = set()
-                for s in stores:
-                    try:
-                        pp.update(set(_face_photos(s.index_dir, str(nm))))
-                    except Exception:
-                        continue
-                sets.append(pp)
-            if sets:
-                inter = set.intersection(*sets) if len(sets) > 1 else sets[0]
-                out = [r for r in out if str(r.path) in inter]
-        elif req.person:
-            ppl = set()
-            for s in stores:
-                try:
-                    ppl.update(set(_face_photos(s.index_dir, str(req.person))))
-                except Exception:
-                    continue
-            out = [r for r in out if str(r.path) in ppl]
-    except Exception:
-        pass
-    if req.place and str(req.place).strip():
-        place_map: Dict[str, str] = {}
-        for s in stores:
-            try:
-                meta_p = s.index_dir / 'exif_index.json'
-                if meta_p.exists():
-                    m = json.loads(meta_p.read_text())
-                    place_map.update({p: (str(v or '')) for p, v in zip(m.get('paths', []), m.get('place', []))})
-            except Exception:
-                continue
-        pl = str(req.place).strip().lower()
-        out = [r for r in out if pl in (place_map.get(str(r.path), '') or '').lower()]
-    if req.has_text:
-        texts_map: Dict[str, str] = {}
-        for s in stores:
-            try:
-                if hasattr(s, 'ocr_texts_file') and s.ocr_texts_file.exists():
-                    d = json.loads(s.ocr_texts_file.read_text())
-                    texts_map.update({p: (t or '') for p, t in zip(d.get('paths', []), d.get('texts', []))})
-            except Exception:
-                continue
-        out = [r for r in out if texts_map.get(str(r.path), '').strip()]
+    # Score each store in place and merge per-store top-k; filters become per-store row masks
+    from infra.federated_search import federated_search
+    from infra.filter_mask import compile_filter_mask
+    out = federated_search(stores, qv, req.top_k, mask_for=lambda s: compile_filter_mask(s, req))
 
     sid = log_search(primary.index_dir, getattr(emb, 'index_id', 'default'), req.query, [(str(r.path), float(r.score)) for r in out])
     return {"search_id": sid, "results": [{"path": p, "score": sc} for (p, sc) in [(str(r.path), float(r.score)) for r in out]]}
@@ -2071,16 +2003,11 @@ def api_get_favorites(directory: str = Query(..., alias="dir")) -> SuccessRespon
 @app.post("/favorites")
 def api_set_favorite(req: FavoritesRequest) -> Dict[str, Any]:
     store = IndexStore(Path(req.dir))
-    coll = load_collections(store.index_dir)
-    fav = coll.get('Favorites', [])
     if req.favorite:
-        if req.path not in fav:
-            fav.append(req.path)
+        add_to_collection(store.index_dir, 'Favorites', [req.path])
     else:
-        fav = [p for p in fav if p != req.path]
-    coll['Favorites'] = fav
-    save_collections(store.index_dir, coll)
-    return {"ok": True, "favorites": fav}
+        remove_from_collection(store.index_dir, 'Favorites', [req.path])
+    return {"ok": True, "favorites": collection_paths(store.index_dir, 'Favorites')}
 
 
 @app.get("/tags")
@@ -2092,10 +2019,8 @@ def api_get_tags(directory: str = Query(..., alias="dir")) -> Dict[str, Any]:
 @app.post("/tags")
 def api_set_tags(req: TagsRequest) -> Dict[str, Any]:
     store = IndexStore(Path(req.dir))
-    t = load_tags(store.index_dir)
-    t[req.path] = sorted({s.strip() for s in req.tags if s.strip()})
-    save_tags(store.index_dir, t)
-    return {"ok": True, "tags": t[req.path]}
+    set_tags(store.index_dir, [req.path], (s.strip() for s in req.tags))
+    return {"ok": True, "tags": tags_for(store.index_dir, [req.path]).get(req.path, [])}
 
 
 @app.get("/saved")
@@ -2210,10 +2135,8 @@ def api_set_collection(
     paths_value = _from_body(body, paths, "paths", default=[], cast=_as_str_list) or []
 
     store = IndexStore(Path(dir_value))
-    coll = load_collections(store.index_dir)
-    coll[name_value] = sorted(set(paths_value))
-    save_collections(store.index_dir, coll)
-    return {"ok": True, "collections": coll}
+    set_collection(store.index_dir, name_value, sorted(set(paths_value)))
+    return {"ok": True, "collections": load_collections(store.index_dir)}
 
 @app.post("/collections/delete")
 def api_delete_collection(
@@ -2225,10 +2148,7 @@ def api_delete_collection(
     name_value = _require(_from_body(body, name, "name"), "name")
 
     store = IndexStore(Path(dir_value))
-    coll = load_collections(store.index_dir)
-    if name_value in coll:
-        del coll[name_value]
-        save_collections(store.index_dir, coll)
+    if delete_collection(store.index_dir, name_value):
         return {"ok": True, "deleted": name_value}
     return {"ok": False, "deleted": None}
 
@@ -3861,26 +3781,14 @@ def api_batch_tag(
     if not folder.exists():
         raise HTTPException(400, "Folder not found")
     store = IndexStore(folder)
-    tag_map = load_tags(store.index_dir)
+    # One transaction per batch; concurrent batches no longer overwrite each other
     updated = 0
-    for path in paths_value:
-        if operation_value == "replace":
-            tag_map[path] = sorted(set(tags_value))
-            updated += 1
-        elif operation_value == "add":
-            current_tags = set(tag_map.get(path, []))
-            new_tags = current_tags.union(set(tags_value))
-            if new_tags != current_tags:
-                tag_map[path] = sorted(new_tags)
-                updated += 1
-        elif operation_value == "remove":
-            current_tags = set(tag_map.get(path, []))
-            new_tags = current_tags - set(tags_value)
-            if new_tags != current_tags:
-                tag_map[path] = sorted(new_tags)
-                updated += 1
-
-    save_tags(store.index_dir, tag_map)
+    if operation_value == "replace":
+        updated = set_tags(store.index_dir, paths_value, tags_value)
+    elif operation_value == "add":
+        updated = add_tags(store.index_dir, paths_value, tags_value)
+    elif operation_value == "remove":
+        updated = remove_tags(store.index_dir, paths_value, tags_value)
     return {"ok": True, "updated": updated, "processed": len(paths_value), "operation": operation_value}
 
 
@@ -3901,16 +3809,9 @@ def api_batch_add_to_collection(
         raise HTTPException(400, "Folder not found")
 
     store = IndexStore(folder)
-    collections = load_collections(store.index_dir)
-
-    current_paths = set(collections.get(collection_value, []))
-    new_paths = current_paths.union(set(paths_value))
-
-    collections[collection_value] = sorted(new_paths)
-    save_collections(store.index_dir, collections)
-
-    added = len(new_paths) - len(current_paths)
-    return {"ok": True, "collection": collection_value, "added": added, "total": len(new_paths)}
+    added = add_to_collection(store.index_dir, collection_value, paths_value)
+    total = len(collection_paths(store.index_dir, collection_value))
+    return {"ok": True, "collection": collection_value, "added": added, "total": total}
 
 
 # Face Clustering Enhancement APIs
@@ -3,24 +3,24 @@ Auto-Curation API Router
 Provides endpoints for intelligent photo organization and curation
 """
 
-from fastapi import APIRouter, HTTPException, BackgroundTasks, Depends
+from fastapi import APIRouter, HTTPException, Depends
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel, Field
 from typing import List, Optional, Dict, Any, Set
 from datetime import datetime, timedelta
 import asyncio
-import os
-import hashlib
+import time
 from pathlib import Path
 import json
-from PIL import Image, ExifTags
-from PIL.ExifTags import TAGS, GPSTAGS
-import cv2
-import numpy as np
 from sklearn.feature_extraction.text import TfidfVectorizer
 from sklearn.metrics.pairwise import cosine_similarity
 import logging
 
+from api.scheduler.job_scheduler import JobCancelled, current_cancel_token, get_job_scheduler
+from infra.curation_analysis import DEFAULT_QUALITY, analyze_photos, image_metadata, image_quality
+from infra.curation_dupes import find_duplicate_groups
+from infra.index_registry import get_index_store
+
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -143,252 +143,40 @@ class AutoCurationResult(BaseModel):
     analysis: List[PhotoAnalysis]
     completed_at: datetime
 
+def _metadata_model(meta: Dict[str, Any]) -> PhotoMetadata:
+    return PhotoMetadata(**{**meta, "date_taken": datetime.fromtimestamp(meta["date_taken"])})
+
 def extract_image_metadata(image_path: str) -> PhotoMetadata:
     """Extract EXIF metadata from image file"""
-    try:
-        with Image.open(image_path) as img:
-            exif_data = img._getexif()
-            metadata = {}
-
-            if exif_data:
-                for tag_id, value in exif_data.items():
-                    tag = TAGS.get(tag_id, tag_id)
-                    metadata[tag] = value
-
-            # Extract specific metadata
-            date_taken = None
-            camera = None
-            lens = None
-            settings = {}
-
-            if 'DateTimeOriginal' in metadata:
-                try:
-                    date_taken = datetime.strptime(metadata['DateTimeOriginal'], '%Y:%m:%d %H:%M:%S')
-                except:
-                    pass
-
-            if 'Make' in metadata and 'Model' in metadata:
-                camera = f"{metadata['Make']} {metadata['Model']}"
-
-            # Extract camera settings
-            if 'ExposureTime' in metadata:
-                settings['shutter_speed'] = f"1/{int(1/metadata['ExposureTime'])}"
-            if 'FNumber' in metadata:
-                settings['aperture'] = f"f/{metadata['FNumber']}"
-            if 'ISOSpeedRatings' in metadata:
-                settings['iso'] = metadata['ISOSpeedRatings']
-            if 'FocalLength' in metadata:
-                settings['focal_length'] = f"{metadata['FocalLength']}mm"
-            if 'Flash' in metadata:
-                settings['flash_used'] = bool(metadata['Flash'])
-
-            # File info
-            file_stat = os.stat(image_path)
-            file_info = {
-                'size_bytes': file_stat.st_size,
-                'format': img.format,
-                'dimensions': {'width': img.width, 'height': img.height},
-                'color_space': img.mode
-            }
-
-            return PhotoMetadata(
-                path=image_path,
-                date_taken=date_taken or datetime.fromtimestamp(file_stat.st_mtime),
-                camera=camera or "Unknown",
-                lens=lens,
-                settings=settings,
-                file_info=file_info
-            )
-    except Exception as e:
-        logger.error(f"Error extracting metadata from {image_path}: {e}")
-        # Return basic metadata
-        file_stat = os.stat(image_path)
-        return PhotoMetadata(
-            path=image_path,
-            date_taken=datetime.fromtimestamp(file_stat.st_mtime),
-            camera="Unknown",
-            file_info={
-                'size_bytes': file_stat.st_size,
-                'format': Path(image_path).suffix.upper().replace('.', ''),
-                'dimensions': {'width': 0, 'height': 0},
-                'color_space': 'Unknown'
-            }
-        )
+    return _metadata_model(image_metadata(image_path))
 
 def assess_image_quality(image_path: str, metadata: PhotoMetadata) -> QualityMetrics:
     """Assess image quality using various metrics"""
-    try:
-        # Load image
-        img = cv2.imread(image_path)
-        if img is None:
-            # Return default quality if image can't be loaded
-            return QualityMetrics(
-                overall=50.0,
-                technical=50.0,
-                composition=50.0,
-                sharpness=50.0,
-                exposure=50.0,
-                colors=50.0,
-                factors={}
-            )
+    return QualityMetrics(**image_quality(image_path))
 
-        # Convert to grayscale for analysis
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-
-        # Sharpness assessment (Laplacian variance)
-        laplacian_var = cv2.Laplacian(gray, cv2.CV_64F).var()
-        sharpness = min(100, max(0, laplacian_var / 100))  # Normalize to 0-100
-
-        # Brightness assessment
-        brightness = np.mean(gray)
-        brightness_score = min(100, max(0, 100 - abs(brightness - 128) * 0.8))
-
-        # Contrast assessment
-        contrast = np.std(gray)
-        contrast_score = min(100, max(0, contrast * 0.5))
-
-        # Noise assessment (simplified)
-        blur = cv2.GaussianBlur(gray, (5, 5), 0)
-        noise = np.mean(cv2.absdiff(gray, blur))
-        noise_score = min(100, max(0, 100 - noise))
-
-        # Composition assessment (simplified - rule of thirds simulation)
-        height, width = gray.shape
-        h_third, v_third = height // 3, width // 3
-
-        # Check if there's content in rule of thirds areas
-        roi_corners = [
-            gray[0:h_third, 0:v_third],
-            gray[0:h_third, 2*v_third:],
-            gray[2*h_third:, 0:v_third],
-            gray[2*h_third:, 2*v_third:]
-        ]
-
-        corner_activity = np.mean([np.std(roi) for roi in roi_corners])
-        center_activity = np.std(gray[h_third:2*h_third, v_third:2*v_third])
-
-        composition_score = min(100, max(0, (corner_activity - center_activity) * 2 + 50))
-
-        # Color assessment
-        if len(img.shape) == 3:
-            # Convert to HSV for better color analysis
-            hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
-            saturation = np.mean(hsv[:, :, 1])
-            color_score = min(100, max(0, saturation / 2.55))  # Normalize from 0-255 to 0-100
-        else:
-            color_score = 30  # Grayscale images get lower color score
-
-        # Calculate overall scores
-        technical = (sharpness + noise_score) / 2
-        composition = composition_score
-        overall = (sharpness + brightness_score + contrast_score + noise_score + composition_score + color_score) / 6
-
-        return QualityMetrics(
-            overall=min(100, max(0, overall)),
-            technical=min(100, max(0, technical)),
-            composition=min(100, max(0, composition)),
-            sharpness=min(100, max(0, sharpness)),
-            exposure=min(100, max(0, brightness_score)),
-            colors=min(100, max(0, color_score)),
-            factors={
-                'blurriness': min(100, max(0, 100 - sharpness)),
-                'noise': min(100, max(0, 100 - noise_score)),
-                'contrast': contrast_score,
-                'brightness': brightness_score,
-                'saturation': color_score,
-                'composition_score': composition_score,
-                'rule_of_thirds': composition_score,
-                'leading_lines': composition_score * 0.8,  # Simplified
-                'symmetry': composition_score * 0.6  # Simplified
-            }
-        )
-
-    except Exception as e:
-        logger.error(f"Error assessing quality for {image_path}: {e}")
-        return QualityMetrics(
-            overall=50.0,
-            technical=50.0,
-            composition=50.0,
-            sharpness=50.0,
-            exposure=50.0,
-            colors=50.0,
-            factors={}
-        )
-
-def find_duplicate_photos(photo_paths: List[str], threshold: float = 85.0) -> List[List[str]]:
-    """Find duplicate or similar photos"""
-    duplicates = []
-    processed = set()
+def find_duplicate_photos(photo_paths: List[str], threshold: float = 85.0, store=None) -> List[List[str]]:
+    """Find duplicate or similar photos.
 
+    Exact copies are found by size-bucketed streaming hashes, near duplicates
+    by embedding similarity from ``store`` (perceptual hashes for photos it
+    does not cover); see ``infra.curation_dupes``.
+    """
     try:
-        # Calculate file hashes for exact duplicates
-        file_hashes = {}
-        for path in photo_paths:
-            try:
-                with open(path, 'rb') as f:
-                    file_hash = hashlib.md5(f.read()).hexdigest()
-                    if file_hash not in file_hashes:
-                        file_hashes[file_hash] = []
-                    file_hashes[file_hash].append(path)
-            except Exception as e:
-                logger.error(f"Error reading {path}: {e}")
-                continue
-
-        # Find exact duplicates
-        for file_hash, paths in file_hashes.items():
-            if len(paths) > 1:
-                duplicates.append(paths)
-                processed.update(paths)
-
-        # For remaining photos, use image similarity (simplified)
-        remaining = [p for p in photo_paths if p not in processed]
-
-        # This is a simplified version - in production, you'd use more sophisticated
-        # image similarity algorithms like SIFT, ORB, or deep learning features
-        for i, path1 in enumerate(remaining):
-            similar_photos = [path1]
-            try:
-                img1 = cv2.imread(path1, cv2.IMREAD_GRAYSCALE)
-                if img1 is None:
-                    continue
-
-                img1 = cv2.resize(img1, (256, 256))  # Resize for faster processing
-
-                for path2 in remaining[i+1:]:
-                    if path2 in processed:
-                        continue
-
-                    try:
-                        img2 = cv2.imread(path2, cv2.IMREAD_GRAYSCALE)
-                        if img2 is None:
-                            continue
-
-                        img2 = cv2.resize(img2, (256, 256))
-
-                        # Calculate similarity using template matching (simplified)
-                        result = cv2.matchTemplate(img1, img2, cv2.TM_CCOEFF_NORMED)
-                        similarity = np.max(result) * 100
-
-                        if similarity >= threshold:
-                            similar_photos.append(path2)
-                            processed.add(path2)
-
-                    except Exception as e:
-                        logger.error(f"Error comparing {path1} and {path2}: {e}")
-                        continue
-
-                if len(similar_photos) > 1:
-                    duplicates.append(similar_photos)
-                    processed.update(similar_photos)
-
-            except Exception as e:
-                logger.error(f"Error processing {path1}: {e}")
-                continue
-
+        return find_duplicate_groups(photo_paths, threshold, store=store)
     except Exception as e:
         logger.error(f"Error in duplicate detection: {e}")
+        return []
 
-    return duplicates
+def _curation_store(options: Dict[str, Any]):
+    """Loaded IndexStore named by the ``directory``/``index_key`` options, if any."""
+    directory = options.get("directory")
+    if not directory:
+        return None
+    try:
+        return get_index_store(directory, options.get("index_key"))
+    except Exception as e:
+        logger.warning(f"No index for {directory}, comparing photos by hash: {e}")
+        return None
 
 def detect_events(photo_analyses: List[PhotoAnalysis]) -> List[EventInfo]:
     """Detect events from photo metadata and patterns"""
@@ -520,64 +308,75 @@ def generate_smart_collections(photo_analyses: List[PhotoAnalysis]) -> List[Smar
 
     return collections
 
-async def analyze_photos_task(job_id: str, request: AutoCurationRequest):
-    """Background task for analyzing photos"""
+def _analysis_cache_dir(store) -> Optional[Path]:
+    """Keep the analysis cache with the library's index when one was named."""
+    return getattr(store, "index_dir", None)
+
+def analyze_photos_task(job_id: str, request: AutoCurationRequest):
+    """Background task for analyzing photos.
+
+    Runs on a scheduler worker thread; the per-photo work goes to a process
+    pool and is cached by (path, mtime, size), see ``infra.curation_analysis``.
+    """
     try:
+        started = time.monotonic()
+        total = len(request.photo_paths)
         analysis_jobs[job_id] = {
             "status": "processing",
             "processed_photos": 0,
-            "total_photos": len(request.photo_paths),
+            "total_photos": total,
             "current_step": "Initializing analysis",
             "estimated_time_remaining": 0,
             "actions_suggested": 0
         }
+        store = _curation_store(request.options)
+        token = current_cancel_token()
+
+        def _progress(done: int, reused: int) -> bool:
+            analyzed = done - reused
+            elapsed = time.monotonic() - started
+            remaining = total - done
+            analysis_jobs[job_id].update({
+                "processed_photos": done,
+                "current_step": f"Analyzing photos ({reused} unchanged)" if reused else "Analyzing photos",
+                "estimated_time_remaining": int(elapsed / analyzed * remaining) if analyzed else remaining,
+            })
+            return not (token and token.cancelled)
+
+        rows = analyze_photos(
+            request.photo_paths,
+            quality=request.options.get("enable_quality_assessment", True),
+            cache_dir=_analysis_cache_dir(store),
+            on_progress=_progress,
+        )
+        if token:
+            token.raise_if_cancelled()
 
         photo_analyses = []
         actions = []
-
-        # Process each photo
-        for i, photo_path in enumerate(request.photo_paths):
-            try:
-                # Update progress
-                analysis_jobs[job_id].update({
-                    "processed_photos": i,
-                    "current_step": f"Analyzing {os.path.basename(photo_path)}",
-                    "estimated_time_remaining": max(0, (len(request.photo_paths) - i) * 2)  # Estimate 2 seconds per photo
-                })
-
-                # Extract metadata
-                metadata = extract_image_metadata(photo_path)
-
-                # Assess quality if enabled
-                quality = QualityMetrics(overall=50.0, technical=50.0, composition=50.0,
-                                      sharpness=50.0, exposure=50.0, colors=50.0, factors={})
-                if request.options.get("enable_quality_assessment", True):
-                    quality = assess_image_quality(photo_path, metadata)
-
-                # Create analysis (simplified version)
-                analysis = PhotoAnalysis(
-                    path=photo_path,
-                    quality=quality,
-                    duplicates=[],  # Will be filled later
-                    events=[],     # Will be filled later
-                    faces=[],      # Will be filled later
-                    locations=[],  # Will be filled later
-                    tags=[],       # Will be filled later
-                    metadata=metadata
-                )
-
-                photo_analyses.append(analysis)
-
-            except Exception as e:
-                logger.error(f"Error analyzing photo {photo_path}: {e}")
+        for row in rows:
+            if row is None:
                 continue
+            metadata = _metadata_model(row["metadata"])
+            analysis = PhotoAnalysis(
+                path=metadata.path,
+                quality=QualityMetrics(**(row["quality"] or DEFAULT_QUALITY)),
+                duplicates=[],  # Will be filled later
+                events=[],     # Will be filled later
+                faces=[],      # Will be filled later
+                locations=[],  # Will be filled later
+                tags=[],       # Will be filled later
+                metadata=metadata
+            )
+            photo_analyses.append(analysis)
 
         # Find duplicates if enabled
         if request.options.get("enable_duplicate_detection", True):
             analysis_jobs[job_id]["current_step"] = "Finding duplicates"
             duplicate_groups = find_duplicate_photos(
                 request.photo_paths,
-                request.options.get("duplicate_threshold", 85.0)
+                request.options.get("duplicate_threshold", 85.0),
+                store=store,
             )
 
             # Create duplicate cleanup actions
@@ -645,7 +444,7 @@ async def analyze_photos_task(job_id: str, request: AutoCurationRequest):
                     "events_detected": len(events),
                     "smart_collections_suggested": len(collections),
                     "quality_ratings_assigned": len([a for a in actions if a.type == "rate_photos"]),
-                    "processing_time": 0  # Would track actual time
+                    "processing_time": round(time.monotonic() - started, 2)
                 },
                 "actions": actions,
                 "collections": collections,
@@ -654,6 +453,9 @@ async def analyze_photos_task(job_id: str, request: AutoCurationRequest):
             }
         })
 
+    except JobCancelled:
+        analysis_jobs[job_id].update({"status": "cancelled", "current_step": "Cancelled"})
+        raise
     except Exception as e:
         logger.error(f"Error in analysis job {job_id}: {e}")
         analysis_jobs[job_id] = {
@@ -663,12 +465,22 @@ async def analyze_photos_task(job_id: str, request: AutoCurationRequest):
         }
 
 @router.post("/analyze", response_model=Dict[str, str])
-async def start_auto_curation_analysis(request: AutoCurationRequest, background_tasks: BackgroundTasks):
+async def start_auto_curation_analysis(request: AutoCurationRequest):
     """Start auto-curation analysis in background"""
     job_id = f"job_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{len(analysis_jobs)}"
 
-    # Start background task
-    background_tasks.add_task(analyze_photos_task, job_id, request)
+    # Queue on the job scheduler (curation class) rather than the event loop's thread pool
+    analysis_jobs[job_id] = {
+        "status": "queued",
+        "processed_photos": 0,
+        "total_photos": len(request.photo_paths),
+        "current_step": "Queued",
+        "estimated_time_remaining": 0,
+        "actions_suggested": 0
+    }
+    get_job_scheduler().submit_function(
+        analyze_photos_task, job_id, request, name=f"auto-curation {job_id}", job_class="curation"
+    )
 
     return {
         "job_id": job_id,
@@ -7,9 +7,9 @@ from fastapi import APIRouter, Body, HTTPException
 
 from api.routers.file_management import api_delete
 from api.utils import _as_bool, _as_str_list, _from_body, _require
-from infra.collections import load_collections, save_collections
+from infra.collections import add_to_collection, collection_paths
 from infra.index_store import IndexStore
-from infra.tags import load_tags, save_tags
+from infra.tags import add_tags, remove_tags, set_tags
 
 router = APIRouter(tags=["batch"])
 
@@ -55,26 +55,14 @@ def api_batch_tag(
     if not folder.exists():
         raise HTTPException(400, "Folder not found")
     store = IndexStore(folder)
-    tag_map = load_tags(store.index_dir)
+    # One transaction per batch; concurrent batches no longer overwrite each other
     updated = 0
-    for path in paths_value:
-        if operation_value == "replace":
-            tag_map[path] = sorted(set(tags_value))
-            updated += 1
-        elif operation_value == "add":
-            current_tags = set(tag_map.get(path, []))
-            new_tags = current_tags.union(set(tags_value))
-            if new_tags != current_tags:
-                tag_map[path] = sorted(new_tags)
-                updated += 1
-        elif operation_value == "remove":
-            current_tags = set(tag_map.get(path, []))
-            new_tags = current_tags - set(tags_value)
-            if new_tags != current_tags:
-                tag_map[path] = sorted(new_tags)
-                updated += 1
-
-    save_tags(store.index_dir, tag_map)
+    if operation_value == "replace":
+        updated = set_tags(store.index_dir, paths_value, tags_value)
+    elif operation_value == "add":
+        updated = add_tags(store.index_dir, paths_value, tags_value)
+    elif operation_value == "remove":
+        updated = remove_tags(store.index_dir, paths_value, tags_value)
     return {"ok": True, "updated": updated, "processed": len(paths_value), "operation": operation_value}
 
 
@@ -95,13 +83,6 @@ def api_batch_add_to_collection(
         raise HTTPException(400, "Folder not found")
 
     store = IndexStore(folder)
-    collections = load_collections(store.index_dir)
-
-    current_paths = set(collections.get(collection_value, []))
-    new_paths = current_paths.union(set(paths_value))
-
-    collections[collection_value] = sorted(new_paths)
-    save_collections(store.index_dir, collections)
-
-    added = len(new_paths) - len(current_paths)
-    return {"ok": True, "collection": collection_value, "added": added, "total": len(new_paths)}
\ No newline at end of file
+    added = add_to_collection(store.index_dir, collection_value, paths_value)
+    total = len(collection_paths(store.index_dir, collection_value))
+    return {"ok": True, "collection": collection_value, "added": added, "total": total}
\ No newline at end of file
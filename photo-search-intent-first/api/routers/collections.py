@@ -7,7 +7,7 @@ from fastapi import APIRouter, Body, Query
 
 from api.schemas.v1 import CollectionsResponse, CollectionDeleteResponse
 from api.utils import _as_str_list, _from_body, _require
-from infra.collections import load_collections, save_collections
+from infra.collections import delete_collection, load_collections, set_collection
 from infra.index_store import IndexStore
 
 router = APIRouter(tags=["collections"])
@@ -33,10 +33,8 @@ def api_set_collection(
     paths_value = _from_body(body, paths, "paths", default=[], cast=_as_str_list) or []
 
     store = IndexStore(Path(dir_value))
-    coll = load_collections(store.index_dir)
-    coll[name_value] = sorted(set(paths_value))
-    save_collections(store.index_dir, coll)
-    return CollectionsResponse(ok=True, collections=coll)
+    set_collection(store.index_dir, name_value, sorted(set(paths_value)))
+    return CollectionsResponse(ok=True, collections=load_collections(store.index_dir))
 
 
 @router.post("/collections/delete", response_model=CollectionDeleteResponse)
@@ -50,9 +48,6 @@ def api_delete_collection(
     name_value = _require(_from_body(body, name, "name"), "name")
 
     store = IndexStore(Path(dir_value))
-    coll = load_collections(store.index_dir)
-    if name_value in coll:
-        del coll[name_value]
-        save_collections(store.index_dir, coll)
+    if delete_collection(store.index_dir, name_value):
         return CollectionDeleteResponse(ok=True, deleted=name_value)
     return CollectionDeleteResponse(ok=False, deleted=None)
\ No newline at end of file
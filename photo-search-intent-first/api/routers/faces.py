@@ -5,9 +5,8 @@ from typing import Any, Dict, List, Optional
 
 from fastapi import APIRouter, Body, HTTPException, Query
 
-from api.utils import _as_str_list, _emb, _from_body, _require
+from api.utils import _as_str_list, _emb, _from_body, _require, _submit_faces
 from infra.faces import (
-    build_faces as _build_faces,
     list_clusters as _face_list,
     photos_for_person as _face_photos,
     set_cluster_name as _face_name,
@@ -23,7 +22,7 @@ def build_faces(
     provider: Optional[str] = None,
     body: Optional[Dict[str, Any]] = Body(None),
 ) -> Dict[str, Any]:
-    """Build face detection and clustering for all photos in directory."""
+    """Queue face detection and clustering for all photos in directory; returns the job id."""
     dir_value = _require(_from_body(body, dir, "dir"), "dir")
     provider_value = _from_body(body, provider, "provider", default="local") or "local"
 
@@ -34,8 +33,8 @@ def build_faces(
     emb = _emb(provider_value, None, None)
     store = IndexStore(folder, index_key=getattr(emb, 'index_id', None))
     store.load()
-    out = _build_faces(store.index_dir, store.state.paths or [])
-    return out
+    job_id = _submit_faces(store)
+    return {"ok": True, "job_id": job_id}
 
 
 @router.get("/faces/clusters")
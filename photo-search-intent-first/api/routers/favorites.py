@@ -10,7 +10,7 @@ from fastapi import APIRouter, HTTPException, Query
 
 from api.schemas.v1 import FavoritesRequest, SuccessResponse, FavoriteResponse
 from api.utils import _zip_meta
-from infra.collections import load_collections, save_collections
+from infra.collections import add_to_collection, load_collections, remove_from_collection
 from infra.index_store import IndexStore
 
 router = APIRouter()
@@ -52,13 +52,8 @@ def api_set_favorite(req: FavoritesRequest) -> FavoriteResponse:
     Returns FavoriteResponse with the toggled path and resulting favorite state.
     """
     store = IndexStore(Path(req.dir))
-    coll = load_collections(store.index_dir)
-    fav = coll.get('Favorites', [])
     if req.favorite:
-        if req.path not in fav:
-            fav.append(req.path)
+        add_to_collection(store.index_dir, 'Favorites', [req.path])
     else:
-        fav = [p for p in fav if p != req.path]
-    coll['Favorites'] = fav
-    save_collections(store.index_dir, coll)
+        remove_from_collection(store.index_dir, 'Favorites', [req.path])
     return FavoriteResponse(ok=True, path=req.path, favorite=req.favorite)
\ No newline at end of file
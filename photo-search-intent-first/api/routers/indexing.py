@@ -4,7 +4,6 @@ import json
 import os
 import shutil
 import time
-import uuid
 from pathlib import Path
 from typing import Any, Dict, Optional, Set
 
@@ -14,11 +13,9 @@ from pydantic import BaseModel
 from adapters.provider_factory import get_provider
 from domain.models import SUPPORTED_EXTS
 # Lazy import: from infra.index_store import IndexStore  # imports numpy
-from infra.analytics import _write_event as _write_event_infra
 from infra.watcher import WatchManager
-from usecases.index_photos import index_photos
 from api.auth import require_auth
-from api.utils import _from_body, _require, _emb
+from api.utils import _from_body, _require, _emb, _submit_index
 from api.runtime_flags import is_offline
 
 
@@ -58,24 +55,9 @@ def api_index(req: IndexRequest, _auth=Depends(require_auth)) -> Dict[str, Any]:
 
     emb = _emb(provider, req.hf_token, req.openai_key)
 
-    job_id = f"index-{uuid.uuid4().hex[:8]}"
-
-    new_c, upd_c, total = index_photos(
-        folder,
-        batch_size=req.batch_size,
-        embedder=emb,
-        job_id=job_id,
-    )
-    try:
-        _write_event_infra(IndexStore(folder, index_key=getattr(emb, "index_id", None)).index_dir, {
-            "type": "index",
-            "new": int(new_c),
-            "updated": int(upd_c),
-            "total": int(total),
-        })
-    except Exception:
-        pass
-    return {"new": new_c, "updated": upd_c, "total": total, "job_id": job_id}
+    # Queued as an admission-controlled embedding job; clients poll its status
+    job_id = _submit_index(folder, req.batch_size, emb)
+    return {"ok": True, "job_id": job_id}
 
 
 @router.post("/data/nuke")
@@ -12,7 +12,7 @@ Returned JSON structure matches the TypeScript consumer expectation in
 from __future__ import annotations
 
 from pathlib import Path
-from typing import Dict, Any, Iterable, Sequence
+from typing import Dict, Any, Iterable, Optional, Sequence
 import json
 import os
 import time
@@ -231,4 +231,22 @@ def model_status(force: int = 0) -> Dict[str, Any]:  # pragma: no cover - simple
     payload = _build_status_payload()
     _cache["payload"] = payload
     _cache["ts"] = now
-    return payload
\ No newline at end of file
+    return payload
+
+@router.get("/api/model/pool")
+def model_pool() -> Dict[str, Any]:
+    """Embedding providers resident in this process, with load time and memory."""
+    from adapters.provider_pool import provider_pool
+    providers = provider_pool.stats()
+    return {
+        "ok": True,
+        "providers": providers,
+        "resident_bytes": sum(p["resident_bytes"] for p in providers),
+    }
+
+
+@router.post("/api/model/unload")
+def model_unload(provider: Optional[str] = None, model: Optional[str] = None) -> Dict[str, Any]:
+    """Drop pooled providers (optionally only one kind/model) to free memory."""
+    from adapters.provider_pool import provider_pool
+    return {"ok": True, "unloaded": provider_pool.unload(kind=provider, model=model)}
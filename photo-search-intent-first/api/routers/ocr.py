@@ -9,9 +9,9 @@ from typing import Dict, Any, List, Optional
 from pathlib import Path
 import json
 
-from api.utils import _require, _from_body, _as_str_list, _emb
+from api.utils import _require, _from_body, _as_str_list, _emb, _submit_ocr
 from infra.index_store import IndexStore
-from infra.analytics import _write_event
+from infra.text_index import text_index_for_store
 
 router = APIRouter()
 
@@ -25,7 +25,7 @@ def api_build_ocr(
     openai_key: Optional[str] = None,
     body: Optional[Dict[str, Any]] = Body(None),
 ) -> Dict[str, Any]:
-    """Build OCR text index for a photo directory."""
+    """Queue an OCR text index build for a photo directory; returns its job id."""
     dir_value = _require(_from_body(body, dir, "dir"), "dir")
     provider_value = _from_body(body, provider, "provider", default="local") or "local"
     languages_value = _from_body(body, languages, "languages")
@@ -40,15 +40,8 @@ def api_build_ocr(
     
     emb = _emb(provider_value, hf_token_value, openai_key_value)
     store = IndexStore(folder, index_key=getattr(emb, 'index_id', None))
-    updated = store.build_ocr(emb, languages=languages_value)
-    
-    # Log analytics event
-    try:
-        _write_event(store.index_dir, { 'type': 'ocr_build', 'updated': updated, 'langs': languages_value or [] })
-    except Exception:
-        pass  # Non-critical, don't fail the request
-    
-    return {"updated": updated}
+    job_id = _submit_ocr(store, emb, languages_value)
+    return {"ok": True, "job_id": job_id}
 
 
 @router.post("/ocr/snippets")
@@ -56,32 +49,24 @@ def api_ocr_snippets(
     dir: Optional[str] = None,
     paths: Optional[List[str]] = None,
     limit: Optional[int] = None,
+    query: Optional[str] = None,
     body: Optional[Dict[str, Any]] = Body(None),
 ) -> Dict[str, Any]:
     """Get OCR text snippets for specific image paths."""
     dir_value = _require(_from_body(body, dir, "dir"), "dir")
     paths_value = _from_body(body, paths, "paths", default=[], cast=_as_str_list) or []
     limit_value = _from_body(body, limit, "limit", default=160, cast=int) or 160
+    query_value = _from_body(body, query, "query")
 
     store = IndexStore(Path(dir_value))
     texts: Dict[str, str] = {}
     try:
         if not store.ocr_texts_file.exists():
             return {"snippets": {}}
-        d = json.loads(store.ocr_texts_file.read_text())
-        base = {p: (t or '') for p, t in zip(d.get('paths', []), d.get('texts', []))}
-        
-        def mk_snip(s: str) -> str:
-            try:
-                s = ' '.join(s.split())
-                return s[: max(0, limit_value)].strip()
-            except Exception:
-                return s[: max(0, limit_value)] if s else ''
-        
-        for p in paths_value or []:
-            t = base.get(p, '')
-            if t:
-                texts[p] = mk_snip(t)
+        # Only the requested rows are read; with a query the snippet centres on its matches
+        texts = text_index_for_store(store).snippets(
+            paths_value, query=query_value, field="ocr", limit=limit_value
+        )
     except Exception:
         texts = {}
     return {"snippets": texts}
@@ -10,7 +10,7 @@ from fastapi import APIRouter, Body, Query
 from api.schemas.v1 import TagsRequest, TagResponse, TagsListResponse, AutoTagResponse
 from api.utils import _from_body, _require, _emb
 from infra.index_store import IndexStore
-from infra.tags import load_tags, save_tags, all_tags
+from infra.tags import load_tags, save_tags, all_tags, set_tags, tags_for
 
 # Legacy router without prefix for parity with original_server.py routes
 router = APIRouter(tags=["tagging"])
@@ -79,7 +79,5 @@ def api_get_tags(directory: str = Query(..., alias="dir")) -> TagsListResponse:
 def api_set_tags(req: TagsRequest) -> TagResponse:
     """Set tags for a specific photo."""
     store = IndexStore(Path(req.dir))
-    t = load_tags(store.index_dir)
-    t[req.path] = sorted({s.strip() for s in req.tags if s.strip()})
-    save_tags(store.index_dir, t)
-    return TagResponse(ok=True, path=req.path, tags=t[req.path])
\ No newline at end of file
+    set_tags(store.index_dir, [req.path], (s.strip() for s in req.tags))
+    return TagResponse(ok=True, path=req.path, tags=tags_for(store.index_dir, [req.path]).get(req.path, []))
\ No newline at end of file
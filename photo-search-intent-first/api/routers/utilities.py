@@ -7,12 +7,12 @@ import shutil
 from pathlib import Path
 from typing import Any, Dict, List, Optional
 
-from fastapi import APIRouter, Body, HTTPException, Query
+from fastapi import APIRouter, Body, HTTPException, Query, Request
 from fastapi.responses import FileResponse, JSONResponse
 # Lazy import: from PIL import Image, ExifTags  # Can cause threading issues if imported at top level
 
 from api.schemas.v1 import CachedSearchRequest, SearchRequest
-from api.utils import _as_bool, _as_str_list, _emb, _from_body, _require
+from api.utils import _as_bool, _as_str_list, _emb, _from_body, _require, _thumb_response
 from infra.analytics import log_search, _write_event as _write_event_infra
 # Lazy import: from infra.faces import load_faces as _faces_load  # imports numpy and PIL
 # Lazy import: from infra.index_store import IndexStore  # imports numpy
@@ -86,14 +86,13 @@ def api_export(
 def api_map(directory: str = Query(..., alias="dir"), limit: int = 1000) -> Dict[str, Any]:
     """Extract GPS coordinates from EXIF data of photos for map visualization."""
     from PIL import ExifTags
-    from infra.index_store import IndexStore
+    from infra.index_registry import get_index_store
     folder = Path(directory)
     if not folder.exists():
         raise HTTPException(400, "Folder not found")
     inv = {v: k for k, v in ExifTags.TAGS.items()}
     pts: List[Dict[str, float]] = []
-    store = IndexStore(folder)
-    store.load()
+    store = get_index_store(folder)
     def to_deg(val):
         try:
             d,m,s = val
@@ -145,7 +144,7 @@ def search_paginated(
     body: Optional[Dict[str, Any]] = Body(None),
 ) -> Dict[str, Any]:
     """Paginated search with cursor support for large result sets."""
-    from infra.index_store import IndexStore
+    from infra.index_registry import get_index_store
     # Extract pagination parameters
     limit_value = _from_body(body, limit, "limit", default=24, cast=lambda v: int(v)) or 24
     offset_value = _from_body(body, offset, "offset", default=0, cast=lambda v: int(v)) or 0
@@ -169,8 +168,7 @@ def search_paginated(
 
     # Get embedder
     emb = _emb(search_req.provider, search_req.hf_token, search_req.openai_key)
-    store = IndexStore(folder, index_key=getattr(emb, 'index_id', None))
-    store.load()
+    store = get_index_store(folder, index_key=getattr(emb, 'index_id', None))
 
     # Perform search
     if search_req.use_captions and store.captions_available():
@@ -315,69 +313,26 @@ def thumb_batch(
 
 @router.get("/thumb")
 def get_thumbnail(
+    request: Request,
     directory: str = Query(..., alias="dir"), 
     path: str = Query(...), 
-    size: int = 256
+    size: int = 256,
+    v: Optional[str] = None,
 ):
     """Get thumbnail of a photo."""
-    from infra.index_store import IndexStore
+    from services.thumbnail_service import thumbnail_service
     folder = Path(directory)
     if not folder.exists():
         raise HTTPException(400, "Folder not found")
     
-    store = IndexStore(folder)
-    store.load()
-    
-    # Fallback to any existing index if the default one is empty
-    if not store.state.paths:
-        try:
-            bases = []
-            try:
-                bases.append(store.index_dir.parent)
-            except Exception:
-                pass
-            bases.append(folder / '.photo_index')
-            pfile = None
-            for base in bases:
-                try:
-                    if not base.exists():
-                        continue
-                    # Try preferred index first
-                    preferred = base / 'st-clip-ViT-B-32' / 'paths.json'
-                    if preferred.exists():
-                        pfile = preferred
-                        break
-                    # Try any subdirectory with paths.json
-                    for sub in base.iterdir():
-                        if sub.is_dir():
-                            cand = sub / 'paths.json'
-                            if cand.exists():
-                                pfile = cand
-                                break
-                    if pfile is not None:
-                        break
-                except Exception:
-                    continue
-            if pfile is not None:
-                data = json.loads(pfile.read_text(encoding='utf-8'))
-                store.state.paths = data.get('paths', []) or []
-                store.state.mtimes = data.get('mtimes', [0.0] * len(store.state.paths))
-        except Exception:
-            pass
-    
     try:
-        # Find the mtime for this path
-        idx_map = {sp: float(mt) for sp, mt in zip(store.state.paths or [], store.state.mtimes or [])}
-        mtime = idx_map.get(path, 0.0)
-        
-        # Generate or get existing thumbnail
-        tp = get_or_create_thumb(store.index_dir, Path(path), float(mtime), size=size)
-        if tp is None or not tp.exists():
-            raise HTTPException(404, "Thumb not found")
-        
-        return FileResponse(str(tp))
+        # Served from the path -> mtime map; the index itself is never loaded
+        thumb = thumbnail_service.get(folder, path, size=size)
     except Exception:
         raise HTTPException(500, "Failed to generate thumbnail")
+    if thumb is None:
+        raise HTTPException(404, "Thumb not found")
+    return _thumb_response(thumb, request.headers.get("if-none-match"), versioned=bool(v))
 
 
 @router.get("/thumb_face")
@@ -391,15 +346,14 @@ def get_face_thumbnail(
     openai_key: Optional[str] = None
 ):
     """Get thumbnail of a face from a photo."""
-    from infra.index_store import IndexStore
+    from infra.index_registry import get_index_store
     from infra.faces import load as _faces_load
     folder = Path(directory)
     if not folder.exists():
         raise HTTPException(400, "Folder not found")
     
     embd = _emb(provider, hf_token, openai_key)
-    store = IndexStore(folder, index_key=getattr(embd, 'index_id', None))
-    store.load()
+    store = get_index_store(folder, index_key=getattr(embd, 'index_id', None))
     
     try:
         idx_map = {sp: float(mt) for sp, mt in zip(store.state.paths or [], store.state.mtimes or [])}
@@ -443,7 +397,7 @@ def search_like(
     body: Optional[Dict[str, Any]] = Body(None),
 ) -> Dict[str, Any]:
     """Find similar photos to a given photo."""
-    from infra.index_store import IndexStore
+    from infra.index_registry import get_index_store
     dir_value = _require(_from_body(body, dir, "dir"), "dir")
     path_value = _require(_from_body(body, path, "path"), "path")
     top_k_value = _from_body(body, top_k, "top_k", default=12, cast=int) or 12
@@ -456,8 +410,7 @@ def search_like(
         raise HTTPException(400, "Folder not found")
     
     emb = _emb(provider_value, hf_token_value, openai_key_value)
-    store = IndexStore(folder, index_key=getattr(emb, 'index_id', None))
-    store.load()
+    store = get_index_store(folder, index_key=getattr(emb, 'index_id', None))
     out = store.search_like(path_value, top_k=top_k_value)
     return {"results": [{"path": str(r.path), "score": float(r.score)} for r in out]}
 
@@ -475,7 +428,7 @@ def search_like_plus(
     body: Optional[Dict[str, Any]] = Body(None),
 ) -> Dict[str, Any]:
     """Enhanced similarity search with text weighting."""
-    from infra.index_store import IndexStore
+    from infra.index_registry import get_index_store
     dir_value = _require(_from_body(body, dir, "dir"), "dir")
     path_value = _require(_from_body(body, path, "path"), "path")
     top_k_value = _from_body(body, top_k, "top_k", default=12, cast=int) or 12
@@ -490,8 +443,7 @@ def search_like_plus(
         raise HTTPException(400, "Folder not found")
     
     emb = _emb(provider_value, hf_token_value, openai_key_value)
-    store = IndexStore(folder, index_key=getattr(emb, 'index_id', None))
-    store.load()
+    store = get_index_store(folder, index_key=getattr(emb, 'index_id', None))
     
     if store.state.embeddings is None or not store.state.paths:
         return {"results": []}
@@ -518,6 +470,7 @@ def search_cached(
 ) -> Dict[str, Any]:
     """Perform a semantic search with lightweight result caching."""
     from infra.index_store import IndexStore
+    from infra.index_registry import get_index_store
     folder = Path(req.dir).expanduser().resolve()
     if not folder.exists() or not folder.is_dir():
         raise HTTPException(400, "Folder not found")
@@ -552,8 +505,7 @@ def search_cached(
 
     # Cache miss - perform actual search
     emb = _emb(req.provider, req.hf_token, req.openai_key)
-    store = IndexStore(folder, index_key=getattr(emb, 'index_id', None))
-    store.load()
+    store = get_index_store(folder, index_key=getattr(emb, 'index_id', None))
     
     if req.use_captions and store.captions_available():
         results = store.search_with_captions(emb, req.query, top_k=req.top_k)
@@ -588,7 +540,7 @@ def build_thumbnails(
     body: Optional[Dict[str, Any]] = Body(None),
 ) -> Dict[str, Any]:
     """Build thumbnails for all photos in directory."""
-    from infra.index_store import IndexStore
+    from infra.index_registry import get_index_store
     dir_value = _require(_from_body(body, dir, "dir"), "dir")
     size_value = _from_body(body, size, "size", default=512, cast=int) or 512
     provider_value = _from_body(body, provider, "provider", default="local") or "local"
@@ -600,8 +552,7 @@ def build_thumbnails(
         raise HTTPException(400, "Folder not found")
     
     emb = _emb(provider_value, hf_token_value, openai_key_value)
-    store = IndexStore(folder, index_key=getattr(emb, 'index_id', None))
-    store.load()
+    store = get_index_store(folder, index_key=getattr(emb, 'index_id', None))
     
     made = 0
     for sp, mt in zip(store.state.paths or [], store.state.mtimes or []):
@@ -630,7 +581,7 @@ def api_export_search(
     body: Optional[Dict[str, Any]] = Body(None),
 ) -> Dict[str, Any]:
     """Export search results to JSON/CSV format."""
-    from infra.index_store import IndexStore
+    from infra.index_registry import get_index_store
     dir_value = _require(_from_body(body, dir, "dir"), "dir")
     query_value = _require(_from_body(body, query, "query"), "query")
     format_value = (_from_body(body, format, "format", default="json") or "json").lower()
@@ -647,8 +598,7 @@ def api_export_search(
         raise HTTPException(400, "Folder not found")
 
     emb = _emb(provider_value, hf_token_value, openai_key_value)
-    store = IndexStore(folder, index_key=getattr(emb, 'index_id', None))
-    store.load()
+    store = get_index_store(folder, index_key=getattr(emb, 'index_id', None))
 
     # Perform search
     results = store.search(emb, query_value, top_k=1000)  # Get many results for export
@@ -706,6 +656,7 @@ def api_export_library(
 ) -> Dict[str, Any]:
     """Export entire photo library to JSON/CSV format."""
     from infra.index_store import IndexStore
+    from infra.index_registry import get_index_store
     dir_value = _require(_from_body(body, dir, "dir"), "dir")
     format_value = (_from_body(body, format, "format", default="json") or "json").lower()
     include_metadata_value = _from_body(body, include_metadata, "include_metadata", default=False, cast=_as_bool) or False
@@ -738,8 +689,7 @@ def api_export_library(
     
     # Fallback to default
     if store is None:
-        store = IndexStore(folder)
-        store.load()
+        store = get_index_store(folder)
 
     # Get all photos
     paths = store.state.paths or []
@@ -1,11 +1,30 @@
 """
 Lightweight job scheduler for the Photo Search backend.
 Provides simple queuing and prioritization for background tasks.
+
+Workers block on a condition variable and are woken by submit, completion
+and cancellation, so dispatch has no polling delay and idle workers never
+hold the queue lock. Each priority level has its own FIFO queue; jobs may
+belong to a job class with a concurrency limit (e.g. one embedding job at a
+time), and running jobs can be cancelled cooperatively through their
+CancelToken.
+
+Job classes also declare resource needs (model RAM, CPU cores). A job is
+admitted only while the running jobs' totals stay within the scheduler's
+budgets, so e.g. two 4 GB model jobs never run side by side. Classes marked
+``executor="process"`` run in a shared process pool so CPU-heavy work does
+not compete with the API for the GIL.
 """
+import asyncio
+import inspect
+import multiprocessing
+import os
 import time
-import heapq
 import threading
-from typing import Callable, Any, Optional, Dict
+import uuid
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, wait as wait_futures
+from typing import Callable, Any, Optional, Dict, Deque, Tuple
 from dataclasses import dataclass, field
 from enum import IntEnum
 import logging
@@ -21,6 +40,65 @@ class JobPriority(IntEnum):
     LOW = 3          # Maintenance/background tasks
 
 
+class JobCancelled(Exception):
+    """Raised inside a job when its cancellation has been requested."""
+
+
+class CancelToken:
+    """Cooperative cancellation flag shared between a job and the scheduler.
+
+    ``event`` may be a multiprocessing manager Event so that a job running in
+    the process pool sees the flag too.
+    """
+
+    def __init__(self, event: Any = None) -> None:
+        self._event = event if event is not None else threading.Event()
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self) -> None:
+        self._event.set()
+
+    def raise_if_cancelled(self) -> None:
+        """Checkpoint for long-running jobs: raise JobCancelled if cancelled."""
+        if self._event.is_set():
+            raise JobCancelled()
+
+
+_current = threading.local()
+
+
+def current_cancel_token() -> Optional[CancelToken]:
+    """The CancelToken of the job running on this thread, if any."""
+    return getattr(_current, "token", None)
+
+
+def current_job_id() -> Optional[str]:
+    """The id of the job running on this thread, if any."""
+    return getattr(_current, "job_id", None)
+
+
+def _call_with_token(event: Any, func: Callable, args: tuple, kwargs: dict) -> Any:
+    """Process-pool entry point: expose the job's cancel flag via current_cancel_token()."""
+    _current.token = CancelToken(event)
+    try:
+        return func(*args, **kwargs)
+    finally:
+        _current.token = None
+
+
+@dataclass(frozen=True)
+class JobClass:
+    """Resource declaration shared by all jobs of one kind."""
+    name: str
+    ram_mb: int = 0                        # Peak memory the job holds (models, buffers)
+    cpu_cores: float = 0.0                 # Cores the job keeps busy
+    max_concurrent: Optional[int] = None   # Hard cap on simultaneous jobs
+    executor: str = "thread"               # "thread", or "process" for picklable CPU-bound work
+
+
 @dataclass
 class Job:
     """Represents a scheduled job."""
@@ -30,143 +108,308 @@ class Job:
     args: tuple = field(default_factory=tuple)
     kwargs: dict = field(default_factory=dict)
     priority: JobPriority = JobPriority.NORMAL
+    job_class: str = "default"  # Concurrency limits apply per class
     submit_time: float = field(default_factory=time.time)
     start_time: Optional[float] = None
     end_time: Optional[float] = None
     estimated_duration: float = 1.0  # Estimated duration in seconds
     result: Any = None
     error: Optional[Exception] = None
-    status: str = "pending"  # pending, running, completed, failed
-    
+    status: str = "pending"  # pending, running, completed, failed, cancelled
+    cancel_token: CancelToken = field(default_factory=CancelToken)
+
     def __lt__(self, other):
-        """For heap ordering: priority first, then submit time."""
+        """Ordering: priority first, then submit time."""
         if self.priority != other.priority:
             return self.priority < other.priority
         return self.submit_time < other.submit_time
 
 
+class _Histogram:
+    """Fixed-bucket latency histogram (seconds)."""
+
+    BOUNDS: Tuple[float, ...] = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0, 30.0, 120.0, 600.0)
+
+    def __init__(self) -> None:
+        self.counts = [0] * (len(self.BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float) -> None:
+        seconds = max(0.0, float(seconds))
+        i = 0
+        while i < len(self.BOUNDS) and seconds > self.BOUNDS[i]:
+            i += 1
+        self.counts[i] += 1
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+
+    def _quantile(self, q: float) -> Optional[float]:
+        """Upper bucket bound containing the q-quantile (max for the overflow bucket)."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= rank and c:
+                return self.BOUNDS[i] if i < len(self.BOUNDS) else self.max
+        return self.max
+
+    def snapshot(self) -> Dict[str, Any]:
+        buckets = {f"le_{b:g}": c for b, c in zip(self.BOUNDS, self.counts)}
+        buckets["le_inf"] = self.counts[-1]
+        return {
+            'count': self.count,
+            'sum': round(self.total, 6),
+            'max': round(self.max, 6),
+            'p50': self._quantile(0.5),
+            'p95': self._quantile(0.95),
+            'buckets': buckets,
+        }
+
+
 class LightweightJobScheduler:
-    """Simple job scheduler with priority queue and basic resource management."""
-    
-    def __init__(self, max_workers: int = 4, max_queue_size: int = 1000):
+    """Job scheduler with per-priority queues and per-class concurrency limits."""
+
+    def __init__(self, max_workers: int = 4, max_queue_size: int = 1000,
+                 class_limits: Optional[Dict[str, int]] = None,
+                 ram_budget_mb: Optional[int] = None,
+                 cpu_budget: Optional[float] = None,
+                 process_workers: Optional[int] = None):
         self.max_workers = max_workers
         self.max_queue_size = max_queue_size
-        self.job_queue: list = []  # Heap-based priority queue
+        self.queues: Dict[JobPriority, Deque[Job]] = {p: deque() for p in JobPriority}
+        self.class_limits: Dict[str, int] = dict(class_limits or {})
+        self.class_running: Dict[str, int] = {}
+        self.job_classes: Dict[str, JobClass] = {}
+        # None = unlimited
+        self.ram_budget_mb = ram_budget_mb
+        self.cpu_budget = cpu_budget
+        self.running_ram_mb = 0
+        self.running_cpu = 0.0
+        self.process_workers = process_workers or max(1, (os.cpu_count() or 2) - 1)
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+        self._mp_manager: Any = None
         self.running_jobs: Dict[str, Job] = {}
         self.completed_jobs: Dict[str, Job] = {}
         self.worker_threads = []
         self.shutdown_event = threading.Event()
+        # One lock guards queues, running/completed maps and stats;
+        # workers wait on the condition instead of polling.
         self.queue_lock = threading.Lock()
+        self.work_available = threading.Condition(self.queue_lock)
         self.stats = {
             'submitted': 0,
             'completed': 0,
             'failed': 0,
             'cancelled': 0
         }
-        self.stats_lock = threading.Lock()
-        
+        self.queue_latency = _Histogram()
+        self.run_time = _Histogram()
+
         # Start worker threads
         self._start_workers()
-    
+
     def _start_workers(self):
         """Start worker threads."""
         for i in range(self.max_workers):
             worker = threading.Thread(
-                target=self._worker_loop, 
+                target=self._worker_loop,
                 name=f"JobWorker-{i}",
                 daemon=True
             )
             worker.start()
             self.worker_threads.append(worker)
-    
+
+    def set_class_limit(self, job_class: str, limit: Optional[int]) -> None:
+        """Allow at most ``limit`` concurrent jobs of ``job_class`` (None removes the limit)."""
+        with self.work_available:
+            if limit is None:
+                self.class_limits.pop(job_class, None)
+            else:
+                self.class_limits[job_class] = max(1, int(limit))
+            self.work_available.notify_all()
+
+    def register_job_class(self, job_class: JobClass) -> None:
+        """Declare (or replace) the resource needs of a job class."""
+        with self.work_available:
+            self.job_classes[job_class.name] = job_class
+            if job_class.max_concurrent is not None:
+                self.class_limits[job_class.name] = max(1, int(job_class.max_concurrent))
+            self.work_available.notify_all()
+
+    def _job_class(self, name: str) -> JobClass:
+        return self.job_classes.get(name) or JobClass(name)
+
+    def _class_at_limit(self, job_class: str) -> bool:
+        limit = self.class_limits.get(job_class)
+        return limit is not None and self.class_running.get(job_class, 0) >= limit
+
+    def _fits_budget(self, job_class: str, reserved_ram_mb: int = 0, reserved_cpu: float = 0.0) -> bool:
+        """Resource admission; a job larger than the whole budget may still run alone.
+
+        ``reserved_*`` is budget held back for a higher-priority job that is
+        waiting for resources.
+        """
+        jc = self._job_class(job_class)
+        if jc.ram_mb and self.ram_budget_mb is not None and (self.running_ram_mb or reserved_ram_mb):
+            if self.running_ram_mb + reserved_ram_mb + jc.ram_mb > self.ram_budget_mb:
+                return False
+        if jc.cpu_cores and self.cpu_budget is not None and (self.running_cpu or reserved_cpu):
+            if self.running_cpu + reserved_cpu + jc.cpu_cores > self.cpu_budget:
+                return False
+        return True
+
+    def _pending_count(self) -> int:
+        return sum(len(q) for q in self.queues.values())
+
+    def _next_runnable(self) -> Optional[Job]:
+        """Pop the oldest job of the highest priority whose class has capacity.
+
+        Caller holds the lock. Jobs blocked by their class limit keep their
+        place in the queue. The first job blocked on RAM/CPU reserves its
+        share of the budget: later jobs only start if they fit beside it, so
+        freed resources go to that job instead of a stream of smaller ones.
+        """
+        reserved_ram, reserved_cpu, reserving = 0, 0.0, False
+        for priority in JobPriority:
+            queue = self.queues[priority]
+            for i, job in enumerate(queue):
+                if self._class_at_limit(job.job_class):
+                    continue
+                if self._fits_budget(job.job_class, reserved_ram, reserved_cpu):
+                    del queue[i]
+                    return job
+                if not reserving:
+                    jc = self._job_class(job.job_class)
+                    reserved_ram, reserved_cpu, reserving = jc.ram_mb, jc.cpu_cores, True
+        return None
+
     def _worker_loop(self):
         """Main loop for worker threads."""
-        while not self.shutdown_event.is_set():
-            job = None
-            try:
-                # Get next job from queue
-                with self.queue_lock:
-                    if self.job_queue:
-                        job = heapq.heappop(self.job_queue)
-                    else:
-                        # No jobs available, sleep briefly
-                        time.sleep(0.1)
-                        continue
-                
-                if job and not self.shutdown_event.is_set():
-                    # Execute job
-                    self._execute_job(job)
-                    
-            except Exception as e:
-                logger.error(f"Worker error: {e}")
-                if job:
-                    self._mark_job_failed(job, e)
-                time.sleep(0.1)  # Brief pause on error
-    
+        while True:
+            with self.work_available:
+                job = None
+                while not self.shutdown_event.is_set():
+                    job = self._next_runnable()
+                    if job is not None:
+                        break
+                    self.work_available.wait()
+                if job is None:
+                    return
+                job.start_time = time.time()
+                job.status = "running"
+                self.running_jobs[job.id] = job
+                self.class_running[job.job_class] = self.class_running.get(job.job_class, 0) + 1
+                jc = self._job_class(job.job_class)
+                self.running_ram_mb += jc.ram_mb
+                self.running_cpu += jc.cpu_cores
+                self.queue_latency.observe(job.start_time - job.submit_time)
+            self._execute_job(job)
+
     def _execute_job(self, job: Job):
         """Execute a job."""
+        logger.info(f"Starting job {job.id}: {job.name}")
+        _current.token = job.cancel_token
+        _current.job_id = job.id
         try:
-            # Mark job as running
-            job.start_time = time.time()
-            job.status = "running"
-            
-            with self.queue_lock:
-                self.running_jobs[job.id] = job
-            
-            logger.info(f"Starting job {job.id}: {job.name}")
-            
-            # Execute the job function
-            job.result = job.func(*job.args, **job.kwargs)
-            
-            # Mark job as completed
-            job.end_time = time.time()
-            job.status = "completed"
-            
-            with self.queue_lock:
-                self.running_jobs.pop(job.id, None)
-                self.completed_jobs[job.id] = job
-            
-            self._inc_stat('completed')
-            logger.info(f"Completed job {job.id}: {job.name} in {job.end_time - job.start_time:.2f}s")
-            
+            job.cancel_token.raise_if_cancelled()
+            if self._job_class(job.job_class).executor == "process":
+                job.result = self._run_in_process(job)
+            else:
+                job.result = job.func(*job.args, **job.kwargs)
+                if inspect.iscoroutine(job.result):
+                    job.result = asyncio.run(job.result)
+            status = "cancelled" if job.cancel_token.cancelled else "completed"
+            self._finish_job(job, status)
+            logger.info(f"Finished job {job.id}: {job.name} ({status}) in {job.end_time - job.start_time:.2f}s")
+        except JobCancelled:
+            self._finish_job(job, "cancelled")
+            logger.info(f"Cancelled job {job.id}: {job.name}")
         except Exception as e:
             logger.error(f"Job {job.id} failed: {e}")
-            self._mark_job_failed(job, e)
-    
-    def _mark_job_failed(self, job: Job, error: Exception):
-        """Mark a job as failed."""
+            self._finish_job(job, "failed", e)
+        finally:
+            _current.token = None
+            _current.job_id = None
+
+    def _get_process_pool(self) -> ProcessPoolExecutor:
+        with self.queue_lock:
+            if self._process_pool is None:
+                # Spawn: model libraries (torch, onnxruntime) do not survive fork()
+                self._process_pool = ProcessPoolExecutor(
+                    max_workers=self.process_workers,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._process_pool
+
+    def _get_mp_manager(self) -> Any:
+        with self.queue_lock:
+            if self._mp_manager is None:
+                self._mp_manager = multiprocessing.get_context("spawn").Manager()
+            return self._mp_manager
+
+    def _run_in_process(self, job: Job) -> Any:
+        """Run ``job.func`` in the process pool; the worker thread only waits.
+
+        The job's cancel flag is mirrored into a manager Event, so inside the
+        child ``current_cancel_token()`` works as it does on a worker thread.
+        A job still queued in the pool is cancelled outright.
+        """
+        event = self._get_mp_manager().Event()
+        future = self._get_process_pool().submit(_call_with_token, event, job.func, job.args, job.kwargs)
+        while True:
+            done, _ = wait_futures([future], timeout=0.25)
+            if done:
+                return future.result()
+            if job.cancel_token.cancelled:
+                event.set()
+                if future.cancel():
+                    raise JobCancelled()
+
+    def _finish_job(self, job: Job, status: str, error: Optional[Exception] = None):
+        """Record the outcome of a running job and wake workers waiting on its class."""
         job.end_time = time.time()
-        job.status = "failed"
+        job.status = status
         job.error = error
-        
-        with self.queue_lock:
-            self.running_jobs.pop(job.id, None)
+        with self.work_available:
+            if self.running_jobs.pop(job.id, None) is not None:
+                self.class_running[job.job_class] = max(0, self.class_running.get(job.job_class, 1) - 1)
+                jc = self._job_class(job.job_class)
+                self.running_ram_mb = max(0, self.running_ram_mb - jc.ram_mb)
+                self.running_cpu = max(0.0, self.running_cpu - jc.cpu_cores)
             self.completed_jobs[job.id] = job
-        
-        self._inc_stat('failed')
-    
+            self.stats[status] += 1
+            if job.start_time is not None:
+                self.run_time.observe(job.end_time - job.start_time)
+            self.work_available.notify_all()
+
     def submit_job(self, job: Job) -> str:
         """Submit a job to the scheduler."""
-        with self.stats_lock:
-            if self.stats['submitted'] >= self.max_queue_size:
+        with self.work_available:
+            if self._pending_count() >= self.max_queue_size:
                 raise RuntimeError("Job queue is full")
             self.stats['submitted'] += 1
-        
-        # Add to queue
-        with self.queue_lock:
-            heapq.heappush(self.job_queue, job)
-        
+            self.queues[JobPriority(job.priority)].append(job)
+            self.work_available.notify()
+
         logger.info(f"Submitted job {job.id}: {job.name} with priority {job.priority.name}")
         return job.id
-    
-    def submit_function(self, func: Callable, *args, name: Optional[str] = None, 
-                       priority: JobPriority = JobPriority.NORMAL, 
-                       estimated_duration: float = 1.0, **kwargs) -> str:
-        """Submit a function to be executed as a job."""
-        import uuid
+
+    def submit_function(self, func: Callable, *args, name: Optional[str] = None,
+                       priority: JobPriority = JobPriority.NORMAL,
+                       estimated_duration: float = 1.0,
+                       job_class: str = "default", **kwargs) -> str:
+        """Submit a function to be executed as a job.
+
+        The function can poll ``current_cancel_token()`` to honour cancellation.
+        """
         job_id = str(uuid.uuid4())
         job_name = name or func.__name__
-        
+
         job = Job(
             id=job_id,
             name=job_name,
@@ -174,27 +417,66 @@ class LightweightJobScheduler:
             args=args,
             kwargs=kwargs,
             priority=priority,
+            job_class=job_class,
             estimated_duration=estimated_duration
         )
-        
+
         return self.submit_job(job)
-    
+
+    def wait(self, job_id: str, timeout: Optional[float] = None) -> Optional[Job]:
+        """Block until ``job_id`` has finished; returns the job (None on timeout/unknown)."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.work_available:
+            while job_id not in self.completed_jobs:
+                known = job_id in self.running_jobs or any(j.id == job_id for q in self.queues.values() for j in q)
+                if not known:
+                    return None
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self.work_available.wait(remaining)
+            return self.completed_jobs[job_id]
+
+    def run(self, func: Callable, *args, name: Optional[str] = None,
+            priority: JobPriority = JobPriority.HIGH,
+            job_class: str = "default", **kwargs) -> Any:
+        """Run ``func`` as a job and wait for its result.
+
+        For request handlers that must answer with the job's result: the work
+        still goes through admission control and the job class's executor.
+        Re-raises the job's error, or JobCancelled.
+        """
+        job_id = self.submit_function(func, *args, name=name, priority=priority, job_class=job_class, **kwargs)
+        job = self.wait(job_id)
+        if job is None:
+            raise RuntimeError(f"Job {job_id} disappeared before finishing")
+        if job.status == "cancelled":
+            raise JobCancelled()
+        if job.error is not None:
+            raise job.error
+        return job.result
+
     def cancel_job(self, job_id: str) -> bool:
-        """Cancel a pending job."""
-        with self.queue_lock:
-            # Try to remove from queue
-            for i, job in enumerate(self.job_queue):
-                if job.id == job_id:
-                    self.job_queue.pop(i)
-                    heapq.heapify(self.job_queue)  # Restore heap property
-                    
-                    # Mark as cancelled
-                    job.status = "cancelled"
-                    self.completed_jobs[job.id] = job
-                    self._inc_stat('cancelled')
-                    return True
+        """Cancel a pending job, or request cancellation of a running one."""
+        with self.work_available:
+            for queue in self.queues.values():
+                for job in queue:
+                    if job.id == job_id:
+                        queue.remove(job)
+                        job.cancel_token.cancel()
+                        job.status = "cancelled"
+                        job.end_time = time.time()
+                        self.completed_jobs[job.id] = job
+                        self.stats['cancelled'] += 1
+                        self.work_available.notify_all()
+                        return True
+            job = self.running_jobs.get(job_id)
+            if job is not None:
+                # The job stops at its next checkpoint and is recorded as cancelled
+                job.cancel_token.cancel()
+                return True
             return False
-    
+
     def get_job_status(self, job_id: str) -> Optional[Dict[str, Any]]:
         """Get the status of a job."""
         with self.queue_lock:
@@ -204,13 +486,13 @@ class LightweightJobScheduler:
                 return {
                     'id': job.id,
                     'name': job.name,
-                    'status': job.status,
+                    'status': "cancelling" if job.cancel_token.cancelled else job.status,
                     'priority': job.priority.name,
                     'submit_time': job.submit_time,
                     'start_time': job.start_time,
                     'progress': self._estimate_progress(job)
                 }
-            
+
             # Check completed jobs
             if job_id in self.completed_jobs:
                 job = self.completed_jobs[job_id]
@@ -223,22 +505,24 @@ class LightweightJobScheduler:
                     'start_time': job.start_time,
                     'end_time': job.end_time,
                     'duration': (job.end_time - job.start_time) if job.end_time and job.start_time else None,
-                    'error': str(job.error) if job.error else None
+                    'error': str(job.error) if job.error else None,
+                    'result': job.result if job.status == "completed" else None
                 }
-            
+
             # Check pending jobs
-            for job in self.job_queue:
-                if job.id == job_id:
-                    return {
-                        'id': job.id,
-                        'name': job.name,
-                        'status': job.status,
-                        'priority': job.priority.name,
-                        'submit_time': job.submit_time
-                    }
-        
+            for queue in self.queues.values():
+                for job in queue:
+                    if job.id == job_id:
+                        return {
+                            'id': job.id,
+                            'name': job.name,
+                            'status': job.status,
+                            'priority': job.priority.name,
+                            'submit_time': job.submit_time
+                        }
+
         return None
-    
+
     def _estimate_progress(self, job: Job) -> float:
         """Estimate job progress (0.0 to 1.0)."""
         if job.status == "completed":
@@ -248,76 +532,115 @@ class LightweightJobScheduler:
             # Simple estimation based on elapsed vs estimated duration
             return min(0.95, elapsed / job.estimated_duration)
         return 0.0
-    
+
     def get_queue_stats(self) -> Dict[str, Any]:
-        """Get statistics about the job queue."""
+        """Get statistics about the job queue, including latency histograms."""
         with self.queue_lock:
-            pending_count = len(self.job_queue)
-            running_count = len(self.running_jobs)
-            completed_count = len(self.completed_jobs)
-        
-        with self.stats_lock:
-            stats_copy = self.stats.copy()
-        
-        return {
-            **stats_copy,
-            'pending': pending_count,
-            'running': running_count,
-            'completed': completed_count,
-            'workers': self.max_workers
-        }
-    
+            classes = set(self.class_limits) | set(self.job_classes) | {c for c, n in self.class_running.items() if n}
+            return {
+                **self.stats,
+                'pending': self._pending_count(),
+                'pending_by_priority': {p.name: len(q) for p, q in self.queues.items()},
+                'running': len(self.running_jobs),
+                'completed': len(self.completed_jobs),
+                'workers': self.max_workers,
+                'classes': {
+                    c: {
+                        'running': self.class_running.get(c, 0),
+                        'limit': self.class_limits.get(c),
+                        'ram_mb': self._job_class(c).ram_mb,
+                        'cpu_cores': self._job_class(c).cpu_cores,
+                        'executor': self._job_class(c).executor,
+                    }
+                    for c in sorted(classes)
+                },
+                'resources': {
+                    'ram_mb': self.running_ram_mb,
+                    'ram_budget_mb': self.ram_budget_mb,
+                    'cpu_cores': self.running_cpu,
+                    'cpu_budget': self.cpu_budget,
+                },
+                'queue_latency': self.queue_latency.snapshot(),
+                'run_time': self.run_time.snapshot(),
+            }
+
     def get_pending_jobs(self, limit: int = 10) -> list:
         """Get list of pending jobs."""
         with self.queue_lock:
-            jobs = sorted(self.job_queue, key=lambda j: (j.priority, j.submit_time))
+            jobs = [job for p in JobPriority for job in self.queues[p]][:limit]
             return [{
                 'id': job.id,
                 'name': job.name,
                 'priority': job.priority.name,
+                'job_class': job.job_class,
                 'submit_time': job.submit_time,
                 'estimated_duration': job.estimated_duration
-            } for job in jobs[:limit]]
-    
+            } for job in jobs]
+
     def cleanup_completed_jobs(self, max_age_seconds: float = 3600) -> int:
         """Remove completed jobs older than max_age_seconds."""
         cutoff_time = time.time() - max_age_seconds
         removed_count = 0
-        
+
         with self.queue_lock:
             # Create list of jobs to remove
             to_remove = [
                 job_id for job_id, job in self.completed_jobs.items()
                 if job.end_time and job.end_time < cutoff_time
             ]
-            
+
             # Remove them
             for job_id in to_remove:
                 self.completed_jobs.pop(job_id, None)
                 removed_count += 1
-        
+
         return removed_count
-    
-    def _inc_stat(self, key: str):
-        """Thread-safe increment of statistics."""
-        with self.stats_lock:
-            self.stats[key] += 1
-    
+
     def shutdown(self, wait: bool = True):
         """Shutdown the scheduler."""
         logger.info("Shutting down job scheduler")
-        self.shutdown_event.set()
-        
+        with self.work_available:
+            self.shutdown_event.set()
+            self.work_available.notify_all()
+
         if wait:
             # Wait for worker threads to finish
             for worker in self.worker_threads:
                 worker.join(timeout=5.0)  # 5 second timeout per worker
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=wait, cancel_futures=True)
+            self._process_pool = None
+        if self._mp_manager is not None:
+            self._mp_manager.shutdown()
+            self._mp_manager = None
+
+
+# Built-in job classes. Embedding and OCR keep their models in memory;
+# OCR fans out to its own process pool (infra.ocr_build), faces run in ours.
+JOB_CLASSES = (
+    JobClass("embedding", ram_mb=4096, cpu_cores=2, max_concurrent=1),
+    JobClass("ocr", ram_mb=2048, cpu_cores=4, max_concurrent=1),
+    JobClass("faces", ram_mb=1024, cpu_cores=2, max_concurrent=1, executor="process"),
+    JobClass("curation", ram_mb=512, cpu_cores=1),
+)
+
+
+def _create_default_scheduler() -> LightweightJobScheduler:
+    from infra.config import config
+
+    scheduler = LightweightJobScheduler(
+        ram_budget_mb=config.job_ram_budget_mb if config.job_ram_budget_mb > 0 else None,
+        cpu_budget=float(config.job_cpu_budget or max(1, (os.cpu_count() or 2) - 1)),
+    )
+    for job_class in JOB_CLASSES:
+        scheduler.register_job_class(job_class)
+    return scheduler
 
 
 # Global instance
-job_scheduler = LightweightJobScheduler()
+job_scheduler = _create_default_scheduler()
 
 
 def get_job_scheduler() -> LightweightJobScheduler:
     """Get the global job scheduler instance."""
-    return job_scheduler
\ No newline at end of file
+    return job_scheduler
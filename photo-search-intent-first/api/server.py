@@ -1,6 +1,5 @@
 from __future__ import annotations
 
-import json
 import logging
 import os
 import time
@@ -80,6 +79,7 @@ from api.routers.workspace import router as workspace_router
 from api.attention import router as attention_router  # NEW: adaptive attention (scaffold)
 from api.routes.health import router as health_router  # Extracted health & root endpoints
 from api.routers.admin import router as admin_router
+from api.v1.endpoints.jobs import job_router
 from infra.analytics import log_search
 from infra.collections import load_collections
 from infra.config import config
@@ -97,21 +97,18 @@ from api.dependencies import (
     get_directory_scanner,
     get_search_executor,
     get_media_scanner,
-    get_expression_evaluator,
 )
 from usecases.manage_presets import load_presets, save_presets
 from usecases.index_photos import index_photos  # noqa: F401 (potential future use)
 from services.directory_scanner import DirectoryScanner
 from services.search_executor import SearchExecutor
 from services.media_scanner import MediaScanner
-from services.rpn_expression_evaluator import RPNExpressionEvaluator
 # Lazy import: from infra.video_index_store import VideoIndexStore  # imports numpy
 
 # Global service instances
 directory_scanner = DirectoryScanner()
 search_executor = SearchExecutor()
 media_scanner = MediaScanner()
-rpn_evaluator = RPNExpressionEvaluator()
 # Lazy import: from infra.thumbs import get_or_create_thumb, get_or_create_face_thumb
 # Lazy import: from infra.faces import load_faces as _faces_load
 try:
@@ -204,10 +201,24 @@ app.include_router(videos_router)
 app.include_router(watch_router)
 app.include_router(workspace_router)
 app.include_router(admin_router)
+app.include_router(job_router)
 
 # Mount versioned API router
 app.include_router(api_v1)
 
+
+@app.on_event("startup")
+def _warm_providers() -> None:
+    """Load the configured embedding models in the background (PS_WARM_PROVIDERS)."""
+    if not config.warm_providers:
+        return
+    import threading
+    from adapters.provider_pool import warm_configured_providers
+    threading.Thread(
+        target=warm_configured_providers, args=(config.warm_providers,), name="provider-warmup", daemon=True
+    ).start()
+
+
 # Mount static files for React app
 web_dir = Path(__file__).parent / "web"
 if web_dir.exists():
@@ -304,18 +315,30 @@ def _initialize_search_provider(unified_req: UnifiedSearchRequest):
         embedder = get_provider(provider, **kwargs)
         dir_p = _validate_search_directory(unified_req.directory)
         
-        from infra.index_store import IndexStore
-        store = IndexStore(dir_p)
+        from infra.index_registry import get_index_store
+        store = get_index_store(dir_p)
         
         return store, embedder
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Provider initialization failed: {e}")
 
 
-def _perform_semantic_search(store, embedder, unified_req: UnifiedSearchRequest) -> List:
-    """Perform the core semantic search operation with all search modes."""
+def _perform_semantic_search(store, embedder, unified_req: UnifiedSearchRequest, query_value: str) -> List:
+    """Perform the core semantic search operation with all search modes.
+
+    Boolean expressions in the query (AND/OR/NOT, field:value terms) are
+    compiled to a row subset first, so ranking only sees matching photos.
+    """
+    subset = None
+    try:
+        from services.query_planner import expression_subset
+        subset = expression_subset(store, query_value)
+    except Exception:
+        subset = None
+    if subset is not None and not subset:
+        return []
     executor = get_search_executor()
-    return executor.execute(store, embedder, unified_req)
+    return executor.execute_search(store, embedder, unified_req, subset=subset)
 
 
 def _apply_metadata_filters(store, results: List, unified_req: UnifiedSearchRequest) -> List:
@@ -678,9 +701,8 @@ def _apply_text_and_caption_filters(store, results: List, unified_req: UnifiedSe
     """Apply OCR text and caption-based filters including advanced expression parsing."""
     output = results
     
-    # Apply each filter type sequentially
+    # Boolean expressions were already applied before ranking
     output = _apply_ocr_text_filters(store, output, unified_req, query_value)
-    output = _apply_caption_expression_filters(store, output, query_value)
     
     return output
 
@@ -688,7 +710,7 @@ def _apply_text_and_caption_filters(store, results: List, unified_req: UnifiedSe
 def _apply_ocr_text_filters(store, results: List, unified_req: UnifiedSearchRequest, query_value: str) -> List:
     """Apply OCR text-based filters including has_text and quoted text requirements."""
     try:
-        texts_map = _load_ocr_texts_map(store)
+        texts_map = _load_ocr_texts_map(store, [str(r.path) for r in results])
         
         # Apply has_text filter
         if unified_req.has_text:
@@ -702,14 +724,15 @@ def _apply_ocr_text_filters(store, results: List, unified_req: UnifiedSearchRequ
         return results
 
 
-def _load_ocr_texts_map(store) -> dict:
-    """Load OCR texts mapping from store."""
-    import json
-    texts_map = {}
-    if hasattr(store, 'ocr_texts_file') and store.ocr_texts_file.exists():
-        data = json.loads(store.ocr_texts_file.read_text())
-        texts_map = {p: (t or '') for p, t in zip(data.get('paths', []), data.get('texts', []))}
-    return texts_map
+def _load_ocr_texts_map(store, paths: Optional[List[str]] = None) -> dict:
+    """Load OCR texts for ``paths`` (all texts when None) from the store's text index."""
+    if not (hasattr(store, 'ocr_texts_file') and store.ocr_texts_file.exists()):
+        return {}
+    from infra.text_index import text_index_for_store
+    index = text_index_for_store(store)
+    if paths is None:
+        paths = index.paths_with_text('ocr')
+    return index.texts('ocr', paths)
 
 
 def _apply_quoted_text_filter(results: List, texts_map: dict, query_value: str) -> List:
@@ -735,273 +758,6 @@ def _apply_quoted_text_filter(results: List, texts_map: dict, query_value: str)
     return [r for r in results if _has_all_phrases(str(r.path))]
 
 
-def _apply_caption_expression_filters(store, results: List, query_value: str) -> List:
-    """Apply advanced caption expression parsing with boolean logic."""
-    try:
-        caption_map = _load_caption_map(store)
-        
-        if caption_map and query_value:
-            return _parse_caption_expressions(store, results, caption_map, query_value)
-        
-        return results
-    except Exception:
-        return results
-
-
-def _load_caption_map(store) -> dict:
-    """Load caption mapping from store."""
-    import json
-    caption_map = {}
-    if store.captions_available() and store.captions_file.exists():
-        caption_data = json.loads(store.captions_file.read_text())
-        caption_map = {p: (t or '') for p, t in zip(caption_data.get('paths', []), caption_data.get('texts', []))}
-    return caption_map
-
-
-def _parse_caption_expressions(store, results: List, cap_map: dict, query_value: str) -> List:
-    """Parse advanced boolean expressions in caption search."""
-    try:
-        import shlex
-        
-        tokens = shlex.split(query_value) if query_value else []
-        if not tokens:
-            return results
-        
-        # Step 1: Convert query to RPN notation
-        rpn_output = _convert_to_rpn(tokens)
-        
-        # Step 2: Build evaluation context with all metadata
-        evaluation_context = _build_evaluation_context(store, cap_map)
-        
-        # Step 3: Evaluate each result against the RPN expression
-        return [r for r in results if _evaluate_rpn_expression(rpn_output, str(r.path), evaluation_context)]
-    except Exception:
-        return results
-
-
-def _convert_to_rpn(tokens: List[str]) -> List[str]:
-    """Convert infix tokens to Reverse Polish Notation using shunting yard algorithm."""
-    normalized_tokens = _normalize_rpn_tokens(tokens)
-    return _apply_shunting_yard_algorithm(normalized_tokens)
-
-
-def _normalize_rpn_tokens(tokens: List[str]) -> List[str]:
-    """Normalize tokens for RPN conversion."""
-    op_set = {'AND', 'OR', 'NOT'}
-    normalized_tokens = []
-    
-    for tok in tokens:
-        tu = tok.upper()
-        if tu in op_set:
-            normalized_tokens.append(tu)
-        elif tok in ('(', ')'):
-            normalized_tokens.append(tok)
-        else:
-            normalized_tokens.append(tok)
-    
-    return normalized_tokens
-
-
-def _apply_shunting_yard_algorithm(tokens: List[str]) -> List[str]:
-    """Apply shunting yard algorithm to convert to RPN."""
-    precedence = {'NOT': 3, 'AND': 2, 'OR': 1}
-    op_set = {'AND', 'OR', 'NOT'}
-    
-    output = []
-    stack = []
-    
-    for tok in tokens:
-        tu = tok.upper()
-        
-        if tu in op_set:
-            _process_operator_token(stack, output, tu, precedence)
-        elif tok == '(':
-            stack.append(tok)
-        elif tok == ')':
-            _process_closing_parenthesis(stack, output)
-        else:
-            output.append(tok)
-    
-    # Pop remaining operators
-    while stack:
-        output.append(stack.pop())
-    
-    return output
-
-
-def _process_operator_token(stack: List[str], output: List[str], operator: str, precedence: dict) -> None:
-    """Process an operator token in shunting yard algorithm."""
-    while (stack and 
-           stack[-1] != '(' and 
-           precedence.get(stack[-1], 0) >= precedence[operator]):
-        output.append(stack.pop())
-    stack.append(operator)
-
-
-def _process_closing_parenthesis(stack: List[str], output: List[str]) -> None:
-    """Process a closing parenthesis in shunting yard algorithm."""
-    while stack and stack[-1] != '(':
-        output.append(stack.pop())
-    if stack and stack[-1] == '(':
-        stack.pop()
-
-
-def _build_evaluation_context(store, cap_map: dict) -> dict:
-    """Build comprehensive evaluation context with all metadata maps."""
-    from infra.tags import load_tags
-    
-    context = {
-        'cap_map': cap_map,
-        'store_index_dir': store.index_dir,  # Include store index dir for person field
-        'tags_map': load_tags(store.index_dir) if store.index_dir else {},
-        'person_cache': {},
-        'texts_map': {},
-        'metadata_maps': {}
-    }
-    
-    # Load OCR texts
-    try:
-        if hasattr(store, 'ocr_texts_file') and store.ocr_texts_file.exists():
-            d = json.loads(store.ocr_texts_file.read_text())
-            context['texts_map'] = {p: (t or '') for p, t in zip(d.get('paths', []), d.get('texts', []))}
-    except Exception:
-        pass
-    
-    # Build basic metadata maps
-    context['metadata_maps']['mtime'] = {p: float(mt) for p, mt in zip(store.state.paths or [], store.state.mtimes or [])}
-    
-    # Load EXIF metadata
-    _load_exif_metadata(store, context['metadata_maps'])
-    
-    return context
-
-
-def _load_exif_metadata(store, metadata_maps: dict) -> None:
-    """Load EXIF metadata into evaluation context."""
-    try:
-        exif_data = _load_exif_file_data(store)
-        if not exif_data:
-            return
-        
-        paths = exif_data.get('paths', [])
-        
-        # Load different types of metadata
-        _load_numeric_metadata(metadata_maps, paths, exif_data)
-        _load_string_metadata(metadata_maps, paths, exif_data)
-        _load_fractional_metadata(metadata_maps, paths, exif_data)
-    except Exception:
-        pass
-
-
-def _load_exif_file_data(store) -> dict:
-    """Load and parse EXIF index file."""
-    try:
-        exif_file_path = store.index_dir / 'exif_index.json'
-        if not exif_file_path.exists():
-            return {}
-        return json.loads(exif_file_path.read_text())
-    except Exception:
-        return {}
-
-
-def _load_numeric_metadata(metadata_maps: dict, paths: list, exif_data: dict) -> None:
-    """Load numeric EXIF metadata with type safety."""
-    numeric_fields = [
-        ('iso', int, 'iso'),
-        ('fnumber', float, 'fnumber'),
-        ('width', int, 'width'),
-        ('height', int, 'height'),
-        ('brightness', float, 'brightness'),
-        ('sharpness', float, 'sharpness')
-    ]
-    
-    for field_name, field_type, data_key in numeric_fields:
-        metadata_maps[field_name] = {
-            p: (field_type(x) if isinstance(x, (int, float)) else None)
-            for p, x in zip(paths, exif_data.get(data_key, []))
-        }
-
-
-def _load_string_metadata(metadata_maps: dict, paths: list, exif_data: dict) -> None:
-    """Load string EXIF metadata."""
-    string_fields = [
-        ('camera', 'camera'),
-        ('place', 'place')
-    ]
-    
-    for field_name, data_key in string_fields:
-        metadata_maps[field_name] = {
-            p: (value or '') for p, value in zip(paths, exif_data.get(data_key, []))
-        }
-
-
-def _load_fractional_metadata(metadata_maps: dict, paths: list, exif_data: dict) -> None:
-    """Load fractional EXIF metadata with conversion."""
-    def _convert_fraction_value(v):
-        try:
-            if isinstance(v, (list, tuple)) and len(v) == 2:
-                a, b = v
-                return float(a) / float(b) if b else None
-            if isinstance(v, str) and '/' in v:
-                a, b = v.split('/', 1)
-                return float(a) / float(b)
-            return float(v) if isinstance(v, (int, float)) else None
-        except Exception:
-            return None
-    
-    fractional_fields = [
-        ('exposure', 'exposure'),
-        ('focal', 'focal')
-    ]
-    
-    for field_name, data_key in fractional_fields:
-        metadata_maps[field_name] = {
-            p: _convert_fraction_value(x) for p, x in zip(paths, exif_data.get(data_key, []))
-        }
-
-
-def _evaluate_rpn_expression(rpn_output: List[str], path: str, context: dict) -> bool:
-    """Evaluate RPN expression for a single photo path."""
-    evaluator = get_expression_evaluator()
-    return evaluator.evaluate(rpn_output, path, context)
-
-
-def _evaluate_field_expression(token: str, path: str, context: dict) -> bool:
-    """Evaluate a single field expression against a photo path."""
-    def _get_document_text(pth: str) -> str:
-        from pathlib import Path
-        name = Path(pth).name
-        return f"{context['cap_map'].get(pth, '')}\n{context['texts_map'].get(pth, '')}\n{name}".lower()
-    
-    # Simple text search (no field specified)
-    if ':' not in token:
-        return token.lower() in _get_document_text(path)
-    
-    try:
-        field, value = token.split(':', 1)
-        field_value = (value or '').strip().strip('"').strip("'")
-        field_name = field.lower()
-        
-        # Route to appropriate field handler
-        if field_name in ('camera', 'place'):
-            return _evaluate_string_field(field_name, field_value, path, context)
-        elif field_name in ('tag', 'rating'):
-            return _evaluate_tag_field(field_name, field_value, path, context)
-        elif field_name == 'person':
-            return _evaluate_person_field(field_value, path, context)
-        elif field_name == 'has_text':
-            return _evaluate_text_presence_field(field_value, path, context)
-        elif field_name == 'filetype':
-            return _evaluate_filetype_field(field_value, path)
-        elif field_name in ('iso', 'fnumber', 'width', 'height', 'mtime', 'brightness', 'sharpness', 'exposure', 'focal', 'duration'):
-            return _evaluate_numeric_field(field_name, field_value, path, context)
-        else:
-            # Unknown field - search in document text
-            return field_value.lower() in _get_document_text(path)
-    except Exception:
-        return False
-
-
 def _evaluate_string_field(field_name: str, field_value: str, path: str, context: dict) -> bool:
     """Evaluate string-based fields like camera and place."""
     field_data = context['metadata_maps'].get(field_name, {}).get(path, '')
@@ -1173,7 +929,7 @@ def api_search(req: SearchRequest) -> SearchResponse:
     store, embedder = _initialize_search_provider(unified_req)
     
     # Step 2: Perform semantic search or get all results
-    initial_results = _perform_semantic_search(store, embedder, unified_req)
+    initial_results = _perform_semantic_search(store, embedder, unified_req, query_value)
     
     # Step 3: Apply collection-based filters (favorites, tags, people, dates)
     collection_filtered = _apply_collection_filters(store, initial_results, unified_req)
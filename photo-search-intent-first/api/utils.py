@@ -57,6 +57,87 @@ def _emb(provider: str, hf_token: Optional[str], openai_key: Optional[str], st_m
     return get_provider(provider, hf_token=hf_token, openai_api_key=openai_key, st_model=st_model, tf_model=tf_model, hf_model=hf_model)
 
 
+def _job_cancel_check() -> Optional[Callable[[], None]]:
+    """Checkpoint callable for the running scheduler job (raises JobCancelled), if any."""
+    from api.scheduler.job_scheduler import current_cancel_token
+    token = current_cancel_token()
+    return token.raise_if_cancelled if token is not None else None
+
+
+def _index_job(folder: Any, batch_size: int, emb: Any) -> Any:
+    """Index ``folder`` and log the analytics event; runs on the job scheduler."""
+    from api.scheduler.job_scheduler import current_job_id
+    from infra.analytics import _write_event
+    from infra.index_store import IndexStore
+    from usecases.index_photos import index_photos
+
+    # Progress events carry the scheduler job id, so clients follow one id
+    new_c, upd_c, total = index_photos(
+        folder, batch_size=batch_size, embedder=emb, job_id=current_job_id(), cancel=_job_cancel_check()
+    )
+    try:
+        _write_event(IndexStore(folder, index_key=getattr(emb, "index_id", None)).index_dir, {
+            "type": "index",
+            "new": int(new_c),
+            "updated": int(upd_c),
+            "total": int(total),
+        })
+    except Exception:
+        pass  # Non-critical
+    return new_c, upd_c, total
+
+
+def _ocr_job(store: Any, emb: Any, languages: Optional[List[str]]) -> Dict[str, Any]:
+    """OCR job body: ``store.build_ocr`` stopping at cancellation, then the analytics event."""
+    from infra.analytics import _write_event
+
+    updated = store.build_ocr(emb, languages=languages, cancel=_job_cancel_check())
+    try:
+        _write_event(store.index_dir, {'type': 'ocr_build', 'updated': updated, 'langs': languages or []})
+    except Exception:
+        pass  # Non-critical
+    return {"updated": updated}
+
+
+def _faces_job(index_dir: Any, paths: List[str]) -> Dict[str, Any]:
+    """Faces job body (runs in the process pool): ``build_faces`` stopping at cancellation."""
+    from infra.faces import build_faces
+    return build_faces(index_dir, paths, cancel=_job_cancel_check())
+
+
+def _submit_index(folder: Any, batch_size: int, emb: Any) -> str:
+    """Queue an admission-controlled indexing job and return its id without waiting.
+
+    Clients poll ``/jobs/{job_id}/status`` (and ``/index/status`` for counts).
+    """
+    from api.scheduler.job_scheduler import get_job_scheduler
+    return get_job_scheduler().submit_function(
+        _index_job, folder, batch_size, emb, name=f"index {folder}", job_class="embedding"
+    )
+
+
+def _submit_ocr(store: Any, emb: Any, languages: Optional[List[str]]) -> str:
+    """Queue an OCR build for ``store`` and return its job id without waiting.
+
+    ``/jobs/{job_id}/status`` carries ``{"updated": n}`` as its result once completed.
+    """
+    from api.scheduler.job_scheduler import get_job_scheduler
+    return get_job_scheduler().submit_function(
+        _ocr_job, store, emb, languages, name=f"ocr {store.root}", job_class="ocr"
+    )
+
+
+def _submit_faces(store: Any) -> str:
+    """Queue a faces build for ``store`` and return its job id without waiting.
+
+    The result in ``/jobs/{job_id}/status`` is ``build_faces``'s counts dict.
+    """
+    from api.scheduler.job_scheduler import get_job_scheduler
+    return get_job_scheduler().submit_function(
+        _faces_job, store.index_dir, list(store.state.paths or []), name=f"faces {store.root}", job_class="faces"
+    )
+
+
 T = TypeVar("T")
 def _zip_meta(
     meta: Dict[str, Iterable[Any]],
@@ -70,4 +151,25 @@ def _zip_meta(
     result: Dict[str, T] = {}
     for path, raw in zip(paths, values):
         result[str(path)] = transform(raw)
-    return result
\ No newline at end of file
+    return result
+
+def _thumb_response(thumb: Any, if_none_match: Optional[str] = None, versioned: bool = False) -> Any:
+    """Serve a ``services.thumbnail_service.Thumb`` with HTTP cache validators.
+
+    The ETag is the thumbnail's cache key, so it changes whenever the photo's
+    indexed mtime or the size does. Versioned URLs (carrying ``v=``) are
+    marked immutable; plain URLs are revalidated and answered with 304.
+    """
+    from email.utils import formatdate
+    from fastapi import Response
+    from fastapi.responses import FileResponse
+
+    etag = f'"{thumb.etag}"'
+    headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(thumb.mtime or thumb.path.stat().st_mtime, usegmt=True),
+        "Cache-Control": "public, max-age=31536000, immutable" if versioned else "no-cache",
+    }
+    if if_none_match and etag in [t.strip() for t in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+    return FileResponse(str(thumb.path), media_type="image/jpeg", headers=headers)
@@ -35,6 +35,7 @@ from .enhanced_smart_collections import enhanced_smart_collections_router
 from .enhanced_faces import enhanced_faces_router
 from .enhanced_search import enhanced_search_router
 from .enhanced_indexing import enhanced_indexing_router
+from .jobs import job_router
 
 __all__ = [
     "search_router",
@@ -71,4 +72,5 @@ __all__ = [
     "enhanced_faces_router",
     "enhanced_search_router",
     "enhanced_indexing_router",
+    "job_router",
 ]
\ No newline at end of file
@@ -12,8 +12,8 @@ import os
 
 from api.utils import _require, _from_body, _as_str_list, _as_bool, _emb
 from infra.index_store import IndexStore
-from infra.tags import load_tags, save_tags
-from infra.collections import load_collections, save_collections
+from infra.tags import add_tags, remove_tags, set_tags
+from infra.collections import add_to_collection, collection_paths
 
 # Create router for batch operations
 batch_router = APIRouter(prefix="/batch", tags=["batch"])
@@ -40,27 +40,11 @@ def batch_tag_v1(
         raise HTTPException(400, "Folder not found")
     
     store = IndexStore(folder)
-    tag_map = load_tags(store.index_dir)
     updated = 0
+    if operation_value in ("replace", "add", "remove"):
+        apply = {"replace": set_tags, "add": add_tags, "remove": remove_tags}[operation_value]
+        updated = apply(store.index_dir, paths_value, tags_value)
     
-    for path in paths_value:
-        current_tags = set(tag_map.get(path, []))
-        
-        if operation_value == "replace":
-            tag_map[path] = sorted(set(tags_value))
-            updated += 1
-        elif operation_value == "add":
-            for tag in tags_value:
-                current_tags.add(tag)
-            tag_map[path] = sorted(current_tags)
-            updated += 1
-        elif operation_value == "remove":
-            for tag in tags_value:
-                current_tags.discard(tag)
-            tag_map[path] = sorted(current_tags)
-            updated += 1
-    
-    save_tags(store.index_dir, tag_map)
     return {
         "ok": True, 
         "updated": updated, 
@@ -88,20 +72,12 @@ def batch_add_to_collection_v1(
         raise HTTPException(400, "Folder not found")
 
     store = IndexStore(folder)
-    collections = load_collections(store.index_dir)
-
-    current_paths = set(collections.get(collection_value, []))
-    new_paths = current_paths.union(set(paths_value))
-
-    collections[collection_value] = sorted(new_paths)
-    save_collections(store.index_dir, collections)
-
-    added = len(new_paths) - len(current_paths)
+    added = add_to_collection(store.index_dir, collection_value, paths_value)
     return {
         "ok": True, 
         "collection": collection_value, 
         "added": added, 
-        "total": len(new_paths)
+        "total": len(collection_paths(store.index_dir, collection_value))
     }
 
 
@@ -7,7 +7,7 @@ from pathlib import Path
 
 from api.schemas.v1 import CollectionResponse, SuccessResponse
 from api.utils import _require, _from_body, _as_str_list
-from infra.collections import load_collections, save_collections, load_smart_collections, save_smart_collections
+from infra.collections import delete_collection, load_collections, set_collection, load_smart_collections, save_smart_collections
 
 # Create router for collections endpoints
 collections_router = APIRouter(prefix="/collections", tags=["collections"])
@@ -50,10 +50,8 @@ def set_collection_v1(
         if not folder.exists():
             return {"ok": False, "message": "Directory not found"}
         
-        collections = load_collections(folder)
-        collections[name_value] = sorted(set(paths_value))
-        save_collections(folder, collections)
-        return {"ok": True, "collections": collections}
+        set_collection(folder, name_value, sorted(set(paths_value)))
+        return {"ok": True, "collections": load_collections(folder)}
     except Exception as e:
         return {"ok": False, "message": str(e)}
 
@@ -75,10 +73,7 @@ def delete_collection_v1(
         if not folder.exists():
             return {"ok": False, "message": "Directory not found"}
         
-        collections = load_collections(folder)
-        if name_value in collections:
-            del collections[name_value]
-            save_collections(folder, collections)
+        if delete_collection(folder, name_value):
             return {"ok": True, "deleted": name_value}
         return {"ok": False, "message": f"Collection '{name_value}' not found"}
     except Exception as e:
@@ -5,10 +5,9 @@ from fastapi import APIRouter, Body, HTTPException
 from typing import Dict, Any, List, Optional
 from pathlib import Path
 
-from api.utils import _require, _from_body, _as_str_list, _emb
+from api.utils import _require, _from_body, _as_str_list, _emb, _submit_faces
 from infra.index_store import IndexStore
 from infra.faces import (
-    build_faces as _build_faces,
     list_clusters as _face_list,
     photos_for_person as _face_photos,
     set_cluster_name as _face_name,
@@ -26,7 +25,7 @@ def build_faces_v1(
     body: Optional[Dict[str, Any]] = Body(None),
 ) -> Dict[str, Any]:
     """
-    Build face index for the specified directory.
+    Queue a face index build for the specified directory and return its job id.
     """
     dir_value = _require(_from_body(body, dir, "dir"), "dir")
     provider_value = _from_body(body, provider, "provider", default="local") or "local"
@@ -38,8 +37,8 @@ def build_faces_v1(
     emb = _emb(provider_value, None, None)
     store = IndexStore(folder, index_key=getattr(emb, 'index_id', None))
     store.load()
-    result = _build_faces(store.index_dir, store.state.paths or [])
-    return result
+    job_id = _submit_faces(store)
+    return {"ok": True, "job_id": job_id}
 
 
 @faces_router.get("/clusters")
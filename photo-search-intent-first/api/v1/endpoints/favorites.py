@@ -5,7 +5,7 @@ from fastapi import APIRouter, Body
 from typing import Dict, Any
 
 from api.schemas.v1 import FavoritesRequest, FavoriteResponse
-from infra.collections import load_collections, save_collections
+from infra.collections import add_to_collection, load_collections, remove_from_collection
 from pathlib import Path
 
 # Create router for favorites endpoints
@@ -43,16 +43,10 @@ def set_favorite_v1(
         if not folder.exists():
             return FavoriteResponse(ok=False, message="Directory not found")
         
-        collections = load_collections(folder)
-        favorites = set(collections.get('Favorites', []))
-        
         if request.favorite:
-            favorites.add(request.path)
+            add_to_collection(folder, 'Favorites', [request.path])
         else:
-            favorites.discard(request.path)
-        
-        collections['Favorites'] = sorted(list(favorites))
-        save_collections(folder, collections)
+            remove_from_collection(folder, 'Favorites', [request.path])
         
         return FavoriteResponse(
             ok=True,
@@ -5,14 +5,12 @@ from fastapi import APIRouter, Body, HTTPException, Query, Depends
 from typing import Dict, Any, Optional
 
 from api.schemas.v1 import IndexRequest, IndexResponse, IndexStatusResponse, SuccessResponse
-from api.utils import _require, _from_body, _emb
+from api.utils import _require, _from_body, _emb, _submit_index
 from api.auth import require_auth
 from infra.index_store import IndexStore
-from infra.analytics import _analytics_file, _write_event
-from usecases.index_photos import index_photos
+from infra.analytics import _analytics_file
 from pathlib import Path
 import json
-import uuid
 import logging
 
 # Create router for indexing endpoints
@@ -48,41 +46,14 @@ def index_v1(
         raise HTTPException(400, f"Cannot access folder: {str(e)}")
 
     emb = _emb(req.provider, req.hf_token, req.openai_key)
-    store = IndexStore(folder, index_key=getattr(emb, 'index_id', None))
-    
-    # Generate a job ID
-    job_id = str(uuid.uuid4())
-    
-    # Index photos synchronously (matches modern approach)
+
     try:
-        new_c, upd_c, total = index_photos(
-            folder,
-            batch_size=req.batch_size,
-            embedder=emb,
-            job_id=job_id,
-        )
-        
-        # Log analytics event
-        try:
-            _write_event(store.index_dir, {
-                "type": "index",
-                "new": int(new_c),
-                "updated": int(upd_c),
-                "total": int(total),
-            })
-        except Exception:
-            pass  # Non-critical, don't fail the request
-        
-        return IndexResponse(
-            ok=True,
-            new=new_c,
-            updated=upd_c,
-            total=total,
-            job_id=job_id,
-        )
+        # Queued as an admission-controlled embedding job; clients poll its status
+        job_id = _submit_index(folder, req.batch_size, emb)
     except Exception as e:
-        logging.error(f"Indexing job {job_id} failed: {str(e)}")
+        logging.error(f"Could not queue indexing for {folder}: {str(e)}")
         raise HTTPException(500, f"Indexing failed: {str(e)}")
+    return IndexResponse(ok=True, job_id=job_id)
 
 
 @indexing_router.get("/status", response_model=IndexStatusResponse)
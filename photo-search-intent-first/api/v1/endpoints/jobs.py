@@ -36,6 +36,7 @@ class JobStatusResponse(BaseModel):
     duration: float | None = None
     error: str | None = None
     progress: float | None = None
+    result: Any = None
 
 
 class QueueStatsResponse(BaseModel):
@@ -47,6 +48,10 @@ class QueueStatsResponse(BaseModel):
     pending: int
     running: int
     workers: int
+    pending_by_priority: Dict[str, int] = {}
+    classes: Dict[str, Dict[str, Any]] = {}
+    queue_latency: Dict[str, Any] = {}
+    run_time: Dict[str, Any] = {}
 
 
 @job_router.get("/stats", response_model=QueueStatsResponse)
@@ -78,11 +83,11 @@ async def get_job_status(job_id: str) -> JobStatusResponse:
 
 @job_router.delete("/{job_id}", response_model=Dict[str, bool])
 async def cancel_job(job_id: str) -> Dict[str, bool]:
-    """Cancel a pending job."""
+    """Cancel a pending job, or ask a running job to stop at its next checkpoint."""
     scheduler = get_job_scheduler()
     success = scheduler.cancel_job(job_id)
     
     if not success:
-        raise HTTPException(status_code=404, detail="Job not found or already running")
+        raise HTTPException(status_code=404, detail="Job not found or already finished")
     
     return {"cancelled": True}
\ No newline at end of file
@@ -6,9 +6,10 @@ from typing import Dict, Any, List, Optional
 from pathlib import Path
 import json
 
-from api.utils import _require, _from_body, _as_str_list, _emb
+from api.utils import _require, _from_body, _as_str_list, _emb, _submit_ocr
 from api.schemas.v1 import SearchResponse, SearchResultItem
 from infra.index_store import IndexStore
+from infra.text_index import text_index_for_store
 
 # Create router for OCR endpoints
 ocr_router = APIRouter(prefix="/ocr", tags=["ocr"])
@@ -24,7 +25,7 @@ def build_ocr_v1(
     body: Optional[Dict[str, Any]] = Body(None),
 ) -> Dict[str, Any]:
     """
-    Build OCR index for the specified directory.
+    Queue an OCR index build for the specified directory and return its job id.
     """
     dir_value = _require(_from_body(body, dir, "dir"), "dir")
     provider_value = _from_body(body, provider, "provider", default="local") or "local"
@@ -38,9 +39,8 @@ def build_ocr_v1(
     
     emb = _emb(provider_value, hf_token_value, openai_key_value)
     store = IndexStore(folder, index_key=getattr(emb, 'index_id', None))
-    updated = store.build_ocr(emb, languages=languages_value)
-    
-    return {"ok": True, "updated": updated}
+    job_id = _submit_ocr(store, emb, languages_value)
+    return {"ok": True, "job_id": job_id}
 
 
 @ocr_router.get("/status")
@@ -94,6 +94,7 @@ def get_ocr_snippets_v1(
     dir: Optional[str] = None,
     paths: Optional[List[str]] = None,
     limit: Optional[int] = None,
+    query: Optional[str] = None,
     body: Optional[Dict[str, Any]] = Body(None),
 ) -> Dict[str, Any]:
     """
@@ -102,26 +103,17 @@ def get_ocr_snippets_v1(
     dir_value = _require(_from_body(body, dir, "dir"), "dir")
     paths_value = _from_body(body, paths, "paths", default=[], cast=_as_str_list) or []
     limit_value = _from_body(body, limit, "limit", default=160, cast=int) or 160
+    query_value = _from_body(body, query, "query")
 
     store = IndexStore(Path(dir_value))
     texts: Dict[str, str] = {}
     try:
         if not store.ocr_texts_file.exists():
             return {"ok": True, "snippets": {}}
-        d = json.loads(store.ocr_texts_file.read_text())
-        base = {p: (t or '') for p, t in zip(d.get('paths', []), d.get('texts', []))}
-        
-        def mk_snip(s: str) -> str:
-            try:
-                s = ' '.join(s.split())
-                return s[: max(0, limit_value)].strip()
-            except Exception:
-                return s[: max(0, limit_value)] if s else ''
-        
-        for p in paths_value or []:
-            t = base.get(p, '')
-            if t:
-                texts[p] = mk_snip(t)
+        # Only the requested rows are read; with a query the snippet centres on its matches
+        texts = text_index_for_store(store).snippets(
+            paths_value, query=query_value, field="ocr", limit=limit_value
+        )
     except Exception:
         texts = {}
     
@@ -6,7 +6,7 @@ from typing import Dict, Any, List
 
 from api.schemas.v1 import TagsRequest, TagResponse, SuccessResponse
 from api.utils import _require, _from_body
-from infra.tags import load_tags, save_tags
+from infra.tags import add_tags, load_tags, save_tags, tags_for
 from pathlib import Path
 
 # Create router for tags endpoints
@@ -43,25 +43,12 @@ def set_tags_v1(
         if not folder.exists():
             return TagResponse(ok=False, message="Directory not found")
         
-        tags_map = load_tags(folder)
-        
-        # Get existing tags for the path or initialize as empty list
-        existing_tags = set(tags_map.get(request.path, []))
-        
-        # Add new tags
-        for tag in request.tags:
-            existing_tags.add(tag)
-        
-        # Update the tags map
-        tags_map[request.path] = sorted(list(existing_tags))
-        
-        # Save the updated tags
-        save_tags(folder, tags_map)
+        add_tags(folder, [request.path], request.tags)
         
         return TagResponse(
             ok=True,
             path=request.path,
-            tags=sorted(list(existing_tags))
+            tags=tags_for(folder, [request.path]).get(request.path, [])
         )
     except Exception as e:
         return TagResponse(ok=False, message=str(e))
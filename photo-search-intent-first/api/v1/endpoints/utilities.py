@@ -6,7 +6,7 @@ from fastapi.responses import FileResponse, JSONResponse
 from typing import Dict, Any, List, Optional
 
 from api.schemas.v1 import CachedSearchRequest, SearchRequest, SuccessResponse
-from api.utils import _as_bool, _as_str_list, _emb, _from_body, _require
+from api.utils import _as_bool, _as_str_list, _emb, _from_body, _require, _thumb_response
 from api.auth import require_auth
 from infra.analytics import log_search, _write_event as _write_event_infra
 from infra.thumbs import get_or_create_face_thumb, get_or_create_thumb
@@ -103,14 +103,13 @@ def map_v1(
     Extract GPS coordinates from EXIF data of photos for map visualization.
     """
     from PIL import ExifTags
-    from infra.index_store import IndexStore
+    from infra.index_registry import get_index_store
     folder = Path(directory)
     if not folder.exists():
         raise HTTPException(400, "Folder not found")
     inv = {v: k for k, v in ExifTags.TAGS.items()}
     pts: List[Dict[str, float]] = []
-    store = IndexStore(folder)
-    store.load()
+    store = get_index_store(folder)
     def to_deg(val):
         try:
             d,m,s = val
@@ -165,7 +164,7 @@ def search_paginated_v1(
     """
     Paginated search with cursor support for large result sets.
     """
-    from infra.index_store import IndexStore
+    from infra.index_registry import get_index_store
     # Extract pagination parameters
     limit_value = _from_body(body, limit, "limit", default=24, cast=lambda v: int(v)) or 24
     offset_value = _from_body(body, offset, "offset", default=0, cast=lambda v: int(v)) or 0
@@ -189,8 +188,7 @@ def search_paginated_v1(
 
     # Get embedder
     emb = _emb(search_req.provider, search_req.hf_token, search_req.openai_key)
-    store = IndexStore(folder, index_key=getattr(emb, 'index_id', None))
-    store.load()
+    store = get_index_store(folder, index_key=getattr(emb, 'index_id', None))
 
     # Perform search
     if search_req.use_captions and store.captions_available():
@@ -231,6 +229,7 @@ def search_cached_v1(
     Perform a semantic search with lightweight result caching.
     """
     from infra.index_store import IndexStore
+    from infra.index_registry import get_index_store
     folder = Path(req.dir).expanduser().resolve()
     if not folder.exists() or not folder.is_dir():
         raise HTTPException(400, "Folder not found")
@@ -264,8 +263,7 @@ def search_cached_v1(
 
     # Cache miss - perform actual search
     emb = _emb(req.provider, req.hf_token, req.openai_key)
-    store = IndexStore(folder, index_key=getattr(emb, 'index_id', None))
-    store.load()
+    store = get_index_store(folder, index_key=getattr(emb, 'index_id', None))
     
     if req.use_captions and store.captions_available():
         results = store.search_with_captions(emb, req.query, top_k=req.top_k)
@@ -303,7 +301,7 @@ def build_thumbnails_v1(
     """
     Build thumbnails for all photos in directory.
     """
-    from infra.index_store import IndexStore
+    from infra.index_registry import get_index_store
     dir_value = _require(_from_body(body, dir, "dir"), "dir")
     size_value = _from_body(body, size, "size", default=512, cast=int) or 512
     provider_value = _from_body(body, provider, "provider", default="local") or "local"
@@ -315,8 +313,7 @@ def build_thumbnails_v1(
         raise HTTPException(400, "Folder not found")
     
     emb = _emb(provider_value, hf_token_value, openai_key_value)
-    store = IndexStore(folder, index_key=getattr(emb, 'index_id', None))
-    store.load()
+    store = get_index_store(folder, index_key=getattr(emb, 'index_id', None))
     
     made = 0
     for sp, mt in zip(store.state.paths or [], store.state.mtimes or []):
@@ -395,35 +392,29 @@ def thumb_batch_v1(
 
 @utilities_router.get("/thumb")
 def get_thumbnail_v1(
+    request: Request,
     directory: str = Query(..., alias="dir"), 
     path: str = Query(...), 
     size: int = 256,
-    _auth = Depends(require_auth)
+    v: Optional[str] = None,
+    _auth = Depends(require_auth),
 ):
     """
     Get thumbnail of a photo.
     """
-    from infra.index_store import IndexStore
+    from services.thumbnail_service import thumbnail_service
     folder = Path(directory)
     if not folder.exists():
         raise HTTPException(400, "Folder not found")
     
-    store = IndexStore(folder)
-    store.load()
-    
     try:
-        # Find the mtime for this path
-        idx_map = {sp: float(mt) for sp, mt in zip(store.state.paths or [], store.state.mtimes or [])}
-        mtime = idx_map.get(path, 0.0)
-        
-        # Generate or get existing thumbnail
-        tp = get_or_create_thumb(store.index_dir, Path(path), float(mtime), size=size)
-        if tp is None or not tp.exists():
-            raise HTTPException(404, "Thumb not found")
-        
-        return FileResponse(str(tp))
+        # Served from the path -> mtime map; the index itself is never loaded
+        thumb = thumbnail_service.get(folder, path, size=size)
     except Exception:
         raise HTTPException(500, "Failed to generate thumbnail")
+    if thumb is None:
+        raise HTTPException(404, "Thumb not found")
+    return _thumb_response(thumb, request.headers.get("if-none-match"), versioned=bool(v))
 
 
 @utilities_router.get("/thumb_face")
@@ -440,15 +431,14 @@ def get_face_thumbnail_v1(
     """
     Get thumbnail of a face from a photo.
     """
-    from infra.index_store import IndexStore
+    from infra.index_registry import get_index_store
     from infra.faces import load as _faces_load
     folder = Path(directory)
     if not folder.exists():
         raise HTTPException(400, "Folder not found")
     
     embd = _emb(provider, hf_token, openai_key)
-    store = IndexStore(folder, index_key=getattr(embd, 'index_id', None))
-    store.load()
+    store = get_index_store(folder, index_key=getattr(embd, 'index_id', None))
     
     try:
         idx_map = {sp: float(mt) for sp, mt in zip(store.state.paths or [], store.state.mtimes or [])}
@@ -495,7 +485,7 @@ def search_like_v1(
     """
     Find similar photos to a given photo.
     """
-    from infra.index_store import IndexStore
+    from infra.index_registry import get_index_store
     dir_value = _require(_from_body(body, dir, "dir"), "dir")
     path_value = _require(_from_body(body, path, "path"), "path")
     top_k_value = _from_body(body, top_k, "top_k", default=12, cast=int) or 12
@@ -508,8 +498,7 @@ def search_like_v1(
         raise HTTPException(400, "Folder not found")
     
     emb = _emb(provider_value, hf_token_value, openai_key_value)
-    store = IndexStore(folder, index_key=getattr(emb, 'index_id', None))
-    store.load()
+    store = get_index_store(folder, index_key=getattr(emb, 'index_id', None))
     out = store.search_like(path_value, top_k=top_k_value)
     return SuccessResponse(ok=True, data={"results": [{"path": str(r.path), "score": float(r.score)} for r in out]})
 
@@ -530,7 +519,7 @@ def search_like_plus_v1(
     """
     Enhanced similarity search with text weighting.
     """
-    from infra.index_store import IndexStore
+    from infra.index_registry import get_index_store
     dir_value = _require(_from_body(body, dir, "dir"), "dir")
     path_value = _require(_from_body(body, path, "path"), "path")
     top_k_value = _from_body(body, top_k, "top_k", default=12, cast=int) or 12
@@ -545,8 +534,7 @@ def search_like_plus_v1(
         raise HTTPException(400, "Folder not found")
     
     emb = _emb(provider_value, hf_token_value, openai_key_value)
-    store = IndexStore(folder, index_key=getattr(emb, 'index_id', None))
-    store.load()
+    store = get_index_store(folder, index_key=getattr(emb, 'index_id', None))
     
     if store.state.embeddings is None or not store.state.paths:
         return SuccessResponse(ok=True, data={"results": []})
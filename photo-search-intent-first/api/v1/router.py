@@ -14,7 +14,7 @@ from .endpoints import (
     data_management_router, utilities_router, file_management_router, fast_index_router,
     captions_router, admin_router, watch_router, workspace_router,
     smart_collections_router, trips_router, enhanced_smart_collections_router,
-    enhanced_faces_router, enhanced_search_router, enhanced_indexing_router
+    enhanced_faces_router, enhanced_search_router, enhanced_indexing_router, job_router
 )
 
 # Main API v1 router
@@ -54,4 +54,5 @@ api_v1.include_router(trips_router)
 api_v1.include_router(enhanced_smart_collections_router)
 api_v1.include_router(enhanced_faces_router)
 api_v1.include_router(enhanced_search_router)
-api_v1.include_router(enhanced_indexing_router)
\ No newline at end of file
+api_v1.include_router(enhanced_indexing_router)
+api_v1.include_router(job_router)
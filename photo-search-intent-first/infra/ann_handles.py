@@ -0,0 +1,238 @@
+"""Resident ANN index handles shared by every IndexStore/WorkspaceIndex.
+
+Intent:
+  The ``search_hnsw``/``search_faiss``/``search_annoy`` methods used to open
+  the on-disk index (``load_index``/``read_index``/``AnnoyIndex.load``) and
+  re-read its meta JSON on every query, and ``FastIndexManager`` re-tried the
+  library imports on every search. For mid-size libraries that I/O made the
+  "fast" path slower than exact search. This module keeps:
+
+  - library availability, resolved once per process (``ann_library``);
+  - opened index objects keyed by file path, memory-mapped where the library
+    supports it (Annoy always, FAISS via ``IO_FLAG_MMAP``), reopened only when
+    the artifact's (mtime, size) stamp changes;
+  - meta JSON and workspace ``.npy``/paths files under the same stamp rule.
+
+Contract:
+  - ann_library(kind) -> module or None (kind in {"hnsw", "faiss", "annoy"})
+  - read_meta(meta_file) -> Optional[dict]
+  - open_handle(kind, index_file, meta_file) -> Optional[AnnHandle]
+  - AnnHandle.query(q, k, ef, nprobe) -> (row ids, approximate similarities)
+  - invalidate(path=None) drops cached entries (all of them by default)
+"""
+from __future__ import annotations
+
+import json
+import threading
+from dataclasses import dataclass, field
+from functools import lru_cache
+from pathlib import Path
+from types import ModuleType
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+_Stamp = Tuple[Tuple[int, int], ...]
+
+
+@lru_cache(maxsize=None)
+def ann_library(kind: str) -> Optional[ModuleType]:
+    """The backend's library if importable; a failed import is not retried."""
+    try:
+        if kind == "hnsw":
+            import hnswlib  # type: ignore
+            return hnswlib
+        if kind == "faiss":
+            import faiss  # type: ignore
+            return faiss
+        if kind == "annoy":
+            import annoy  # type: ignore
+            return annoy
+    except Exception:
+        return None
+    return None
+
+
+def _stamp(*files: Path) -> Optional[_Stamp]:
+    out = []
+    for f in files:
+        try:
+            st = Path(f).stat()
+        except OSError:
+            return None
+        out.append((st.st_mtime_ns, st.st_size))
+    return tuple(out)
+
+
+_lock = threading.Lock()
+_cache: Dict[str, Tuple[_Stamp, Any]] = {}
+
+
+def _cached(key: str, files: Tuple[Path, ...], loader: Callable[[], Any]) -> Any:
+    stamp = _stamp(*files)
+    if stamp is None:
+        with _lock:
+            _cache.pop(key, None)
+        return None
+    with _lock:
+        hit = _cache.get(key)
+    if hit is not None and hit[0] == stamp:
+        return hit[1]
+    value = loader()
+    with _lock:
+        _cache[key] = (stamp, value)
+    return value
+
+
+def read_meta(meta_file: Path) -> Optional[dict]:
+    """Parsed ANN meta JSON, re-read only when the file changes."""
+    def _load() -> Optional[dict]:
+        try:
+            return json.loads(Path(meta_file).read_text())
+        except Exception:
+            return None
+    return _cached(f"meta:{meta_file}", (Path(meta_file),), _load)
+
+
+def resident_npy(path: Path) -> Optional[np.ndarray]:
+    """Memory-mapped ``.npy`` matrix, reopened only when the file changes."""
+    return _cached(f"npy:{path}", (Path(path),), lambda: np.load(path, mmap_mode="r"))
+
+
+def resident_paths(path: Path) -> List[str]:
+    """The ``paths`` list of a ``paths.json`` file, re-read only when it changes."""
+    def _load() -> List[str]:
+        try:
+            return json.loads(Path(path).read_text()).get("paths", [])
+        except Exception:
+            return []
+    return _cached(f"paths:{path}", (Path(path),), _load) or []
+
+
+@dataclass
+class AnnHandle:
+    kind: str
+    index: Any
+    meta: dict
+    # hnswlib's ef and FAISS's nprobe are index state; set + search must not interleave
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+    @property
+    def size(self) -> int:
+        return int(self.meta.get("size") or 0)
+
+    def query(
+        self,
+        q: np.ndarray,
+        k: int,
+        ef: Optional[int] = None,
+        nprobe: Optional[int] = None,
+    ) -> Tuple[List[int], List[float]]:
+        """Up to ``k`` nearest rows for ``q`` with approximate cosine similarities.
+
+        ``ef`` is the HNSW search breadth (Annoy: ``search_k``); ``nprobe`` the
+        number of IVF lists FAISS visits. Both are ignored by backends that
+        have no such knob.
+        """
+        q = np.asarray(q, dtype=np.float32)
+        k = max(1, min(int(k), self.size or int(k)))
+        if self.kind == "hnsw":
+            with self.lock:
+                self.index.set_ef(max(int(ef or 50), k))
+                labels, distances = self.index.knn_query(q, k=k)
+            return [int(i) for i in labels[0]], [1.0 - float(d) for d in distances[0]]
+        if self.kind == "faiss":
+            # Tuned defaults from the build report, overridden per query
+            params = dict(self.meta.get("search_params") or {})
+            if nprobe:
+                params["nprobe"] = int(nprobe)
+            if ef and self.meta.get("family") == "hnsw":
+                params["efSearch"] = int(ef)
+            if params:
+                from infra.faiss_factory import set_search_params
+                with self.lock:
+                    set_search_params(ann_library("faiss"), self.index, params)
+                    D, I = self.index.search(q.reshape(1, -1), k)
+            else:
+                D, I = self.index.search(q.reshape(1, -1), k)
+            pairs = [(int(i), float(d)) for i, d in zip(I[0], D[0]) if i >= 0]
+            return [i for i, _ in pairs], [d for _, d in pairs]
+        if self.kind == "annoy":
+            ids, dists = self.index.get_nns_by_vector(q.tolist(), k, search_k=int(ef or -1), include_distances=True)
+            # Annoy's angular distance is sqrt(2 - 2cos)
+            return list(ids), [1.0 - float(d) ** 2 / 2.0 for d in dists]
+        raise ValueError(f"Unknown ANN backend: {self.kind}")
+
+
+def _faiss_ivf(index: Any) -> Optional[Any]:
+    """The IVF layer of a FAISS index (also inside pre-transforms), if any."""
+    lib = ann_library("faiss")
+    try:
+        return lib.extract_index_ivf(index) if lib is not None else None
+    except Exception:
+        return None
+
+
+def _open(kind: str, index_file: Path, meta: dict) -> Optional[Any]:
+    lib = ann_library(kind)
+    if lib is None:
+        return None
+    dim = int(meta.get("dim") or 0)
+    if kind == "hnsw":
+        if dim <= 0:
+            return None
+        index = lib.Index(space="cosine", dim=dim)
+        index.load_index(str(index_file))
+        return index
+    if kind == "faiss":
+        flag = getattr(lib, "IO_FLAG_MMAP", None)
+        if flag is not None:
+            try:
+                return lib.read_index(str(index_file), flag)
+            except Exception:
+                pass  # Index type without mmap support: read into memory
+        return lib.read_index(str(index_file))
+    if kind == "annoy":
+        if dim <= 0:
+            return None
+        index = lib.AnnoyIndex(dim, "angular")
+        if not index.load(str(index_file)):  # mmaps the file
+            return None
+        return index
+    return None
+
+
+def open_handle(kind: str, index_file: Path, meta_file: Path) -> Optional[AnnHandle]:
+    """Resident handle for an on-disk ANN index; None if missing or unloadable."""
+    def _load() -> Optional[AnnHandle]:
+        meta = read_meta(meta_file)
+        if meta is None:
+            return None
+        try:
+            index = _open(kind, Path(index_file), meta)
+        except Exception:
+            return None
+        return AnnHandle(kind=kind, index=index, meta=meta) if index is not None else None
+    return _cached(f"{kind}:{index_file}", (Path(index_file), Path(meta_file)), _load)
+
+
+def invalidate(path: Optional[Path] = None) -> None:
+    """Forget cached handles/files for ``path`` (any key mentioning it), or everything."""
+    with _lock:
+        if path is None:
+            _cache.clear()
+            return
+        needle = str(path)
+        for key in [k for k in _cache if k.split(":", 1)[1] == needle]:
+            _cache.pop(key, None)
+
+
+__all__ = [
+    "AnnHandle",
+    "ann_library",
+    "invalidate",
+    "open_handle",
+    "read_meta",
+    "resident_npy",
+    "resident_paths",
+]
@@ -0,0 +1,299 @@
+"""Incremental upkeep of on-disk ANN indexes as the embedding store changes.
+
+Intent:
+  ANN artifacts were only ever rebuilt from scratch, and ``upsert`` never
+  touched them, so after new photos arrived the HNSW/FAISS/Annoy results
+  silently drifted from the store. Each artifact now records the embedding
+  generation it reflects and is brought forward on every ``IndexStore.save``:
+
+  - hnswlib: ``mark_deleted`` for dropped or changed rows, ``add_items`` for
+    new ones (capacity grown on load);
+  - FAISS IVF/Flat (ID-mapped): ``remove_ids`` / ``add_with_ids``;
+  - Annoy and FAISS-HNSW cannot remove vectors, so new rows go to a delta
+    that ``IndexStore.ann_search`` scores exactly alongside the ANN
+    candidates, and dropped rows are filtered out.
+
+  Once the delta plus deleted labels pass ``REBUILD_RATIO`` of the index (or
+  ``REBUILD_MIN`` rows), a full rebuild is scheduled on a background thread.
+
+Labels:
+  ANN labels are the store rows at build time. Later saves move, drop and
+  append rows, so ``<index>.labels.npy`` maps label -> current row (-1 for
+  dropped). The file is absent while the mapping is the identity. Labels
+  ``>= meta["indexed"]`` are delta rows that are not inside the ANN structure.
+
+Contract:
+  - label_rows(index_file) -> Optional[np.ndarray] (None: identity)
+  - reset(index_file) forgets the label map
+  - staging_file(index_file) -> where a rebuild writes the new index
+  - install(index_file, meta_file, meta) swaps a staged rebuild in
+  - plan(old_paths, new_paths, changed_rows, labels) -> (mapped, removed, added)
+  - sync(kind, index_file, meta_file, ...) -> "synced" | "rebuild" | "skipped"
+  - schedule_rebuild(key, fn) -> Optional[threading.Thread]; rebuilding(key) -> bool
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from infra import ann_handles
+
+logger = logging.getLogger(__name__)
+
+REBUILD_RATIO = 0.1
+REBUILD_MIN = 2048
+
+
+def labels_file(index_file: Path) -> Path:
+    return Path(index_file).with_suffix(".labels.npy")
+
+
+def label_rows(index_file: Path) -> Optional[np.ndarray]:
+    """label -> current row map, kept resident; None when it is the identity."""
+    path = labels_file(index_file)
+    if not path.exists():
+        return None
+    return ann_handles.resident_npy(path)
+
+
+def reset(index_file: Path) -> None:
+    try:
+        labels_file(index_file).unlink()
+    except OSError:
+        pass
+    ann_handles.invalidate(labels_file(index_file))
+
+
+def mutable(kind: str, meta: dict) -> bool:
+    """Whether the backend can add and remove vectors in place."""
+    if kind == "hnsw":
+        return True
+    if kind == "faiss":
+        return meta.get("family") in ("ivf", "flat") and bool(meta.get("id_mapped"))
+    return False
+
+
+def plan(
+    old_paths: Sequence[str],
+    new_paths: Sequence[str],
+    changed_rows: Sequence[int],
+    labels: np.ndarray,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Carry labels from ``old_paths`` rows to ``new_paths`` rows.
+
+    Returns ``mapped`` (label -> new row, -1 if dropped), the labels that
+    were live and are now dropped (``removed``), and the new rows no label
+    covers (``added``). Rows in ``changed_rows`` have a new vector, so their
+    old label is dropped and the row is re-added.
+    """
+    where = {p: i for i, p in enumerate(new_paths)}
+    old_to_new = np.fromiter((where.get(p, -1) for p in old_paths), dtype=np.int64, count=len(old_paths))
+    changed = np.zeros(len(new_paths), dtype=bool)
+    if len(changed_rows):
+        changed[np.asarray(changed_rows, dtype=np.int64)] = True
+    live = (labels >= 0) & (labels < len(old_to_new))
+    mapped = np.full(len(labels), -1, dtype=np.int64)
+    mapped[live] = old_to_new[labels[live]]
+    mapped[(mapped >= 0) & changed[np.maximum(mapped, 0)]] = -1
+    removed = np.nonzero(live & (mapped < 0))[0]
+    covered = np.zeros(len(new_paths), dtype=bool)
+    covered[mapped[mapped >= 0]] = True
+    added = np.nonzero(~covered)[0]
+    return mapped, removed, added
+
+
+def staging_file(path: Path) -> Path:
+    path = Path(path)
+    return path.with_name(path.name + ".tmp")
+
+
+def _replace_with(path: Path, write: Callable[[str], None]) -> None:
+    """Write via ``write(tmp_path)`` then swap in, so mmap readers keep their file."""
+    tmp = staging_file(path)
+    write(str(tmp))
+    os.replace(tmp, path)
+
+
+def install(index_file: Path, meta_file: Path, meta: dict) -> None:
+    """Swap the index staged at ``staging_file(index_file)`` in with ``meta``.
+
+    The slow part of a rebuild (training, writing the staged file) leaves the
+    old index, labels and meta serving together. Here the meta goes first, so
+    for the few renames until the new meta lands ``open_handle`` finds no
+    artifact and searches fall back to exact instead of pairing the old label
+    map with the new index.
+    """
+    index_file, meta_file = Path(index_file), Path(meta_file)
+    try:
+        meta_file.unlink()
+    except FileNotFoundError:
+        pass
+    ann_handles.invalidate(meta_file)
+    os.replace(staging_file(index_file), index_file)
+    reset(index_file)
+    _replace_with(meta_file, lambda p: Path(p).write_text(json.dumps(meta)))
+    ann_handles.invalidate(index_file)
+
+
+def _save_npy(path: str, array: np.ndarray) -> None:
+    with open(path, "wb") as f:
+        np.save(f, array)
+
+
+def _apply_hnsw(lib, index_file: Path, meta: dict, E: np.ndarray, removed: np.ndarray, added: np.ndarray, first_label: int) -> int:
+    index = lib.Index(space="cosine", dim=int(meta["dim"]))
+    index.load_index(str(index_file), max_elements=int(first_label + len(added)))
+    for label in removed.tolist():
+        try:
+            index.mark_deleted(int(label))
+        except RuntimeError:
+            pass  # already deleted
+    if len(added):
+        index.add_items(np.asarray(E[added], dtype=np.float32), np.arange(first_label, first_label + len(added)))
+    _replace_with(index_file, index.save_index)
+    return int(index.get_current_count())
+
+
+def _apply_faiss(lib, index_file: Path, meta: dict, E: np.ndarray, removed: np.ndarray, added: np.ndarray, first_label: int) -> int:
+    index = lib.read_index(str(index_file))
+    if len(removed):
+        index.remove_ids(np.asarray(removed, dtype=np.int64))
+    if len(added):
+        index.add_with_ids(
+            np.ascontiguousarray(E[added], dtype=np.float32),
+            np.arange(first_label, first_label + len(added), dtype=np.int64),
+        )
+    _replace_with(index_file, lambda p: lib.write_index(index, p))
+    return int(index.ntotal)
+
+
+def sync(
+    kind: str,
+    index_file: Path,
+    meta_file: Path,
+    old_paths: Sequence[str],
+    old_generation: int,
+    new_paths: Sequence[str],
+    embeddings: np.ndarray,
+    changed_rows: Sequence[int],
+    generation: int,
+) -> str:
+    """Bring one ANN artifact from ``old_generation`` to ``generation``.
+
+    Returns "synced", "rebuild" (the artifact cannot follow incrementally or
+    has drifted too far; the caller should rebuild it) or "skipped".
+    """
+    index_file, meta_file = Path(index_file), Path(meta_file)
+    meta = ann_handles.read_meta(meta_file)
+    if meta is None or not index_file.exists():
+        return "skipped"
+    if meta.get("generation") == generation:
+        return "skipped"
+    if meta.get("generation") != old_generation:
+        return "rebuild"
+    lib = ann_handles.ann_library(kind)
+    if lib is None:
+        return "skipped"
+
+    labels = label_rows(index_file)
+    indexed = int(meta.get("indexed", meta.get("size") or 0))
+    if labels is None:
+        labels = np.arange(indexed, dtype=np.int64)
+    labels = np.asarray(labels, dtype=np.int64)
+    mapped, removed, added = plan(old_paths, new_paths, changed_rows, labels)
+    first_label = len(labels)
+    new_labels = np.concatenate([mapped, added.astype(np.int64)])
+    meta = dict(meta)
+    if mutable(kind, meta):
+        if kind == "hnsw":
+            # mark_deleted leaves holes that count until the next rebuild
+            stored = _apply_hnsw(lib, index_file, meta, embeddings, removed, added, first_label)
+            meta["deleted"] = int(meta.get("deleted", 0)) + len(removed)
+        else:
+            stored = _apply_faiss(lib, index_file, meta, embeddings, removed, added, first_label)
+            meta["deleted"] = 0
+        meta["size"] = stored - meta["deleted"]
+        indexed = len(new_labels)
+        meta["delta"] = 0
+    else:
+        meta["deleted"] = int(meta.get("deleted", 0)) + int(np.count_nonzero(removed < indexed))
+        meta["delta"] = int(np.count_nonzero(new_labels[indexed:] >= 0))
+    meta["indexed"] = indexed
+    meta["labels"] = len(new_labels)
+    meta["generation"] = generation
+
+    if len(new_labels) == len(new_paths) and np.array_equal(new_labels, np.arange(len(new_paths))):
+        reset(index_file)
+    else:
+        path = labels_file(index_file)
+        _replace_with(path, lambda p: _save_npy(p, new_labels))
+        ann_handles.invalidate(path)
+    meta_file.write_text(json.dumps(meta))
+    ann_handles.invalidate(index_file)
+
+    drift = int(meta.get("delta", 0)) + int(meta.get("deleted", 0))
+    if drift > max(REBUILD_MIN, REBUILD_RATIO * max(1, indexed)):
+        return "rebuild"
+    return "synced"
+
+
+_rebuilding: Dict[str, threading.Thread] = {}
+_rerun: Set[str] = set()
+_rebuild_lock = threading.Lock()
+
+
+def rebuilding(key: str) -> bool:
+    with _rebuild_lock:
+        running = _rebuilding.get(key)
+        return running is not None and running.is_alive()
+
+
+def schedule_rebuild(key: str, fn: Callable[[], object]) -> Optional[threading.Thread]:
+    """Run ``fn`` on a background thread; if one is running for ``key``, run it again after.
+
+    The thread is not a daemon, so a CLI indexing run finishes the rebuild
+    before exiting.
+    """
+    with _rebuild_lock:
+        running = _rebuilding.get(key)
+        if running is not None and running.is_alive():
+            _rerun.add(key)
+            return None
+
+        def _run() -> None:
+            while True:
+                try:
+                    fn()
+                except Exception as e:
+                    logger.warning("Background ANN rebuild %s failed: %s", key, e)
+                with _rebuild_lock:
+                    if key in _rerun:
+                        _rerun.discard(key)
+                        continue
+                    _rebuilding.pop(key, None)
+                    return
+
+        thread = threading.Thread(target=_run, name=f"ann-rebuild:{key}", daemon=False)
+        _rebuilding[key] = thread
+    thread.start()
+    return thread
+
+
+__all__ = [
+    "REBUILD_MIN",
+    "REBUILD_RATIO",
+    "label_rows",
+    "labels_file",
+    "mutable",
+    "plan",
+    "rebuilding",
+    "reset",
+    "schedule_rebuild",
+    "sync",
+]
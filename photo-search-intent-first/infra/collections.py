@@ -2,10 +2,13 @@ from __future__ import annotations
 
 import json
 from pathlib import Path
-from typing import Dict, List, Any
+from typing import Dict, Iterable, List, Any
+
+from infra.label_store import COLLECTION, existing_label_store, label_store_for, pairs_from_json
 
 
 def _file(index_dir: Path) -> Path:
+    """Legacy collections file; migrated into ``labels.db`` once, on first use, then ignored."""
     return index_dir / "collections.json"
 
 def _smart_file(index_dir: Path) -> Path:
@@ -14,22 +17,49 @@ def _smart_file(index_dir: Path) -> Path:
 
 def load_collections(index_dir: Path) -> Dict[str, List[str]]:
     try:
-        p = _file(index_dir)
-        if p.exists():
-            return json.loads(p.read_text())
+        store = existing_label_store(index_dir)
+        return store.by_label(COLLECTION) if store is not None else {}
     except Exception:
-        pass
-    return {}
+        return {}
 
 
 def save_collections(index_dir: Path, data: Dict[str, List[str]]) -> None:
+    """Make the stored collections equal ``data``; only changed memberships are written."""
     try:
-        p = _file(index_dir)
-        p.write_text(json.dumps(data, indent=2))
+        label_store_for(index_dir).replace_all(COLLECTION, pairs_from_json(COLLECTION, data), names=data.keys())
     except Exception:
         pass
 
 
+def collection_paths(index_dir: Path, name: str) -> List[str]:
+    """Members of one collection, in the order they were added."""
+    try:
+        store = existing_label_store(index_dir)
+        return store.paths_for(COLLECTION, name) if store is not None else []
+    except Exception:
+        return []
+
+
+def add_to_collection(index_dir: Path, name: str, paths: Iterable[str]) -> int:
+    """Add ``paths`` to ``name`` (creating it) in one transaction; returns paths added."""
+    store = label_store_for(index_dir)
+    store.create(COLLECTION, name)
+    return store.add(COLLECTION, [name], paths)
+
+
+def remove_from_collection(index_dir: Path, name: str, paths: Iterable[str]) -> int:
+    return label_store_for(index_dir).remove(COLLECTION, [name], paths)
+
+
+def set_collection(index_dir: Path, name: str, paths: Iterable[str]) -> List[str]:
+    """Replace the members of ``name``; returns them in stored order."""
+    return label_store_for(index_dir).set_members(COLLECTION, name, paths)
+
+
+def delete_collection(index_dir: Path, name: str) -> bool:
+    return label_store_for(index_dir).delete_label(COLLECTION, name)
+
+
 def load_smart_collections(index_dir: Path) -> Dict[str, Any]:
     try:
         p = _smart_file(index_dir)
@@ -34,12 +34,21 @@ class Config(BaseModel):
     # Model and provider settings
     photovault_model_dir: Optional[Path] = Field(default=None, description="Local model directory")
     sentence_transformers_home: Optional[Path] = Field(default=None, description="Sentence transformers cache")
+    warm_providers: str = Field(default="", description="Providers to load and warm at startup, e.g. 'local,clip:clip-ViT-B-32'")
     transformers_offline: bool = Field(default=False, description="Run transformers offline")
     offline_mode: bool = Field(default=False, description="General offline mode")
 
     # Storage and paths
     ps_appdata_dir: Optional[Path] = Field(default=None, description="App data directory")
     storage_backend: str = Field(default="file", description="Storage backend: 'file' or 'sqlite'")
+    embedding_dtype: str = Field(default="float32", description="On-disk embedding segment dtype: 'float32' or 'float16'")
+    index_cache_mb: int = Field(default=2048, description="Memory budget for resident search indexes (MB, <=0 disables eviction)")
+    metadata_workers: int = Field(default=0, description="Processes for EXIF extraction (0 = auto)")
+    ocr_workers: int = Field(default=0, description="Processes for OCR builds, one reader each (0 = auto)")
+    hash_workers: int = Field(default=0, description="Processes for look-alike hashing (0 = auto)")
+    curation_workers: int = Field(default=0, description="Processes for auto-curation photo analysis (0 = auto)")
+    job_ram_budget_mb: int = Field(default=6144, description="Memory budget for concurrently running background jobs (MB, <=0 disables)")
+    job_cpu_budget: float = Field(default=0, description="CPU cores background jobs may occupy at once (0 = cores - 1)")
 
     # Other
     env: str = Field(default="dev", description="Environment (dev/prod)")
@@ -99,10 +108,19 @@ def load_config() -> Config:
         cors_origins=cors_origins_value,
         photovault_model_dir=Path(os.environ["PHOTOVAULT_MODEL_DIR"]) if os.environ.get("PHOTOVAULT_MODEL_DIR") else None,
         sentence_transformers_home=Path(os.environ["SENTENCE_TRANSFORMERS_HOME"]) if os.environ.get("SENTENCE_TRANSFORMERS_HOME") else None,
+        warm_providers=os.environ.get("PS_WARM_PROVIDERS", "").strip(),
         transformers_offline=os.environ.get("TRANSFORMERS_OFFLINE", "").strip() == "1",
         offline_mode=os.environ.get("OFFLINE_MODE", "").strip() == "1",
         ps_appdata_dir=Path(os.environ["PS_APPDATA_DIR"]) if os.environ.get("PS_APPDATA_DIR") else None,
         storage_backend=os.environ.get("STORAGE_BACKEND", "file").strip().lower(),
+        embedding_dtype=os.environ.get("PS_EMBEDDING_DTYPE", "float32").strip().lower() or "float32",
+        index_cache_mb=int(os.environ.get("PS_INDEX_CACHE_MB", "2048").strip() or 2048),
+        metadata_workers=int(os.environ.get("PS_METADATA_WORKERS", "0").strip() or 0),
+        ocr_workers=int(os.environ.get("PS_OCR_WORKERS", "0").strip() or 0),
+        hash_workers=int(os.environ.get("PS_HASH_WORKERS", "0").strip() or 0),
+        curation_workers=int(os.environ.get("PS_CURATION_WORKERS", "0").strip() or 0),
+        job_ram_budget_mb=int(os.environ.get("PS_JOB_RAM_MB", "6144").strip() or 6144),
+        job_cpu_budget=float(os.environ.get("PS_JOB_CPU_CORES", "0").strip() or 0),
         env=os.environ.get("ENV", "dev").strip(),
     )
 
@@ -0,0 +1,374 @@
+"""Parallel, incremental per-photo analysis for auto-curation.
+
+Intent:
+  ``analyze_photos_task`` used to open and fully decode every photo serially
+  inside a coroutine, on every run, and kept the results only in the job's
+  in-memory dict. This module:
+
+  - reads metadata from the image header only (``Image.open`` does not
+    decode pixels) and scores quality from one OpenCV decode per photo;
+  - fans fixed-size chunks out to a process pool with a bounded number of
+    chunks in flight (serial below ``MIN_PARALLEL_FILES`` or when no pool is
+    available), reporting progress per finished chunk;
+  - persists each photo's metadata and quality in a SQLite cache keyed by
+    (path, mtime, size) and ``VERSION``, so re-analysing a shoot only touches
+    new or edited photos, and a cancelled run keeps the chunks it finished.
+
+  Results are plain JSON-able dicts so they cross process boundaries and the
+  cache unchanged; the router wraps them in its pydantic models.
+
+Contract:
+  - image_metadata(path) -> dict (raises OSError when the file is unreadable)
+  - image_quality(path) -> dict with the ``QUALITY_FIELDS`` scores and factors
+  - AnalysisCache(cache_dir).get(paths, stamps, quality) / .put(rows)
+  - analyze_photos(paths, quality=True, cache_dir=None, workers=None,
+    chunk_size=32, on_progress=None) -> one {"metadata", "quality"} dict per
+    path, or None for photos that could not be read or were not reached
+    because ``on_progress`` returned False
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import sqlite3
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from contextlib import contextmanager
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+from PIL import Image
+from PIL.ExifTags import TAGS
+
+from infra.config import config
+
+logger = logging.getLogger(__name__)
+
+# Bump when the metadata or scoring below changes so cached rows are redone
+VERSION = 1
+CACHE_FILE = "curation_analysis.db"
+# Below this many files the pool start-up cost outweighs the parallelism
+MIN_PARALLEL_FILES = 64
+QUALITY_FIELDS = ("overall", "technical", "composition", "sharpness", "exposure", "colors")
+DEFAULT_QUALITY: Dict[str, Any] = {**{k: 50.0 for k in QUALITY_FIELDS}, "factors": {}}
+# Exif sub-IFD: DateTimeOriginal, exposure settings
+_EXIF_IFD = 0x8769
+
+Stamp = Tuple[float, int]
+Row = Dict[str, Any]
+
+
+def _plain(value: Any) -> Any:
+    """EXIF values (rationals, tuples, bytes) as JSON scalars."""
+    if isinstance(value, (int, str)) or value is None:
+        return value
+    if isinstance(value, (tuple, list)):
+        return _plain(value[0]) if len(value) == 1 else [_plain(v) for v in value]
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return str(value)
+
+
+def _clamp(x: float) -> float:
+    return float(min(100.0, max(0.0, x)))
+
+
+def image_metadata(path: str) -> Row:
+    """Camera, date and file info for ``path`` from its header."""
+    st = os.stat(path)
+    date_taken = st.st_mtime
+    camera = "Unknown"
+    settings: Dict[str, Any] = {}
+    try:
+        with Image.open(path) as img:
+            exif = img.getexif()
+            tags = {TAGS.get(k, k): v for k, v in exif.items()}
+            tags.update({TAGS.get(k, k): v for k, v in exif.get_ifd(_EXIF_IFD).items()})
+            file_info = {
+                "size_bytes": st.st_size,
+                "format": img.format,
+                "dimensions": {"width": img.width, "height": img.height},
+                "color_space": img.mode,
+            }
+    except Exception as e:
+        logger.error(f"Error extracting metadata from {path}: {e}")
+        tags = {}
+        file_info = {
+            "size_bytes": st.st_size,
+            "format": Path(path).suffix.upper().replace(".", ""),
+            "dimensions": {"width": 0, "height": 0},
+            "color_space": "Unknown",
+        }
+
+    try:
+        date_taken = datetime.strptime(str(tags["DateTimeOriginal"]), "%Y:%m:%d %H:%M:%S").timestamp()
+    except (KeyError, ValueError):
+        pass
+    if "Make" in tags and "Model" in tags:
+        camera = f"{tags['Make']} {tags['Model']}"
+    try:
+        if "ExposureTime" in tags:
+            settings["shutter_speed"] = f"1/{int(1 / float(tags['ExposureTime']))}"
+    except (ZeroDivisionError, TypeError, ValueError):
+        pass
+    if "FNumber" in tags:
+        settings["aperture"] = f"f/{_plain(tags['FNumber'])}"
+    if "ISOSpeedRatings" in tags:
+        settings["iso"] = _plain(tags["ISOSpeedRatings"])
+    if "FocalLength" in tags:
+        settings["focal_length"] = f"{_plain(tags['FocalLength'])}mm"
+    if "Flash" in tags:
+        settings["flash_used"] = bool(_plain(tags["Flash"]))
+
+    return {
+        "path": path,
+        "date_taken": date_taken,
+        "camera": camera,
+        "lens": None,
+        "settings": settings,
+        "file_info": file_info,
+    }
+
+
+def image_quality(path: str) -> Row:
+    """Sharpness, exposure, contrast, noise, composition and colour scores (0-100)."""
+    import cv2
+
+    try:
+        img = cv2.imread(path)
+        if img is None:
+            return dict(DEFAULT_QUALITY)
+        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+
+        sharpness = _clamp(cv2.Laplacian(gray, cv2.CV_64F).var() / 100)
+        brightness_score = _clamp(100 - abs(float(np.mean(gray)) - 128) * 0.8)
+        contrast_score = _clamp(float(np.std(gray)) * 0.5)
+        blur = cv2.GaussianBlur(gray, (5, 5), 0)
+        noise_score = _clamp(100 - float(np.mean(cv2.absdiff(gray, blur))))
+
+        # Rule-of-thirds proxy: activity in the corner thirds vs the centre
+        height, width = gray.shape
+        h3, w3 = height // 3, width // 3
+        corners = [gray[0:h3, 0:w3], gray[0:h3, 2 * w3:], gray[2 * h3:, 0:w3], gray[2 * h3:, 2 * w3:]]
+        corner_activity = float(np.mean([np.std(c) for c in corners]))
+        center_activity = float(np.std(gray[h3:2 * h3, w3:2 * w3]))
+        composition_score = _clamp((corner_activity - center_activity) * 2 + 50)
+
+        if img.ndim == 3:
+            hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
+            color_score = _clamp(float(np.mean(hsv[:, :, 1])) / 2.55)
+        else:
+            color_score = 30.0
+
+        overall = (sharpness + brightness_score + contrast_score + noise_score + composition_score + color_score) / 6
+        return {
+            "overall": _clamp(overall),
+            "technical": _clamp((sharpness + noise_score) / 2),
+            "composition": composition_score,
+            "sharpness": sharpness,
+            "exposure": brightness_score,
+            "colors": color_score,
+            "factors": {
+                "blurriness": _clamp(100 - sharpness),
+                "noise": _clamp(100 - noise_score),
+                "contrast": contrast_score,
+                "brightness": brightness_score,
+                "saturation": color_score,
+                "composition_score": composition_score,
+                "rule_of_thirds": composition_score,
+                "leading_lines": composition_score * 0.8,
+                "symmetry": composition_score * 0.6,
+            },
+        }
+    except Exception as e:
+        logger.error(f"Error assessing quality for {path}: {e}")
+        return dict(DEFAULT_QUALITY)
+
+
+def _analyze_one(path: str, quality: bool) -> Optional[Row]:
+    try:
+        metadata = image_metadata(path)
+    except OSError as e:
+        logger.error(f"Error analyzing photo {path}: {e}")
+        return None
+    return {"metadata": metadata, "quality": image_quality(path) if quality else None}
+
+
+def _analyze_chunk(paths: Sequence[str], quality: bool) -> List[Optional[Row]]:
+    return [_analyze_one(p, quality) for p in paths]
+
+
+def _init_worker() -> None:
+    # One process per core already; keep OpenCV from spawning its own threads
+    try:
+        import cv2
+
+        cv2.setNumThreads(1)
+    except Exception:
+        pass
+
+
+def _default_workers() -> int:
+    configured = int(config.curation_workers)
+    if configured > 0:
+        return configured
+    return max(1, min(8, (os.cpu_count() or 2) - 1))
+
+
+def default_cache_dir() -> Path:
+    return Path(config.ps_appdata_dir) if config.ps_appdata_dir else Path.home() / ".photo_search"
+
+
+def _stamp(path: str) -> Optional[Stamp]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return float(st.st_mtime), int(st.st_size)
+
+
+class AnalysisCache:
+    """Per-photo analysis results keyed by (path, mtime, size)."""
+
+    def __init__(self, cache_dir: Path) -> None:
+        self.path = Path(cache_dir) / CACHE_FILE
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS analysis ("
+                " path TEXT PRIMARY KEY, mtime REAL, size INTEGER, version INTEGER,"
+                " metadata TEXT, quality TEXT)"
+            )
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, paths: Sequence[str], stamps: Sequence[Optional[Stamp]], quality: bool) -> Dict[int, Row]:
+        """Current cached rows, keyed by position in ``paths``."""
+        wanted = {p: i for i, (p, s) in enumerate(zip(paths, stamps)) if s is not None}
+        found: Dict[int, Row] = {}
+        plist = list(wanted)
+        with self._connect() as conn:
+            for start in range(0, len(plist), 500):
+                part = plist[start:start + 500]
+                marks = ",".join("?" * len(part))
+                for path, mtime, size, version, meta, qual in conn.execute(
+                    f"SELECT path, mtime, size, version, metadata, quality FROM analysis WHERE path IN ({marks})", part
+                ):
+                    i = wanted[path]
+                    if version != VERSION or (mtime, size) != stamps[i] or (quality and qual is None):
+                        continue
+                    found[i] = {"metadata": json.loads(meta), "quality": json.loads(qual) if quality else None}
+        return found
+
+    def put(self, rows: Sequence[Tuple[str, Stamp, Row]]) -> None:
+        if not rows:
+            return
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO analysis (path, mtime, size, version, metadata, quality) VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (p, s[0], s[1], VERSION, json.dumps(r["metadata"]), None if r["quality"] is None else json.dumps(r["quality"]))
+                    for p, s, r in rows
+                ],
+            )
+
+
+def _run_parallel(
+    chunks: Sequence[Sequence[int]],
+    paths: Sequence[str],
+    quality: bool,
+    workers: int,
+    on_chunk: Callable[[Sequence[int], List[Optional[Row]]], bool],
+) -> None:
+    max_in_flight = max(1, workers) * 2
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        pending = {}
+        next_chunk = 0
+        stop = False
+        while pending or (next_chunk < len(chunks) and not stop):
+            while not stop and next_chunk < len(chunks) and len(pending) < max_in_flight:
+                rows = chunks[next_chunk]
+                pending[pool.submit(_analyze_chunk, [paths[i] for i in rows], quality)] = rows
+                next_chunk += 1
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                rows = pending.pop(fut)
+                if not on_chunk(rows, fut.result()):
+                    stop = True
+
+
+def analyze_photos(
+    paths: Sequence[str],
+    quality: bool = True,
+    cache_dir: Optional[Path] = None,
+    workers: Optional[int] = None,
+    chunk_size: int = 32,
+    on_progress: Optional[Callable[[int, int], bool]] = None,
+) -> List[Optional[Row]]:
+    """Metadata (and quality scores) for ``paths``, reusing cached results.
+
+    ``on_progress(done, reused)`` runs after each finished chunk; returning
+    False stops the run, leaving unreached photos as None.
+    """
+    paths = [str(p) for p in paths]
+    n = len(paths)
+    stamps = [_stamp(p) for p in paths]
+    results: List[Optional[Row]] = [None] * n
+    cache: Optional[AnalysisCache] = None
+    try:
+        cache = AnalysisCache(cache_dir or default_cache_dir())
+        for i, row in cache.get(paths, stamps, quality).items():
+            results[i] = row
+    except (OSError, sqlite3.Error) as e:
+        logger.warning(f"Curation analysis cache unavailable, analysing everything: {e}")
+        cache = None
+    todo = [i for i in range(n) if results[i] is None and stamps[i] is not None]
+    reused = n - len(todo)
+    done = reused
+    finished = set()
+
+    def _on_chunk(rows: Sequence[int], chunk: List[Optional[Row]]) -> bool:
+        nonlocal done
+        fresh = []
+        for i, row in zip(rows, chunk):
+            results[i] = row
+            finished.add(i)
+            if row is not None:
+                fresh.append((paths[i], stamps[i], row))
+        if cache is not None:
+            try:
+                cache.put(fresh)
+            except sqlite3.Error as e:
+                logger.warning(f"Could not cache curation analysis: {e}")
+        done += len(rows)
+        return on_progress(done, reused) is not False if on_progress else True
+
+    if on_progress and on_progress(done, reused) is False:
+        return results
+    chunks = [todo[i:i + chunk_size] for i in range(0, len(todo), chunk_size)]
+    workers = _default_workers() if workers is None else max(1, int(workers))
+    if workers > 1 and len(todo) >= MIN_PARALLEL_FILES:
+        try:
+            _run_parallel(chunks, paths, quality, workers, _on_chunk)
+            return results
+        except Exception as e:
+            # Pools can be unavailable (sandboxing, frozen apps); finish serially
+            logger.warning(f"Parallel curation analysis failed, continuing serially: {e}")
+    for rows in chunks:
+        rows = [i for i in rows if i not in finished]
+        if rows and not _on_chunk(rows, _analyze_chunk([paths[i] for i in rows], quality)):
+            break
+    return results
+
+
+__all__ = ["AnalysisCache", "DEFAULT_QUALITY", "analyze_photos", "image_metadata", "image_quality"]
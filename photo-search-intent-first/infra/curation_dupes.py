@@ -0,0 +1,272 @@
+"""Duplicate clustering for auto-curation.
+
+Intent:
+  Auto-curation used to MD5 every photo by reading the whole file into memory
+  and then decode and ``cv2.matchTemplate`` every remaining pair: O(n^2)
+  full-size decodes, so a 20k-photo shoot took the better part of a day.
+  This module finds the same groups in roughly linear I/O:
+
+  - exact duplicates: files are bucketed by size (one ``stat`` each); only
+    same-size files have their first ``PREFIX_BYTES`` hashed, and only prefix
+    collisions are hashed in full, streamed in ``READ_CHUNK`` blocks;
+  - near duplicates: photos whose CLIP embedding in the ``IndexStore`` is
+    current (same mtime) are matched by a cosine range query, blocked matrix
+    products in NumPy or FAISS ``range_search`` when FAISS is installed;
+  - when some photos have no usable embedding (e.g. a fresh import not yet
+    indexed), every photo is also compared by pHash distance via
+    ``infra.dupes`` (one thumbnail decode per photo, sub-quadratic pairing),
+    so an unindexed copy still joins its indexed original; pairs of two
+    embedded photos are left to the embedding decision;
+  - all matches are merged with a union-find, so a chain of near duplicates
+    ends up in one group regardless of the order pairs are found in.
+
+Contract:
+  - exact_duplicate_groups(paths) -> [[paths]] of byte-identical files
+  - cosine_pairs(E, min_cosine) -> (i, j) row pairs, i < j
+  - find_duplicate_groups(paths, threshold=85.0, store=None) -> [[paths]]
+    groups in input order; each group lists its members in input order
+"""
+from __future__ import annotations
+
+import hashlib
+import logging
+import os
+from typing import Dict, List, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from infra import ann_handles
+from infra.dupes import ALGOS, HASH_BITS, hamming_pairs, hash_images
+
+logger = logging.getLogger(__name__)
+
+PREFIX_BYTES = 64 * 1024
+READ_CHUNK = 1 << 20
+# Rows per block of the embedding range query (block x n float32 scores)
+SIM_BLOCK = 1024
+# Below this many embeddings the NumPy scan beats building a FAISS index
+FAISS_MIN = 4096
+# Embedding mtimes within this many seconds of the file count as current
+MTIME_SLACK = 1.0
+
+
+class UnionFind:
+    """Disjoint sets over ``0..n-1`` with path halving and union by size."""
+
+    def __init__(self, n: int) -> None:
+        self.parent = list(range(n))
+        self.size = [1] * n
+
+    def find(self, x: int) -> int:
+        parent = self.parent
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    def union(self, a: int, b: int) -> None:
+        ra, rb = self.find(a), self.find(b)
+        if ra == rb:
+            return
+        if self.size[ra] < self.size[rb]:
+            ra, rb = rb, ra
+        self.parent[rb] = ra
+        self.size[ra] += self.size[rb]
+
+    def groups(self) -> List[List[int]]:
+        """Sets with more than one member, each ascending, ordered by their smallest element."""
+        members: Dict[int, List[int]] = {}
+        for x in range(len(self.parent)):
+            members.setdefault(self.find(x), []).append(x)
+        return sorted((g for g in members.values() if len(g) > 1), key=lambda g: g[0])
+
+
+def _unreadable(seen: Set[str], path: str, e: OSError) -> None:
+    """Warn about ``path`` the first time it fails within one scan."""
+    if path not in seen:
+        seen.add(path)
+        logger.warning(f"Skipping unreadable file {path}: {e}")
+
+
+def _digest(path: str, seen: Set[str], limit: Optional[int] = None) -> Optional[bytes]:
+    h = hashlib.blake2b(digest_size=16)
+    remaining = limit
+    try:
+        with open(path, "rb") as f:
+            while remaining is None or remaining > 0:
+                block = f.read(READ_CHUNK if remaining is None else min(READ_CHUNK, remaining))
+                if not block:
+                    break
+                h.update(block)
+                if remaining is not None:
+                    remaining -= len(block)
+    except OSError as e:
+        _unreadable(seen, path, e)
+        return None
+    return h.digest()
+
+
+def _split(rows: Sequence[int], key) -> List[List[int]]:
+    buckets: Dict[object, List[int]] = {}
+    for r in rows:
+        k = key(r)
+        if k is not None:
+            buckets.setdefault(k, []).append(r)
+    return [b for b in buckets.values() if len(b) > 1]
+
+
+def _exact_rows(paths: Sequence[str], sizes: Sequence[Optional[int]], seen: Set[str]) -> List[List[int]]:
+    candidates = _split(range(len(paths)), lambda r: sizes[r])
+    groups: List[List[int]] = []
+    for same_size in candidates:
+        size = sizes[same_size[0]]
+        for same_prefix in _split(same_size, lambda r: _digest(paths[r], seen, PREFIX_BYTES)):
+            if size <= PREFIX_BYTES:
+                # The prefix already covered the whole file
+                groups.append(same_prefix)
+            else:
+                groups.extend(_split(same_prefix, lambda r: _digest(paths[r], seen)))
+    return groups
+
+
+def _stat(paths: Sequence[str], seen: Set[str]) -> Tuple[List[Optional[int]], List[Optional[float]]]:
+    sizes: List[Optional[int]] = []
+    mtimes: List[Optional[float]] = []
+    for p in paths:
+        try:
+            st = os.stat(p)
+        except OSError as e:
+            _unreadable(seen, p, e)
+            sizes.append(None)
+            mtimes.append(None)
+            continue
+        sizes.append(st.st_size)
+        mtimes.append(st.st_mtime)
+    return sizes, mtimes
+
+
+def exact_duplicate_groups(paths: Sequence[str]) -> List[List[str]]:
+    """Groups of byte-identical files; unreadable files are skipped."""
+    seen: Set[str] = set()
+    sizes, _ = _stat(paths, seen)
+    return [[paths[r] for r in sorted(g)] for g in _exact_rows(paths, sizes, seen)]
+
+
+def _normalized(E: np.ndarray) -> np.ndarray:
+    E = np.ascontiguousarray(E, dtype=np.float32)
+    norms = np.linalg.norm(E, axis=1, keepdims=True)
+    return E / np.maximum(norms, 1e-12)
+
+
+def _faiss_pairs(lib, E: np.ndarray, min_cosine: float) -> Tuple[np.ndarray, np.ndarray]:
+    index = lib.IndexFlatIP(E.shape[1])
+    index.add(E)
+    lims, _, ids = index.range_search(E, float(min_cosine))
+    rows = np.repeat(np.arange(len(E), dtype=np.int64), np.diff(lims))
+    ids = ids.astype(np.int64)
+    keep = ids > rows
+    return rows[keep], ids[keep]
+
+
+def cosine_pairs(E: np.ndarray, min_cosine: float) -> Tuple[np.ndarray, np.ndarray]:
+    """All row pairs (i < j) whose embeddings have cosine similarity >= ``min_cosine``."""
+    n = len(E)
+    if n < 2:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    E = _normalized(E)
+    lib = ann_handles.ann_library("faiss") if n >= FAISS_MIN else None
+    if lib is not None:
+        try:
+            return _faiss_pairs(lib, E, min_cosine)
+        except Exception as e:
+            logger.warning(f"FAISS range search failed, using NumPy: {e}")
+    out_i: List[np.ndarray] = []
+    out_j: List[np.ndarray] = []
+    for start in range(0, n - 1, SIM_BLOCK):
+        stop = min(n, start + SIM_BLOCK)
+        # Only columns right of the block's first row can pair with it
+        sims = E[start:stop] @ E[start:].T
+        bi, bj = np.nonzero(sims >= min_cosine)
+        bi = bi + start
+        bj = bj + start
+        keep = bj > bi
+        out_i.append(bi[keep])
+        out_j.append(bj[keep])
+    return np.concatenate(out_i).astype(np.int64), np.concatenate(out_j).astype(np.int64)
+
+
+def min_cosine(threshold: float) -> float:
+    """Map a 0-100 similarity threshold onto CLIP cosine similarity.
+
+    CLIP places re-takes and re-encodes of one scene around 0.95, so the
+    scale is compressed: 85 -> 0.95, 70 -> 0.90, 100 -> identical only.
+    """
+    t = min(100.0, max(0.0, float(threshold)))
+    return 1.0 - (100.0 - t) / 300.0
+
+
+def max_hamming(threshold: float) -> int:
+    """Map a 0-100 similarity threshold onto a pHash bit distance (85 -> 5)."""
+    t = min(100.0, max(0.0, float(threshold)))
+    return int(round((100.0 - t) / 100.0 * HASH_BITS / 2))
+
+
+def _embedding_rows(
+    store, paths: Sequence[str], mtimes: Sequence[Optional[float]]
+) -> Tuple[List[int], List[int]]:
+    """(input rows, store rows) for photos whose stored embedding is current."""
+    state = getattr(store, "state", None)
+    if state is None or state.embeddings is None or not state.paths:
+        return [], []
+    row_of = {p: i for i, p in enumerate(state.paths)}
+    stored_mtimes = state.mtimes or []
+    rows: List[int] = []
+    srows: List[int] = []
+    for r, p in enumerate(paths):
+        s = row_of.get(p)
+        if s is None or mtimes[r] is None or s >= len(state.embeddings):
+            continue
+        if s < len(stored_mtimes) and abs(float(stored_mtimes[s]) - mtimes[r]) > MTIME_SLACK:
+            continue
+        rows.append(r)
+        srows.append(s)
+    return rows, srows
+
+
+def find_duplicate_groups(paths: Sequence[str], threshold: float = 85.0, store=None) -> List[List[str]]:
+    """Cluster exact and near duplicates among ``paths``.
+
+    ``store`` is an ``IndexStore`` holding embeddings for (some of) the
+    photos; without it every photo is compared by perceptual hash.
+    """
+    paths = list(dict.fromkeys(paths))
+    n = len(paths)
+    if n < 2:
+        return []
+    seen: Set[str] = set()
+    sizes, mtimes = _stat(paths, seen)
+    uf = UnionFind(n)
+    for group in _exact_rows(paths, sizes, seen):
+        for r in group[1:]:
+            uf.union(group[0], r)
+
+    rows, srows = _embedding_rows(store, paths, mtimes) if store is not None else ([], [])
+    if len(rows) > 1:
+        i, j = cosine_pairs(store.state.embeddings[srows], min_cosine(threshold))
+        for a, b in zip(i.tolist(), j.tolist()):
+            uf.union(rows[a], rows[b])
+
+    embedded = np.zeros(n, dtype=bool)
+    embedded[rows] = True
+    readable = [r for r in range(n) if sizes[r] is not None]
+    if any(not embedded[r] for r in readable) and len(readable) > 1:
+        hashes, ok = hash_images([paths[r] for r in readable])
+        hashed = np.asarray(readable, dtype=np.int64)[ok]
+        col = hashes[ok][:, ALGOS.index("phash")]
+        i, j = hamming_pairs(col, max_hamming(threshold))
+        a, b = hashed[i], hashed[j]
+        cross = ~(embedded[a] & embedded[b])
+        for x, y in zip(a[cross].tolist(), b[cross].tolist()):
+            uf.union(x, y)
+
+    return [[paths[r] for r in g] for g in uf.groups()]
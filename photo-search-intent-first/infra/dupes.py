@@ -1,89 +1,475 @@
+"""Perceptual hashes and sub-quadratic look-alike grouping.
+
+Intent:
+  Look-alike detection used to decode every photo at full size serially,
+  build an 8x8 average hash pixel by pixel in Python, ``Path.exists()`` every
+  known path on each build and then compare every hash with every other one.
+  This module:
+
+  - decodes a grayscale thumbnail only (JPEG DCT scaling via ``draft``,
+    ``Image.reduce`` for other formats) and computes aHash, dHash and pHash
+    for a whole chunk of photos at once with NumPy;
+  - fans the chunks out to a process pool with a bounded number in flight;
+  - stores the hashes as a packed ``(n, 3)`` uint64 array (``hashes.npy``)
+    with the paths and mtimes they were computed from (``hashes_meta.json``),
+    so unchanged photos are never decoded again;
+  - finds pairs within ``max_distance`` bits by multi-index hashing: the 64
+    bits are split into ``m`` chunks, and by the pigeonhole principle any pair
+    within ``r`` bits agrees on some chunk to within ``r // m`` bits, so only
+    photos sharing a (probed) chunk value are compared. ``m`` is chosen from
+    a cost estimate, falling back to a blocked all-pairs scan when the
+    library is small or the radius is so wide that probing would cost more.
+
+Contract:
+  - hash_images(paths) -> ((len(paths), 3) uint64, ok mask); columns as ALGOS
+  - build_hashes(index_dir, paths, mtimes=None, workers=None) -> photos hashed
+  - load_hashes(index_dir) -> (paths, (n, 3) uint64) or None
+  - hamming_pairs(hashes, max_distance) -> (i, j) row pairs, i < j
+  - find_lookalikes(index_dir, max_distance=5, algo="ahash") -> [[paths]]
+"""
 from __future__ import annotations
 
 import json
+import logging
+import math
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import combinations
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Dict, List, Optional, Sequence, Tuple
 
+import numpy as np
 from PIL import Image
 
+from infra.config import config
+
+logger = logging.getLogger(__name__)
+
+ALGOS = ("ahash", "dhash", "phash")
+HASH_BITS = 64
+# Shorter side of the decoded thumbnail; pHash works on a 32x32 grid
+DECODE_SIZE = 64
+PHASH_SIZE = 32
+# Below this many photos the pool start-up cost outweighs the parallelism
+MIN_PARALLEL_FILES = 256
+# Candidate pairs materialised at once while probing or scanning
+PAIR_BLOCK = 1 << 22
+# Chunks up to this many bits are looked up through a dense offset table
+TABLE_BITS = 22
+
+_POPCOUNT8 = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
 
 def _file(index_dir: Path) -> Path:
-    return index_dir / "hashes.json"
+    return index_dir / "hashes.npy"
+
+
+def _meta_file(index_dir: Path) -> Path:
+    return index_dir / "hashes_meta.json"
+
+
+def popcount64(x: np.ndarray) -> np.ndarray:
+    """Set bits per element of a uint64 array."""
+    x = np.ascontiguousarray(x, dtype=np.uint64)
+    bitwise_count = getattr(np, "bitwise_count", None)  # NumPy >= 2.0
+    if bitwise_count is not None:
+        return bitwise_count(x).astype(np.int64)
+    return _POPCOUNT8[x.view(np.uint8)].reshape(x.shape + (8,)).sum(axis=-1, dtype=np.int64)
+
+
+# ---------------------------------------------------------------------------
+# Hash computation
+# ---------------------------------------------------------------------------
+
+def _decode(path: str) -> Optional[Tuple[np.ndarray, np.ndarray]]:
+    """(32x32, 8x9) grayscale grids of a reduced-resolution decode, or None."""
+    try:
+        with Image.open(path) as img:
+            if img.format == "JPEG":
+                img.draft("L", (DECODE_SIZE, DECODE_SIZE))
+            gray = img.convert("L")
+        factor = min(gray.size) // DECODE_SIZE
+        if factor >= 2:
+            gray = gray.reduce(min(factor, 8))
+        grid = np.asarray(gray.resize((PHASH_SIZE, PHASH_SIZE), Image.BILINEAR), dtype=np.float32)
+        diff = np.asarray(gray.resize((9, 8), Image.BILINEAR), dtype=np.float32)
+        return grid, diff
+    except Exception:
+        return None
+
+
+def _dct_matrix(n: int) -> np.ndarray:
+    k = np.arange(n)[:, None]
+    x = np.arange(n)[None, :]
+    m = np.cos(np.pi * (2 * x + 1) * k / (2 * n)) * np.sqrt(2.0 / n)
+    m[0] /= np.sqrt(2.0)
+    return m.astype(np.float32)
+
+
+_DCT = _dct_matrix(PHASH_SIZE)
+
 
+def _pack(bits: np.ndarray) -> np.ndarray:
+    """(k, 64) bools -> (k,) uint64, first bit most significant."""
+    return np.packbits(bits.astype(np.uint8), axis=1).view(">u8").astype(np.uint64).ravel()
 
-def _ahash(path: Path, size: int = 8) -> int:
-    img = Image.open(path).convert("L").resize((size, size), Image.BILINEAR)
-    pixels = list(img.getdata())
-    avg = sum(pixels) / len(pixels)
-    bits = 0
-    for p in pixels:
-        bits = (bits << 1) | (1 if p >= avg else 0)
-    return bits
 
+def hashes_from_grids(grids: np.ndarray, diffs: np.ndarray) -> np.ndarray:
+    """aHash, dHash and pHash for a batch of (k, 32, 32) and (k, 8, 9) grids."""
+    k = len(grids)
+    small = grids.reshape(k, 8, 4, 8, 4).mean(axis=(2, 4)).reshape(k, 64)
+    ahash = _pack(small >= small.mean(axis=1, keepdims=True))
+    dhash = _pack((diffs[:, :, 1:] > diffs[:, :, :-1]).reshape(k, 64))
+    low = (_DCT @ grids @ _DCT.T)[:, :8, :8].reshape(k, 64)
+    # The DC term is left out of the median, as in the usual pHash
+    phash = _pack(low > np.median(low[:, 1:], axis=1, keepdims=True))
+    return np.stack([ahash, dhash, phash], axis=1)
 
-def _hamming(a: int, b: int) -> int:
-    return (a ^ b).bit_count()
+
+def hash_images(paths: Sequence[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """Hashes (one row per path, columns as ``ALGOS``) and a mask of the readable paths."""
+    decoded = [_decode(str(p)) for p in paths]
+    ok = np.array([d is not None for d in decoded], dtype=bool)
+    out = np.zeros((len(paths), len(ALGOS)), dtype=np.uint64)
+    if ok.any():
+        grids = np.stack([d[0] for d in decoded if d is not None])
+        diffs = np.stack([d[1] for d in decoded if d is not None])
+        out[ok] = hashes_from_grids(grids, diffs)
+    return out, ok
+
+
+def _default_workers() -> int:
+    configured = int(config.hash_workers)
+    if configured > 0:
+        return configured
+    return max(1, min(8, (os.cpu_count() or 2) - 1))
+
+
+def _hash_parallel(paths: Sequence[str], workers: int, chunk_size: int) -> Tuple[np.ndarray, np.ndarray]:
+    chunks = [list(paths[i:i + chunk_size]) for i in range(0, len(paths), chunk_size)]
+    results: List[Optional[Tuple[np.ndarray, np.ndarray]]] = [None] * len(chunks)
+    max_in_flight = max(1, workers) * 2
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = {}
+        next_chunk = 0
+        while next_chunk < len(chunks) or pending:
+            while next_chunk < len(chunks) and len(pending) < max_in_flight:
+                pending[pool.submit(hash_images, chunks[next_chunk])] = next_chunk
+                next_chunk += 1
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                results[pending.pop(fut)] = fut.result()
+    return _concat(results)  # type: ignore[arg-type]
+
+
+def _concat(parts: Sequence[Tuple[np.ndarray, np.ndarray]]) -> Tuple[np.ndarray, np.ndarray]:
+    if not parts:
+        return np.zeros((0, len(ALGOS)), dtype=np.uint64), np.zeros(0, dtype=bool)
+    return np.concatenate([h for h, _ in parts]), np.concatenate([m for _, m in parts])
+
+
+# ---------------------------------------------------------------------------
+# Storage
+# ---------------------------------------------------------------------------
+
+def _read(index_dir: Path) -> Optional[Tuple[Dict, np.ndarray]]:
+    try:
+        meta = json.loads(_meta_file(index_dir).read_text(encoding="utf-8"))
+        hashes = np.load(_file(index_dir))
+    except Exception:
+        return None
+    if meta.get("algos") != list(ALGOS) or hashes.shape != (len(meta.get("paths") or []), len(ALGOS)):
+        return None
+    return meta, hashes
+
+
+def load_hashes(index_dir: Path) -> Optional[Tuple[List[str], np.ndarray]]:
+    stored = _read(index_dir)
+    return (stored[0]["paths"], stored[1]) if stored is not None else None
+
+
+def has_hashes(index_dir: Path) -> bool:
+    return _file(index_dir).exists() and _meta_file(index_dir).exists()
+
+
+def _write(index_dir: Path, paths: List[str], mtimes: List[float], hashes: np.ndarray) -> None:
+    tmp = index_dir / "hashes.tmp.npy"
+    np.save(tmp, np.ascontiguousarray(hashes, dtype=np.uint64))
+    os.replace(tmp, _file(index_dir))
+    meta_tmp = index_dir / "hashes_meta.json.tmp"
+    meta_tmp.write_text(json.dumps({"algos": list(ALGOS), "paths": paths, "mtimes": mtimes}), encoding="utf-8")
+    os.replace(meta_tmp, _meta_file(index_dir))
+
+
+def _present(paths: Sequence[str]) -> List[bool]:
+    """Which ``paths`` still exist, listing each parent folder once."""
+    listings: Dict[str, Optional[set]] = {}
+    out = []
+    for p in paths:
+        folder, name = os.path.split(p)
+        if folder not in listings:
+            try:
+                listings[folder] = set(os.listdir(folder or "."))
+            except OSError:
+                listings[folder] = None
+        names = listings[folder]
+        out.append(names is not None and name in names)
+    return out
 
 
-def build_hashes(index_dir: Path, paths: List[str], size: int = 8) -> int:
-    """Compute simple image hashes for quick look-alike detection.
+def build_hashes(
+    index_dir: Path,
+    paths: List[str],
+    size: int = 8,
+    mtimes: Optional[Sequence[float]] = None,
+    workers: Optional[int] = None,
+    chunk_size: int = 64,
+) -> int:
+    """Hash ``paths`` for look-alike detection, reusing unchanged photos.
 
-    Returns number of hashes computed.
+    ``mtimes`` (e.g. ``store.state.mtimes``) saves a ``stat`` per photo; deleted
+    photos are then found with one directory listing per folder instead.
+    Either way photos no longer on disk are dropped. Photos that cannot be
+    decoded are left out and retried on the next build. Returns the number of
+    photos hashed in this call.
     """
+    if size != 8:
+        raise ValueError("Only 8x8 (64-bit) hashes are supported")
     index_dir.mkdir(parents=True, exist_ok=True)
-    data = {"paths": [], "hashes": []}
-    f = _file(index_dir)
-    if f.exists():
-        try:
-            data = json.loads(f.read_text())
-        except Exception:
-            data = {"paths": [], "hashes": []}
-    known = {p: h for p, h in zip(data.get("paths", []), data.get("hashes", []))}
-    updated = 0
-    for p in paths:
-        if p in known:
-            continue
+    paths = [str(p) for p in (paths or [])]
+    if mtimes is not None and len(mtimes) == len(paths):
+        present = _present(paths)
+        stamps: List[Optional[float]] = [float(m) if ok else None for m, ok in zip(mtimes, present)]
+    else:
+        stamps = []
+        for p in paths:
+            try:
+                stamps.append(os.stat(p).st_mtime)
+            except OSError:
+                stamps.append(None)
+
+    prev: Dict[str, Tuple[float, int]] = {}
+    stored = _read(index_dir)
+    prev_hashes = stored[1] if stored is not None else None
+    if stored is not None:
+        meta = stored[0]
+        prev = {p: (float(m), j) for j, (p, m) in enumerate(zip(meta["paths"], meta.get("mtimes") or [])) if m is not None}
+
+    keep = [i for i, s in enumerate(stamps) if s is not None]
+    hashes = np.zeros((len(keep), len(ALGOS)), dtype=np.uint64)
+    ok = np.ones(len(keep), dtype=bool)
+    todo: List[int] = []
+    for k, i in enumerate(keep):
+        hit = prev.get(paths[i])
+        if hit is not None and hit[0] == stamps[i] and prev_hashes is not None:
+            hashes[k] = prev_hashes[hit[1]]
+        else:
+            todo.append(k)
+
+    todo_paths = [paths[keep[k]] for k in todo]
+    workers = _default_workers() if workers is None else max(1, int(workers))
+    computed: Optional[Tuple[np.ndarray, np.ndarray]] = None
+    if workers > 1 and len(todo_paths) >= MIN_PARALLEL_FILES:
         try:
-            h = _ahash(Path(p), size=size)
-            known[p] = h
-            updated += 1
-        except Exception:
-            continue
-    # remove entries for missing files
-    cleaned = {p: h for p, h in known.items() if Path(p).exists()}
-    data = {"paths": list(cleaned.keys()), "hashes": list(cleaned.values())}
-    f.write_text(json.dumps(data))
-    return updated
+            computed = _hash_parallel(todo_paths, workers, chunk_size)
+        except Exception as e:
+            # Pools can be unavailable (sandboxing, frozen apps); degrade to serial
+            logger.warning("Parallel hashing failed, continuing serially: %s", e)
+    if computed is None:
+        computed = _concat([hash_images(todo_paths[s:s + chunk_size]) for s in range(0, len(todo_paths), chunk_size)])
+    if todo:
+        idx = np.asarray(todo, dtype=np.int64)
+        hashes[idx] = computed[0]
+        ok[idx] = computed[1]
 
+    rows = [k for k in range(len(keep)) if ok[k]]
+    _write(
+        index_dir,
+        [paths[keep[k]] for k in rows],
+        [stamps[keep[k]] for k in rows],  # type: ignore[misc]
+        hashes[np.asarray(rows, dtype=np.int64)],
+    )
+    return int(computed[1].sum())
 
-def find_lookalikes(index_dir: Path, max_distance: int = 5) -> List[List[str]]:
-    """Group look-alike photos by simple hash distance (small number means very similar)."""
-    f = _file(index_dir)
-    if not f.exists():
-        return []
-    try:
-        data = json.loads(f.read_text())
-    except Exception:
+
+# ---------------------------------------------------------------------------
+# Pair search
+# ---------------------------------------------------------------------------
+
+def _chunk_layout(m: int) -> List[Tuple[int, int]]:
+    """(shift, width) of ``m`` near-equal chunks covering 64 bits."""
+    base, extra = divmod(HASH_BITS, m)
+    layout, shift = [], HASH_BITS
+    for c in range(m):
+        width = base + (1 if c < extra else 0)
+        shift -= width
+        layout.append((shift, width))
+    return layout
+
+
+def _probes(width: int, radius: int) -> int:
+    return sum(math.comb(width, k) for k in range(min(radius, width) + 1))
+
+
+def _plan(n: int, r: int) -> Optional[int]:
+    """Chunk count minimising estimated work, or None when all-pairs is cheaper.
+
+    Work is counted in probed rows plus candidate pairs (each roughly one
+    gather and one distance check); a dense all-pairs block scan costs about a
+    fifth of that per pair, and a bucket table about a fiftieth per slot.
+    """
+    best, best_cost = None, 0.2 * n * (n - 1) / 2.0
+    for m in range(1, min(r + 1, HASH_BITS) + 1):
+        s = r // m
+        cost = 0.0
+        for _, width in _chunk_layout(m):
+            probes = _probes(width, s)
+            cost += probes * n + probes * n * n / float(1 << width)
+            cost += (1 << width) / 50.0 if width <= TABLE_BITS else n * math.log2(max(2, n))
+        if cost < best_cost:
+            best, best_cost = m, cost
+    return best
+
+
+def _flip_masks(width: int, radius: int) -> List[int]:
+    masks = [0]
+    for k in range(1, min(radius, width) + 1):
+        for bits in combinations(range(width), k):
+            masks.append(sum(1 << b for b in bits))
+    return masks
+
+
+def _close(hashes: np.ndarray, i: np.ndarray, j: np.ndarray, r: int) -> Tuple[np.ndarray, np.ndarray]:
+    keep = popcount64(hashes[i] ^ hashes[j]) <= r
+    return i[keep], j[keep]
+
+
+def _all_pairs(hashes: np.ndarray, r: int) -> Tuple[np.ndarray, np.ndarray]:
+    n = len(hashes)
+    out_i, out_j = [], []
+    block = max(1, PAIR_BLOCK // max(1, n))
+    for start in range(0, n, block):
+        stop = min(n, start + block)
+        dist = popcount64(hashes[start:stop, None] ^ hashes[None, :])
+        ii, jj = np.nonzero(dist <= r)
+        ii += start
+        upper = jj > ii
+        out_i.append(ii[upper])
+        out_j.append(jj[upper])
+    return np.concatenate(out_i), np.concatenate(out_j)
+
+
+def _bucket_lookup(keys: np.ndarray, order: np.ndarray, width: int):
+    """``probe -> (first position in order, bucket size)`` for chunk keys."""
+    if width <= TABLE_BITS:
+        # Dense start-offset table: one gather per probe instead of a binary search
+        starts = np.zeros((1 << width) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(keys, minlength=1 << width), out=starts[1:])
+
+        def lookup(probe: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+            lo = starts[probe]
+            return lo, starts[probe + 1] - lo
+    else:
+        sorted_keys = keys[order]
+
+        def lookup(probe: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+            lo = np.searchsorted(sorted_keys, probe, side="left")
+            return lo, np.searchsorted(sorted_keys, probe, side="right") - lo
+    return lookup
+
+
+def _mih_pairs(hashes: np.ndarray, r: int, m: int) -> Tuple[np.ndarray, np.ndarray]:
+    n = len(hashes)
+    out_i, out_j = [], []
+    for shift, width in _chunk_layout(m):
+        keys = ((hashes >> np.uint64(shift)) & np.uint64((1 << width) - 1)).astype(np.int64)
+        order = np.argsort(keys, kind="stable")
+        lookup = _bucket_lookup(keys, order, width)
+        # Built as uint64 and viewed as int64 like the keys: a full 64-bit
+        # chunk (m == 1) has masks up to 1 << 63, which overflow a Python-int XOR
+        flips = np.array(_flip_masks(width, r // m), dtype=np.uint64).view(np.int64)
+        for flip in flips:
+            lo, counts = lookup(keys ^ flip)
+            # A photo's own bucket always holds itself
+            queries = np.flatnonzero(counts > (0 if flip else 1))
+            if not len(queries):
+                continue
+            lo, counts = lo[queries], counts[queries]
+            cum = np.cumsum(counts)
+            start = 0
+            while start < len(queries):
+                # Bound the candidate pairs materialised at once
+                base = int(cum[start - 1]) if start else 0
+                stop = max(start + 1, int(np.searchsorted(cum, base + PAIR_BLOCK, side="right")))
+                c = counts[start:stop]
+                total = int(cum[stop - 1]) - base
+                qi = np.repeat(queries[start:stop], c)
+                cj = order[np.repeat(lo[start:stop] - (cum[start:stop] - c - base), c) + np.arange(total)]
+                upper = cj > qi
+                ii, jj = _close(hashes, qi[upper], cj[upper], r)
+                out_i.append(ii)
+                out_j.append(jj)
+                start = stop
+    if not out_i:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    pairs = np.unique(np.concatenate(out_i) * n + np.concatenate(out_j))
+    return pairs // n, pairs % n
+
+
+def hamming_pairs(hashes: np.ndarray, max_distance: int) -> Tuple[np.ndarray, np.ndarray]:
+    """All row pairs (i < j) whose 64-bit hashes differ in at most ``max_distance`` bits."""
+    hashes = np.ascontiguousarray(hashes, dtype=np.uint64).ravel()
+    r = max(0, min(HASH_BITS, int(max_distance)))
+    if len(hashes) < 2:
+        return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+    m = _plan(len(hashes), r)
+    i, j = _all_pairs(hashes, r) if m is None else _mih_pairs(hashes, r, m)
+    return i.astype(np.int64), j.astype(np.int64)
+
+
+def find_lookalikes(index_dir: Path, max_distance: int = 5, algo: str = "ahash") -> List[List[str]]:
+    """Group look-alike photos by hash distance (small number means very similar).
+
+    Grouping is unchanged: in path order, each photo not yet grouped collects
+    every later ungrouped photo within ``max_distance`` of it.
+    """
+    if algo not in ALGOS:
+        raise ValueError(f"Unknown hash: {algo}")
+    loaded = load_hashes(index_dir)
+    if loaded is None:
         return []
-    paths = data.get("paths", [])
-    hashes = data.get("hashes", [])
+    paths, hashes = loaded
     n = len(paths)
-    used = [False] * n
+    col = hashes[:, ALGOS.index(algo)]
+    # Identical hashes are matched once, then expanded back to their rows
+    uniq, inverse = np.unique(col, return_inverse=True)
+    inverse = inverse.ravel()
+    ui, uj = hamming_pairs(uniq, max_distance)
+    neighbours: Dict[int, List[int]] = {}
+    for a, b in zip(ui.tolist(), uj.tolist()):
+        neighbours.setdefault(a, []).append(b)
+        neighbours.setdefault(b, []).append(a)
+    rows_of: Dict[int, List[int]] = {}
+    for row, u in enumerate(inverse.tolist()):
+        rows_of.setdefault(u, []).append(row)
+
+    used = np.zeros(n, dtype=bool)
     groups: List[List[str]] = []
     for i in range(n):
         if used[i]:
             continue
-        gi = [paths[i]]
         used[i] = True
-        hi = hashes[i]
-        for j in range(i + 1, n):
-            if used[j]:
-                continue
-            if _hamming(int(hi), int(hashes[j])) <= max_distance:
-                gi.append(paths[j])
-                used[j] = True
-        if len(gi) > 1:
-            groups.append(gi)
+        u = int(inverse[i])
+        if len(rows_of[u]) == 1 and u not in neighbours:
+            continue
+        members = []
+        for v in [u, *neighbours.get(u, ())]:
+            for j in rows_of[v]:
+                if j > i and not used[j]:
+                    used[j] = True
+                    members.append(j)
+        if members:
+            groups.append([paths[i]] + [paths[j] for j in sorted(members)])
     return groups
 
 
@@ -102,7 +488,6 @@ def load_resolved(index_dir: Path) -> List[str]:
     p = _resolved_file(index_dir)
     try:
         if p.exists():
-            import json
             data = json.loads(p.read_text())
             if isinstance(data, list):
                 return [str(x) for x in data]
@@ -112,9 +497,7 @@ def load_resolved(index_dir: Path) -> List[str]:
 
 
 def save_resolved(index_dir: Path, ids: List[str]) -> None:
-    from json import dumps
     try:
-        _resolved_file(index_dir).write_text(dumps(sorted(set(ids))))
+        _resolved_file(index_dir).write_text(json.dumps(sorted(set(ids))))
     except Exception:
         pass
-
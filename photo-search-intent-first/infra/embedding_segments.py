@@ -0,0 +1,282 @@
+"""Append-only, memory-mapped embedding segments.
+
+On-disk layout (inside an IndexStore ``index_dir``)::
+
+    segments/seg-000001.emb   32-byte header + raw row-major matrix
+    segments/seg-000002.emb
+    manifest.json             live segments, tombstoned rows, generation
+    order.npy                 optional logical-row -> physical-row map
+
+Physical row ids number the rows of all live segments in manifest order.
+The logical index (the order of ``paths.json``) is the ascending list of
+non-tombstoned physical ids unless ``order.npy`` is present, which happens
+when rows were re-embedded in place. ``compact()`` folds everything back into
+a single canonical segment, after which ``open_matrix`` is a zero-copy
+``np.memmap``. The manifest also records ``paths_digest`` of the
+``paths.json`` it was written with, so readers can tell a matching pair from
+one caught between the two renames of a save.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import struct
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+
+MAGIC = b"PSEG"
+FORMAT_VERSION = 1
+_HEADER = struct.Struct("<4sHHIQ12x")
+HEADER_SIZE = _HEADER.size  # 32 bytes
+
+_DTYPES = {0: np.dtype("<f4"), 1: np.dtype("<f2")}
+_DTYPE_CODES = {"float32": 0, "float16": 1}
+
+MANIFEST_NAME = "manifest.json"
+ORDER_NAME = "order.npy"
+SEGMENTS_DIR = "segments"
+
+_dir_locks: Dict[str, threading.RLock] = {}
+_dir_locks_guard = threading.Lock()
+
+
+def dir_lock(index_dir: Path) -> threading.RLock:
+    """Process-wide lock serialising writers (save/compact) of one index dir."""
+    key = str(index_dir)
+    with _dir_locks_guard:
+        lock = _dir_locks.get(key)
+        if lock is None:
+            lock = threading.RLock()
+            _dir_locks[key] = lock
+        return lock
+
+
+def _dtype_code(dtype: str) -> int:
+    try:
+        return _DTYPE_CODES[str(dtype)]
+    except KeyError:
+        raise ValueError(f"Unsupported segment dtype: {dtype}") from None
+
+
+def write_segment(path: Path, matrix: np.ndarray, dtype: str = "float32") -> int:
+    """Write ``matrix`` as a segment file. Returns the number of rows written."""
+    code = _dtype_code(dtype)
+    arr = np.ascontiguousarray(matrix, dtype=_DTYPES[code])
+    if arr.ndim != 2:
+        raise ValueError("Segment matrix must be 2-D")
+    rows, dim = int(arr.shape[0]), int(arr.shape[1])
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, FORMAT_VERSION, code, dim, rows))
+        f.write(arr.tobytes(order="C"))
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+    return rows
+
+
+def open_segment(path: Path) -> np.ndarray:
+    """Open a segment as a copy-on-write memmap (writes never reach the file)."""
+    with open(path, "rb") as f:
+        magic, version, code, dim, rows = _HEADER.unpack(f.read(HEADER_SIZE))
+    if magic != MAGIC or version > FORMAT_VERSION or code not in _DTYPES:
+        raise ValueError(f"Not a valid embedding segment: {path}")
+    if rows == 0:
+        return np.zeros((0, dim), dtype=_DTYPES[code])
+    return np.memmap(path, dtype=_DTYPES[code], mode="c", offset=HEADER_SIZE, shape=(rows, dim))
+
+
+def read_manifest(index_dir: Path) -> Optional[Dict[str, Any]]:
+    p = index_dir / MANIFEST_NAME
+    if not p.exists():
+        return None
+    try:
+        data = json.loads(p.read_text(encoding="utf-8"))
+    except Exception:
+        return None
+    if not isinstance(data, dict) or data.get("format") != FORMAT_VERSION:
+        return None
+    return data
+
+
+def paths_digest(paths: Sequence[str]) -> str:
+    """Digest of the logical path order, stored in the manifest beside ``rows``."""
+    return hashlib.sha1(json.dumps(list(paths)).encode("utf-8")).hexdigest()
+
+
+def write_manifest(index_dir: Path, manifest: Dict[str, Any]) -> None:
+    p = index_dir / MANIFEST_NAME
+    tmp = p.with_suffix(".json.tmp")
+    tmp.write_text(json.dumps(manifest), encoding="utf-8")
+    os.replace(tmp, p)
+
+
+def next_segment_path(index_dir: Path, manifest: Optional[Dict[str, Any]]) -> Path:
+    seq = int((manifest or {}).get("next_seq", 1))
+    return index_dir / SEGMENTS_DIR / f"seg-{seq:06d}.emb"
+
+
+def total_physical_rows(manifest: Dict[str, Any]) -> int:
+    return int(sum(int(s.get("rows", 0)) for s in manifest.get("segments", [])))
+
+
+def logical_order(index_dir: Path, manifest: Dict[str, Any]) -> np.ndarray:
+    """Physical row id for every logical row."""
+    if manifest.get("ordered"):
+        return np.load(index_dir / ORDER_NAME).astype(np.int64)
+    total = total_physical_rows(manifest)
+    tomb = np.asarray(manifest.get("tombstones", []), dtype=np.int64)
+    live = np.arange(total, dtype=np.int64)
+    if tomb.size:
+        live = np.setdiff1d(live, tomb, assume_unique=True)
+    return live
+
+
+def is_canonical(manifest: Dict[str, Any]) -> bool:
+    return (
+        len(manifest.get("segments", [])) <= 1
+        and not manifest.get("tombstones")
+        and not manifest.get("ordered")
+    )
+
+
+def _open_all(index_dir: Path, manifest: Dict[str, Any]) -> List[np.ndarray]:
+    return [open_segment(index_dir / SEGMENTS_DIR / s["file"]) for s in manifest.get("segments", [])]
+
+
+def gather_rows(segments: Sequence[np.ndarray], pids: np.ndarray) -> np.ndarray:
+    """Gather physical rows ``pids`` from a list of segments (always copies)."""
+    dim = int(segments[0].shape[1]) if segments else 0
+    out = np.empty((len(pids), dim), dtype=np.float32)
+    if len(pids) == 0:
+        return out
+    ends = np.cumsum([len(s) for s in segments])
+    starts = ends - np.asarray([len(s) for s in segments])
+    which = np.searchsorted(ends, pids, side="right")
+    for si, seg in enumerate(segments):
+        sel = np.nonzero(which == si)[0]
+        if sel.size:
+            out[sel] = seg[pids[sel] - starts[si]]
+    return out
+
+
+def open_matrix(index_dir: Path, manifest: Dict[str, Any]) -> np.ndarray:
+    """Logical embedding matrix for ``manifest``.
+
+    Canonical float32 layouts are returned as a zero-copy memmap; anything
+    else is gathered into a fresh float32 array.
+    """
+    segments = _open_all(index_dir, manifest)
+    dim = int(manifest.get("dim", 0))
+    if not segments:
+        return np.zeros((0, dim), dtype=np.float32)
+    if is_canonical(manifest) and segments[0].dtype == np.float32:
+        return segments[0]
+    return gather_rows(segments, logical_order(index_dir, manifest))
+
+
+def remove_unreferenced(index_dir: Path, manifest: Optional[Dict[str, Any]]) -> None:
+    """Delete segment files not referenced by ``manifest``.
+
+    Readers that already mapped a removed file keep a valid view on POSIX; on
+    platforms that refuse to delete mapped files the orphan is retried later.
+    """
+    seg_dir = index_dir / SEGMENTS_DIR
+    if not seg_dir.exists():
+        return
+    keep = {s["file"] for s in (manifest or {}).get("segments", [])}
+    for p in seg_dir.glob("seg-*.emb*"):
+        if p.name not in keep:
+            try:
+                p.unlink()
+            except OSError:
+                pass
+
+
+def compact(index_dir: Path) -> bool:
+    """Merge all live rows into one canonical segment, dropping tombstones."""
+    with dir_lock(index_dir):
+        manifest = read_manifest(index_dir)
+        if manifest is None or is_canonical(manifest):
+            return False
+        dtype = manifest.get("dtype", "float32")
+        matrix = gather_rows(_open_all(index_dir, manifest), logical_order(index_dir, manifest))
+        seg_path = next_segment_path(index_dir, manifest)
+        rows = write_segment(seg_path, matrix, dtype=dtype)
+        new_manifest = {
+            "format": FORMAT_VERSION,
+            "generation": int(manifest.get("generation", 0)) + 1,
+            "compacted_from": int(manifest.get("generation", 0)),
+            "dim": int(matrix.shape[1]),
+            "dtype": dtype,
+            "rows": rows,
+            "segments": [{"file": seg_path.name, "rows": rows}],
+            "tombstones": [],
+            "ordered": False,
+            "next_seq": int(manifest.get("next_seq", 1)) + 1,
+        }
+        if "paths_digest" in manifest:
+            # Compaction keeps the logical order, so paths.json still matches
+            new_manifest["paths_digest"] = manifest["paths_digest"]
+        write_manifest(index_dir, new_manifest)
+        try:
+            (index_dir / ORDER_NAME).unlink()
+        except OSError:
+            pass
+        remove_unreferenced(index_dir, new_manifest)
+        return True
+
+
+def needs_compaction(manifest: Dict[str, Any], max_segments: int = 4, max_dead_ratio: float = 0.1) -> bool:
+    total = total_physical_rows(manifest)
+    dead = len(manifest.get("tombstones", []))
+    if len(manifest.get("segments", [])) > max(1, int(max_segments)):
+        return True
+    return total > 0 and dead / float(total) > max_dead_ratio
+
+
+_compacting: set = set()
+_compacting_guard = threading.Lock()
+
+
+def compact_in_background(index_dir: Path) -> bool:
+    """Start a daemon compaction for ``index_dir`` unless one is already running."""
+    key = str(index_dir)
+    with _compacting_guard:
+        if key in _compacting:
+            return False
+        _compacting.add(key)
+
+    def _run() -> None:
+        try:
+            compact(index_dir)
+        except Exception:
+            pass
+        finally:
+            with _compacting_guard:
+                _compacting.discard(key)
+
+    threading.Thread(target=_run, name=f"compact:{index_dir.name}", daemon=True).start()
+    return True
+
+
+__all__ = [
+    "HEADER_SIZE",
+    "compact",
+    "compact_in_background",
+    "dir_lock",
+    "gather_rows",
+    "is_canonical",
+    "logical_order",
+    "needs_compaction",
+    "open_matrix",
+    "open_segment",
+    "read_manifest",
+    "write_manifest",
+    "write_segment",
+]
@@ -0,0 +1,277 @@
+"""Incremental, parallel EXIF extraction for the metadata index.
+
+Intent:
+  The metadata build used to open every photo serially on the request thread
+  and re-extract the whole library on every run. This module:
+
+  - skips photos whose (mtime, size) match the previous build, copying their
+    row from the columnar store instead of touching the file;
+  - parses headers only: ``Image.open`` stops at the start of the pixel data,
+    so EXIF (APP1) and dimensions are read without decoding the image;
+  - fans the remaining files out to a process pool in fixed-size chunks with
+    a bounded number of chunks in flight;
+  - throttles ``metadata_status.json`` writes to one per interval.
+
+Contract:
+  - extract_exif(path) -> dict with one value per ``FIELDS`` entry
+  - build_exif_index(index_dir, paths) -> parallel-list dict, also written to
+    ``exif_index.json`` and the metadata columns
+"""
+from __future__ import annotations
+
+import json
+import logging
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+from infra.config import config
+from infra.metadata_columns import load_columns, write_columns
+
+logger = logging.getLogger(__name__)
+
+FIELDS = (
+    "camera", "iso", "fnumber", "exposure", "focal", "width", "height",
+    "flash", "white_balance", "metering", "gps_altitude", "gps_heading",
+    "gps_lat", "gps_lon", "place", "sharpness", "brightness", "contrast",
+)
+# Per-file change detection, stored alongside the EXIF fields
+STAMP_FIELDS = ("file_mtime", "file_size")
+
+STATUS_INTERVAL_S = 1.0
+# Below this many files the pool start-up cost outweighs the parallelism
+MIN_PARALLEL_FILES = 512
+
+
+def _ratio(raw: Any) -> Optional[float]:
+    if raw is None:
+        return None
+    try:
+        if isinstance(raw, tuple) and len(raw) == 2:
+            return float(raw[0]) / float(raw[1])
+        return float(raw)
+    except (ZeroDivisionError, TypeError, ValueError):
+        return None
+
+
+def _dms(raw: Any, ref: Any, negative: str) -> Optional[float]:
+    if not raw or not ref:
+        return None
+    value = float(raw[0]) + float(raw[1]) / 60 + float(raw[2]) / 3600
+    return -value if str(ref).upper() == negative else value
+
+
+def _json_safe(v: Any) -> Any:
+    if v is None or isinstance(v, (bool, int, float, str)):
+        return v
+    if isinstance(v, (tuple, list)):
+        return [_json_safe(x) for x in v]
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        return str(v)
+
+
+def extract_exif(path: str) -> Dict[str, Any]:
+    """EXIF fields for one photo; missing values are None ('' for camera/place)."""
+    from PIL import ExifTags, Image
+
+    inv = {v: k for k, v in ExifTags.TAGS.items()}
+    row: Dict[str, Any] = {k: None for k in FIELDS}
+    row["camera"] = ""
+    row["place"] = ""  # Placeholder for geocoding
+    try:
+        with Image.open(path) as img:
+            row["width"], row["height"] = img.size
+            try:
+                exif = img._getexif()
+            except Exception:
+                exif = None
+            if exif:
+                cam = exif.get(inv.get("Model"))
+                row["camera"] = str(cam).strip() if cam else ""
+                iso = exif.get(inv.get("ISOSpeedRatings"))
+                if iso is None:
+                    iso = exif.get(inv.get("PhotographicSensitivity"))
+                if isinstance(iso, (tuple, list)):
+                    iso = iso[0] if iso else None
+                row["iso"] = _json_safe(iso)
+                row["fnumber"] = _ratio(exif.get(inv.get("FNumber")))
+                row["exposure"] = _ratio(exif.get(inv.get("ExposureTime")))
+                row["focal"] = _ratio(exif.get(inv.get("FocalLength")))
+                row["flash"] = _json_safe(exif.get(inv.get("Flash")))
+                row["white_balance"] = _json_safe(exif.get(inv.get("WhiteBalance")))
+                row["metering"] = _json_safe(exif.get(inv.get("MeteringMode")))
+                gps = exif.get(inv.get("GPSInfo"))
+                if gps:
+                    try:
+                        row["gps_lat"] = _dms(gps.get(2), gps.get(1), "S")
+                        row["gps_lon"] = _dms(gps.get(4), gps.get(3), "W")
+                        row["gps_altitude"] = _ratio(gps.get(6))
+                        row["gps_heading"] = _ratio(gps.get(24))
+                    except Exception:
+                        pass  # GPS parsing errors are non-critical
+    except Exception:
+        pass  # Unreadable file: keep the empty row
+    return row
+
+
+def _extract_chunk(paths: Sequence[str]) -> List[Dict[str, Any]]:
+    return [extract_exif(p) for p in paths]
+
+
+def file_stamp(path: str) -> Optional[Tuple[float, int]]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return float(st.st_mtime), int(st.st_size)
+
+
+def _default_workers() -> int:
+    configured = int(config.metadata_workers)
+    if configured > 0:
+        return configured
+    return max(1, min(8, (os.cpu_count() or 2) - 1))
+
+
+class _Status:
+    """Throttled writer for ``metadata_status.json``."""
+
+    def __init__(self, index_dir: Path, total: int, interval: float = STATUS_INTERVAL_S) -> None:
+        self.path = index_dir / "metadata_status.json"
+        self.total = int(total)
+        self.interval = interval
+        self.start = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+        self._last = 0.0
+
+    def write(self, state: str, done: int, reused: int, force: bool = False) -> None:
+        now = time.monotonic()
+        if not force and now - self._last < self.interval:
+            return
+        self._last = now
+        payload = {"state": state, "total": self.total, "done": int(done), "updated": int(done), "reused": int(reused)}
+        if state == "running":
+            payload["start"] = self.start
+        try:
+            self.path.write_text(json.dumps(payload), encoding="utf-8")
+        except Exception:
+            pass
+
+
+def _reusable_rows(index_dir: Path, paths: Sequence[str], stamps: Sequence[Optional[Tuple[float, int]]]) -> Dict[int, Dict[str, Any]]:
+    """Rows of the previous build whose file is unchanged, keyed by new row id."""
+    try:
+        prev = load_columns(index_dir)
+    except Exception:
+        prev = None
+    if prev is None or not all(f in prev.fields for f in STAMP_FIELDS):
+        return {}
+    prev_mtime, prev_size = prev.numeric("file_mtime"), prev.numeric("file_size")
+    fields = [f for f in FIELDS if f in prev.fields]
+    reused: Dict[int, Dict[str, Any]] = {}
+    for i, (p, stamp) in enumerate(zip(paths, stamps)):
+        if stamp is None:
+            continue
+        j = prev.row_of(p)
+        if j is None or float(prev_mtime[j]) != stamp[0] or float(prev_size[j]) != stamp[1]:
+            continue
+        row = {k: None for k in FIELDS}
+        row.update({k: prev.value(k, j) for k in fields})
+        reused[i] = row
+    return reused
+
+
+def _extract_parallel(
+    paths: Sequence[str],
+    workers: int,
+    chunk_size: int,
+    on_done: Callable[[int], None],
+) -> List[Dict[str, Any]]:
+    chunks = [list(paths[i:i + chunk_size]) for i in range(0, len(paths), chunk_size)]
+    results: List[Optional[List[Dict[str, Any]]]] = [None] * len(chunks)
+    max_in_flight = max(1, workers) * 2
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = {}
+        next_chunk = 0
+        while next_chunk < len(chunks) or pending:
+            while next_chunk < len(chunks) and len(pending) < max_in_flight:
+                pending[pool.submit(_extract_chunk, chunks[next_chunk])] = next_chunk
+                next_chunk += 1
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                ci = pending.pop(fut)
+                results[ci] = fut.result()
+                on_done(len(chunks[ci]))
+    return [row for chunk in results for row in (chunk or [])]
+
+
+def build_exif_index(
+    index_dir: Path,
+    paths: Sequence[str],
+    workers: Optional[int] = None,
+    chunk_size: int = 128,
+) -> Dict[str, Any]:
+    """Build (or refresh) the EXIF index for ``paths``.
+
+    Unchanged files are copied from the previous build; the rest are
+    extracted, in parallel when there are enough of them.
+    """
+    paths = [str(p) for p in (paths or [])]
+    n = len(paths)
+    status = _Status(index_dir, n)
+    status.write("running", 0, 0, force=True)
+
+    stamps = [file_stamp(p) for p in paths]
+    rows: List[Optional[Dict[str, Any]]] = [None] * n
+    for i, row in _reusable_rows(index_dir, paths, stamps).items():
+        rows[i] = row
+    todo = [i for i in range(n) if rows[i] is None]
+    reused = n - len(todo)
+    done = reused
+
+    def _progress(count: int) -> None:
+        nonlocal done
+        done += count
+        status.write("running", done, reused)
+
+    todo_paths = [paths[i] for i in todo]
+    workers = _default_workers() if workers is None else max(1, int(workers))
+    extracted: Optional[List[Dict[str, Any]]] = None
+    if workers > 1 and len(todo_paths) >= MIN_PARALLEL_FILES:
+        try:
+            extracted = _extract_parallel(todo_paths, workers, chunk_size, _progress)
+        except Exception as e:
+            # Pools can be unavailable (sandboxing, frozen apps); degrade to serial
+            logger.warning("Parallel EXIF extraction failed, continuing serially: %s", e)
+            done = reused
+    if extracted is None:
+        extracted = []
+        for start in range(0, len(todo_paths), chunk_size):
+            chunk = _extract_chunk(todo_paths[start:start + chunk_size])
+            extracted.extend(chunk)
+            _progress(len(chunk))
+    for i, row in zip(todo, extracted):
+        rows[i] = row
+
+    out: Dict[str, Any] = {"paths": paths}
+    for key in FIELDS:
+        out[key] = [row[key] for row in rows]  # type: ignore[index]
+    out["file_mtime"] = [s[0] if s else None for s in stamps]
+    out["file_size"] = [s[1] if s else None for s in stamps]
+
+    try:
+        (index_dir / "exif_index.json").write_text(json.dumps(out), encoding="utf-8")
+    except Exception:
+        pass
+    try:
+        write_columns(index_dir, out)
+    except Exception:
+        pass
+    status.write("complete", n, reused, force=True)
+    return out
+
+
+__all__ = ["FIELDS", "build_exif_index", "extract_exif", "file_stamp"]
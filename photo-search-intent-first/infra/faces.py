@@ -2,7 +2,7 @@ from __future__ import annotations
 
 import json
 from pathlib import Path
-from typing import Any, Dict, List, Tuple
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 import numpy as np
 from PIL import Image
@@ -46,13 +46,17 @@ def _try_insightface():
         return None, False
 
 
-def _embed_faces_insightface(paths: List[str]) -> Tuple[Dict[str, List[Dict[str, Any]]], np.ndarray]:
+def _embed_faces_insightface(
+    paths: List[str], cancel: Optional[Callable[[], None]] = None
+) -> Tuple[Dict[str, List[Dict[str, Any]]], np.ndarray]:
     from insightface.app import FaceAnalysis  # type: ignore
     app = FaceAnalysis(providers=['CPUExecutionProvider'])
     app.prepare(ctx_id=0, det_size=(640, 640))
     feats: List[np.ndarray] = []
     photo_map: Dict[str, List[Dict[str, Any]]] = {}
     for sp in paths:
+        if cancel is not None:
+            cancel()
         try:
             img = np.array(Image.open(sp).convert('RGB'))  # type: ignore
         except Exception:
@@ -83,12 +87,12 @@ def _embed_faces_insightface(paths: List[str]) -> Tuple[Dict[str, List[Dict[str,
     return photo_map, E
 
 
-def build_faces(index_dir: Path, photo_paths: List[str]) -> Dict[str, Any]:
+def build_faces(index_dir: Path, photo_paths: List[str], cancel: Optional[Callable[[], None]] = None) -> Dict[str, Any]:
     _, ok = _try_insightface()
     if not ok:
         # No face engine available
         return {"updated": 0, "faces": 0, "clusters": 0}
-    photos, E = _embed_faces_insightface(photo_paths)
+    photos, E = _embed_faces_insightface(photo_paths, cancel)
     # Cluster embeddings using DBSCAN cosine
     clusters: Dict[int, List[Tuple[str, int]]] = {}
     labels: List[int] = []
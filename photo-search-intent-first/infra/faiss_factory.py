@@ -0,0 +1,323 @@
+"""FAISS index factories, training lifecycle and recall-vs-latency tuning.
+
+Intent:
+  ``build_faiss`` used to write an ``IndexFlatIP``: exact brute force behind
+  the FAISS API, so no faster than the numpy path and just as large (2 GB of
+  float32 for a 1M-photo workspace). This module picks a real approximate
+  structure from the library size, trains it on a sample, keeps the trained
+  (empty) index on disk so a rebuild of a similar-sized library skips k-means,
+  and measures recall@k and per-query latency against exact search so the
+  default search breadth is the cheapest one that meets a recall target.
+
+  Size tiers (``choose_factory``), all with inner-product metric:
+    - n <  FLAT_MAX   ->  "Flat"                  exact; small enough already
+    - n <  HNSW_MAX   ->  "HNSW32"                HNSW graph over flat vectors
+    - n <  PQ_MIN     ->  "IVF{nlist},Flat"       inverted lists, k-means trained
+    - otherwise       ->  "OPQ{m},IVF{nlist},PQ{m}"  rotated product quantisation,
+                                                   m bytes per vector
+
+Contract:
+  - choose_factory(n, dim, previous=None) -> FAISS index_factory string
+  - family(spec) -> "flat" | "hnsw" | "ivf"
+  - min_training_points(spec) / training_size(spec, n) -> rows sampled for training
+  - build_index(lib, E, spec, trained_file, previous) -> (index, info)
+  - tune(lib, index, E, spec, k, queries, target_recall) -> report dict
+  - set_search_params(lib, index, params) applies nprobe / efSearch
+  - build_index_files(E, index_file, meta_file, factory, target_recall, extra_meta) -> meta or None
+"""
+from __future__ import annotations
+
+import logging
+import math
+import re
+import time
+from pathlib import Path
+from types import ModuleType
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from infra import ann_handles, ann_maintenance
+
+logger = logging.getLogger(__name__)
+
+FLAT_MAX = 20_000
+HNSW_MAX = 200_000
+PQ_MIN = 500_000
+HNSW_M = 32
+# FAISS warns below ~39 training points per centroid
+TRAIN_POINTS_PER_LIST = 50
+MIN_TRAIN = 10_000
+ADD_CHUNK = 65_536
+# Sweeps for the recall-vs-latency report
+NPROBE_SWEEP = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+EF_SWEEP = (16, 32, 64, 128, 256, 512)
+
+
+def family(spec: str) -> str:
+    if "IVF" in spec:
+        return "ivf"
+    if spec.startswith("HNSW"):
+        return "hnsw"
+    return "flat"
+
+
+def _nlist(spec: str) -> int:
+    m = re.search(r"IVF(\d+)", spec)
+    return int(m.group(1)) if m else 0
+
+
+def _pq_m(dim: int) -> int:
+    """Sub-quantiser count: ``m`` bytes per vector, ``m`` must divide ``dim``."""
+    for m in (64, 48, 32, 24, 16, 8, 4, 2):
+        if m <= dim and dim % m == 0:
+            return m
+    return 1
+
+
+def choose_factory(n: int, dim: int, previous: Optional[dict] = None) -> str:
+    """Index structure for ``n`` vectors of ``dim``; keeps ``previous`` if still a fit.
+
+    The previous factory is reused while the library stays within 2x of the
+    size it was trained for, so its persisted training stays valid.
+    """
+    if n < FLAT_MAX:
+        spec = "Flat"
+    elif n < HNSW_MAX:
+        spec = f"HNSW{HNSW_M}"
+    else:
+        nlist = int(min(65_536, max(64, 4 * math.sqrt(n))))
+        if n < PQ_MIN:
+            spec = f"IVF{nlist},Flat"
+        else:
+            m = _pq_m(dim)
+            spec = f"OPQ{m},IVF{nlist},PQ{m}"
+    if previous:
+        prev = str(previous.get("factory") or "")
+        prev_n = int(previous.get("trained_for") or 0)
+        if (
+            prev
+            and int(previous.get("dim") or 0) == dim
+            and family(prev) == family(spec)
+            and ("PQ" in prev) == ("PQ" in spec)
+            and prev_n > 0
+            and prev_n / 2 <= n <= prev_n * 2
+        ):
+            return prev
+    return spec
+
+
+def min_training_points(spec: str) -> int:
+    """Sample size that trains ``spec`` well (0: no training needed)."""
+    if family(spec) != "ivf":
+        return 0
+    return int(max(MIN_TRAIN, TRAIN_POINTS_PER_LIST * _nlist(spec)))
+
+
+def training_size(spec: str, n: int) -> int:
+    return int(min(n, min_training_points(spec)))
+
+
+def _metric(lib: ModuleType) -> Any:
+    return getattr(lib, "METRIC_INNER_PRODUCT", 0)
+
+
+def build_index(
+    lib: ModuleType,
+    E: np.ndarray,
+    spec: str,
+    trained_file: Optional[Path] = None,
+    previous: Optional[dict] = None,
+) -> Tuple[Any, Dict[str, Any]]:
+    """Create (or reload the trained state of) ``spec`` and add all rows of ``E``."""
+    n, dim = int(E.shape[0]), int(E.shape[1])
+    info: Dict[str, Any] = {"factory": spec, "family": family(spec), "reused_training": False, "train_seconds": 0.0}
+    index = None
+    prev = previous or {}
+    if (
+        trained_file is not None
+        and trained_file.exists()
+        and prev.get("factory") == spec
+        and int(prev.get("dim") or 0) == dim
+    ):
+        try:
+            index = lib.read_index(str(trained_file))
+            info["reused_training"] = True
+            info["trained_for"] = int(prev.get("trained_for") or n)
+        except Exception as e:
+            logger.info("Discarding unreadable FAISS training state %s: %s", trained_file, e)
+            index = None
+    if index is None:
+        index = lib.index_factory(dim, spec, _metric(lib))
+        if family(spec) == "flat" and hasattr(lib, "IndexIDMap2"):
+            # IVF takes ids natively; Flat needs the map for remove_ids/add_with_ids
+            index = lib.IndexIDMap2(index)
+            info["id_mapped"] = True
+        info["trained_for"] = n
+        if not index.is_trained:
+            rows = training_size(spec, n)
+            sample = np.sort(np.random.default_rng(0).choice(n, size=rows, replace=False))
+            t0 = time.perf_counter()
+            index.train(np.ascontiguousarray(E[sample], dtype=np.float32))
+            info["train_seconds"] = round(time.perf_counter() - t0, 3)
+            info["trained_on"] = rows
+            if trained_file is not None:
+                lib.write_index(index, str(trained_file))
+    info["id_mapped"] = info.get("id_mapped", False) or family(spec) == "ivf"
+    for start in range(0, n, ADD_CHUNK):
+        chunk = np.ascontiguousarray(E[start:start + ADD_CHUNK], dtype=np.float32)
+        if info["id_mapped"]:
+            # Ids are the store rows, so incremental updates can address them
+            index.add_with_ids(chunk, np.arange(start, start + len(chunk), dtype=np.int64))
+        else:
+            index.add(chunk)
+    return index, info
+
+
+def set_search_params(lib: Optional[ModuleType], index: Any, params: Dict[str, Any]) -> None:
+    """Apply ``nprobe``/``efSearch``; names the index does not have are ignored."""
+    if not params or lib is None:
+        return
+    space = lib.ParameterSpace() if hasattr(lib, "ParameterSpace") else None
+    for name, value in params.items():
+        try:
+            if space is None:
+                raise AttributeError("ParameterSpace")
+            space.set_index_parameter(index, name, value)
+        except Exception:
+            if name == "nprobe":
+                ivf = ann_handles._faiss_ivf(index)
+                if ivf is not None:
+                    ivf.nprobe = int(value)
+
+
+def _exact_topk(E: np.ndarray, Q: np.ndarray, k: int) -> np.ndarray:
+    """Exact top-k row ids per query, scanning ``E`` in chunks."""
+    best_s = np.full((len(Q), 0), -np.inf, dtype=np.float32)
+    best_i = np.zeros((len(Q), 0), dtype=np.int64)
+    for start in range(0, len(E), ADD_CHUNK):
+        S = np.asarray(E[start:start + ADD_CHUNK], dtype=np.float32) @ Q.T
+        ids = np.broadcast_to(np.arange(start, start + len(S))[:, None], S.shape)
+        cs = np.concatenate([best_s, S.T], axis=1)
+        ci = np.concatenate([best_i, ids.T], axis=1)
+        kk = min(k, cs.shape[1])
+        part = np.argpartition(-cs, kk - 1, axis=1)[:, :kk]
+        best_s = np.take_along_axis(cs, part, axis=1)
+        best_i = np.take_along_axis(ci, part, axis=1)
+    return best_i
+
+
+def tune(
+    lib: ModuleType,
+    index: Any,
+    E: np.ndarray,
+    spec: str,
+    k: int = 10,
+    queries: int = 200,
+    target_recall: float = 0.95,
+) -> Dict[str, Any]:
+    """Recall@k and per-query latency across the backend's search-breadth sweep.
+
+    Queries are library rows, so the report reflects the photos' own
+    distribution. ``search_params`` is the cheapest setting whose recall
+    meets ``target_recall`` (the widest one if none does).
+    """
+    n = int(E.shape[0])
+    k = max(1, min(int(k), n))
+    sample = np.sort(np.random.default_rng(1).choice(n, size=min(int(queries), n), replace=False))
+    Q = np.ascontiguousarray(E[sample], dtype=np.float32)
+    t0 = time.perf_counter()
+    truth = _exact_topk(E, Q, k)
+    exact_ms = (time.perf_counter() - t0) * 1000.0 / len(Q)
+
+    fam = family(spec)
+    if fam == "ivf":
+        name, values = "nprobe", [v for v in NPROBE_SWEEP if v <= _nlist(spec)]
+    elif fam == "hnsw":
+        name, values = "efSearch", [v for v in EF_SWEEP if v >= k] or [k]
+    else:
+        name, values = None, [None]
+
+    curve: List[Dict[str, Any]] = []
+    chosen: Dict[str, Any] = {}
+    for value in values:
+        if name is not None:
+            set_search_params(lib, index, {name: value})
+        t0 = time.perf_counter()
+        _, I = index.search(Q, k)
+        ms = (time.perf_counter() - t0) * 1000.0 / len(Q)
+        hits = sum(len(set(I[j].tolist()) & set(truth[j].tolist())) for j in range(len(Q)))
+        recall = hits / float(k * len(Q))
+        curve.append({"param": name, "value": value, "recall": round(recall, 4), "ms": round(ms, 4)})
+        if name is not None and not chosen and recall >= target_recall:
+            chosen = {name: value}
+    if name is not None and not chosen:
+        chosen = {name: values[-1]}
+    if chosen:
+        set_search_params(lib, index, chosen)
+    return {
+        "k": k,
+        "queries": len(Q),
+        "target_recall": float(target_recall),
+        "exact_ms": round(exact_ms, 4),
+        "curve": curve,
+        "search_params": chosen,
+    }
+
+
+def build_index_files(
+    E: np.ndarray,
+    index_file: Path,
+    meta_file: Path,
+    factory: str = "auto",
+    target_recall: float = 0.95,
+    extra_meta: Optional[dict] = None,
+) -> Optional[dict]:
+    """Build, tune and persist a FAISS index for ``E``; the written meta, or None.
+
+    The trained-but-empty index is kept next to ``index_file`` as
+    ``<name>.trained.index`` and reused by the next build with the same factory.
+    """
+    lib = ann_handles.ann_library("faiss")
+    if lib is None or E is None or len(E) == 0:
+        return None
+    index_file, meta_file = Path(index_file), Path(meta_file)
+    n, dim = int(E.shape[0]), int(E.shape[1])
+    previous = ann_handles.read_meta(meta_file) if meta_file.exists() else None
+    spec = choose_factory(n, dim, previous) if factory in (None, "", "auto") else factory
+    trained_file = index_file.with_suffix(".trained.index")
+
+    t0 = time.perf_counter()
+    index, info = build_index(lib, E, spec, trained_file, previous)
+    build_seconds = time.perf_counter() - t0
+    report = tune(lib, index, E, spec, target_recall=target_recall)
+    # Resident handles mmap the old file: stage a new one and swap it in
+    staged = ann_maintenance.staging_file(index_file)
+    lib.write_index(index, str(staged))
+    meta = {
+        "dim": dim,
+        "size": n,
+        **info,
+        "build_seconds": round(build_seconds, 3),
+        "search_params": report["search_params"],
+        "report": report,
+        "bytes": staged.stat().st_size,
+        **(extra_meta or {}),
+    }
+    ann_maintenance.install(index_file, meta_file, meta)
+    logger.info(
+        "Built FAISS %s over %d vectors (%.1fs, %s)", spec, n, build_seconds, report["search_params"] or "exact"
+    )
+    return meta
+
+
+__all__ = [
+    "build_index",
+    "build_index_files",
+    "choose_factory",
+    "family",
+    "min_training_points",
+    "set_search_params",
+    "training_size",
+    "tune",
+]
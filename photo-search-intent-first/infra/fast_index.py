@@ -8,26 +8,45 @@ Intent:
 Contract:
   - build(kind) -> bool (False if library missing or no embeddings)
   - status() -> { backends: [ {kind, available, built, size, dim, error} ], selected?: str }
-  - search(query, top_k, fast_kind_hint, use_fast) -> (results, metadata)
+  - search(query, top_k, fast_kind_hint, use_fast, subset, oversample, ef, nprobe,
+    measure_recall) -> (results, metadata)
 
 Selection Rules:
   1. If not use_fast: always exact.
   2. If fast_kind_hint provided and that backend is built+available -> use it; else fall back to exact.
   3. If fast_kind_hint is None or 'auto': pick first built+available in preference order FAISS > HNSW > ANNOY.
   4. Always rerank final candidates using exact similarities for deterministic ordering.
+     Only the ``top_k * oversample`` candidate rows are scored, never the whole
+     matrix; ``ef`` (HNSW/Annoy search breadth) and ``nprobe`` (FAISS IVF lists)
+     trade latency for recall. Timings (and recall, with ``measure_recall``)
+     are returned under ``meta["ann"]``.
+  5. With a filter ``subset`` the choice depends on selectivity (|subset| / N):
+     below ``MIN_ANN_SELECTIVITY`` the subset is scored exactly (cost ~ |subset|);
+     otherwise the ANN backend is queried for ``top_k / selectivity * oversample``
+     candidates which are then masked, falling back to masked exact search if
+     too few survive.
 
 This module is intentionally dependency-light; it delegates actual index
 construction/search to the existing methods on IndexStore.
 """
 from __future__ import annotations
 
+import math
 from typing import Any, Dict, List, Optional, Tuple
 
+from infra.ann_handles import ann_library
 from infra.index_store import IndexStore
 from domain.models import SearchResult
 
 _PREF_ORDER = ["faiss", "hnsw", "annoy"]
 
+# Below this fraction of rows a filtered query is cheaper as masked brute force
+MIN_ANN_SELECTIVITY = 0.05
+# Extra ANN candidates fetched for filtered queries, on top of 1/selectivity
+FILTER_OVERSAMPLE = 2.0
+# ANN candidates fetched per requested result and reranked exactly
+ANN_OVERSAMPLE = 2.0
+
 
 def _backend_status(store: IndexStore, kind: str) -> Dict[str, Any]:
     out: Dict[str, Any] = {"kind": kind, "available": False, "built": False, "size": None, "dim": None, "error": None}
@@ -40,21 +59,9 @@ def _backend_status(store: IndexStore, kind: str) -> Dict[str, Any]:
             st = store.annoy_status()
         else:
             return out
-        # Library availability is encoded in exists for faiss, others we test import inline
-        if kind == "faiss":
-            out["available"] = bool(st.get("exists"))  # already gated by import
-            out["built"] = bool(st.get("exists"))
-        else:
-            # For hnsw/annoy we treat 'exists' as built; try import to set available
-            out["built"] = bool(st.get("exists"))
-            try:
-                if kind == "hnsw":
-                    import hnswlib  # type: ignore  # noqa: F401
-                elif kind == "annoy":
-                    from annoy import AnnoyIndex  # type: ignore  # noqa: F401
-                out["available"] = True
-            except Exception:
-                out["available"] = False
+        # Library availability is resolved once per process (infra.ann_handles)
+        out["available"] = ann_library(kind) is not None
+        out["built"] = bool(st.get("exists"))
         if out["built"]:
             out["size"] = st.get("size")
             out["dim"] = st.get("dim")
@@ -92,8 +99,17 @@ class FastIndexManager:
         use_fast: bool = False,
         fast_kind_hint: Optional[str] = None,
         subset: Optional[List[int]] = None,
+        oversample: float = ANN_OVERSAMPLE,
+        ef: Optional[int] = None,
+        nprobe: Optional[int] = None,
+        measure_recall: bool = False,
     ) -> Tuple[List[SearchResult], Dict[str, Any]]:
         meta: Dict[str, Any] = {"backend": "exact", "fallback": False, "requested": fast_kind_hint, "use_fast": use_fast}
+        ann_opts = {"oversample": oversample, "ef": ef, "nprobe": nprobe, "measure_recall": measure_recall}
+        if subset is not None and len(subset) == 0:
+            # A filter that matches nothing must not degrade into an unfiltered search
+            meta["strategy"] = "empty_filter"
+            return [], meta
         if not use_fast:
             return self.store.search(embedder, query, top_k=top_k, subset=subset), meta
 
@@ -121,14 +137,57 @@ class FastIndexManager:
             meta["fallback"] = True
             return self.store.search(embedder, query, top_k=top_k, subset=subset), meta
         meta["backend"] = chosen
-        if chosen == "faiss":
-            res = self.store.search_faiss(embedder, query, top_k=top_k, subset=subset)
-        elif chosen == "hnsw":
-            res = self.store.search_hnsw(embedder, query, top_k=top_k, subset=subset)
-        elif chosen == "annoy":
-            res = self.store.search_annoy(embedder, query, top_k=top_k, subset=subset)
-        else:
-            res = self.store.search(embedder, query, top_k=top_k, subset=subset)
-        return res, meta
+        if subset is not None:
+            return self._search_filtered(chosen, embedder, query, top_k, subset, meta, ann_opts)
+        return self._search_backend(chosen, embedder, query, top_k, meta, ann_opts), meta
+
+    def _search_backend(
+        self,
+        kind: str,
+        embedder,
+        query: str,
+        top_k: int,
+        meta: Dict[str, Any],
+        ann_opts: Dict[str, Any],
+        subset: Optional[List[int]] = None,
+    ) -> List[SearchResult]:
+        if kind not in _PREF_ORDER:
+            return self.store.search(embedder, query, top_k=top_k, subset=subset)
+        results, info = self.store.ann_search(kind, embedder, query, top_k=top_k, subset=subset, **ann_opts)
+        meta["ann"] = info
+        return results
+
+    def _search_filtered(
+        self,
+        kind: str,
+        embedder,
+        query: str,
+        top_k: int,
+        subset: List[int],
+        meta: Dict[str, Any],
+        ann_opts: Dict[str, Any],
+    ) -> Tuple[List[SearchResult], Dict[str, Any]]:
+        """Pre-filtered search: masked exact or oversampled ANN by selectivity."""
+        total = len(self.store.state.paths or [])
+        if not subset or total == 0:
+            meta["strategy"] = "empty_filter"
+            return [], meta
+        selectivity = len(subset) / float(total)
+        meta["selectivity"] = round(selectivity, 6)
+        if selectivity < MIN_ANN_SELECTIVITY:
+            meta["strategy"] = "masked_exact"
+            meta["backend"] = "exact"
+            return self.store.search(embedder, query, top_k=top_k, subset=subset), meta
+        want = min(total, int(math.ceil(top_k / selectivity * FILTER_OVERSAMPLE)))
+        opts = dict(ann_opts, measure_recall=False)
+        # The backend drops candidates outside the subset by row id before reranking
+        res = self._search_backend(kind, embedder, query, want, meta, opts, subset=subset)
+        meta["candidates"] = want
+        if len(res) >= min(top_k, len(subset)):
+            meta["strategy"] = "ann_oversampled"
+            return res[:top_k], meta
+        meta["strategy"] = "masked_exact"
+        meta["fallback"] = True
+        return self.store.search(embedder, query, top_k=top_k, subset=subset), meta
 
 __all__ = ["FastIndexManager"]
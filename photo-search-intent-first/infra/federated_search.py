@@ -0,0 +1,89 @@
+"""Scatter-gather semantic search across several IndexStores.
+
+Intent:
+  Workspace search used to ``np.vstack`` every folder's embedding matrix into
+  a fresh array per request before scoring. This module scores each store's
+  (memory-mapped) matrix in place on a thread pool -- the matrix-vector
+  products release the GIL -- keeps a top-k per store and merges the
+  per-store lists with a heap. Filters are compiled per store into a row mask
+  (see ``infra.filter_mask``) so only eligible rows are scored. Nothing ever
+  holds a concatenated copy of all libraries.
+
+Contract:
+  - store_top_k(store, q, k, mask) -> [(score, path)] best first
+  - federated_search(stores, q, top_k, mask_for) -> List[SearchResult]
+"""
+from __future__ import annotations
+
+import heapq
+import logging
+import os
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+from pathlib import Path
+from typing import Callable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from domain.models import SearchResult
+from infra.index_store import IndexStore
+
+logger = logging.getLogger(__name__)
+
+MaskFn = Callable[[IndexStore], Optional[np.ndarray]]
+
+
+def store_top_k(store: IndexStore, q: np.ndarray, k: int, mask: Optional[np.ndarray] = None) -> List[Tuple[float, str]]:
+    """Best ``k`` ``(score, path)`` pairs of one store, restricted to ``mask`` rows."""
+    E = store.state.embeddings
+    paths = store.state.paths
+    if E is None or not paths or len(E) == 0 or k <= 0:
+        return []
+    subset: Optional[List[int]] = None
+    if mask is not None:
+        subset = np.flatnonzero(mask).tolist()
+        if not subset:
+            return []
+    sims = store._scores(q, subset)
+    idx = IndexStore._top_indices(sims, k)
+    if subset is not None:
+        return [(float(sims[i]), paths[subset[i]]) for i in idx]
+    return [(float(sims[i]), paths[i]) for i in idx]
+
+
+def federated_search(
+    stores: Sequence[IndexStore],
+    q: np.ndarray,
+    top_k: int,
+    mask_for: Optional[MaskFn] = None,
+    max_workers: Optional[int] = None,
+) -> List[SearchResult]:
+    """Global top-k over ``stores``; ``mask_for(store)`` may narrow each store's rows.
+
+    A store whose scoring fails (e.g. an embedding dimension from another
+    model) is logged and left out rather than failing the whole search.
+    """
+    top_k = max(1, int(top_k))
+    q = np.asarray(q, dtype=np.float32)
+
+    def _one(store: IndexStore) -> List[Tuple[float, str]]:
+        try:
+            mask = mask_for(store) if mask_for is not None else None
+            return store_top_k(store, q, top_k, mask)
+        except Exception as e:
+            logger.warning("Workspace search skipped %s: %s", getattr(store, "index_dir", store), e)
+            return []
+
+    stores = list(stores)
+    if len(stores) <= 1:
+        per_store = [_one(s) for s in stores]
+    else:
+        workers = max_workers or min(len(stores), os.cpu_count() or 2)
+        with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ws-search") as pool:
+            per_store = list(pool.map(_one, stores))
+    # Each list is already sorted best-first, so a k-way heap merge suffices
+    merged = heapq.merge(*per_store, key=lambda hit: -hit[0])
+    return [SearchResult(path=Path(p), score=s) for s, p in islice(merged, top_k)]
+
+
+__all__ = ["federated_search", "store_top_k"]
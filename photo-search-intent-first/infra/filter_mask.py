@@ -0,0 +1,206 @@
+"""Compile search filters into a row mask over an IndexStore.
+
+Intent:
+  Filters (favorites, tags, people, dates, EXIF, OCR text) used to be applied
+  after semantic top-k, so restrictive filters returned near-empty pages. This
+  module turns a request's filters into a boolean mask aligned with
+  ``store.state.paths`` *before* ranking, so the searchers can score only the
+  rows that can actually be returned.
+
+Contract:
+  - compile_filter_mask(store, request) -> Optional[np.ndarray[bool]]
+      ``None`` when the request has no filters; otherwise one entry per row.
+  - mask_subset(mask) -> list[int] row ids suitable for ``subset=``.
+
+``request`` is any object exposing the v1 ``SearchRequest`` filter attributes;
+missing attributes are treated as "filter not set".
+"""
+from __future__ import annotations
+
+from typing import Any, List, Optional
+
+import numpy as np
+
+from infra.metadata_columns import ExifColumns, columns_for_store, in_range
+from infra.text_index import text_index_for_store
+
+_METERING_LABELS = {0: 'unknown', 1: 'average', 2: 'center', 3: 'spot', 4: 'multispot', 5: 'pattern', 6: 'partial', 255: 'other'}
+
+
+def _get(request: Any, name: str, default: Any = None) -> Any:
+    return getattr(request, name, default)
+
+
+def has_filters(request: Any) -> bool:
+    return any([
+        _get(request, 'favorites_only'),
+        _get(request, 'tags'),
+        _get(request, 'persons'),
+        _get(request, 'person'),
+        _get(request, 'date_from') is not None and _get(request, 'date_to') is not None,
+        _get(request, 'has_text'),
+        _needs_exif(request),
+    ])
+
+
+def _needs_exif(request: Any) -> bool:
+    return any([
+        _get(request, 'camera'),
+        _get(request, 'iso_min') is not None, _get(request, 'iso_max') is not None,
+        _get(request, 'f_min') is not None, _get(request, 'f_max') is not None,
+        _get(request, 'place'),
+        _get(request, 'flash'), _get(request, 'wb'), _get(request, 'metering'),
+        _get(request, 'alt_min') is not None, _get(request, 'alt_max') is not None,
+        _get(request, 'heading_min') is not None, _get(request, 'heading_max') is not None,
+        _get(request, 'sharp_only'), _get(request, 'exclude_underexp'), _get(request, 'exclude_overexp'),
+    ])
+
+
+def _rows_for(store, paths: Any) -> np.ndarray:
+    """Boolean mask of rows whose path is in ``paths``."""
+    want = set(str(p) for p in (paths or []))
+    return np.fromiter((p in want for p in store.state.paths), dtype=bool, count=len(store.state.paths))
+
+
+def exif_columns(store) -> Optional[ExifColumns]:
+    """EXIF metadata columns aligned with store rows (see ``infra.metadata_columns``)."""
+    return columns_for_store(store)
+
+
+def _exif_mask(request: Any, cols: ExifColumns) -> np.ndarray:
+    n = len(cols)
+    mask = np.ones(n, dtype=bool)
+    camera = (_get(request, 'camera') or '').strip()
+    if camera:
+        mask &= cols.contains('camera', camera)
+    place = (_get(request, 'place') or '').strip()
+    if place:
+        mask &= cols.contains('place', place)
+    for name, col, cast in (('iso', 'iso', int), ('f', 'fnumber', float)):
+        lo, hi = _get(request, f'{name}_min'), _get(request, f'{name}_max')
+        if lo is not None or hi is not None:
+            mask &= cols.range(col, None if lo is None else cast(lo), None if hi is None else cast(hi))
+    flash = _get(request, 'flash')
+    if flash:
+        fv = cols.numeric('flash')
+        ok = np.isfinite(fv)
+        fired = np.zeros(n, dtype=bool)
+        fired[ok] = (fv[ok].astype(np.int64) & 1) == 1
+        if flash == 'fired':
+            mask &= ok & fired
+        elif flash in ('no', 'noflash'):
+            mask &= ok & ~fired
+        else:
+            mask &= ok
+    wb = _get(request, 'wb')
+    if wb:
+        wv = cols.numeric('white_balance')
+        if wb == 'auto':
+            mask &= wv == 0
+        elif wb == 'manual':
+            mask &= wv == 1
+        else:
+            mask &= np.isfinite(wv)
+    metering = _get(request, 'metering')
+    if metering:
+        name = str(metering).lower()
+        mv = cols.numeric('metering')
+        ok = np.isfinite(mv)
+        allowed = np.zeros(n, dtype=bool)
+        for code in np.unique(mv[ok]).astype(np.int64):
+            label = _METERING_LABELS.get(int(code), 'other')
+            if name in (label, 'any') or (name == 'matrix' and label == 'pattern'):
+                allowed |= mv == code
+        mask &= allowed
+    alt_min, alt_max = _get(request, 'alt_min'), _get(request, 'alt_max')
+    if alt_min is not None or alt_max is not None:
+        mask &= cols.range('gps_altitude', alt_min, alt_max)
+    h_min, h_max = _get(request, 'heading_min'), _get(request, 'heading_max')
+    if h_min is not None or h_max is not None:
+        mask &= in_range(np.mod(cols.numeric('gps_heading'), 360.0), h_min, h_max)
+    if _get(request, 'sharp_only'):
+        mask &= cols.range('sharpness', 60.0)
+    with np.errstate(invalid='ignore'):
+        if _get(request, 'exclude_underexp'):
+            mask &= ~(cols.numeric('brightness') < 50.0)
+        if _get(request, 'exclude_overexp'):
+            mask &= ~(cols.numeric('brightness') > 205.0)
+    return mask
+
+
+def compile_filter_mask(store, request: Any) -> Optional[np.ndarray]:
+    """Evaluate every filter on ``request`` into one boolean row mask.
+
+    Filters whose backing data cannot be read are skipped, matching the
+    permissive behaviour of the former post-filters.
+    """
+    if not has_filters(request):
+        return None
+    n = len(store.state.paths)
+    mask = np.ones(n, dtype=bool)
+
+    if _get(request, 'favorites_only'):
+        try:
+            from infra.collections import collection_paths
+            mask &= _rows_for(store, collection_paths(store.index_dir, 'Favorites'))
+        except Exception:
+            pass
+
+    tags = _get(request, 'tags')
+    if tags:
+        try:
+            from infra.tags import paths_with_tags
+            # Intersection of the per-tag posting lists, resolved to rows
+            mask &= _rows_for(store, paths_with_tags(store.index_dir, tags))
+        except Exception:
+            pass
+
+    try:
+        from infra.faces import photos_for_person as _face_photos
+        persons = _get(request, 'persons') or []
+        person = _get(request, 'person')
+        if persons:
+            for nm in persons:
+                try:
+                    mask &= _rows_for(store, _face_photos(store.index_dir, str(nm)))
+                except Exception:
+                    mask &= False
+        elif person:
+            mask &= _rows_for(store, _face_photos(store.index_dir, str(person)))
+    except Exception:
+        pass
+
+    date_from, date_to = _get(request, 'date_from'), _get(request, 'date_to')
+    if date_from is not None and date_to is not None:
+        try:
+            mt = np.asarray(store.state.mtimes, dtype=float)
+            if len(mt) == n:
+                mask &= in_range(mt, date_from, date_to)
+        except Exception:
+            pass
+
+    if _needs_exif(request):
+        try:
+            cols = exif_columns(store)
+            if cols is not None:
+                mask &= _exif_mask(request, cols)
+        except Exception:
+            pass
+
+    if _get(request, 'has_text'):
+        try:
+            with_text: List[str] = []
+            if store.ocr_texts_file.exists():
+                with_text = text_index_for_store(store).paths_with_text('ocr')
+            mask &= _rows_for(store, with_text)
+        except Exception:
+            pass
+
+    return mask
+
+
+def mask_subset(mask: np.ndarray) -> List[int]:
+    return np.flatnonzero(mask).tolist()
+
+
+__all__ = ["compile_filter_mask", "exif_columns", "has_filters", "mask_subset"]
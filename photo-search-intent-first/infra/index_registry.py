@@ -0,0 +1,146 @@
+"""Process-wide registry of resident IndexStore instances.
+
+Intent:
+  Search-style handlers used to build a fresh ``IndexStore`` and call ``load()``
+  on every request, re-parsing ``paths.json`` and re-reading ``embeddings.npy``.
+  The registry keeps one loaded store per (folder, index_key), shared by all
+  concurrent readers, and revalidates it with ``IndexStore.generation()`` (a few
+  ``stat`` calls) instead of reloading.
+
+Contract:
+  - get_index_store(folder, index_key) -> loaded IndexStore (treat as read-only)
+  - invalidate(folder, index_key=None) drops resident entries for a folder
+  - stats() -> {entries, resident_bytes, budget_bytes, hits, misses, reloads, evictions}
+
+Writers (indexing, OCR/caption builds) keep constructing their own IndexStore;
+their ``save()`` bumps the on-disk generation and the next ``get`` reloads.
+Entries are evicted least-recently-used first once the resident total exceeds
+the configured budget (``PS_INDEX_CACHE_MB``).
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple, Union
+
+from infra.config import config
+from infra.index_store import IndexStore
+
+logger = logging.getLogger(__name__)
+
+_Key = Tuple[str, str]
+
+
+@dataclass
+class _Entry:
+    store: IndexStore
+    generation: tuple
+    nbytes: int
+    loaded_at: float
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+
+class IndexRegistry:
+    """Thread-safe LRU of loaded IndexStore objects keyed by (folder, index_key)."""
+
+    def __init__(self, budget_bytes: Optional[int] = None) -> None:
+        if budget_bytes is None:
+            budget_bytes = max(0, int(config.index_cache_mb)) * 1024 * 1024
+        self.budget_bytes = int(budget_bytes)
+        self._entries: "OrderedDict[_Key, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"hits": 0, "misses": 0, "reloads": 0, "evictions": 0}
+
+    @staticmethod
+    def _key(folder: Union[str, Path], index_key: Optional[str]) -> _Key:
+        return (str(Path(folder).expanduser().resolve()), index_key or "")
+
+    def get(self, folder: Union[str, Path], index_key: Optional[str] = None) -> IndexStore:
+        key = self._key(folder, index_key)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = _Entry(
+                    store=IndexStore(Path(key[0]), index_key=index_key),
+                    generation=(),
+                    nbytes=0,
+                    loaded_at=0.0,
+                )
+                self._entries[key] = entry
+            self._entries.move_to_end(key)
+
+        # Per-entry lock: concurrent requests for the same index wait for a
+        # single load instead of each reading the matrix from disk.
+        with entry.lock:
+            gen = entry.store.generation()
+            if entry.loaded_at and gen == entry.generation:
+                with self._lock:
+                    self._stats["hits"] += 1
+                return entry.store
+            fresh = IndexStore(Path(key[0]), index_key=index_key)
+            fresh.load()
+            with self._lock:
+                if entry.loaded_at:
+                    self._stats["reloads"] += 1
+                else:
+                    self._stats["misses"] += 1
+            # Swap in a new object rather than mutating the shared one so
+            # readers holding the old store keep a consistent snapshot.
+            entry.store = fresh
+            entry.generation = gen
+            entry.nbytes = fresh.memory_usage()
+            entry.loaded_at = time.time()
+
+        self._enforce_budget(keep=key)
+        return entry.store
+
+    def _enforce_budget(self, keep: Optional[_Key] = None) -> None:
+        if self.budget_bytes <= 0:
+            return
+        with self._lock:
+            total = sum(e.nbytes for e in self._entries.values())
+            for k in list(self._entries.keys()):
+                if total <= self.budget_bytes:
+                    break
+                if k == keep:
+                    continue
+                victim = self._entries.pop(k)
+                total -= victim.nbytes
+                self._stats["evictions"] += 1
+                logger.debug("Evicted resident index %s (%d bytes)", k, victim.nbytes)
+
+    def invalidate(self, folder: Union[str, Path], index_key: Optional[str] = None) -> int:
+        root = self._key(folder, None)[0]
+        with self._lock:
+            victims = [k for k in self._entries if k[0] == root and (index_key is None or k[1] == index_key)]
+            for k in victims:
+                self._entries.pop(k, None)
+        return len(victims)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "resident_bytes": int(sum(e.nbytes for e in self._entries.values())),
+                "budget_bytes": self.budget_bytes,
+                **self._stats,
+            }
+
+
+index_registry = IndexRegistry()
+
+
+def get_index_store(folder: Union[str, Path], index_key: Optional[str] = None) -> IndexStore:
+    """Return the shared, loaded IndexStore for ``folder``/``index_key``."""
+    return index_registry.get(folder, index_key)
+
+
+__all__ = ["IndexRegistry", "index_registry", "get_index_store"]
@@ -1,4 +1,8 @@
+import copy
 import json
+import logging
+import math
+import time
 from dataclasses import dataclass
 from pathlib import Path
 from typing import List, Tuple, Optional
@@ -6,8 +10,17 @@ from typing import List, Tuple, Optional
 import numpy as np
 
 from domain.models import MODEL_NAME, Photo, SearchResult
+from infra import ann_handles as ann
+from infra import ann_maintenance as ann_maint
+from infra import faiss_factory
+from infra import ocr_build
+from infra import text_index
+from infra import embedding_segments as seg
+from infra.config import config
 import os
 
+logger = logging.getLogger(__name__)
+
 
 @dataclass
 class IndexState:
@@ -26,6 +39,11 @@ def _sanitize_key(key: str) -> str:
 
 
 class IndexStore:
+    # Embedding segment storage (see infra.embedding_segments)
+    segment_dtype: str = config.embedding_dtype
+    max_segments: int = 4
+    max_dead_ratio: float = 0.1
+
     def __init__(self, root: Path, index_key: Optional[str] = None) -> None:
         # Restore directory validation before building the Path
         if not root:
@@ -72,6 +90,7 @@ class IndexStore:
         self.index_dir.mkdir(parents=True, exist_ok=True)
         self.paths_file = self.index_dir / "paths.json"
         self.embeddings_file = self.index_dir / "embeddings.npy"
+        self.manifest_file = self.index_dir / seg.MANIFEST_NAME
         self.ann_file = self.index_dir / "annoy.index"
         self.ann_meta_file = self.index_dir / "annoy.meta.json"
         self.faiss_file = self.index_dir / "faiss.index"
@@ -84,9 +103,20 @@ class IndexStore:
         self.cap_embeds_file = self.index_dir / "cap_embeddings.npy"
 
         self.state = IndexState(paths=[], mtimes=[], embeddings=None)
+        # Snapshot of the persisted layout: generation, paths and physical row ids
+        self._disk: Optional[dict] = None
+        # Rows whose vectors the last save() wrote (new or changed)
+        self._changed_rows: np.ndarray = np.zeros(0, dtype=np.int64)
+        # Resident auxiliary matrices: file name -> (stat stamp, array)
+        self._aux: dict = {}
 
     def load(self) -> None:
+        manifest = seg.read_manifest(self.index_dir)
+        if manifest is not None and self.paths_file.exists():
+            self._load_segments()
+            return
         if self.paths_file.exists() and self.embeddings_file.exists():
+            # Legacy single-file layout; migrated to segments on next save()
             with open(self.paths_file, "r") as f:
                 data = json.load(f)
             self.state.paths = data.get("paths", [])
@@ -95,14 +125,197 @@ class IndexStore:
                 self.state.embeddings = np.load(self.embeddings_file)
             except Exception:
                 self.state.embeddings = None
+            self._disk = None
+
+    def _load_segments(self) -> None:
+        # paths.json and manifest.json are each replaced atomically, but one
+        # after the other; the manifest's paths_digest tells whether the pair
+        # we read belongs to the same save. Retry once if we caught them mid-save.
+        # (Manifests written before the digest existed fall back to the row count.)
+        for attempt in range(2):
+            if attempt:
+                time.sleep(0.05)
+            manifest = seg.read_manifest(self.index_dir)
+            try:
+                with open(self.paths_file, "r") as f:
+                    data = json.load(f)
+                paths = data.get("paths", [])
+                mtimes = data.get("mtimes", [0.0] * len(paths))
+                if manifest is None or int(manifest.get("rows", -1)) != len(paths):
+                    continue
+                digest = manifest.get("paths_digest")
+                if digest is not None and digest != seg.paths_digest(paths):
+                    continue
+                E = seg.open_matrix(self.index_dir, manifest)
+            except Exception:
+                continue
+            self.state.paths = paths
+            self.state.mtimes = mtimes
+            self.state.embeddings = E
+            self._disk = {
+                "generation": int(manifest.get("generation", 0)),
+                # Compaction bumps the generation without changing any row
+                "content": int(manifest.get("compacted_from", manifest.get("generation", 0))),
+                "paths": list(paths),
+                "pids": seg.logical_order(self.index_dir, manifest),
+            }
+            return
+        self.state.paths = []
+        self.state.mtimes = []
+        self.state.embeddings = None
+        self._disk = None
 
     def save(self) -> None:
-        with open(self.paths_file, "w") as f:
-            json.dump({"paths": self.state.paths, "mtimes": self.state.mtimes}, f)
+        before = self._disk
+        with seg.dir_lock(self.index_dir):
+            payload = {"paths": self.state.paths, "mtimes": self.state.mtimes}
+
+            def _write_paths(tmp: str) -> None:
+                with open(tmp, "w") as f:
+                    json.dump(payload, f)
+
+            ann_maint._replace_with(self.paths_file, _write_paths)
+            if self.state.embeddings is not None:
+                self._save_segments()
+        self._sync_ann(before)
+        manifest = seg.read_manifest(self.index_dir)
+        if manifest is not None and seg.needs_compaction(manifest, self.max_segments, self.max_dead_ratio):
+            seg.compact_in_background(self.index_dir)
+
+    def _save_segments(self) -> None:
+        """Persist embeddings, writing only rows that are new or changed.
+
+        Rows are matched to the persisted layout by path and compared with the
+        on-disk vectors, so callers that mutate ``state.embeddings`` directly
+        (in-place updates, vstack, pruning) need no extra bookkeeping.
+        """
+        E = self.state.embeddings
+        n = len(E)
+        manifest = seg.read_manifest(self.index_dir)
+        dim = int(E.shape[1]) if E.ndim == 2 else 0
+        disk = self._disk
+        if manifest is not None and disk is not None and manifest.get("compacted_from") == disk["generation"]:
+            # A background compaction rewrote our snapshot in logical order
+            disk = {"generation": int(manifest["generation"]), "paths": disk["paths"],
+                    "pids": np.arange(len(disk["paths"]), dtype=np.int64)}
+        incremental = (
+            manifest is not None
+            and disk is not None
+            and disk["generation"] == int(manifest.get("generation", -1))
+            and int(manifest.get("dim", -1)) == dim
+            and len(self.state.paths) == n
+        )
+        order = np.full(n, -1, dtype=np.int64)
+        if incremental:
+            where = {p: i for i, p in enumerate(disk["paths"])}
+            cand = [(i, disk["pids"][where[p]]) for i, p in enumerate(self.state.paths) if p in where]
+            if cand:
+                rows = np.fromiter((c[0] for c in cand), dtype=np.int64, count=len(cand))
+                pids = np.fromiter((c[1] for c in cand), dtype=np.int64, count=len(cand))
+                segments = [seg.open_segment(self.index_dir / seg.SEGMENTS_DIR / s["file"])
+                            for s in manifest.get("segments", [])]
+                step = 8192
+                for start in range(0, len(rows), step):
+                    r = rows[start:start + step]
+                    old = seg.gather_rows(segments, pids[start:start + step])
+                    cur = np.asarray(E[r], dtype=np.float32)
+                    if manifest.get("dtype") == "float16":
+                        cur = cur.astype(np.float16).astype(np.float32)
+                    same = np.all(cur == old, axis=1)
+                    order[r[same]] = pids[start:start + step][same]
+                del segments
+            total = seg.total_physical_rows(manifest)
+            segments_meta = list(manifest.get("segments", []))
+            next_seq = int(manifest.get("next_seq", 1))
+            generation = int(manifest.get("generation", 0)) + 1
+            dtype = manifest.get("dtype", self.segment_dtype)
+        else:
+            total = 0
+            segments_meta = []
+            next_seq = int((manifest or {}).get("next_seq", 1))
+            generation = int((manifest or {}).get("generation", 0)) + 1
+            dtype = self.segment_dtype
+
+        dirty = np.nonzero(order < 0)[0]
+        self._changed_rows = dirty
+        if incremental and dirty.size == 0:
+            prev_live = disk["pids"]
+            if len(prev_live) == len(order) and np.array_equal(prev_live, order):
+                return  # embeddings unchanged; paths.json already rewritten
+        if dirty.size:
+            seg_path = self.index_dir / seg.SEGMENTS_DIR / f"seg-{next_seq:06d}.emb"
+            written = seg.write_segment(seg_path, np.asarray(E[dirty]), dtype=dtype)
+            segments_meta.append({"file": seg_path.name, "rows": written})
+            order[dirty] = np.arange(total, total + written, dtype=np.int64)
+            total += written
+            next_seq += 1
+        live = np.zeros(total, dtype=bool)
+        live[order] = True
+        tombstones = np.nonzero(~live)[0]
+        ordered = bool(n > 1 and np.any(np.diff(order) <= 0))
+        if ordered:
+            np.save(self.index_dir / seg.ORDER_NAME, order)
+        else:
+            try:
+                (self.index_dir / seg.ORDER_NAME).unlink()
+            except OSError:
+                pass
+        new_manifest = {
+            "format": seg.FORMAT_VERSION,
+            "generation": generation,
+            "dim": dim,
+            "dtype": dtype,
+            "rows": n,
+            "segments": segments_meta,
+            "tombstones": tombstones.tolist(),
+            "ordered": ordered,
+            "next_seq": next_seq,
+            "paths_digest": seg.paths_digest(self.state.paths),
+        }
+        seg.write_manifest(self.index_dir, new_manifest)
+        self._disk = {"generation": generation, "paths": list(self.state.paths), "pids": order}
+        if not incremental:
+            seg.remove_unreferenced(self.index_dir, new_manifest)
+            try:
+                self.embeddings_file.unlink()
+            except OSError:
+                pass
+
+    def compact(self) -> bool:
+        """Merge embedding segments and drop tombstoned rows (see infra.embedding_segments)."""
+        return seg.compact(self.index_dir)
+
+    def generation(self) -> tuple:
+        """Cheap on-disk stamp of the persisted index.
+
+        Changes whenever ``save()`` rewrites the index files, so resident copies
+        (see ``infra.index_registry``) can be revalidated with a couple of stats.
+        """
+        stamp = []
+        for f in (self.paths_file, self.manifest_file, self.embeddings_file):
+            try:
+                st = f.stat()
+                stamp.append((st.st_mtime_ns, st.st_size))
+            except OSError:
+                stamp.append(None)
+        return tuple(stamp)
+
+    def memory_usage(self) -> int:
+        """Approximate resident bytes held by the loaded state."""
+        total = 0
         if self.state.embeddings is not None:
-            np.save(self.embeddings_file, self.state.embeddings)
+            total += int(self.state.embeddings.nbytes)
+        # Paths/mtimes lists: rough per-entry overhead
+        total += 100 * len(self.state.paths)
+        return total
+
+    def upsert(self, embedder, photos: List[Photo], batch_size: int = 32, progress: Optional[callable] = None,
+               cancel: Optional[callable] = None) -> Tuple[int, int]:
+        """Embed new and modified photos in batches; returns (new, updated).
 
-    def upsert(self, embedder, photos: List[Photo], batch_size: int = 32, progress: Optional[callable] = None) -> Tuple[int, int]:
+        ``cancel`` is called before each batch and may raise to stop the run;
+        nothing is saved in that case.
+        """
         self.load()
         existing_map = {p: i for i, p in enumerate(self.state.paths)}
 
@@ -126,6 +339,8 @@ class IndexStore:
             total_updates = len(modified_idx)
             done_updates = 0
             for start in range(0, total_updates, max(1, int(batch_size))):
+                if cancel is not None:
+                    cancel()
                 chunk_idx = modified_idx[start:start + max(1, int(batch_size))]
                 paths_to_update = [Path(self.state.paths[i]) for i in chunk_idx]
                 new_embs = embedder.embed_images(paths_to_update, batch_size=batch_size)
@@ -154,6 +369,8 @@ class IndexStore:
             done_new = 0
             # Process in chunks to enable progress updates
             for start in range(0, total_new, max(1, int(batch_size))):
+                if cancel is not None:
+                    cancel()
                 chunk = new_items[start:start + max(1, int(batch_size))]
                 new_embs = embedder.embed_images([p.path for p in chunk], batch_size=batch_size)
                 # Keep only non-zero vectors
@@ -290,22 +507,45 @@ class IndexStore:
         self.save()
         return newc, updated
 
+    @staticmethod
+    def _top_indices(sims: np.ndarray, k: int) -> np.ndarray:
+        """Indices of the ``k`` largest scores, best first."""
+        k = max(1, min(int(k), len(sims)))
+        idx = np.argpartition(-sims, k - 1)[:k]
+        return idx[np.argsort(-sims[idx])]
+
+    def _rank(self, sims: np.ndarray, top_k: int, subset: Optional[List[int]] = None) -> List[SearchResult]:
+        """Build results from a score vector computed once over ``subset`` (or all rows)."""
+        idx = self._top_indices(sims, top_k)
+        if subset is not None and len(subset) > 0:
+            return [SearchResult(path=Path(self.state.paths[subset[i]]), score=float(sims[i])) for i in idx]
+        return [SearchResult(path=Path(self.state.paths[i]), score=float(sims[i])) for i in idx]
+
+    def _aux_matrix(self, path: Path) -> Optional[np.ndarray]:
+        """OCR/caption text-embedding matrix, kept resident until the file changes."""
+        try:
+            st = path.stat()
+        except OSError:
+            return None
+        stamp = (st.st_mtime_ns, st.st_size)
+        cached = self._aux.get(path.name)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+        M = np.load(path, mmap_mode="r")
+        self._aux[path.name] = (stamp, M)
+        return M
+
+    def _scores(self, q: np.ndarray, subset: Optional[List[int]] = None, aux: Optional[np.ndarray] = None) -> np.ndarray:
+        M = self.state.embeddings if aux is None else aux
+        if subset is not None and len(subset) > 0:
+            M = M[subset]
+        return (M @ q).astype(float)
+
     def search(self, embedder, query: str, top_k: int = 12, subset: Optional[List[int]] = None) -> List[SearchResult]:
         if not self.state.paths or self.state.embeddings is None or len(self.state.embeddings) == 0:
             return []
         q = embedder.embed_text(query)
-        E = self.state.embeddings
-        if subset is not None and len(subset) > 0:
-            E = E[subset]
-        sims = (E @ q).astype(float)
-        top_k = max(1, min(top_k, len(sims)))
-        idx = np.argpartition(-sims, top_k - 1)[:top_k]
-        idx = idx[np.argsort(-sims[idx])]
-        if subset is not None and len(subset) > 0:
-            idx = [subset[i] for i in idx]
-            sims_sorted = [float((self.state.embeddings @ q)[i]) for i in idx]
-            return [SearchResult(path=Path(self.state.paths[i]), score=sims_sorted[j]) for j, i in enumerate(idx)]
-        return [SearchResult(path=Path(self.state.paths[i]), score=float((self.state.embeddings @ q)[i])) for i in idx]
+        return self._rank(self._scores(q, subset), top_k, subset)
 
     def search_like(self, embedder, path: str, top_k: int = 12, subset: Optional[list[int]] = None) -> list[SearchResult]:
         if self.state.embeddings is None or not self.state.paths:
@@ -314,43 +554,26 @@ class IndexStore:
             i = self.state.paths.index(path)
         except ValueError:
             return []
-        q = self.state.embeddings[i]
-        E = self.state.embeddings if subset is None else self.state.embeddings[subset]
-        sims = (E @ q).astype(float)
-        k = max(1, min(top_k, len(sims)))
-        idx = np.argpartition(-sims, k - 1)[:k]
-        idx = idx[np.argsort(-sims[idx])]
-        if subset:
-            idx = [subset[i] for i in idx]
-        return [SearchResult(path=Path(self.state.paths[i]), score=float((self.state.embeddings @ q)[i])) for i in idx]
+        q = np.asarray(self.state.embeddings[i])
+        return self._rank(self._scores(q, subset), top_k, subset)
 
     # OCR support (optional, uses EasyOCR if available; caches text and text-embeddings)
     def ocr_available(self) -> bool:
         return self.ocr_texts_file.exists() and self.ocr_embeds_file.exists()
 
-    def build_ocr(self, embedder, languages: Optional[List[str]] = None) -> int:
+    def build_ocr(self, embedder, languages: Optional[List[str]] = None, cancel: Optional[callable] = None) -> int:
+        """OCR the library and embed the texts (see infra.ocr_build); returns photos OCR'd.
+
+        ``cancel`` is checked between OCR chunks; finished chunks stay in the
+        resume checkpoint.
+        """
         try:
-            import easyocr  # type: ignore
+            import easyocr  # type: ignore  # noqa: F401
         except Exception:
             return 0
         self.load()
         if not self.state.paths:
             return 0
-        # Prepare progress status file for UI polling (OCR)
-        status_path = self.index_dir / 'ocr_status.json'
-        try:
-            total = len(self.state.paths or [])
-            status = {
-                'state': 'running',
-                'start': __import__('time').strftime('%Y-%m-%dT%H:%M:%SZ', __import__('time').gmtime()),
-                'total': int(total),
-                'done': 0,
-                'updated': 0,
-            }
-            status_path.parent.mkdir(parents=True, exist_ok=True)
-            status_path.write_text(json.dumps(status), encoding='utf-8')
-        except Exception:
-            pass
         texts = {}
         if self.ocr_texts_file.exists():
             try:
@@ -359,99 +582,43 @@ class IndexStore:
                 texts = {p: t for p, t in zip(d.get("paths", []), d.get("texts", []))}
             except Exception:
                 texts = {}
-        reader = easyocr.Reader(languages or ["en"], gpu=False)
-        updated = 0
-        ocr_texts: list[str] = []
-        done = 0
-        for p in self.state.paths:
-            t_prev = texts.get(p)
-            if t_prev:
-                ocr_texts.append(t_prev)
-                done += 1
-                try:
-                    cur = {}
-                    try:
-                        cur = json.loads(status_path.read_text(encoding='utf-8')) if status_path.exists() else {}
-                    except Exception:
-                        cur = {}
-                    cur['done'] = int(done)
-                    cur['updated'] = int(updated)
-                    status_path.write_text(json.dumps(cur), encoding='utf-8')
-                except Exception:
-                    pass
-                continue
-            try:
-                res = reader.readtext(p, detail=0)
-                txt = " ".join(res).strip()
-            except Exception:
-                txt = ""
-            texts[p] = txt
-            ocr_texts.append(txt)
-            updated += 1
-            done += 1
-            # Update OCR status after each item
-            try:
-                cur = {}
-                try:
-                    cur = json.loads(status_path.read_text(encoding='utf-8')) if status_path.exists() else {}
-                except Exception:
-                    cur = {}
-                cur['done'] = int(done)
-                cur['updated'] = int(updated)
-                status_path.write_text(json.dumps(cur), encoding='utf-8')
-            except Exception:
-                pass
+        ocr_texts, updated = ocr_build.run_ocr(self.index_dir, self.state.paths, languages, previous=texts, cancel=cancel)
         # Save texts
         with open(self.ocr_texts_file, "w") as f:
             json.dump({"paths": self.state.paths, "texts": ocr_texts}, f)
+        self._sync_text_index("ocr", self.ocr_texts_file)
         # Build text embeddings
-        vecs: list[np.ndarray] = []
-        for t in ocr_texts:
-            if t:
-                vecs.append(embedder.embed_text(t))
-            else:
-                vecs.append(np.zeros((self.state.embeddings.shape[1],), dtype=np.float32))
-        O = np.stack(vecs).astype(np.float32)
-        np.save(self.ocr_embeds_file, O)
-        # Mark completion
-        try:
-            status = {
-                'state': 'complete',
-                'end': __import__('time').strftime('%Y-%m-%dT%H:%M:%SZ', __import__('time').gmtime()),
-                'total': int(len(self.state.paths or [])),
-                'done': int(len(self.state.paths or [])),
-                'updated': int(updated),
-            }
-            status_path.write_text(json.dumps(status), encoding='utf-8')
-        except Exception:
-            pass
+        O = ocr_build.embed_ocr_texts(embedder, ocr_texts, self.state.embeddings.shape[1])
+        # Resident stores mmap the old matrix (see _aux_matrix): swap, don't overwrite
+        ann_maint._replace_with(self.ocr_embeds_file, lambda p: ann_maint._save_npy(p, O))
+        ocr_build.finish(self.index_dir)
         return updated
 
+    def _sync_text_index(self, source: str, texts_file: Path) -> None:
+        """Fold a freshly written texts file into the FTS index (only changed rows are rewritten)."""
+        try:
+            text_index.text_index_for(self.index_dir).sync_file(source, texts_file)
+        except Exception as e:
+            logger.warning("Text index update for %s failed: %s", source, e)
+
     def search_with_ocr(self, embedder, query: str, top_k: int = 12, subset: Optional[List[int]] = None, weight_img: float = 0.5, weight_ocr: float = 0.5) -> List[SearchResult]:
         # Combine image similarity with OCR-text similarity
-        base = self.search(embedder, query, top_k=top_k, subset=subset)
-        if not self.ocr_available() or not self.state.paths:
-            return base
+        return self._search_with_text(self.ocr_embeds_file, embedder, query, top_k, subset, weight_img, weight_ocr)
+
+    def _search_with_text(self, texts_file: Path, embedder, query: str, top_k: int, subset: Optional[List[int]], weight_img: float, weight_txt: float) -> List[SearchResult]:
+        """Weighted image+text ranking; each score vector is computed exactly once."""
+        if not self.state.paths or self.state.embeddings is None or len(self.state.embeddings) == 0:
+            return []
+        q = embedder.embed_text(query)
+        sims_img = self._scores(q, subset)
         try:
-            q = embedder.embed_text(query)
-            E = self.state.embeddings
-            T = np.load(self.ocr_embeds_file)
-            if subset is not None and len(subset) > 0:
-                E = E[subset]
-                T = T[subset]
-            sims_img = (E @ q).astype(float)
-            sims_txt = (T @ q).astype(float)
-            sims = weight_img * sims_img + weight_ocr * sims_txt
-            k = max(1, min(top_k, len(sims)))
-            idx = np.argpartition(-sims, k - 1)[:k]
-            idx = idx[np.argsort(-sims[idx])]
-            if subset is not None and len(subset) > 0:
-                idx = [subset[i] for i in idx]
-                sims_sorted = [float((weight_img * (self.state.embeddings @ q) + weight_ocr * np.load(self.ocr_embeds_file) @ q)[i]) for i in idx]
-                return [SearchResult(path=Path(self.state.paths[i]), score=sims_sorted[j]) for j, i in enumerate(idx)]
-            return [SearchResult(path=Path(self.state.paths[i]), score=float((self.state.embeddings @ q)[i] * weight_img + (np.load(self.ocr_embeds_file) @ q)[i] * weight_ocr)) for i in idx]
+            T = self._aux_matrix(texts_file)
+            if T is None or len(T) != len(self.state.embeddings):
+                raise ValueError("text embeddings out of date")
+            sims = weight_img * sims_img + weight_txt * self._scores(q, subset, aux=T)
         except Exception:
-            return base
+            return self._rank(sims_img, top_k, subset)
+        return self._rank(sims, top_k, subset)
 
     # Captions support (optional, uses VLM HF pipeline via adapters; caches text and text-embeddings)
     def captions_available(self) -> bool:
@@ -487,6 +654,7 @@ class IndexStore:
             self.cap_texts_file.write_text(json.dumps({"paths": self.state.paths, "texts": out_texts}))
         except Exception:
             pass
+        self._sync_text_index("caption", self.cap_texts_file)
         # Save embeddings
         vecs: list[np.ndarray] = []
         for t in out_texts:
@@ -496,51 +664,96 @@ class IndexStore:
                 dim = int(self.state.embeddings.shape[1]) if self.state.embeddings is not None else 0
                 vecs.append(np.zeros((dim,), dtype=np.float32))
         C = np.stack(vecs).astype(np.float32)
-        np.save(self.cap_embeds_file, C)
+        ann_maint._replace_with(self.cap_embeds_file, lambda p: ann_maint._save_npy(p, C))
         return updated
 
     def search_with_captions(self, embedder, query: str, top_k: int = 12, subset: Optional[List[int]] = None, weight_img: float = 0.5, weight_cap: float = 0.5) -> List[SearchResult]:
-        base = self.search(embedder, query, top_k=top_k, subset=subset)
-        if not self.captions_available() or not self.state.paths:
-            return base
-        try:
-            q = embedder.embed_text(query)
-            E = self.state.embeddings
-            T = np.load(self.cap_embeds_file)
-            if subset is not None and len(subset) > 0:
-                E = E[subset]
-                T = T[subset]
-            sims_img = (E @ q).astype(float)
-            sims_txt = (T @ q).astype(float)
-            sims = weight_img * sims_img + weight_cap * sims_txt
-            k = max(1, min(top_k, len(sims)))
-            idx = np.argpartition(-sims, k - 1)[:k]
-            idx = idx[np.argsort(-sims[idx])]
-            if subset is not None and len(subset) > 0:
-                idx = [subset[i] for i in idx]
-            # Return exact weighted scores for final ranking
-            full_T = np.load(self.cap_embeds_file)
-            exact_img = (self.state.embeddings @ q).astype(float)
-            exact_txt = (full_T @ q).astype(float)
-            return [SearchResult(path=Path(self.state.paths[i]), score=float(weight_img * exact_img[i] + weight_cap * exact_txt[i])) for i in idx]
-        except Exception:
-            return base
-
-    # HNSW (hnswlib) support
-    def hnsw_status(self) -> dict:
-        status = {"exists": self.hnsw_file.exists() and self.hnsw_meta_file.exists()}
+        return self._search_with_text(self.cap_embeds_file, embedder, query, top_k, subset, weight_img, weight_cap)
+
+    # ANN upkeep (see infra.ann_maintenance)
+    def _content_generation(self) -> Optional[int]:
+        """Generation of the persisted rows (unchanged by compaction); None if unknown."""
+        if self._disk is None:
+            return None
+        return int(self._disk.get("content", self._disk["generation"]))
+
+    def _ann_current(self, meta: dict) -> bool:
+        built = meta.get("generation")
+        current = self._content_generation()
+        return built is None or current is None or int(built) == current
+
+    def _build_meta(self) -> dict:
+        """Generation stamp written into ANN meta by every build."""
+        gen = self._content_generation()
+        return {} if gen is None else {"generation": gen}
+
+    def _sync_ann(self, before: Optional[dict]) -> None:
+        """Carry existing ANN artifacts forward to the generation save() just wrote."""
+        after = self._disk
+        if after is None or (before is not None and before["generation"] == after["generation"]):
+            return
+        for kind in ("hnsw", "faiss", "annoy"):
+            index_file, meta_file = self._ann_files(kind)
+            if not index_file.exists() or not meta_file.exists():
+                continue
+            key = str(index_file)
+            if before is None or ann_maint.rebuilding(key):
+                status = "rebuild"
+            else:
+                try:
+                    status = ann_maint.sync(
+                        kind, index_file, meta_file,
+                        before["paths"], int(before.get("content", before["generation"])),
+                        self.state.paths, self.state.embeddings, self._changed_rows,
+                        int(after["generation"]),
+                    )
+                except Exception as e:
+                    logger.warning("Incremental %s update failed, rebuilding: %s", kind, e)
+                    status = "rebuild"
+            if status == "rebuild":
+                self._rebuild_ann_in_background(kind)
+
+    def _rebuild_ann_in_background(self, kind: str):
+        """Full rebuild of one ANN artifact from a fresh read of the saved store."""
+        meta = ann.read_meta(self._ann_files(kind)[1]) or {}
+
+        def _rebuild() -> bool:
+            # A private copy: the caller keeps mutating its own state
+            store = copy.copy(self)
+            store.state = IndexState(paths=[], mtimes=[], embeddings=None)
+            store._aux = {}
+            store.load()
+            if kind == "hnsw":
+                return store.build_hnsw(M=int(meta.get("M", 16)), ef_construction=int(meta.get("ef_construction", 200)))
+            if kind == "faiss":
+                # Keep the user's choice: "auto" re-picks for the new size, a fixed factory stays
+                return store.build_faiss(
+                    factory=str(meta.get("requested_factory") or meta.get("factory") or "auto"),
+                    target_recall=float(meta.get("target_recall") or (meta.get("report") or {}).get("target_recall") or 0.95),
+                )
+            return store.build_annoy(trees=int(meta.get("trees", 50)))
+
+        return ann_maint.schedule_rebuild(str(self._ann_files(kind)[0]), _rebuild)
+
+    def _ann_status(self, index_file: Path, meta_file: Path) -> dict:
+        status = {"exists": index_file.exists() and meta_file.exists()}
         if status["exists"]:
-            try:
-                meta = json.loads(self.hnsw_meta_file.read_text())
-                status.update(meta)
-            except Exception:
+            meta = ann.read_meta(meta_file)
+            if meta is None:
                 status["exists"] = False
+            else:
+                status.update(meta)
+                status["stale"] = not self._ann_current(meta)
+                status["rebuilding"] = ann_maint.rebuilding(str(index_file))
         return status
 
+    # HNSW (hnswlib) support
+    def hnsw_status(self) -> dict:
+        return self._ann_status(self.hnsw_file, self.hnsw_meta_file)
+
     def build_hnsw(self, M: int = 16, ef_construction: int = 200) -> bool:
-        try:
-            import hnswlib  # type: ignore
-        except Exception:
+        hnswlib = ann.ann_library("hnsw")
+        if hnswlib is None:
             return False
         if self.state.embeddings is None:
             self.load()
@@ -552,117 +765,140 @@ class IndexStore:
         p.init_index(max_elements=E.shape[0], ef_construction=ef_construction, M=M)
         p.add_items(E)
         p.set_ef(50)
-        p.save_index(str(self.hnsw_file))
-        self.hnsw_meta_file.write_text(json.dumps({"dim": dim, "size": len(E), "M": M, "ef_construction": ef_construction}))
+        p.save_index(str(ann_maint.staging_file(self.hnsw_file)))
+        ann_maint.install(self.hnsw_file, self.hnsw_meta_file, {"dim": dim, "size": len(E), "M": M, "ef_construction": ef_construction, **self._build_meta()})
         return True
 
-    def search_hnsw(self, embedder, query: str, top_k: int = 12, subset: Optional[List[int]] = None) -> List[SearchResult]:
+    def search_hnsw(self, embedder, query: str, top_k: int = 12, subset: Optional[List[int]] = None, oversample: float = 1.0, ef: Optional[int] = None) -> List[SearchResult]:
         # Subset not supported efficiently; fall back to exact if subset provided
         if subset:
             return self.search(embedder, query, top_k=top_k, subset=subset)
-        try:
-            import hnswlib  # type: ignore
-        except Exception:
-            return self.search(embedder, query, top_k=top_k)
-        status = self.hnsw_status()
-        if not status.get('exists'):
-            return self.search(embedder, query, top_k=top_k)
+        return self.ann_search("hnsw", embedder, query, top_k=top_k, oversample=oversample, ef=ef)[0]
+
+    def _ann_files(self, kind: str) -> Optional[Tuple[Path, Path]]:
+        return {
+            "hnsw": (self.hnsw_file, self.hnsw_meta_file),
+            "faiss": (self.faiss_file, self.faiss_meta_file),
+            "annoy": (self.ann_file, self.ann_meta_file),
+        }.get(kind)
+
+    def _rerank_rows(self, q: np.ndarray, rows: List[int], top_k: int) -> List[SearchResult]:
+        """Exact scores for the candidate rows only; the rest of the matrix is not touched."""
+        n = len(self.state.paths)
+        rows_arr = np.unique(np.asarray([i for i in rows if 0 <= i < n], dtype=np.int64))
+        if rows_arr.size == 0:
+            return []
+        sims = (np.asarray(self.state.embeddings[rows_arr]) @ q).astype(float)
+        order = self._top_indices(sims, top_k)
+        return [SearchResult(path=Path(self.state.paths[rows_arr[i]]), score=float(sims[i])) for i in order]
+
+    def ann_search(
+        self,
+        kind: str,
+        embedder,
+        query: str,
+        top_k: int = 12,
+        subset: Optional[List[int]] = None,
+        oversample: float = 1.0,
+        ef: Optional[int] = None,
+        nprobe: Optional[int] = None,
+        measure_recall: bool = False,
+    ) -> Tuple[List[SearchResult], dict]:
+        """ANN candidates reranked exactly, plus latency/recall metadata.
+
+        ``top_k * oversample`` candidates are fetched from the ANN index and
+        only those rows are scored, so the query stays sublinear. With
+        ``measure_recall`` the exact top-k is also computed (O(N)) and the
+        overlap reported as ``recall``.
+        """
+        files = self._ann_files(kind)
+        handle = ann.open_handle(kind, *files) if files else None
+        if handle is None or not self._ann_current(handle.meta):
+            # Never serve an index that lags the store (a rebuild is on its way)
+            info = {"backend": "exact", "fallback": True, "stale": handle is not None}
+            return self.search(embedder, query, top_k=top_k, subset=subset), info
         q = embedder.embed_text(query).astype('float32')
-        p = hnswlib.Index(space='cosine', dim=status.get('dim', q.shape[0]))
-        p.load_index(str(self.hnsw_file))
-        p.set_ef(max(50, top_k))
-        labels, distances = p.knn_query(q, k=min(top_k, status.get('size', top_k)))
-        labs = labels[0].tolist()
-        # Convert cosine distance to similarity
-        sims = [1.0 - float(d) for d in distances[0].tolist()]
-        # Re-rank with exact dot-product for stability
-        if self.state.embeddings is not None:
-            exact = (self.state.embeddings @ q).astype(float)
-            labs = sorted(labs, key=lambda i: -exact[i])[:top_k]
-            return [SearchResult(path=Path(self.state.paths[i]), score=float(exact[i])) for i in labs]
-        return [SearchResult(path=Path(self.state.paths[i]), score=sims[k]) for k, i in enumerate(labs)]
+        want = max(int(top_k), int(math.ceil(top_k * max(1.0, float(oversample)))))
+        deleted = int(handle.meta.get("deleted") or 0)
+        t0 = time.perf_counter()
+        # Deleted labels can still occupy result slots; ask for a few more
+        candidates, approx = handle.query(q, want + min(deleted, want), ef=ef, nprobe=nprobe)
+        t1 = time.perf_counter()
+        delta: List[int] = []
+        labels = ann_maint.label_rows(files[0])
+        if labels is not None:
+            pairs = [(int(labels[i]), s) for i, s in zip(candidates, approx) if 0 <= i < len(labels) and labels[i] >= 0]
+            candidates, approx = [i for i, _ in pairs], [s for _, s in pairs]
+            # Rows added since the build that the backend could not take in
+            tail = np.asarray(labels[int(handle.meta.get("indexed", len(labels))):])
+            delta = tail[tail >= 0].tolist()
+        if subset:
+            allowed = set(subset)
+            keep = [j for j, i in enumerate(candidates) if i in allowed]
+            candidates, approx = [candidates[j] for j in keep], [approx[j] for j in keep]
+        if self.state.embeddings is not None and len(self.state.embeddings) == len(self.state.paths):
+            if subset and delta:
+                delta = [i for i in delta if i in allowed]
+            results = self._rerank_rows(q, candidates + delta, top_k)
+        else:
+            results = [SearchResult(path=Path(self.state.paths[i]), score=float(s)) for i, s in zip(candidates, approx)][:top_k]
+        t2 = time.perf_counter()
+        info = {
+            "backend": kind,
+            "candidates": len(candidates),
+            "delta": len(delta),
+            "oversample": float(oversample),
+            "ef": ef,
+            "nprobe": nprobe,
+            "ann_ms": round((t1 - t0) * 1000.0, 3),
+            "rerank_ms": round((t2 - t1) * 1000.0, 3),
+        }
+        if measure_recall and self.state.embeddings is not None:
+            exact = self.search(embedder, query, top_k=top_k, subset=subset)
+            truth = {str(r.path) for r in exact}
+            info["recall"] = round(len(truth & {str(r.path) for r in results}) / float(len(truth)), 4) if truth else 1.0
+        return results, info
 
     # FAISS (optional) support
     def faiss_status(self) -> dict:
         # Check both file existence AND library availability
-        has_library = False
-        try:
-            import faiss  # type: ignore
-            has_library = True
-        except Exception:
-            has_library = False
+        if ann.ann_library("faiss") is None:
+            return {"exists": False}
+        return self._ann_status(self.faiss_file, self.faiss_meta_file)
 
-        status = {"exists": self.faiss_file.exists() and self.faiss_meta_file.exists() and has_library}
-        if status["exists"]:
-            try:
-                meta = json.loads(self.faiss_meta_file.read_text())
-                status.update(meta)
-            except Exception:
-                status["exists"] = False
-        return status
+    def build_faiss(self, factory: str = "auto", target_recall: float = 0.95) -> bool:
+        """Build a FAISS index sized to the library (see ``infra.faiss_factory``).
 
-    def build_faiss(self) -> bool:
-        try:
-            import faiss  # type: ignore
-        except Exception:
+        ``factory`` is a FAISS ``index_factory`` string ("IVF1024,Flat",
+        "OPQ64,IVF4096,PQ64", "HNSW32", "Flat") or "auto". The recall-vs-latency
+        report lands in ``faiss.meta.json`` and so in ``faiss_status()``.
+        """
+        if ann.ann_library("faiss") is None:
             return False
         if self.state.embeddings is None:
             self.load()
         if self.state.embeddings is None or len(self.state.embeddings) == 0:
             return False
-        dim = int(self.state.embeddings.shape[1])
-        # Use inner product (cosine, since embeddings are normalized)
-        index = faiss.IndexFlatIP(dim)
-        index.add(self.state.embeddings.astype('float32'))
-        faiss.write_index(index, str(self.faiss_file))
-        self.faiss_meta_file.write_text(json.dumps({"dim": dim, "size": len(self.state.embeddings)}))
-        return True
+        # The old index keeps serving while this trains; the swap resets its labels
+        meta = faiss_factory.build_index_files(
+            self.state.embeddings, self.faiss_file, self.faiss_meta_file,
+            factory=factory, target_recall=target_recall,
+            extra_meta={"requested_factory": factory or "auto", "target_recall": float(target_recall), **self._build_meta()},
+        )
+        return meta is not None
 
-    def search_faiss(self, embedder, query: str, top_k: int = 12, subset: Optional[List[int]] = None) -> List[SearchResult]:
-        try:
-            import faiss  # type: ignore
-        except Exception:
-            return self.search(embedder, query, top_k=top_k, subset=subset)
-        status = self.faiss_status()
-        if not status.get("exists"):
-            return self.search(embedder, query, top_k=top_k, subset=subset)
-        q = embedder.embed_text(query).astype('float32')
-        dim = status.get("dim") or (self.state.embeddings.shape[1] if self.state.embeddings is not None else None)
-        if dim is None:
-            return []
-        index = faiss.read_index(str(self.faiss_file))
-        _, I = index.search(q.reshape(1, -1), min(max(1, top_k), status.get("size", top_k)))
-        candidates = I[0].tolist()
-        # Apply subset filter if provided
-        if subset:
-            cand_set = set(subset)
-            candidates = [i for i in candidates if i in cand_set]
-        if not candidates:
-            return []
-        # Re-rank with exact scores to be safe
-        if self.state.embeddings is not None:
-            sims = (self.state.embeddings @ q).astype(float)
-            cand_scores = [(i, float(sims[i])) for i in candidates]
-            cand_scores.sort(key=lambda x: -x[1])
-            candidates = [i for i, _ in cand_scores[:top_k]]
-        return [SearchResult(path=Path(self.state.paths[i]), score=float((self.state.embeddings @ q)[i])) for i in candidates]
+    def search_faiss(self, embedder, query: str, top_k: int = 12, subset: Optional[List[int]] = None, oversample: float = 1.0, nprobe: Optional[int] = None) -> List[SearchResult]:
+        return self.ann_search("faiss", embedder, query, top_k=top_k, subset=subset, oversample=oversample, nprobe=nprobe)[0]
 
     # Annoy (optional) support
     def annoy_status(self) -> dict:
-        status = {"exists": self.ann_file.exists() and self.ann_meta_file.exists()}
-        if status["exists"]:
-            try:
-                meta = json.loads(self.ann_meta_file.read_text())
-                status.update(meta)
-            except Exception:
-                status["exists"] = False
-        return status
+        return self._ann_status(self.ann_file, self.ann_meta_file)
 
     def build_annoy(self, trees: int = 50) -> bool:
-        try:
-            from annoy import AnnoyIndex  # type: ignore
-        except Exception:
+        annoy = ann.ann_library("annoy")
+        if annoy is None:
             return False
+        AnnoyIndex = annoy.AnnoyIndex
         if self.state.embeddings is None:
             self.load()
         if self.state.embeddings is None or len(self.state.embeddings) == 0:
@@ -673,34 +909,13 @@ class IndexStore:
         for i in range(E.shape[0]):
             index.add_item(i, E[i].tolist())
         index.build(max(1, int(trees)))
-        index.save(str(self.ann_file))
-        self.ann_meta_file.write_text(json.dumps({"dim": dim, "size": int(E.shape[0]), "trees": int(trees)}))
+        # Cached handles mmap the old file: save a new one and swap it in
+        index.save(str(ann_maint.staging_file(self.ann_file)))
+        ann_maint.install(self.ann_file, self.ann_meta_file, {"dim": dim, "size": int(E.shape[0]), "trees": int(trees), **self._build_meta()})
         return True
 
-    def search_annoy(self, embedder, query: str, top_k: int = 12, subset: Optional[List[int]] = None) -> List[SearchResult]:
+    def search_annoy(self, embedder, query: str, top_k: int = 12, subset: Optional[List[int]] = None, oversample: float = 1.0, search_k: Optional[int] = None) -> List[SearchResult]:
         # Subset not supported efficiently; fall back to exact for subset
         if subset:
             return self.search(embedder, query, top_k=top_k, subset=subset)
-        try:
-            from annoy import AnnoyIndex  # type: ignore
-        except Exception:
-            return self.search(embedder, query, top_k=top_k)
-        status = self.annoy_status()
-        if not status.get('exists'):
-            return self.search(embedder, query, top_k=top_k)
-        dim = int(status.get('dim') or 0)
-        if dim <= 0:
-            return self.search(embedder, query, top_k=top_k)
-        q = embedder.embed_text(query).astype('float32')
-        idx = AnnoyIndex(dim, metric='angular')
-        idx.load(str(self.ann_file))
-        k = min(max(1, top_k), int(status.get('size', top_k)))
-        # get_nns_by_vector returns labels (indices)
-        labs = idx.get_nns_by_vector(q.tolist(), k, include_distances=False)
-        # Re-rank using exact similarities if embeddings available
-        if self.state.embeddings is not None:
-            sims = (self.state.embeddings @ q).astype(float)
-            labs = sorted(labs, key=lambda i: -sims[i])[:k]
-            return [SearchResult(path=Path(self.state.paths[i]), score=float(sims[i])) for i in labs]
-        # Fallback without exact rerank
-        return [SearchResult(path=Path(self.state.paths[i]), score=1.0) for i in labs]
+        return self.ann_search("annoy", embedder, query, top_k=top_k, oversample=oversample, ef=search_k)[0]
@@ -0,0 +1,366 @@
+"""Transactional tag and collection store (SQLite, WAL) with per-label posting lists.
+
+Intent:
+  Tags and collections used to live in ``tags.json``/``collections.json``:
+  every click re-read and re-wrote the whole pretty-printed file, and two
+  concurrent batch edits could each read the old map and the last writer won.
+  This module keeps one ``labels.db`` per index directory:
+
+  - ``labels``: one row per (kind, label, path) membership. Its unique index
+    is the posting list for a tag or collection, and a second index on
+    (kind, path) answers "tags of this photo". Row ids keep collection
+    insertion order (Favorites are listed in the order they were starred).
+  - ``names``: the labels that exist per kind, so ``all_tags`` is an index
+    scan rather than a pass over every photo, and empty collections persist.
+  - ``sources``: one row per kind once its legacy JSON file has been
+    migrated (its (mtime_ns, size) stamp, or "absent"). Existing libraries
+    migrate on first use and never again: the JSON files are not kept in
+    sync, so re-importing a copied or restored file would throw away every
+    edit made since.
+
+  Every mutation is one ``BEGIN IMMEDIATE`` transaction, so read-modify-write
+  batches from several requests or processes serialise instead of losing
+  updates, and only the changed memberships are written.
+
+Contract:
+  - LabelStore(index_dir) opens/creates ``index_dir/labels.db``
+  - add(kind, labels, paths) / remove(kind, labels, paths) -> paths changed
+  - set_labels(kind, paths, labels) -> give each path exactly ``labels`` (tags)
+  - set_members(kind, label, paths) -> replace one label's photos (collections)
+  - create(kind, label) / delete_label(kind, label) -> bool
+  - replace_all(kind, pairs) -> make the kind equal to ``pairs`` (diffed)
+  - by_path(kind, paths=None) -> {path: sorted labels}
+  - by_label(kind) -> {label: [paths in insertion order]} (empty labels included)
+  - names(kind) -> sorted labels; counts(kind) -> {label: photos}
+  - paths_for(kind, label) -> [paths]; paths_with_all(kind, labels) -> {paths}
+  - label_store_for(index_dir) -> shared LabelStore, legacy JSON migrated
+  - existing_label_store(index_dir) -> the same, or None when nothing was ever stored
+"""
+from __future__ import annotations
+
+import json
+import logging
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+DB_NAME = "labels.db"
+TAG = "tag"
+COLLECTION = "collection"
+# Legacy JSON files and their shape: tags map path -> labels, collections label -> paths
+LEGACY_FILES = {TAG: "tags.json", COLLECTION: "collections.json"}
+_CHUNK = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS labels (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    label TEXT NOT NULL,
+    path TEXT NOT NULL,
+    UNIQUE(kind, label, path)
+);
+CREATE INDEX IF NOT EXISTS labels_by_path ON labels(kind, path);
+CREATE TABLE IF NOT EXISTS names (
+    kind TEXT NOT NULL,
+    label TEXT NOT NULL,
+    PRIMARY KEY(kind, label)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS sources (
+    kind TEXT PRIMARY KEY,
+    stamp TEXT NOT NULL
+);
+"""
+
+Pair = Tuple[str, str]  # (label, path)
+
+
+def _stamp(path: Path) -> Optional[str]:
+    try:
+        st = Path(path).stat()
+    except OSError:
+        return None
+    return f"{st.st_mtime_ns}:{st.st_size}"
+
+
+def _chunks(items: Sequence, size: int = _CHUNK) -> Iterator[Sequence]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _clean(values: Iterable[str]) -> List[str]:
+    return list(dict.fromkeys(str(v) for v in values if v is not None and str(v) != ""))
+
+
+def pairs_from_json(kind: str, data) -> List[Pair]:
+    """(label, path) pairs from a legacy ``tags.json``/``collections.json`` dict."""
+    pairs: List[Pair] = []
+    if not isinstance(data, dict):
+        return pairs
+    for key, values in data.items():
+        for v in _clean(values or ()):
+            pairs.append((v, str(key)) if kind == TAG else (str(key), v))
+    return pairs
+
+
+class LabelStore:
+    """Tag and collection memberships stored next to the other index artifacts."""
+
+    def __init__(self, index_dir: Path) -> None:
+        self.index_dir = Path(index_dir)
+        self.db_path = self.index_dir / DB_NAME
+        self._lock = threading.Lock()
+        self._migrated: Set[str] = set()
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(str(self.db_path), timeout=30, isolation_level=None)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _write(self) -> Iterator[sqlite3.Connection]:
+        """One write transaction; IMMEDIATE takes the write lock before reading."""
+        with self._lock, self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    # Writes
+    @staticmethod
+    def _insert(conn: sqlite3.Connection, kind: str, pairs: Sequence[Pair]) -> List[Pair]:
+        """Insert memberships; returns the ones that were new."""
+        sql = "INSERT OR IGNORE INTO labels(kind, label, path) VALUES (?, ?, ?)"
+        added = [(l, p) for l, p in pairs if conn.execute(sql, (kind, l, p)).rowcount]
+        conn.executemany("INSERT OR IGNORE INTO names(kind, label) VALUES (?, ?)", [(kind, l) for l in {l for l, _ in pairs}])
+        return added
+
+    @staticmethod
+    def _delete(conn: sqlite3.Connection, kind: str, pairs: Sequence[Pair]) -> List[Pair]:
+        """Delete memberships; returns the ones that existed."""
+        sql = "DELETE FROM labels WHERE kind = ? AND label = ? AND path = ?"
+        return [(l, p) for l, p in pairs if conn.execute(sql, (kind, l, p)).rowcount]
+
+    @staticmethod
+    def _drop_unused_tags(conn: sqlite3.Connection, kind: str, labels: Iterable[str]) -> None:
+        # Collections may exist while empty; a tag exists only while it is used
+        if kind != TAG:
+            return
+        conn.executemany(
+            "DELETE FROM names WHERE kind = ? AND label = ? "
+            "AND NOT EXISTS (SELECT 1 FROM labels WHERE kind = ? AND label = ?)",
+            [(kind, l, kind, l) for l in set(labels)],
+        )
+
+    def add(self, kind: str, labels: Iterable[str], paths: Iterable[str]) -> int:
+        """Give every path every label; returns the number of paths that changed."""
+        paths = _clean(paths)
+        pairs = [(l, p) for l in _clean(labels) for p in paths]
+        if not pairs:
+            return 0
+        with self._write() as conn:
+            return len({p for _, p in self._insert(conn, kind, pairs)})
+
+    def remove(self, kind: str, labels: Iterable[str], paths: Iterable[str]) -> int:
+        """Take every label off every path; returns the number of paths that changed."""
+        labels, paths = _clean(labels), _clean(paths)
+        pairs = [(l, p) for l in labels for p in paths]
+        if not pairs:
+            return 0
+        with self._write() as conn:
+            removed = self._delete(conn, kind, pairs)
+            self._drop_unused_tags(conn, kind, labels)
+            return len({p for _, p in removed})
+
+    def set_labels(self, kind: str, paths: Iterable[str], labels: Iterable[str]) -> int:
+        """Give each path exactly ``labels``; returns the number of paths that changed."""
+        paths, want = _clean(paths), set(_clean(labels))
+        changed: Set[str] = set()
+        dropped: Set[str] = set()
+        with self._write() as conn:
+            for chunk in _chunks(paths):
+                marks = ",".join("?" * len(chunk))
+                have: Dict[str, Set[str]] = {p: set() for p in chunk}
+                for path, label in conn.execute(
+                    f"SELECT path, label FROM labels WHERE kind = ? AND path IN ({marks})", [kind, *chunk]
+                ):
+                    have[path].add(label)
+                gone = [(l, p) for p in chunk for l in sorted(have[p] - want)]
+                new = [(l, p) for p in chunk for l in sorted(want - have[p])]
+                self._delete(conn, kind, gone)
+                self._insert(conn, kind, new)
+                changed.update(p for _, p in gone + new)
+                dropped.update(l for l, _ in gone)
+            self._drop_unused_tags(conn, kind, dropped)
+        return len(changed)
+
+    def set_members(self, kind: str, label: str, paths: Iterable[str]) -> List[str]:
+        """Replace the paths of one label (keeping the order of those already in it)."""
+        want = _clean(paths)
+        with self._write() as conn:
+            have = [r[0] for r in conn.execute("SELECT path FROM labels WHERE kind = ? AND label = ? ORDER BY id", (kind, label))]
+            keep = set(want)
+            self._delete(conn, kind, [(label, p) for p in have if p not in keep])
+            existing = set(have)
+            self._insert(conn, kind, [(label, p) for p in want if p not in existing])
+            conn.execute("INSERT OR IGNORE INTO names(kind, label) VALUES (?, ?)", (kind, label))
+            self._drop_unused_tags(conn, kind, [label])
+        return [p for p in have if p in keep] + [p for p in want if p not in existing]
+
+    def create(self, kind: str, label: str) -> None:
+        with self._write() as conn:
+            conn.execute("INSERT OR IGNORE INTO names(kind, label) VALUES (?, ?)", (kind, label))
+
+    def delete_label(self, kind: str, label: str) -> bool:
+        with self._write() as conn:
+            conn.execute("DELETE FROM labels WHERE kind = ? AND label = ?", (kind, label))
+            return conn.execute("DELETE FROM names WHERE kind = ? AND label = ?", (kind, label)).rowcount > 0
+
+    def replace_all(self, kind: str, pairs: Iterable[Pair], names: Iterable[str] = ()) -> int:
+        """Make ``kind`` hold exactly ``pairs`` (plus empty ``names``), writing only the difference."""
+        want = list(dict.fromkeys(pairs))
+        want_set = set(want)
+        want_names = {l for l, _ in want} | set(_clean(names))
+        with self._write() as conn:
+            return self._replace(conn, kind, want, want_set, want_names)
+
+    def _replace(self, conn, kind: str, want: List[Pair], want_set: Set[Pair], want_names: Set[str]) -> int:
+        have = {(l, p) for l, p in conn.execute("SELECT label, path FROM labels WHERE kind = ?", (kind,))}
+        changed = len(self._delete(conn, kind, [pr for pr in have if pr not in want_set]))
+        changed += len(self._insert(conn, kind, [pr for pr in want if pr not in have]))
+        have_names = {r[0] for r in conn.execute("SELECT label FROM names WHERE kind = ?", (kind,))}
+        conn.executemany("DELETE FROM names WHERE kind = ? AND label = ?", [(kind, l) for l in have_names - want_names])
+        conn.executemany("INSERT OR IGNORE INTO names(kind, label) VALUES (?, ?)", [(kind, l) for l in want_names - have_names])
+        return changed
+
+    def sync_legacy(self, kind: str) -> bool:
+        """Import ``tags.json``/``collections.json`` the first time ``kind`` is used."""
+        if kind in self._migrated:
+            return False
+        with self._connect() as conn:
+            done = conn.execute("SELECT 1 FROM sources WHERE kind = ?", (kind,)).fetchone() is not None
+        if done:
+            self._migrated.add(kind)
+            return False
+        json_file = self.index_dir / LEGACY_FILES[kind]
+        stamp = _stamp(json_file)
+        data = None
+        if stamp is not None:
+            try:
+                data = json.loads(json_file.read_text(encoding="utf-8"))
+            except Exception as e:
+                logger.warning("Could not import %s labels from %s: %s", kind, json_file, e)
+        with self._write() as conn:
+            # Another process may have migrated while the file was read
+            if conn.execute("SELECT 1 FROM sources WHERE kind = ?", (kind,)).fetchone() is not None:
+                data = None
+            else:
+                if data is not None:
+                    pairs = pairs_from_json(kind, data)
+                    names = data.keys() if kind == COLLECTION and isinstance(data, dict) else ()
+                    self._replace(conn, kind, pairs, set(pairs), {l for l, _ in pairs} | set(_clean(names)))
+                conn.execute("INSERT INTO sources(kind, stamp) VALUES (?, ?)", (kind, stamp or "absent"))
+        self._migrated.add(kind)
+        return data is not None
+
+    # Reads
+    def by_path(self, kind: str, paths: Optional[Iterable[str]] = None) -> Dict[str, List[str]]:
+        out: Dict[str, List[str]] = {}
+        with self._connect() as conn:
+            if paths is None:
+                rows = conn.execute("SELECT path, label FROM labels WHERE kind = ? ORDER BY path, label", (kind,)).fetchall()
+            else:
+                rows = []
+                want = list(dict.fromkeys(paths))
+                for chunk in _chunks(want):
+                    marks = ",".join("?" * len(chunk))
+                    rows.extend(conn.execute(
+                        f"SELECT path, label FROM labels WHERE kind = ? AND path IN ({marks}) ORDER BY path, label",
+                        [kind, *chunk],
+                    ))
+        for path, label in rows:
+            out.setdefault(path, []).append(label)
+        return out
+
+    def by_label(self, kind: str) -> Dict[str, List[str]]:
+        with self._connect() as conn:
+            out: Dict[str, List[str]] = {r[0]: [] for r in conn.execute("SELECT label FROM names WHERE kind = ? ORDER BY label", (kind,))}
+            for label, path in conn.execute("SELECT label, path FROM labels WHERE kind = ? ORDER BY id", (kind,)):
+                out.setdefault(label, []).append(path)
+        return out
+
+    def names(self, kind: str) -> List[str]:
+        with self._connect() as conn:
+            return [r[0] for r in conn.execute("SELECT label FROM names WHERE kind = ? ORDER BY label", (kind,))]
+
+    def counts(self, kind: str) -> Dict[str, int]:
+        with self._connect() as conn:
+            return {
+                label: int(n)
+                for label, n in conn.execute("SELECT label, COUNT(*) FROM labels WHERE kind = ? GROUP BY label", (kind,))
+            }
+
+    def paths_for(self, kind: str, label: str) -> List[str]:
+        """Posting list of one label, in insertion order."""
+        with self._connect() as conn:
+            return [r[0] for r in conn.execute("SELECT path FROM labels WHERE kind = ? AND label = ? ORDER BY id", (kind, label))]
+
+    def paths_with_all(self, kind: str, labels: Iterable[str]) -> Set[str]:
+        """Paths carrying every one of ``labels`` (intersection of posting lists)."""
+        labels = _clean(labels)
+        if not labels:
+            return set()
+        marks = ",".join("?" * len(labels))
+        with self._connect() as conn:
+            return {
+                r[0]
+                for r in conn.execute(
+                    f"SELECT path FROM labels WHERE kind = ? AND label IN ({marks}) "
+                    "GROUP BY path HAVING COUNT(*) = ?",
+                    [kind, *labels, len(labels)],
+                )
+            }
+
+
+_instances: Dict[str, LabelStore] = {}
+_instances_lock = threading.Lock()
+
+
+def label_store_for(index_dir: Path) -> LabelStore:
+    """Shared LabelStore for ``index_dir``, with any legacy JSON file migrated."""
+    key = str(Path(index_dir))
+    with _instances_lock:
+        store = _instances.get(key)
+        if store is None:
+            store = _instances[key] = LabelStore(Path(index_dir))
+    for kind in LEGACY_FILES:
+        try:
+            store.sync_legacy(kind)
+        except Exception as e:
+            logger.warning("Label import for %s failed: %s", kind, e)
+    return store
+
+
+def existing_label_store(index_dir: Path) -> Optional[LabelStore]:
+    """``label_store_for`` for readers: None (and nothing created) when the
+    directory has neither ``labels.db`` nor a legacy JSON file."""
+    index_dir = Path(index_dir)
+    if str(index_dir) not in _instances and not (index_dir / DB_NAME).exists() and not any(
+        (index_dir / name).exists() for name in LEGACY_FILES.values()
+    ):
+        return None
+    return label_store_for(index_dir)
@@ -0,0 +1,316 @@
+"""Columnar, memory-mapped store for per-photo EXIF metadata.
+
+Intent:
+  ``exif_index.json`` is a dict of parallel lists. Every filtered search, trip
+  build and enhanced-search service used to re-parse it and rebuild per-field
+  dicts. This module keeps the same data as one typed NumPy array per field,
+  loaded once per process and memory-mapped, so range filters are a vectorised
+  comparison instead of a JSON parse.
+
+On-disk layout (inside an IndexStore ``index_dir``)::
+
+    exif_columns/manifest.json           generation, source stamp, field names
+    exif_columns/g000003/paths.json      row order
+    exif_columns/g000003/iso.npy         float64, NaN where missing
+    exif_columns/g000003/camera.codes.npy  int32 codes into camera.dict.json
+    exif_columns/g000003/camera.dict.json  distinct strings, code 0 is ''
+
+Each write goes into a fresh generation directory and the manifest is swapped
+last, so readers holding an older mapping keep a consistent view.
+
+Contract:
+  - write_columns(index_dir, data) persists a parallel-list dict (the
+    ``_build_exif_index`` output) as columns.
+  - load_columns(index_dir) -> Optional[ExifColumns]; cached per process and
+    rebuilt from ``exif_index.json`` when that file is newer than the columns.
+  - columns_for_store(store) -> Optional[ExifColumns] row-aligned with
+    ``store.state.paths``.
+"""
+from __future__ import annotations
+
+import json
+import os
+import shutil
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+COLUMNS_DIR = "exif_columns"
+MANIFEST_NAME = "manifest.json"
+SOURCE_NAME = "exif_index.json"
+FORMAT_VERSION = 1
+
+
+def _is_number(v: Any) -> bool:
+    return isinstance(v, (int, float)) and not isinstance(v, bool)
+
+
+def in_range(values: np.ndarray, lo: Optional[float] = None, hi: Optional[float] = None) -> np.ndarray:
+    """Vectorised ``lo <= values <= hi``; NaN never matches."""
+    mask = np.isfinite(values)
+    with np.errstate(invalid="ignore"):
+        if lo is not None:
+            mask &= values >= float(lo)
+        if hi is not None:
+            mask &= values <= float(hi)
+    return mask
+
+
+class ExifColumns:
+    """Row-aligned metadata columns.
+
+    Numeric fields are float64 arrays with NaN for missing values. String
+    fields are dictionary encoded: ``codes[i]`` indexes ``dictionary`` and
+    code 0 is always the empty string.
+    """
+
+    def __init__(
+        self,
+        paths: List[str],
+        numeric: Dict[str, np.ndarray],
+        strings: Dict[str, Tuple[np.ndarray, List[str]]],
+    ) -> None:
+        self.paths = paths
+        self._numeric = numeric
+        self._strings = strings
+        self._aligned: Optional[Tuple[Sequence[str], int, "ExifColumns"]] = None
+        self._row_of: Optional[Dict[str, int]] = None
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ExifColumns":
+        """In-memory columns from a parallel-list dict (``exif_index.json`` shape)."""
+        return cls(*_encode(data))
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    @property
+    def fields(self) -> List[str]:
+        return sorted(list(self._numeric) + list(self._strings))
+
+    def _rows(self) -> Dict[str, int]:
+        if self._row_of is None:
+            self._row_of = {p: i for i, p in enumerate(self.paths)}
+        return self._row_of
+
+    def row_of(self, path: str) -> Optional[int]:
+        return self._rows().get(path)
+
+    def numeric(self, name: str) -> np.ndarray:
+        col = self._numeric.get(name)
+        if col is None:
+            return np.full(len(self.paths), np.nan)
+        return col
+
+    def codes(self, name: str) -> Tuple[np.ndarray, List[str]]:
+        entry = self._strings.get(name)
+        if entry is None:
+            return np.zeros(len(self.paths), dtype=np.int32), [""]
+        return entry
+
+    def distinct(self, name: str) -> List[str]:
+        """Sorted non-empty values of a string field."""
+        return sorted(v for v in self.codes(name)[1] if v)
+
+    def text(self, name: str) -> np.ndarray:
+        """Decode a string field into an object array."""
+        codes, dictionary = self.codes(name)
+        return np.asarray(dictionary, dtype=object)[codes]
+
+    def value(self, name: str, row: int) -> Any:
+        """Single cell as a JSON-friendly value ('' or None when missing)."""
+        if name in self._strings:
+            codes, dictionary = self._strings[name]
+            return dictionary[int(codes[row])]
+        v = float(self.numeric(name)[row])
+        if not np.isfinite(v):
+            return None
+        return int(v) if v.is_integer() else v
+
+    def range(self, name: str, lo: Optional[float] = None, hi: Optional[float] = None) -> np.ndarray:
+        return in_range(self.numeric(name), lo, hi)
+
+    def contains(self, name: str, needle: str) -> np.ndarray:
+        """Case-insensitive substring match, evaluated once per distinct value."""
+        codes, dictionary = self.codes(name)
+        needle = needle.lower()
+        hit = np.fromiter((bool(v) and needle in v.lower() for v in dictionary), dtype=bool, count=len(dictionary))
+        return hit[codes]
+
+    def aligned(self, paths: Sequence[str]) -> "ExifColumns":
+        """View of these columns re-indexed to ``paths`` (missing rows empty)."""
+        if len(paths) == len(self.paths) and list(paths) == self.paths:
+            return self
+        cached = self._aligned
+        if cached is not None and cached[0] is paths and cached[1] == len(paths):
+            return cached[2]
+        rows = self._rows()
+        src = np.fromiter((rows.get(p, -1) for p in paths), dtype=np.int64, count=len(paths))
+        have = src >= 0
+        numeric: Dict[str, np.ndarray] = {}
+        for name, col in self._numeric.items():
+            out = np.full(len(paths), np.nan)
+            out[have] = col[src[have]]
+            numeric[name] = out
+        strings: Dict[str, Tuple[np.ndarray, List[str]]] = {}
+        for name, (codes, dictionary) in self._strings.items():
+            out_codes = np.zeros(len(paths), dtype=np.int32)
+            out_codes[have] = codes[src[have]]
+            strings[name] = (out_codes, dictionary)
+        view = ExifColumns(list(paths), numeric, strings)
+        self._aligned = (paths, len(paths), view)
+        return view
+
+
+def _encode(data: Dict[str, Any]) -> Tuple[List[str], Dict[str, np.ndarray], Dict[str, Tuple[np.ndarray, List[str]]]]:
+    paths = [str(p) for p in data.get("paths", [])]
+    n = len(paths)
+    numeric: Dict[str, np.ndarray] = {}
+    strings: Dict[str, Tuple[np.ndarray, List[str]]] = {}
+    for key, vals in data.items():
+        if key == "paths" or not isinstance(vals, list):
+            continue
+        vals = vals[:n] + [None] * max(0, n - len(vals))
+        present = [v for v in vals if v is not None and v != ""]
+        if present and all(isinstance(v, str) for v in present):
+            dictionary = [""] + sorted(set(present))
+            code_of = {s: i for i, s in enumerate(dictionary)}
+            codes = np.fromiter((code_of.get(v, 0) if isinstance(v, str) else 0 for v in vals), dtype=np.int32, count=n)
+            strings[key] = (codes, dictionary)
+        else:
+            # Mixed or malformed values (e.g. ISO stored as a string) count as missing
+            numeric[key] = np.fromiter((float(v) if _is_number(v) else np.nan for v in vals), dtype=np.float64, count=n)
+    # Camera and place are always string fields, even when entirely empty
+    for key in ("camera", "place"):
+        if key in data and key not in strings:
+            numeric.pop(key, None)
+            strings[key] = (np.zeros(n, dtype=np.int32), [""])
+    return paths, numeric, strings
+
+
+def _source_stamp(index_dir: Path) -> Optional[List[int]]:
+    try:
+        st = (index_dir / SOURCE_NAME).stat()
+    except OSError:
+        return None
+    return [int(st.st_mtime_ns), int(st.st_size)]
+
+
+def _read_manifest(index_dir: Path) -> Optional[Dict[str, Any]]:
+    p = index_dir / COLUMNS_DIR / MANIFEST_NAME
+    try:
+        data = json.loads(p.read_text(encoding="utf-8"))
+    except Exception:
+        return None
+    if not isinstance(data, dict) or data.get("format") != FORMAT_VERSION:
+        return None
+    return data
+
+
+def write_columns(index_dir: Path, data: Dict[str, Any]) -> Path:
+    """Persist a parallel-list metadata dict as a new column generation."""
+    paths, numeric, strings = _encode(data)
+    root = index_dir / COLUMNS_DIR
+    root.mkdir(parents=True, exist_ok=True)
+    with _lock:
+        prev = _read_manifest(index_dir) or {}
+        gen = int(prev.get("generation", 0)) + 1
+        gen_dir = root / f"g{gen:06d}"
+        gen_dir.mkdir(parents=True, exist_ok=True)
+        (gen_dir / "paths.json").write_text(json.dumps(paths), encoding="utf-8")
+        for name, col in numeric.items():
+            np.save(gen_dir / f"{name}.npy", col)
+        for name, (codes, dictionary) in strings.items():
+            np.save(gen_dir / f"{name}.codes.npy", codes)
+            (gen_dir / f"{name}.dict.json").write_text(json.dumps(dictionary), encoding="utf-8")
+        manifest = {
+            "format": FORMAT_VERSION,
+            "generation": gen,
+            "dir": gen_dir.name,
+            "rows": len(paths),
+            "numeric": sorted(numeric),
+            "strings": sorted(strings),
+            "source": _source_stamp(index_dir),
+        }
+        tmp = root / (MANIFEST_NAME + ".tmp")
+        tmp.write_text(json.dumps(manifest), encoding="utf-8")
+        os.replace(tmp, root / MANIFEST_NAME)
+        for old in root.glob("g*"):
+            if old.is_dir() and old.name != gen_dir.name:
+                shutil.rmtree(old, ignore_errors=True)
+        _cache.pop(str(index_dir), None)
+    return gen_dir
+
+
+def _open(index_dir: Path, manifest: Dict[str, Any]) -> ExifColumns:
+    gen_dir = index_dir / COLUMNS_DIR / manifest["dir"]
+    paths = json.loads((gen_dir / "paths.json").read_text(encoding="utf-8"))
+    numeric = {name: np.load(gen_dir / f"{name}.npy", mmap_mode="r") for name in manifest.get("numeric", [])}
+    strings = {
+        name: (
+            np.load(gen_dir / f"{name}.codes.npy", mmap_mode="r"),
+            json.loads((gen_dir / f"{name}.dict.json").read_text(encoding="utf-8")),
+        )
+        for name in manifest.get("strings", [])
+    }
+    return ExifColumns(paths, numeric, strings)
+
+
+_lock = threading.RLock()
+_cache: Dict[str, Tuple[tuple, ExifColumns]] = {}
+
+
+def _stamp(index_dir: Path) -> tuple:
+    out = []
+    for p in (index_dir / SOURCE_NAME, index_dir / COLUMNS_DIR / MANIFEST_NAME):
+        try:
+            st = p.stat()
+            out.append((st.st_mtime_ns, st.st_size))
+        except OSError:
+            out.append(None)
+    return tuple(out)
+
+
+def load_columns(index_dir: Path) -> Optional[ExifColumns]:
+    """Load the metadata columns for ``index_dir``, converting legacy JSON once."""
+    key = str(index_dir)
+    stamp = _stamp(index_dir)
+    with _lock:
+        hit = _cache.get(key)
+        if hit is not None and hit[0] == stamp:
+            return hit[1]
+        manifest = _read_manifest(index_dir)
+        source = _source_stamp(index_dir)
+        if manifest is not None and (source is None or manifest.get("source") == source):
+            cols = _open(index_dir, manifest)
+        elif source is not None:
+            # exif_index.json was written by a builder that predates the
+            # columns (or is newer than them): convert it once.
+            data = json.loads((index_dir / SOURCE_NAME).read_text(encoding="utf-8"))
+            write_columns(index_dir, data)
+            cols = _open(index_dir, _read_manifest(index_dir) or {})
+            stamp = _stamp(index_dir)
+        else:
+            _cache.pop(key, None)
+            return None
+        _cache[key] = (stamp, cols)
+        return cols
+
+
+def columns_for_store(store) -> Optional[ExifColumns]:
+    """Metadata columns aligned with ``store.state.paths``."""
+    cols = load_columns(store.index_dir)
+    if cols is None:
+        return None
+    return cols.aligned(store.state.paths)
+
+
+__all__ = [
+    "ExifColumns",
+    "columns_for_store",
+    "in_range",
+    "load_columns",
+    "write_columns",
+]
@@ -0,0 +1,337 @@
+"""Batched, parallel and resumable OCR build for an index.
+
+Intent:
+  ``IndexStore.build_ocr`` used to run ``easyocr`` serially over every photo,
+  rewrite ``ocr_status.json`` after each one (cached photos included) and embed
+  the resulting strings one at a time. This module:
+
+  - decodes each photo at a reduced resolution first and skips the OCR pass
+    when no tile has the dense, high-contrast edges that text produces;
+  - fans the remaining photos out to a process pool (one ``easyocr.Reader``
+    per worker, created once in the worker initializer) in fixed-size chunks
+    with a bounded number of chunks in flight;
+  - throttles ``ocr_status.json`` writes to one per interval;
+  - checkpoints finished texts to ``ocr_checkpoint.json`` so an interrupted
+    build resumes where it stopped instead of starting over;
+  - embeds the distinct non-empty strings in batches via ``embed_texts``.
+
+Contract:
+  - looks_like_text(path) -> False only when the photo clearly has no text
+  - run_ocr(index_dir, paths, languages, previous) -> texts aligned with paths
+  - embed_ocr_texts(embedder, texts, dim) -> (len(texts), dim) float32
+"""
+from __future__ import annotations
+
+import json
+import logging
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from infra.config import config
+
+logger = logging.getLogger(__name__)
+
+STATUS_INTERVAL_S = 1.0
+CHECKPOINT_INTERVAL_S = 30.0
+# A reader per worker costs seconds to load; small batches stay in-process
+MIN_PARALLEL_FILES = 32
+EMBED_BATCH = 256
+
+# Pre-pass: photos are decoded with their shorter side near PREPASS_SIZE and
+# cut into PREPASS_TILE-pixel tiles. A tile is text-like when at least
+# PREPASS_MIN_DENSITY of its pixels have a horizontal gradient above
+# PREPASS_EDGE. The thresholds are deliberately loose: a false positive only
+# costs an OCR pass, a false negative loses text.
+PREPASS_SIZE = 256
+PREPASS_TILE = 16
+PREPASS_EDGE = 48
+PREPASS_MIN_DENSITY = 0.08
+
+
+def looks_like_text(path: str) -> bool:
+    """Cheap reduced-resolution check for text-like regions.
+
+    Returns True when in doubt (unreadable or tiny images included), so only
+    photos that are clearly text-free are skipped.
+    """
+    from adapters.fs_scanner import safe_open_image
+
+    img = safe_open_image(Path(path), target_size=PREPASS_SIZE)
+    if img is None:
+        return True
+    try:
+        w, h = img.size
+        scale = PREPASS_SIZE / float(max(1, min(w, h)))
+        if scale < 1.0:
+            img = img.resize((max(1, int(w * scale)), max(1, int(h * scale))))
+        gray = np.asarray(img.convert("L"), dtype=np.int16)
+    finally:
+        img.close()
+    t = PREPASS_TILE
+    rows, cols = gray.shape[0] // t, (gray.shape[1] - 1) // t
+    if rows == 0 or cols == 0:
+        return True
+    edges = np.abs(np.diff(gray, axis=1)) > PREPASS_EDGE
+    tiles = edges[: rows * t, : cols * t].reshape(rows, t, cols, t)
+    density = tiles.mean(axis=(1, 3))
+    return bool((density >= PREPASS_MIN_DENSITY).any())
+
+
+# Per-process reader, created once by _init_worker (or lazily when serial)
+_reader: Any = None
+_reader_langs: Optional[tuple] = None
+
+
+def _init_worker(languages: Sequence[str]) -> None:
+    global _reader, _reader_langs
+    import easyocr  # type: ignore
+
+    _reader = easyocr.Reader(list(languages), gpu=False)
+    _reader_langs = tuple(languages)
+
+
+def _ocr_one(path: str, prepass: bool) -> Optional[str]:
+    """OCR text for ``path``; None means the pre-pass skipped it."""
+    if prepass and not looks_like_text(path):
+        return None
+    try:
+        res = _reader.readtext(path, detail=0)
+        return " ".join(res).strip()
+    except Exception:
+        return ""
+
+
+def _ocr_chunk(paths: Sequence[str], prepass: bool) -> List[Optional[str]]:
+    return [_ocr_one(p, prepass) for p in paths]
+
+
+def _default_workers() -> int:
+    configured = int(config.ocr_workers)
+    if configured > 0:
+        return configured
+    # Each worker holds its own detection + recognition models (~0.5 GB)
+    return max(1, min(4, (os.cpu_count() or 2) - 1))
+
+
+class _Status:
+    """Throttled writer for ``ocr_status.json``."""
+
+    def __init__(self, index_dir: Path, total: int, interval: float = STATUS_INTERVAL_S) -> None:
+        self.path = index_dir / "ocr_status.json"
+        self.total = int(total)
+        self.interval = interval
+        self.start = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+        self._last = 0.0
+
+    def write(self, state: str, done: int, updated: int, skipped: int, force: bool = False) -> None:
+        now = time.monotonic()
+        if not force and now - self._last < self.interval:
+            return
+        self._last = now
+        payload = {"state": state, "total": self.total, "done": int(done), "updated": int(updated), "skipped": int(skipped)}
+        if state == "running":
+            payload["start"] = self.start
+        else:
+            payload["end"] = time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime())
+        try:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.path.write_text(json.dumps(payload), encoding="utf-8")
+        except Exception:
+            pass
+
+
+class _Checkpoint:
+    """Texts finished by an interrupted build, keyed by path.
+
+    Written atomically every ``interval`` seconds and removed once the build
+    completes. A checkpoint made with different languages is ignored.
+    """
+
+    def __init__(self, index_dir: Path, languages: Sequence[str], interval: float = CHECKPOINT_INTERVAL_S) -> None:
+        self.path = index_dir / "ocr_checkpoint.json"
+        self.languages = list(languages)
+        self.interval = interval
+        self.texts: Dict[str, str] = {}
+        self._last = time.monotonic()
+        self._dirty = False
+
+    def load(self) -> Dict[str, str]:
+        try:
+            d = json.loads(self.path.read_text(encoding="utf-8"))
+        except Exception:
+            return {}
+        if d.get("languages") != self.languages:
+            return {}
+        texts = d.get("texts") or {}
+        self.texts = {str(p): str(t) for p, t in texts.items()}
+        return dict(self.texts)
+
+    def add(self, path: str, text: str) -> None:
+        self.texts[path] = text
+        self._dirty = True
+        if time.monotonic() - self._last >= self.interval:
+            self.flush()
+
+    def flush(self) -> None:
+        self._last = time.monotonic()
+        if not self._dirty:
+            return
+        tmp = self.path.with_suffix(".json.tmp")
+        try:
+            tmp.write_text(json.dumps({"languages": self.languages, "texts": self.texts}), encoding="utf-8")
+            os.replace(tmp, self.path)
+            self._dirty = False
+        except Exception as e:
+            logger.warning("Could not write OCR checkpoint: %s", e)
+
+    def clear(self) -> None:
+        try:
+            self.path.unlink(missing_ok=True)
+        except Exception:
+            pass
+
+
+def _ocr_parallel(
+    paths: Sequence[str],
+    languages: Sequence[str],
+    workers: int,
+    chunk_size: int,
+    prepass: bool,
+    on_chunk: Callable[[Sequence[str], List[Optional[str]]], None],
+    cancel: Optional[Callable[[], None]] = None,
+) -> None:
+    chunks = [list(paths[i:i + chunk_size]) for i in range(0, len(paths), chunk_size)]
+    max_in_flight = max(1, workers) * 2
+    # easyocr runs on torch, whose thread pools do not survive fork()
+    ctx = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=_init_worker, initargs=(list(languages),)) as pool:
+        pending = {}
+        next_chunk = 0
+        while next_chunk < len(chunks) or pending:
+            while next_chunk < len(chunks) and len(pending) < max_in_flight:
+                pending[pool.submit(_ocr_chunk, chunks[next_chunk], prepass)] = next_chunk
+                next_chunk += 1
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                ci = pending.pop(fut)
+                on_chunk(chunks[ci], fut.result())
+            if cancel is not None:
+                try:
+                    cancel()
+                except BaseException:
+                    # Chunks not started yet are dropped; running ones finish
+                    for fut in pending:
+                        fut.cancel()
+                    raise
+
+
+def run_ocr(
+    index_dir: Path,
+    paths: Sequence[str],
+    languages: Optional[Sequence[str]] = None,
+    previous: Optional[Dict[str, str]] = None,
+    workers: Optional[int] = None,
+    chunk_size: int = 8,
+    prepass: bool = True,
+    cancel: Optional[Callable[[], None]] = None,
+) -> Tuple[List[str], int]:
+    """OCR every path that has no text yet; returns ``(texts, updated)``.
+
+    Non-empty texts in ``previous`` and texts from an interrupted run's
+    checkpoint are reused. ``cancel`` is called between chunks and may raise
+    to stop; the checkpoint keeps what was done. Raises ImportError when
+    easyocr is unavailable.
+    """
+    import easyocr  # type: ignore  # noqa: F401  (fail fast, before any work)
+
+    languages = list(languages or ["en"])
+    paths = [str(p) for p in (paths or [])]
+    n = len(paths)
+    status = _Status(index_dir, n)
+    checkpoint = _Checkpoint(index_dir, languages)
+
+    known: Dict[str, str] = {p: t for p, t in (previous or {}).items() if t}
+    known.update(checkpoint.load())
+    todo = [p for p in paths if p not in known]
+    done = n - len(todo)
+    updated = 0
+    skipped = 0
+    status.write("running", done, updated, skipped, force=True)
+
+    def _collect(chunk: Sequence[str], texts: List[Optional[str]]) -> None:
+        nonlocal done, updated, skipped
+        for p, txt in zip(chunk, texts):
+            if txt is None:
+                skipped += 1
+                txt = ""
+            known[p] = txt
+            checkpoint.add(p, txt)
+            updated += 1
+        done += len(chunk)
+        status.write("running", done, updated, skipped)
+
+    workers = _default_workers() if workers is None else max(1, int(workers))
+    remaining = todo
+    try:
+        if workers > 1 and len(todo) >= MIN_PARALLEL_FILES:
+            try:
+                _ocr_parallel(todo, languages, workers, chunk_size, prepass, _collect, cancel)
+                remaining = []
+            except Exception as e:
+                if cancel is not None:
+                    cancel()
+                # Pools can be unavailable (sandboxing, frozen apps); finish serially
+                logger.warning("Parallel OCR failed, continuing serially: %s", e)
+                remaining = [p for p in todo if p not in known]
+        if remaining:
+            if _reader is None or _reader_langs != tuple(languages):
+                _init_worker(languages)
+            for start in range(0, len(remaining), chunk_size):
+                if cancel is not None:
+                    cancel()
+                chunk = remaining[start:start + chunk_size]
+                _collect(chunk, _ocr_chunk(chunk, prepass))
+    finally:
+        checkpoint.flush()
+
+    texts = [known.get(p, "") for p in paths]
+    status.write("complete", n, updated, skipped, force=True)
+    return texts, updated
+
+
+def finish(index_dir: Path) -> None:
+    """Drop the resume checkpoint once the build's outputs are on disk."""
+    _Checkpoint(index_dir, []).clear()
+
+
+def embed_ocr_texts(embedder: Any, texts: Sequence[str], dim: int, batch_size: int = EMBED_BATCH) -> np.ndarray:
+    """Text embeddings aligned with ``texts``; empty strings get zero rows.
+
+    Each distinct non-empty string is embedded once, in batches through
+    ``embedder.embed_texts`` when the provider has it.
+    """
+    out = np.zeros((len(texts), int(dim)), dtype=np.float32)
+    rows: Dict[str, List[int]] = {}
+    for i, t in enumerate(texts):
+        if t:
+            rows.setdefault(t, []).append(i)
+    unique = list(rows)
+    batch_fn = getattr(embedder, "embed_texts", None)
+    for start in range(0, len(unique), batch_size):
+        batch = unique[start:start + batch_size]
+        if callable(batch_fn):
+            vecs = np.asarray(batch_fn(batch), dtype=np.float32)
+        else:
+            vecs = np.stack([np.asarray(embedder.embed_text(t), dtype=np.float32) for t in batch])
+        for t, v in zip(batch, vecs):
+            out[rows[t]] = v
+    return out
+
+
+__all__ = ["embed_ocr_texts", "finish", "looks_like_text", "run_ocr"]
@@ -0,0 +1,245 @@
+"""Precomputed visual-style features for style similarity search.
+
+Intent:
+  ``EnhancedSearchService.style_similarity_search`` used to decode every photo
+  in the library, build its histograms and run a KMeans on every request. The
+  features it actually scores on are small and fixed-size, so they are computed
+  once (at index time, and incrementally afterwards) into one float32 matrix
+  and a style query becomes a couple of matrix operations.
+
+On-disk layout (inside an IndexStore ``index_dir``)::
+
+    style_features.npy   float32 (N, FEATURE_DIM); NaN rows for unreadable photos
+    style_index.json     version, paths and mtimes the rows were computed from
+
+Each row is a 96-bin colour histogram (32 bins per B, G, R channel, summing to
+one) followed by the mean and standard deviation of the Sobel gradient
+magnitude, both taken from a 224x224 rendition of the photo.
+
+Contract:
+  - style_features(path) -> Optional[np.ndarray] of FEATURE_DIM floats
+  - build_style_index(index_dir, paths, mtimes) -> StyleIndex row-aligned with
+    ``paths``; only new or modified photos are decoded
+  - style_index_for_store(store) -> Optional[StyleIndex] aligned with
+    ``store.state.paths``, refreshed incrementally when the store changed
+  - style_scores(matrix, ref, ...) -> vectorised colour/texture similarity
+"""
+from __future__ import annotations
+
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from adapters.fs_scanner import safe_open_image
+
+FEATURES_NAME = "style_features.npy"
+META_NAME = "style_index.json"
+FORMAT_VERSION = 1
+
+STYLE_SIZE = 224
+HIST_BINS = 32
+HIST_DIM = 3 * HIST_BINS
+FEATURE_DIM = HIST_DIM + 2
+
+
+def style_features(path: str) -> Optional[np.ndarray]:
+    """Colour histogram and gradient statistics for one photo, or None if unreadable."""
+    import cv2
+
+    img = safe_open_image(path, target_size=STYLE_SIZE)
+    if img is None:
+        return None
+    try:
+        from PIL import Image
+
+        img = img.resize((STYLE_SIZE, STYLE_SIZE), Image.BILINEAR)
+        bgr = np.ascontiguousarray(np.asarray(img, dtype=np.uint8)[..., ::-1])
+    except Exception:
+        return None
+    shift = 8 - int(np.log2(HIST_BINS))
+    hist = np.concatenate([
+        np.bincount((bgr[..., c] >> shift).ravel(), minlength=HIST_BINS) for c in range(3)
+    ]).astype(np.float64)
+    hist /= hist.sum() + 1e-9
+    gray = cv2.cvtColor(bgr, cv2.COLOR_BGR2GRAY)
+    grad_x = cv2.Sobel(gray, cv2.CV_64F, 1, 0, ksize=3)
+    grad_y = cv2.Sobel(gray, cv2.CV_64F, 0, 1, ksize=3)
+    magnitude = np.sqrt(grad_x ** 2 + grad_y ** 2)
+    out = np.empty(FEATURE_DIM, dtype=np.float32)
+    out[:HIST_DIM] = hist
+    out[HIST_DIM] = magnitude.mean()
+    out[HIST_DIM + 1] = magnitude.std()
+    return out
+
+
+def style_scores(
+    matrix: np.ndarray,
+    ref: np.ndarray,
+    color_weight: float = 0.4,
+    texture_weight: float = 0.3,
+) -> np.ndarray:
+    """Weighted colour + texture similarity of every row of ``matrix`` to ``ref``.
+
+    Colour similarity is the histogram correlation clipped to [0, 1]; texture
+    similarity is ``exp(-|t - t_ref| / (|t| + |t_ref|))``. Unreadable (NaN)
+    rows score ``-inf``.
+    """
+    M = np.asarray(matrix, dtype=np.float32)
+    ref = np.asarray(ref, dtype=np.float32)
+    color = np.clip(M[:, :HIST_DIM] @ ref[:HIST_DIM], 0.0, 1.0)
+    tex = M[:, HIST_DIM:]
+    t_ref = ref[HIST_DIM:]
+    dist = np.linalg.norm(tex - t_ref, axis=1)
+    texture = np.exp(-dist / (np.linalg.norm(tex, axis=1) + np.linalg.norm(t_ref) + 1e-9))
+    scores = color_weight * color + texture_weight * texture
+    return np.where(np.isnan(scores), -np.inf, scores)
+
+
+class StyleIndex:
+    """Style feature rows with the paths and mtimes they were computed from."""
+
+    def __init__(self, paths: List[str], mtimes: List[Optional[float]], matrix: np.ndarray) -> None:
+        self.paths = paths
+        self.mtimes = mtimes
+        self.matrix = matrix
+        self._row: Optional[Dict[str, int]] = None
+
+    def __len__(self) -> int:
+        return len(self.paths)
+
+    def row_of(self, path: str) -> Optional[int]:
+        if self._row is None:
+            self._row = {p: i for i, p in enumerate(self.paths)}
+        return self._row.get(path)
+
+    def features(self, path: str) -> Optional[np.ndarray]:
+        """Stored features for ``path``; None when unknown or unreadable."""
+        i = self.row_of(path)
+        if i is None:
+            return None
+        row = np.asarray(self.matrix[i])
+        return None if np.isnan(row[0]) else row
+
+    def matches(self, paths: Sequence[str], mtimes: Sequence[Optional[float]]) -> bool:
+        return list(paths) == self.paths and _mtime_list(paths, mtimes) == self.mtimes
+
+
+_lock = threading.RLock()
+_cache: Dict[str, Tuple[tuple, StyleIndex]] = {}
+
+
+def _stamp(index_dir: Path) -> Optional[tuple]:
+    try:
+        st = (index_dir / META_NAME).stat()
+    except OSError:
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def _mtime_list(paths: Sequence[str], mtimes: Optional[Sequence[Optional[float]]]) -> List[Optional[float]]:
+    mtimes = list(mtimes or [])
+    return [float(mtimes[i]) if i < len(mtimes) and mtimes[i] is not None else None for i in range(len(paths))]
+
+
+def load_style_index(index_dir: Path) -> Optional[StyleIndex]:
+    """Load the persisted style index for ``index_dir`` (cached per process)."""
+    key = str(index_dir)
+    stamp = _stamp(index_dir)
+    with _lock:
+        if stamp is None:
+            _cache.pop(key, None)
+            return None
+        hit = _cache.get(key)
+        if hit is not None and hit[0] == stamp:
+            return hit[1]
+        try:
+            meta = json.loads((index_dir / META_NAME).read_text(encoding="utf-8"))
+            matrix = np.load(index_dir / FEATURES_NAME, mmap_mode="r")
+        except Exception:
+            return None
+        paths = [str(p) for p in meta.get("paths", [])]
+        if meta.get("version") != FORMAT_VERSION or matrix.shape != (len(paths), FEATURE_DIM):
+            return None
+        index = StyleIndex(paths, _mtime_list(paths, meta.get("mtimes")), matrix)
+        _cache[key] = (stamp, index)
+        return index
+
+
+def _write(index_dir: Path, index: StyleIndex) -> None:
+    index_dir.mkdir(parents=True, exist_ok=True)
+    tmp = index_dir / (FEATURES_NAME + ".tmp")
+    with open(tmp, "wb") as f:
+        np.save(f, np.ascontiguousarray(index.matrix, dtype=np.float32))
+    os.replace(tmp, index_dir / FEATURES_NAME)
+    meta_tmp = index_dir / (META_NAME + ".tmp")
+    meta_tmp.write_text(json.dumps({"version": FORMAT_VERSION, "paths": index.paths, "mtimes": index.mtimes}), encoding="utf-8")
+    os.replace(meta_tmp, index_dir / META_NAME)
+
+
+def build_style_index(
+    index_dir: Path,
+    paths: Sequence[str],
+    mtimes: Optional[Sequence[Optional[float]]] = None,
+    workers: Optional[int] = None,
+) -> StyleIndex:
+    """Bring the style index in line with ``paths``, decoding only new or changed photos.
+
+    ``mtimes`` are the index's own modification times (``store.state.mtimes``);
+    rows whose path and mtime match the previous build are copied over. The
+    result is persisted and row-aligned with ``paths``.
+    """
+    paths = [str(p) for p in (paths or [])]
+    stamps = _mtime_list(paths, mtimes)
+    with _lock:
+        prev = load_style_index(index_dir)
+        if prev is not None and prev.matches(paths, stamps):
+            return prev
+        matrix = np.full((len(paths), FEATURE_DIM), np.nan, dtype=np.float32)
+        todo: List[int] = []
+        for i, (p, m) in enumerate(zip(paths, stamps)):
+            j = prev.row_of(p) if prev is not None else None
+            if j is not None and m is not None and prev.mtimes[j] == m:
+                matrix[i] = prev.matrix[j]
+            else:
+                todo.append(i)
+        if todo:
+            # Decoding and the cv2 filters release the GIL
+            n_workers = workers or max(1, min(8, (os.cpu_count() or 2) - 1))
+            with ThreadPoolExecutor(max_workers=n_workers) as pool:
+                for i, feats in zip(todo, pool.map(style_features, [paths[i] for i in todo])):
+                    if feats is not None:
+                        matrix[i] = feats
+        index = StyleIndex(paths, stamps, matrix)
+        try:
+            _write(index_dir, index)
+            _cache[str(index_dir)] = (_stamp(index_dir), index)
+        except Exception:
+            pass  # Read-only index dir: keep the in-memory result for this call
+        return index
+
+
+def style_index_for_store(store) -> Optional[StyleIndex]:
+    """Style index aligned with ``store.state.paths``, updated incrementally if stale."""
+    paths = store.state.paths or []
+    if not paths:
+        return None
+    try:
+        return build_style_index(store.index_dir, paths, store.state.mtimes)
+    except Exception:
+        return None
+
+
+__all__ = [
+    "FEATURE_DIM",
+    "StyleIndex",
+    "build_style_index",
+    "load_style_index",
+    "style_features",
+    "style_index_for_store",
+    "style_scores",
+]
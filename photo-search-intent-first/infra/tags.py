@@ -1,36 +1,73 @@
 from __future__ import annotations
 
-import json
 from pathlib import Path
-from typing import Dict, List
+from typing import Dict, Iterable, List, Set
+
+from infra.label_store import TAG, existing_label_store, label_store_for, pairs_from_json
 
 
 def _file(index_dir: Path) -> Path:
+    """Legacy tags file; migrated into ``labels.db`` once, on first use, then ignored."""
     return index_dir / "tags.json"
 
 
 def load_tags(index_dir: Path) -> Dict[str, List[str]]:
     try:
-        p = _file(index_dir)
-        if p.exists():
-            return json.loads(p.read_text())
+        store = existing_label_store(index_dir)
+        return store.by_path(TAG) if store is not None else {}
     except Exception:
-        pass
-    return {}
+        return {}
 
 
 def save_tags(index_dir: Path, data: Dict[str, List[str]]) -> None:
+    """Make the stored tags equal ``data``; only changed memberships are written."""
     try:
-        _file(index_dir).write_text(json.dumps(data, indent=2))
+        label_store_for(index_dir).replace_all(TAG, pairs_from_json(TAG, data))
     except Exception:
         pass
 
 
 def all_tags(index_dir: Path) -> List[str]:
-    tags = set()
-    for lst in load_tags(index_dir).values():
-        for t in lst:
-            if t:
-                tags.add(t)
-    return sorted(tags)
+    try:
+        store = existing_label_store(index_dir)
+        return store.names(TAG) if store is not None else []
+    except Exception:
+        return []
+
+
+def tags_for(index_dir: Path, paths: Iterable[str]) -> Dict[str, List[str]]:
+    """Tags of just ``paths`` (paths without tags are omitted)."""
+    try:
+        store = existing_label_store(index_dir)
+        return store.by_path(TAG, paths) if store is not None else {}
+    except Exception:
+        return {}
+
+
+def set_tags(index_dir: Path, paths: Iterable[str], tags: Iterable[str]) -> int:
+    """Give every path exactly ``tags`` in one transaction; returns paths changed."""
+    return label_store_for(index_dir).set_labels(TAG, paths, tags)
 
+
+def add_tags(index_dir: Path, paths: Iterable[str], tags: Iterable[str]) -> int:
+    """Add ``tags`` to every path in one transaction; returns paths changed."""
+    return label_store_for(index_dir).add(TAG, tags, paths)
+
+
+def remove_tags(index_dir: Path, paths: Iterable[str], tags: Iterable[str]) -> int:
+    """Remove ``tags`` from every path in one transaction; returns paths changed."""
+    return label_store_for(index_dir).remove(TAG, tags, paths)
+
+
+def paths_with_tags(index_dir: Path, tags: Iterable[str]) -> Set[str]:
+    """Paths carrying every tag in ``tags``, from the per-tag posting lists."""
+    store = existing_label_store(index_dir)
+    return store.paths_with_all(TAG, tags) if store is not None else set()
+
+
+def tag_counts(index_dir: Path) -> Dict[str, int]:
+    try:
+        store = existing_label_store(index_dir)
+        return store.counts(TAG) if store is not None else {}
+    except Exception:
+        return {}
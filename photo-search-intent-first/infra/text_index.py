@@ -0,0 +1,422 @@
+"""Persistent inverted index (SQLite FTS5, BM25) over OCR text, captions and file names.
+
+Intent:
+  Text lookups used to re-read ``ocr_texts.json``/``cap_texts.json`` (or one
+  cached JSON file per photo in the OCR/caption managers) on every query and
+  scan each string with ``in``. This module keeps one ``text_index.db`` per
+  index directory:
+
+  - ``docs``: one row per library photo (``path`` key, file ``name``,
+    ``ocr``, ``caption`` and optional per-source confidences). Photos with
+    no OCR text or caption keep their row, so file names are searchable
+    across the whole library;
+  - ``docs_fts``: an external-content FTS5 table over (name, ocr, caption),
+    kept in step with ``docs`` by triggers, with 2- and 3-character prefix
+    indexes so ``term*`` queries stay fast;
+  - ``sources``: the (mtime_ns, size) stamp of the JSON file each source was
+    last imported from, and the store generation the rows were last aligned
+    with ("paths"), so a stale database catches up on first use.
+
+  Writers update only rows whose text changed, so re-running an OCR or caption
+  build touches the few photos that were (re)processed.
+
+Contract:
+  - TextIndex(index_dir) opens/creates ``index_dir/text_index.db``
+  - update(source, texts, complete=False, confidence=None) -> rows changed
+  - sync_file(source, json_file) imports a ``{"paths", "texts"}`` file if it changed
+  - sync_paths(paths, stamp=None) -> rows added/removed to match the library
+  - search(query, fields=None, limit=None, prefix=True, paths=None, min_confidence=None)
+      -> [(path, score)] best first (score = -bm25, higher is better)
+  - snippets(paths, query=None, field="ocr", limit=160) -> {path: snippet}
+  - texts(field, paths) -> {path: text} for the requested paths only
+  - paths_with_text(field) -> [path]
+  - text_index_for_store(store) -> TextIndex synced with the store's OCR/caption files
+"""
+from __future__ import annotations
+
+import json
+import logging
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+DB_NAME = "text_index.db"
+FIELDS = ("name", "ocr", "caption")
+# bm25() column weights for name, ocr, caption
+WEIGHTS = (0.5, 1.0, 1.0)
+_CHUNK = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS docs (
+    id INTEGER PRIMARY KEY,
+    path TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL DEFAULT '',
+    ocr TEXT NOT NULL DEFAULT '',
+    caption TEXT NOT NULL DEFAULT '',
+    ocr_confidence REAL,
+    caption_confidence REAL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS docs_fts USING fts5(
+    name, ocr, caption,
+    content='docs', content_rowid='id',
+    tokenize='unicode61 remove_diacritics 2',
+    prefix='2 3'
+);
+CREATE TRIGGER IF NOT EXISTS docs_ai AFTER INSERT ON docs BEGIN
+    INSERT INTO docs_fts(rowid, name, ocr, caption) VALUES (new.id, new.name, new.ocr, new.caption);
+END;
+CREATE TRIGGER IF NOT EXISTS docs_ad AFTER DELETE ON docs BEGIN
+    INSERT INTO docs_fts(docs_fts, rowid, name, ocr, caption) VALUES ('delete', old.id, old.name, old.ocr, old.caption);
+END;
+CREATE TRIGGER IF NOT EXISTS docs_au AFTER UPDATE OF name, ocr, caption ON docs BEGIN
+    INSERT INTO docs_fts(docs_fts, rowid, name, ocr, caption) VALUES ('delete', old.id, old.name, old.ocr, old.caption);
+    INSERT INTO docs_fts(rowid, name, ocr, caption) VALUES (new.id, new.name, new.ocr, new.caption);
+END;
+CREATE TABLE IF NOT EXISTS sources (
+    source TEXT PRIMARY KEY,
+    stamp TEXT NOT NULL
+);
+"""
+
+_TERM = re.compile(r"\w+", re.UNICODE)
+
+
+def fts_query(query: str, fields: Optional[Sequence[str]] = None, prefix: bool = True) -> str:
+    """FTS5 MATCH expression for a free-text query: every term must match.
+
+    Terms are quoted (so FTS5 operators in user input are literal), get a
+    trailing ``*`` for prefix search, and are restricted to ``fields``.
+    """
+    terms = _TERM.findall(query or "")
+    if not terms:
+        return ""
+    expr = " AND ".join(f'"{t}"*' if prefix else f'"{t}"' for t in terms)
+    cols = [f for f in (fields or ()) if f in FIELDS]
+    if cols and len(cols) < len(FIELDS):
+        return "{" + " ".join(cols) + "} : (" + expr + ")"
+    return expr
+
+
+def _stamp(path: Path) -> Optional[str]:
+    try:
+        st = Path(path).stat()
+    except OSError:
+        return None
+    return f"{st.st_mtime_ns}:{st.st_size}"
+
+
+def _chunks(items: Sequence, size: int = _CHUNK) -> Iterator[Sequence]:
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+class TextIndex:
+    """FTS5 text index stored next to the other index artifacts."""
+
+    def __init__(self, index_dir: Path) -> None:
+        self.index_dir = Path(index_dir)
+        self.db_path = self.index_dir / DB_NAME
+        self._lock = threading.Lock()
+        self.index_dir.mkdir(parents=True, exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(str(self.db_path), timeout=30)
+        try:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            yield conn
+            conn.commit()
+        finally:
+            conn.close()
+
+    # Writes
+    def update(
+        self,
+        source: str,
+        texts: Mapping[str, str],
+        complete: bool = False,
+        confidence: Optional[Mapping[str, float]] = None,
+    ) -> int:
+        """Set ``source`` ("ocr" or "caption") text for the given paths.
+
+        Only rows whose text (or confidence) differs are written. With
+        ``complete`` the mapping is the whole source: paths missing from it
+        lose their ``source`` text (the row stays for its file name).
+        """
+        if source not in ("ocr", "caption"):
+            raise ValueError(f"Unknown text source: {source}")
+        conf_col = f"{source}_confidence"
+        confidence = confidence or {}
+        with self._lock, self._connect() as conn:
+            current = {
+                row[0]: (row[1], row[2])
+                for row in conn.execute(f"SELECT path, {source}, {conf_col} FROM docs")
+            }
+            changed = 0
+            inserts = []
+            updates = []
+            for path, text in texts.items():
+                text = text or ""
+                conf = confidence.get(path)
+                prev = current.get(path)
+                if prev is None:
+                    inserts.append((path, Path(path).name, text, conf))
+                elif prev[0] != text or (conf is not None and prev[1] != conf):
+                    updates.append((text, conf, path))
+            conn.executemany(
+                f"INSERT INTO docs(path, name, {source}, {conf_col}) VALUES (?, ?, ?, ?)", inserts
+            )
+            conn.executemany(f"UPDATE docs SET {source} = ?, {conf_col} = ? WHERE path = ?", updates)
+            changed = len(inserts) + len(updates)
+            if complete:
+                gone = [p for p, (text, _) in current.items() if p not in texts and text]
+                for chunk in _chunks(gone):
+                    marks = ",".join("?" * len(chunk))
+                    conn.execute(f"UPDATE docs SET {source} = '' WHERE path IN ({marks})", list(chunk))
+                changed += len(gone)
+        return changed
+
+    def sync_paths(self, paths: Sequence[str], stamp: Optional[str] = None) -> int:
+        """Give every library photo a row (for its name) and drop rows of removed photos.
+
+        With ``stamp`` (the store generation) the work is skipped while it is
+        unchanged since the last call.
+        """
+        if stamp is not None:
+            with self._connect() as conn:
+                row = conn.execute("SELECT stamp FROM sources WHERE source = 'paths'").fetchone()
+            if row is not None and row[0] == stamp:
+                return 0
+        want = dict.fromkeys(str(p) for p in paths)
+        with self._lock, self._connect() as conn:
+            current = {r[0] for r in conn.execute("SELECT path FROM docs")}
+            inserts = [(p, Path(p).name) for p in want if p not in current]
+            conn.executemany("INSERT INTO docs(path, name) VALUES (?, ?)", inserts)
+            gone = [p for p in current if p not in want]
+            for chunk in _chunks(gone):
+                marks = ",".join("?" * len(chunk))
+                conn.execute(f"DELETE FROM docs WHERE path IN ({marks})", list(chunk))
+            if stamp is not None:
+                conn.execute("INSERT OR REPLACE INTO sources(source, stamp) VALUES ('paths', ?)", (stamp,))
+        return len(inserts) + len(gone)
+
+    def remove(self, paths: Iterable[str]) -> int:
+        paths = list(paths)
+        removed = 0
+        with self._lock, self._connect() as conn:
+            for chunk in _chunks(paths):
+                marks = ",".join("?" * len(chunk))
+                removed += conn.execute(f"DELETE FROM docs WHERE path IN ({marks})", list(chunk)).rowcount
+        return removed
+
+    def clear(self) -> None:
+        with self._lock, self._connect() as conn:
+            conn.execute("DELETE FROM docs")
+            conn.execute("DELETE FROM sources")
+
+    def sync_file(self, source: str, json_file: Path) -> bool:
+        """Import a ``{"paths": [...], "texts": [...]}`` file when it changed since last import."""
+        stamp = _stamp(json_file)
+        if stamp is None:
+            return False
+        with self._connect() as conn:
+            row = conn.execute("SELECT stamp FROM sources WHERE source = ?", (source,)).fetchone()
+        if row is not None and row[0] == stamp:
+            return False
+        try:
+            data = json.loads(Path(json_file).read_text(encoding="utf-8"))
+        except Exception as e:
+            logger.warning("Could not import %s texts from %s: %s", source, json_file, e)
+            return False
+        texts = {p: (t or "") for p, t in zip(data.get("paths", []), data.get("texts", []))}
+        self.update(source, texts, complete=True)
+        with self._lock, self._connect() as conn:
+            conn.execute("INSERT OR REPLACE INTO sources(source, stamp) VALUES (?, ?)", (source, stamp))
+        return True
+
+    # Reads
+    def count(self) -> int:
+        with self._connect() as conn:
+            return int(conn.execute("SELECT COUNT(*) FROM docs").fetchone()[0])
+
+    def search(
+        self,
+        query: str,
+        fields: Optional[Sequence[str]] = None,
+        limit: Optional[int] = None,
+        prefix: bool = True,
+        paths: Optional[Iterable[str]] = None,
+        min_confidence: Optional[float] = None,
+    ) -> List[Tuple[str, float]]:
+        """Paths matching every query term, ranked by BM25."""
+        match = fts_query(query, fields, prefix)
+        if not match:
+            return []
+        sql = (
+            "SELECT d.path, -bm25(docs_fts, ?, ?, ?) AS score, d.ocr_confidence, d.caption_confidence "
+            "FROM docs_fts JOIN docs d ON d.id = docs_fts.rowid "
+            "WHERE docs_fts MATCH ? ORDER BY bm25(docs_fts, ?, ?, ?)"
+        )
+        args: list = [*WEIGHTS, match, *WEIGHTS]
+        if limit is not None and paths is None and min_confidence is None:
+            sql += " LIMIT ?"
+            args.append(int(limit))
+        with self._connect() as conn:
+            rows = conn.execute(sql, args).fetchall()
+        allowed = set(paths) if paths is not None else None
+        out: List[Tuple[str, float]] = []
+        for path, score, ocr_conf, cap_conf in rows:
+            if allowed is not None and path not in allowed:
+                continue
+            if min_confidence is not None:
+                confs = [c for f, c in (("ocr", ocr_conf), ("caption", cap_conf)) if not fields or f in fields]
+                if not any(c is None or c >= min_confidence for c in confs):
+                    continue
+            out.append((path, float(score)))
+            if limit is not None and len(out) >= limit:
+                break
+        return out
+
+    def texts(self, field: str, paths: Iterable[str]) -> Dict[str, str]:
+        """``field`` text for the given paths (missing or empty texts are omitted)."""
+        if field not in FIELDS:
+            raise ValueError(f"Unknown text field: {field}")
+        paths = list(dict.fromkeys(paths))
+        out: Dict[str, str] = {}
+        with self._connect() as conn:
+            for chunk in _chunks(paths):
+                marks = ",".join("?" * len(chunk))
+                for path, text in conn.execute(
+                    f"SELECT path, {field} FROM docs WHERE path IN ({marks}) AND {field} != ''", list(chunk)
+                ):
+                    out[path] = text
+        return out
+
+    def paths_with_text(self, field: str = "ocr") -> List[str]:
+        if field not in FIELDS:
+            raise ValueError(f"Unknown text field: {field}")
+        with self._connect() as conn:
+            return [r[0] for r in conn.execute(f"SELECT path FROM docs WHERE TRIM({field}) != ''")]
+
+    def snippets(
+        self,
+        paths: Iterable[str],
+        query: Optional[str] = None,
+        field: str = "ocr",
+        limit: int = 160,
+    ) -> Dict[str, str]:
+        """Short display text per path: around the query's matches if given, else the text head."""
+        paths = list(dict.fromkeys(paths))
+        limit = max(0, int(limit))
+        out: Dict[str, str] = {}
+        match = fts_query(query or "", [field]) if query else ""
+        if match:
+            col = FIELDS.index(field)
+            # ~6 characters per token keeps the window close to ``limit``
+            tokens = max(4, min(64, limit // 6 or 4))
+            with self._connect() as conn:
+                for chunk in _chunks(paths):
+                    marks = ",".join("?" * len(chunk))
+                    sql = (
+                        f"SELECT d.path, snippet(docs_fts, {col}, '', '', '…', {tokens}) "
+                        "FROM docs_fts JOIN docs d ON d.id = docs_fts.rowid "
+                        f"WHERE docs_fts MATCH ? AND d.path IN ({marks})"
+                    )
+                    for path, snip in conn.execute(sql, [match, *chunk]):
+                        snip = " ".join((snip or "").split())
+                        if snip:
+                            out[path] = snip[:limit].strip()
+        rest = [p for p in paths if p not in out]
+        for path, text in self.texts(field, rest).items():
+            snip = " ".join(text.split())[:limit].strip()
+            if snip:
+                out[path] = snip
+        return out
+
+
+_instances: Dict[str, TextIndex] = {}
+_instances_lock = threading.Lock()
+
+
+def text_index_for(index_dir: Path) -> TextIndex:
+    """Shared TextIndex for ``index_dir`` (schema created once per process)."""
+    key = str(Path(index_dir))
+    with _instances_lock:
+        idx = _instances.get(key)
+        if idx is None:
+            idx = _instances[key] = TextIndex(Path(index_dir))
+        return idx
+
+
+def text_index_for_store(store) -> TextIndex:
+    """The store's text index, caught up with its photos and OCR/caption JSON files."""
+    idx = text_index_for(store.index_dir)
+    state = getattr(store, "state", None)
+    if state is not None and state.paths and hasattr(store, "generation"):
+        try:
+            idx.sync_paths(state.paths, stamp=json.dumps(store.generation()))
+        except Exception as e:
+            logger.warning("Text index path sync failed: %s", e)
+    for source, json_file in (("ocr", store.ocr_texts_file), ("caption", store.cap_texts_file)):
+        try:
+            idx.sync_file(source, json_file)
+        except Exception as e:
+            logger.warning("Text index sync for %s failed: %s", source, e)
+    return idx
+
+
+class TextLookup(Mapping):
+    """Read-only ``path -> text`` view of one field, fetched per path on demand.
+
+    Drop-in for the ``texts_map``/``cap_map`` dicts used by result filters,
+    which only ever look up the handful of paths being filtered.
+    """
+
+    def __init__(self, index: TextIndex, field: str) -> None:
+        self.index = index
+        self.field = field
+        self._cache: Dict[str, str] = {}
+
+    def prefetch(self, paths: Iterable[str]) -> "TextLookup":
+        want = [p for p in paths if p not in self._cache]
+        found = self.index.texts(self.field, want)
+        for p in want:
+            self._cache[p] = found.get(p, "")
+        return self
+
+    def __getitem__(self, path: str) -> str:
+        if path not in self._cache:
+            self.prefetch([path])
+        text = self._cache[path]
+        if not text:
+            raise KeyError(path)
+        return text
+
+    def get(self, path, default=""):
+        try:
+            return self[path]
+        except KeyError:
+            return default
+
+    def __iter__(self):
+        return iter(self.index.paths_with_text(self.field))
+
+    def __len__(self) -> int:
+        return len(self.index.paths_with_text(self.field))
+
+
+__all__ = [
+    "TextIndex",
+    "TextLookup",
+    "fts_query",
+    "text_index_for",
+    "text_index_for_store",
+]
@@ -1,10 +1,13 @@
 from __future__ import annotations
 
 import hashlib
+import math
 from pathlib import Path
 from typing import Optional, Tuple
 import os
+import threading
 
+from PIL import Image
 
 from adapters.fs_scanner import safe_open_image
 
@@ -27,12 +30,14 @@ def get_or_create_thumb(index_dir: Path, img_path: Path, mtime: float, size: int
         tpath = tdir / tname
         if tpath.exists():
             return tpath
-        img = safe_open_image(img_path)
+        img = safe_open_image(img_path, target_size=size)
         if img is None:
             return None
-        img = img.copy()
         img.thumbnail((size, size))
-        img.save(tpath, format="JPEG", quality=85)
+        # Write then rename so concurrent readers never see a partial file
+        tmp = tpath.with_name(f"{tpath.stem}.{os.getpid()}.{threading.get_ident()}.tmp")
+        img.save(tmp, format="JPEG", quality=85)
+        os.replace(tmp, tpath)
         return tpath
     except Exception:
         return None
@@ -55,12 +60,19 @@ def get_or_create_face_thumb(index_dir: Path, img_path: Path, mtime: float, bbox
         tpath = tdir / tname
         if tpath.exists():
             return tpath
-        img = safe_open_image(img_path)
-        if img is None:
-            return None
-        # crop with a small margin
+        # bbox is in full-resolution pixels: decode just large enough that the
+        # face crop still covers ``size`` pixels, then scale the bbox to match
         x, y, w, h = bbox
         x = max(0, int(x)); y = max(0, int(y)); w = max(1, int(w)); h = max(1, int(h))
+        with Image.open(img_path) as probe:
+            full_w, full_h = probe.size
+        target = int(math.ceil(size * min(full_w, full_h) / float(min(w, h))))
+        img = safe_open_image(img_path, target_size=target)
+        if img is None:
+            return None
+        if img.size != (full_w, full_h):
+            sx = img.width / float(full_w); sy = img.height / float(full_h)
+            x = int(x * sx); y = int(y * sy); w = max(1, int(round(w * sx))); h = max(1, int(round(h * sy)))
         # Add 10% margin
         mx = int(0.1 * w); my = int(0.1 * h)
         x0 = max(0, x - mx); y0 = max(0, y - my)
@@ -4,6 +4,10 @@ import json
 from pathlib import Path
 from typing import Any, Dict, List
 
+import numpy as np
+
+from infra.metadata_columns import load_columns
+
 
 def trips_file(index_dir: Path) -> Path:
     d = index_dir / "trips"
@@ -42,15 +46,15 @@ def build_trips(index_dir: Path, paths: List[str], mtimes: List[float], time_gap
     lon_map: Dict[str, float] = {}
     place_map: Dict[str, str] = {}
     try:
-        p = index_dir / 'exif_index.json'
-        if p.exists():
-            d = json.loads(p.read_text())
-            for sp, lat, lon, plc in zip(d.get('paths',[]), d.get('gps_lat',[]), d.get('gps_lon',[]), d.get('place',[])):
-                if lat is not None and lon is not None:
-                    lat_map[sp] = float(lat)
-                    lon_map[sp] = float(lon)
-                if plc:
-                    place_map[sp] = plc
+        cols = load_columns(index_dir)
+        if cols is not None:
+            lat, lon = cols.numeric('gps_lat'), cols.numeric('gps_lon')
+            for i in np.flatnonzero(np.isfinite(lat) & np.isfinite(lon)):
+                lat_map[cols.paths[i]] = float(lat[i])
+                lon_map[cols.paths[i]] = float(lon[i])
+            codes, places = cols.codes('place')
+            for i in np.flatnonzero(codes):
+                place_map[cols.paths[i]] = places[int(codes[i])]
     except Exception:
         pass
     # Sort by time
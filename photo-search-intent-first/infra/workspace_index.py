@@ -1,11 +1,13 @@
 from __future__ import annotations
 
 import json
+import os
 from pathlib import Path
 from typing import List, Tuple
 
 import numpy as np
 
+from infra import ann_handles, ann_maintenance, faiss_factory
 from infra.index_store import IndexStore
 from domain.models import SearchResult
 
@@ -28,13 +30,13 @@ class WorkspaceIndex:
         self.hnsw_meta = self.base / "hnsw.meta.json"
 
     def build_from_stores(self, stores: List[IndexStore]) -> Tuple[int, int]:
-        paths: List[str] = []
-        embs: List[np.ndarray] = []
-        for s in stores:
-            if s.state.embeddings is not None and len(s.state.embeddings) > 0:
-                paths.extend(s.state.paths)
-                embs.append(s.state.embeddings)
-        if not embs:
+        """Write the stores' rows into one on-disk matrix, one store at a time.
+
+        Rows are copied straight into a memory-mapped ``.npy`` so the combined
+        matrix never exists in RAM.
+        """
+        live = [s for s in stores if s.state.embeddings is not None and len(s.state.embeddings) > 0]
+        if not live:
             # Clear any previous index
             try:
                 if self.paths_file.exists():
@@ -44,38 +46,44 @@ class WorkspaceIndex:
             except Exception:
                 pass
             return (0, 0)
-        E = np.vstack(embs).astype("float32")
+        dim = int(live[0].state.embeddings.shape[1])
+        live = [s for s in live if int(s.state.embeddings.shape[1]) == dim]
+        total = sum(len(s.state.embeddings) for s in live)
+        paths: List[str] = []
+        tmp = self.emb_file.with_name(self.emb_file.stem + ".tmp.npy")
+        E = np.lib.format.open_memmap(tmp, mode="w+", dtype=np.float32, shape=(total, dim))
+        row = 0
+        for s in live:
+            n = len(s.state.embeddings)
+            E[row:row + n] = s.state.embeddings
+            paths.extend(s.state.paths[:n])
+            row += n
+        E.flush()
+        del E
+        os.replace(tmp, self.emb_file)
         self.paths_file.write_text(json.dumps({"paths": paths}))
-        np.save(self.emb_file, E)
-        return (len(paths), E.shape[1])
+        ann_handles.invalidate(self.emb_file)
+        return (len(paths), dim)
 
     def _load_paths(self) -> List[str]:
-        if self.paths_file.exists():
-            try:
-                return json.loads(self.paths_file.read_text()).get("paths", [])
-            except Exception:
-                return []
-        return []
+        return ann_handles.resident_paths(self.paths_file)
 
-    def annoy_status(self) -> dict:
-        ok = self.ann_file.exists() and self.ann_meta.exists()
-        meta = {}
-        if ok:
-            try:
-                meta = json.loads(self.ann_meta.read_text())
-            except Exception:
-                ok = False
+    def _embeddings(self):
+        return ann_handles.resident_npy(self.emb_file)
+
+    @staticmethod
+    def _status(index_file: Path, meta_file: Path) -> dict:
+        ok = index_file.exists() and meta_file.exists()
+        meta = ann_handles.read_meta(meta_file) if ok else None
+        if meta is None:
+            ok, meta = False, {}
         return {"exists": ok, **meta}
 
+    def annoy_status(self) -> dict:
+        return self._status(self.ann_file, self.ann_meta)
+
     def faiss_status(self) -> dict:
-        ok = self.faiss_file.exists() and self.faiss_meta.exists()
-        meta = {}
-        if ok:
-            try:
-                meta = json.loads(self.faiss_meta.read_text())
-            except Exception:
-                ok = False
-        return {"exists": ok, **meta}
+        return self._status(self.faiss_file, self.faiss_meta)
 
     def build_annoy(self, trees: int = 50) -> bool:
         try:
@@ -92,73 +100,60 @@ class WorkspaceIndex:
         for i, v in enumerate(E):
             ann.add_item(i, v.tolist())
         ann.build(trees)
-        ann.save(str(self.ann_file))
+        # Cached handles mmap the old file: save a new one and swap it in
+        ann_maintenance._replace_with(self.ann_file, ann.save)
         self.ann_meta.write_text(json.dumps({"dim": dim, "size": len(E), "trees": trees}))
+        ann_handles.invalidate(self.ann_file)
         return True
 
     def search_annoy(self, embedder, query: str, top_k: int = 12) -> List[SearchResult]:
-        try:
-            from annoy import AnnoyIndex
-        except Exception:
-            return []
-        status = self.annoy_status()
-        if not status.get("exists"):
-            return []
-        q = embedder.embed_text(query)
-        ann = AnnoyIndex(status.get("dim", q.shape[0]), metric="angular")
-        if not ann.load(str(self.ann_file)):
+        handle = ann_handles.open_handle("annoy", self.ann_file, self.ann_meta)
+        if handle is None:
             return []
-        k = max(1, min(top_k, status.get("size", top_k)))
-        idx, _ = ann.get_nns_by_vector(q.tolist(), k, include_distances=True)
-        paths = self._load_paths()
-        # Re-rank using exact scores
-        E = np.load(self.emb_file)
-        sims = (E @ q).astype(float)
-        idx = sorted(idx, key=lambda i: -sims[i])[:k]
-        return [SearchResult(path=Path(paths[i]), score=float(sims[i])) for i in idx]
+        q = embedder.embed_text(query).astype("float32")
+        k = max(1, min(top_k, handle.size or top_k))
+        idx, _ = handle.query(q, k)
+        return self._rerank(q, idx, k)
 
-    def build_faiss(self) -> bool:
-        try:
-            import faiss  # type: ignore
-        except Exception:
+    def _rerank(self, q, idx: List[int], k: int) -> List[SearchResult]:
+        """Order ANN candidates by exact score against the resident embeddings."""
+        E = self._embeddings()
+        paths = self._load_paths()
+        if E is None or not idx:
+            return []
+        # Score only the candidate rows
+        rows = np.unique(np.asarray([i for i in idx if 0 <= i < len(paths)], dtype=np.int64))
+        sims = (np.asarray(E[rows]) @ q).astype(float)
+        order = np.argsort(-sims)[:k]
+        return [SearchResult(path=Path(paths[rows[j]]), score=float(sims[j])) for j in order]
+
+    def build_faiss(self, factory: str = "auto", target_recall: float = 0.95) -> bool:
+        if ann_handles.ann_library("faiss") is None:
             return False
         if not self.emb_file.exists():
             return False
-        E = np.load(self.emb_file)
+        E = np.load(self.emb_file, mmap_mode="r")
         if E.size == 0:
             return False
-        dim = int(E.shape[1])
-        index = faiss.IndexFlatIP(dim)
-        index.add(E.astype("float32"))
-        faiss.write_index(index, str(self.faiss_file))
-        self.faiss_meta.write_text(json.dumps({"dim": dim, "size": len(E)}))
-        return True
+        meta = faiss_factory.build_index_files(
+            E, self.faiss_file, self.faiss_meta, factory=factory, target_recall=target_recall
+        )
+        return meta is not None
 
     def search_faiss(self, embedder, query: str, top_k: int = 12) -> List[SearchResult]:
-        try:
-            import faiss  # type: ignore
-        except Exception:
-            return []
-        status = self.faiss_status()
-        if not status.get("exists"):
+        handle = ann_handles.open_handle("faiss", self.faiss_file, self.faiss_meta)
+        if handle is None:
             return []
         q = embedder.embed_text(query).astype("float32")
-        index = faiss.read_index(str(self.faiss_file))
-        k = max(1, min(top_k, status.get("size", top_k)))
-        D, I = index.search(q.reshape(1, -1), k)
-        E = np.load(self.emb_file)
-        sims = (E @ q).astype(float)
-        paths = self._load_paths()
-        # Re-rank
-        idx = I[0].tolist()
-        idx = sorted(idx, key=lambda i: -sims[i])[:k]
-        return [SearchResult(path=Path(paths[i]), score=float(sims[i])) for i in idx]
+        k = max(1, min(top_k, handle.size or top_k))
+        idx, _ = handle.query(q, k)
+        return self._rerank(q, idx, k)
 
     def search_exact(self, embedder, query: str, top_k: int = 12) -> List[SearchResult]:
-        if not self.emb_file.exists():
+        E = self._embeddings()
+        if E is None:
             return []
         q = embedder.embed_text(query)
-        E = np.load(self.emb_file)
         sims = (E @ q).astype(float)
         k = max(1, min(top_k, len(sims)))
         idx = np.argpartition(-sims, k - 1)[:k]
@@ -168,14 +163,7 @@ class WorkspaceIndex:
 
     # HNSW support
     def hnsw_status(self) -> dict:
-        ok = self.hnsw_file.exists() and self.hnsw_meta.exists()
-        meta = {}
-        if ok:
-            try:
-                meta = json.loads(self.hnsw_meta.read_text())
-            except Exception:
-                ok = False
-        return {"exists": ok, **meta}
+        return self._status(self.hnsw_file, self.hnsw_meta)
 
     def build_hnsw(self, M: int = 16, ef_construction: int = 200) -> bool:
         try:
@@ -194,25 +182,13 @@ class WorkspaceIndex:
         p.set_ef(50)
         p.save_index(str(self.hnsw_file))
         self.hnsw_meta.write_text(json.dumps({"dim": dim, "size": len(E), "M": M, "ef_construction": ef_construction}))
+        ann_handles.invalidate(self.hnsw_file)
         return True
 
     def search_hnsw(self, embedder, query: str, top_k: int = 12) -> List[SearchResult]:
-        try:
-            import hnswlib  # type: ignore
-        except Exception:
-            return self.search_exact(embedder, query, top_k=top_k)
-        status = self.hnsw_status()
-        if not status.get('exists'):
+        handle = ann_handles.open_handle("hnsw", self.hnsw_file, self.hnsw_meta)
+        if handle is None:
             return self.search_exact(embedder, query, top_k=top_k)
         q = embedder.embed_text(query).astype('float32')
-        p = hnswlib.Index(space='cosine', dim=status.get('dim', q.shape[0]))
-        p.load_index(str(self.hnsw_file))
-        p.set_ef(max(50, top_k))
-        labels, distances = p.knn_query(q, k=min(top_k, status.get('size', top_k)))
-        labs = labels[0].tolist()
-        # Re-rank with exact
-        E = np.load(self.emb_file)
-        exact = (E @ q).astype(float)
-        labs = sorted(labs, key=lambda i: -exact[i])[:top_k]
-        paths = self._load_paths()
-        return [SearchResult(path=Path(paths[i]), score=float(exact[i])) for i in labs]
+        labs, _ = handle.query(q, top_k)
+        return self._rerank(q, labs, top_k)
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""Benchmark image decode throughput with and without target-size decoding.
+
+Compares a full-resolution decode (``safe_open_image(path)`` followed by
+``load()``, which is what the embedders and ``img.copy()`` in the thumbnail
+cache used to trigger) against ``safe_open_image(path, target_size=N)`` for the
+sizes used by CLIP embedding (336) and thumbnails (512). Both variants then
+produce the same downstream result (a resize into the target box), so the
+numbers reflect end-to-end cost per photo, reported per file type.
+
+Without arguments a mixed synthetic corpus (large JPEGs, PNGs and WebPs) is
+generated in a temporary directory; pass files or folders to measure a real
+library instead.
+"""
+from __future__ import annotations
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import List, Optional
+
+ROOT = Path(__file__).resolve().parents[1]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+import numpy as np  # noqa: E402
+from PIL import Image  # noqa: E402
+
+from adapters.fs_scanner import safe_open_image  # noqa: E402
+
+EXTS = {".jpg", ".jpeg", ".png", ".webp", ".tif", ".tiff", ".bmp"}
+
+
+def make_corpus(root: Path, count: int, megapixels: float) -> List[Path]:
+    """Write ``count`` noisy photos cycling through JPEG, PNG and WebP."""
+    rng = np.random.default_rng(0)
+    w = int((megapixels * 1e6 * 4 / 3) ** 0.5)
+    h = int(w * 3 / 4)
+    base = rng.integers(0, 255, size=(h // 8, w // 8, 3), dtype=np.uint8)
+    frame = Image.fromarray(base).resize((w, h), Image.BILINEAR)
+    formats = [("JPEG", ".jpg"), ("JPEG", ".jpg"), ("PNG", ".png"), ("WEBP", ".webp")]
+    out: List[Path] = []
+    for i in range(count):
+        fmt, ext = formats[i % len(formats)]
+        p = root / f"img_{i:04d}{ext}"
+        frame.save(p, format=fmt, quality=90)
+        out.append(p)
+    return out
+
+
+def collect(paths: List[str]) -> List[Path]:
+    files: List[Path] = []
+    for raw in paths:
+        p = Path(raw)
+        if p.is_dir():
+            files.extend(x for x in sorted(p.rglob("*")) if x.suffix.lower() in EXTS)
+        elif p.is_file():
+            files.append(p)
+    return files
+
+
+def run(files: List[Path], target: Optional[int], box: int) -> float:
+    """Decode every file and fit it into ``box``; returns images/second."""
+    t0 = time.perf_counter()
+    for p in files:
+        img = safe_open_image(p, target_size=target)
+        if img is None:
+            continue
+        if target is None:
+            img.load()  # baseline: full-resolution decode
+        img.thumbnail((box, box))
+    dt = time.perf_counter() - t0
+    return len(files) / dt if dt else 0.0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Benchmark full vs target-size image decoding.")
+    parser.add_argument("paths", nargs="*", help="Image files or folders (default: synthetic corpus)")
+    parser.add_argument("--count", type=int, default=24, help="Synthetic corpus size")
+    parser.add_argument("--megapixels", type=float, default=24.0, help="Synthetic image size")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[336, 512], help="Target sizes to compare")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        files = collect(args.paths) if args.paths else make_corpus(Path(tmp), args.count, args.megapixels)
+        if not files:
+            print("No images found.", file=sys.stderr)
+            return 2
+        groups = {"all": files}
+        for p in files:
+            groups.setdefault(p.suffix.lower(), []).append(p)
+        print(f"corpus: {len(files)} files")
+        for size in args.sizes:
+            for kind, group in groups.items():
+                full = run(group, None, size)
+                reduced = run(group, size, size)
+                speedup = reduced / full if full else 0.0
+                print(
+                    f"target {size:>4}px {kind:>6} ({len(group):>3}): full {full:7.1f} img/s"
+                    f" | target-size {reduced:7.1f} img/s | x{speedup:.1f}"
+                )
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
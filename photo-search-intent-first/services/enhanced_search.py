@@ -1,17 +1,16 @@
 """
 Enhanced search service with temporal search, style similarity, and advanced filtering.
 """
-import json
 import numpy as np
 from pathlib import Path
 from typing import List, Dict, Any, Optional, Tuple
 from datetime import datetime
 from PIL import Image
-import cv2
-from sklearn.cluster import KMeans
 from collections import defaultdict
 
 from infra.index_store import IndexStore, SearchResult
+from infra.metadata_columns import ExifColumns, load_columns
+from infra.style_index import style_features, style_index_for_store, style_scores
 from domain.models import Photo
 
 
@@ -22,15 +21,38 @@ class EnhancedSearchService:
         self.store = store
         self._load_metadata()
     
+    @property
+    def meta_data(self) -> Optional[ExifColumns]:
+        return self._meta
+    
+    @meta_data.setter
+    def meta_data(self, value: Any) -> None:
+        # Accept the legacy parallel-list dict as well as loaded columns
+        if isinstance(value, dict):
+            value = ExifColumns.from_dict(value) if value.get('paths') else None
+        self._meta = value
+    
     def _load_metadata(self) -> None:
         """Load EXIF and other metadata for enhanced search capabilities."""
-        self.meta_data = {}
-        meta_p = self.store.index_dir / 'exif_index.json'
-        if meta_p.exists():
-            try:
-                self.meta_data = json.loads(meta_p.read_text())
-            except Exception:
-                self.meta_data = {}
+        try:
+            self.meta_data = load_columns(self.store.index_dir)
+        except Exception:
+            self.meta_data = None
+        self._mtime_of = {p: t for p, t in zip(self.store.state.paths or [], self.store.state.mtimes or [])}
+    
+    def _photo_datetime(self, path: str) -> datetime:
+        """EXIF capture time when recorded, otherwise the file modification time."""
+        meta = self.meta_data
+        row = meta.row_of(path) if meta is not None else None
+        if row is not None:
+            fields = meta.fields
+            for field in ('timestamp', 'datetime_original', 'datetime'):
+                if field in fields:
+                    timestamp = meta.value(field, row)
+                    if timestamp:
+                        # Parse timestamp string to datetime
+                        return datetime.strptime(str(timestamp), '%Y:%m:%d %H:%M:%S')
+        return datetime.fromtimestamp(self._mtime_of.get(path, 0))
     
     def temporal_search(self, 
                        query_time: Optional[float] = None,
@@ -152,69 +174,24 @@ class EnhancedSearchService:
     def _get_photo_hour(self, path: str) -> int:
         """Extract hour from photo timestamp."""
         try:
-            # Try to get from EXIF data first
-            if 'paths' in self.meta_data and path in self.meta_data.get('paths', []):
-                idx = self.meta_data['paths'].index(path)
-                timestamp_fields = ['timestamp', 'datetime_original', 'datetime']
-                for field in timestamp_fields:
-                    if field in self.meta_data:
-                        timestamp = self.meta_data[field][idx]
-                        if timestamp:
-                            # Parse timestamp string to datetime
-                            dt = datetime.strptime(timestamp, '%Y:%m:%d %H:%M:%S')
-                            return dt.hour
-            
-            # Fallback to file modification time
-            time_map = {p: t for p, t in zip(self.store.state.paths, self.store.state.mtimes)}
-            mtime = time_map.get(path, 0)
-            return datetime.fromtimestamp(mtime).hour
+            return self._photo_datetime(path).hour
         except Exception:
             return 0  # Default to midnight
-    
+
     def _get_photo_year(self, path: str) -> int:
         """Extract year from photo timestamp."""
         try:
-            # Try to get from EXIF data first
-            if 'paths' in self.meta_data and path in self.meta_data.get('paths', []):
-                idx = self.meta_data['paths'].index(path)
-                timestamp_fields = ['timestamp', 'datetime_original', 'datetime']
-                for field in timestamp_fields:
-                    if field in self.meta_data:
-                        timestamp = self.meta_data[field][idx]
-                        if timestamp:
-                            # Parse timestamp string to datetime
-                            dt = datetime.strptime(timestamp, '%Y:%m:%d %H:%M:%S')
-                            return dt.year
-            
-            # Fallback to file modification time
-            time_map = {p: t for p, t in zip(self.store.state.paths, self.store.state.mtimes)}
-            mtime = time_map.get(path, 0)
-            return datetime.fromtimestamp(mtime).year
+            return self._photo_datetime(path).year
         except Exception:
             return datetime.now().year
-    
+
     def _get_photo_month(self, path: str) -> int:
         """Extract month from photo timestamp."""
         try:
-            # Try to get from EXIF data first
-            if 'paths' in self.meta_data and path in self.meta_data.get('paths', []):
-                idx = self.meta_data['paths'].index(path)
-                timestamp_fields = ['timestamp', 'datetime_original', 'datetime']
-                for field in timestamp_fields:
-                    if field in self.meta_data:
-                        timestamp = self.meta_data[field][idx]
-                        if timestamp:
-                            # Parse timestamp string to datetime
-                            dt = datetime.strptime(timestamp, '%Y:%m:%d %H:%M:%S')
-                            return dt.month
-            
-            # Fallback to file modification time
-            time_map = {p: t for p, t in zip(self.store.state.paths, self.store.state.mtimes)}
-            mtime = time_map.get(path, 0)
-            return datetime.fromtimestamp(mtime).month
+            return self._photo_datetime(path).month
         except Exception:
             return 1  # Default to January
-    
+
     def style_similarity_search(self, 
                               reference_path: str,
                               top_k: int = 12,
@@ -234,160 +211,38 @@ class EnhancedSearchService:
         Returns:
             List of search results ordered by style similarity
         """
-        if not self.store.state.paths or not self.store.state.embeddings:
+        paths = self.store.state.paths
+        embeddings = self.store.state.embeddings
+        if not paths or embeddings is None or len(embeddings) == 0:
             return []
         
-        # Extract features from reference image
-        try:
-            ref_features = self._extract_visual_features(reference_path)
-        except Exception:
-            return []  # Failed to process reference image
-        
-        # Compare with all other images
-        similarities = []
-        for i, path in enumerate(self.store.state.paths):
-            if path == reference_path:
-                continue
-            
-            try:
-                # Extract features from current image
-                features = self._extract_visual_features(path)
-                
-                # Calculate similarity scores
-                color_sim = self._color_similarity(ref_features['color_histogram'], features['color_histogram'])
-                texture_sim = self._texture_similarity(ref_features['texture_features'], features['texture_features'])
-                style_sim = color_weight * color_sim + texture_weight * texture_sim
-                
-                # Combine with semantic similarity if available
-                semantic_sim = 0.0
-                if self.store.state.embeddings is not None:
-                    try:
-                        ref_idx = self.store.state.paths.index(reference_path)
-                        ref_emb = self.store.state.embeddings[ref_idx]
-                        curr_emb = self.store.state.embeddings[i]
-                        # Cosine similarity
-                        semantic_sim = float(np.dot(ref_emb, curr_emb) / 
-                                           (np.linalg.norm(ref_emb) * np.linalg.norm(curr_emb) + 1e-9))
-                    except Exception:
-                        semantic_sim = 0.0
-                
-                # Combined score
-                combined_score = (style_weight * style_sim + (1 - style_weight) * semantic_sim)
-                similarities.append((path, combined_score))
-            except Exception:
-                continue
-        
-        # Sort by similarity score
-        similarities.sort(key=lambda x: x[1], reverse=True)
-        
-        # Return top_k results
-        results = [SearchResult(path=Path(p), score=float(s)) for p, s in similarities[:top_k]]
-        return results
-    
-    def _extract_visual_features(self, image_path: str) -> Dict[str, Any]:
-        """
-        Extract visual features from an image for style similarity.
-        
-        Args:
-            image_path: Path to the image file
-            
-        Returns:
-            Dictionary containing visual features
-        """
-        # Load image
-        image = cv2.imread(image_path)
-        if image is None:
-            raise ValueError(f"Could not load image: {image_path}")
-        
-        # Resize for efficiency
-        image = cv2.resize(image, (224, 224))
-        
-        # Convert to different color spaces
-        hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
-        lab = cv2.cvtColor(image, cv2.COLOR_BGR2LAB)
-        
-        # Color histogram features
-        hist_b = cv2.calcHist([image], [0], None, [32], [0, 256]).flatten()
-        hist_g = cv2.calcHist([image], [1], None, [32], [0, 256]).flatten()
-        hist_r = cv2.calcHist([image], [2], None, [32], [0, 256]).flatten()
-        color_histogram = np.concatenate([hist_b, hist_g, hist_r])
-        color_histogram = color_histogram / (color_histogram.sum() + 1e-9)  # Normalize
-        
-        # Texture features using Local Binary Pattern (simplified)
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        texture_features = self._extract_texture_features(gray)
-        
-        # Dominant colors using K-means clustering
-        image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-        pixels = image_rgb.reshape((-1, 3))
-        kmeans = KMeans(n_clusters=5, random_state=42, n_init=10)
-        kmeans.fit(pixels)
-        dominant_colors = kmeans.cluster_centers_
-        
-        return {
-            'color_histogram': color_histogram,
-            'texture_features': texture_features,
-            'dominant_colors': dominant_colors,
-            'shape': image.shape[:2]  # Height, Width
-        }
-    
-    def _extract_texture_features(self, gray_image: np.ndarray) -> np.ndarray:
-        """
-        Extract texture features from grayscale image.
-        
-        Args:
-            gray_image: Grayscale image
-            
-        Returns:
-            Texture feature vector
-        """
-        # Simple texture features using gradient magnitude
-        grad_x = cv2.Sobel(gray_image, cv2.CV_64F, 1, 0, ksize=3)
-        grad_y = cv2.Sobel(gray_image, cv2.CV_64F, 0, 1, ksize=3)
-        magnitude = np.sqrt(grad_x**2 + grad_y**2)
-        
-        # Statistical features of gradient magnitude
-        mean_grad = np.mean(magnitude)
-        std_grad = np.std(magnitude)
-        texture_features = np.array([mean_grad, std_grad])
-        
-        return texture_features
-    
-    def _color_similarity(self, hist1: np.ndarray, hist2: np.ndarray) -> float:
-        """
-        Calculate color histogram similarity using correlation.
-        
-        Args:
-            hist1: First color histogram
-            hist2: Second color histogram
-            
-        Returns:
-            Similarity score between 0 and 1
-        """
-        # Normalize histograms
-        hist1_norm = hist1 / (np.sum(hist1) + 1e-9)
-        hist2_norm = hist2 / (np.sum(hist2) + 1e-9)
-        
-        # Correlation coefficient
-        correlation = np.correlate(hist1_norm, hist2_norm)[0]
-        return float(np.clip(correlation, 0, 1))
-    
-    def _texture_similarity(self, tex1: np.ndarray, tex2: np.ndarray) -> float:
-        """
-        Calculate texture feature similarity.
-        
-        Args:
-            tex1: First texture features
-            tex2: Second texture features
-            
-        Returns:
-            Similarity score between 0 and 1
-        """
-        # Euclidean distance normalized
-        distance = np.linalg.norm(tex1 - tex2)
-        # Convert distance to similarity (higher distance = lower similarity)
-        similarity = np.exp(-distance / (np.linalg.norm(tex1) + np.linalg.norm(tex2) + 1e-9))
-        return float(np.clip(similarity, 0, 1))
+        # Style features are precomputed per photo (see infra.style_index)
+        index = style_index_for_store(self.store)
+        if index is None:
+            return []
+        ref_row = index.row_of(reference_path)
+        ref_features = index.features(reference_path)
+        if ref_features is None:
+            ref_features = style_features(reference_path)
+            if ref_features is None:
+                return []  # Failed to process reference image
+        
+        scores = style_weight * style_scores(index.matrix, ref_features, color_weight, texture_weight)
+        
+        # Combine with semantic similarity when the reference is indexed
+        if ref_row is not None and len(embeddings) == len(paths):
+            E = np.asarray(embeddings, dtype=np.float32)
+            ref_emb = E[ref_row]
+            norms = np.linalg.norm(E, axis=1) * np.linalg.norm(ref_emb) + 1e-9
+            scores = scores + (1 - style_weight) * ((E @ ref_emb) / norms)
+        if ref_row is not None:
+            scores[ref_row] = -np.inf
+        
+        valid = int(np.isfinite(scores).sum())
+        if valid == 0:
+            return []
+        idx = IndexStore._top_indices(scores, min(top_k, valid))
+        return [SearchResult(path=Path(paths[i]), score=float(scores[i])) for i in idx]
     
     def combined_search(self,
                        query: str,
@@ -457,71 +312,43 @@ class EnhancedSearchService:
         # etc.
         
         filtered_results = results.copy()
+        meta = self.meta_data
+        if meta is None:
+            return filtered_results
+        
+        # Evaluate each filter once over the whole column, then look rows up
+        mask = np.ones(len(meta), dtype=bool)
+        active = False
         
         # Apply camera model filter
         camera_model = filters.get('camera')
-        if camera_model and self.meta_data:
-            filtered_results = [r for r in filtered_results if self._photo_has_camera(str(r.path), camera_model)]
+        if camera_model:
+            mask &= meta.contains('camera', str(camera_model))
+            active = True
         
         # Apply ISO range filter
         iso_min = filters.get('iso_min')
         iso_max = filters.get('iso_max')
-        if (iso_min is not None or iso_max is not None) and self.meta_data:
-            filtered_results = [r for r in filtered_results 
-                               if self._photo_iso_in_range(str(r.path), iso_min, iso_max)]
+        if iso_min is not None or iso_max is not None:
+            mask &= meta.range('iso', iso_min, iso_max)
+            active = True
         
         # Apply aperture range filter
         aperture_min = filters.get('aperture_min')
         aperture_max = filters.get('aperture_max')
-        if (aperture_min is not None or aperture_max is not None) and self.meta_data:
-            filtered_results = [r for r in filtered_results 
-                               if self._photo_aperture_in_range(str(r.path), aperture_min, aperture_max)]
-        
-        return filtered_results
+        if aperture_min is not None or aperture_max is not None:
+            field = 'fnumber' if 'fnumber' in meta.fields else 'f_number'
+            mask &= meta.range(field, aperture_min, aperture_max)
+            active = True
+        
+        if not active:
+            return filtered_results
+        return [r for r in filtered_results if self._row_in(mask, str(r.path))]
     
-    def _photo_has_camera(self, path: str, camera_model: str) -> bool:
-        """Check if photo was taken with specified camera model."""
-        try:
-            if 'paths' in self.meta_data and path in self.meta_data.get('paths', []):
-                idx = self.meta_data['paths'].index(path)
-                camera = self.meta_data.get('camera', [])[idx]
-                if camera and camera_model.lower() in str(camera).lower():
-                    return True
-        except Exception:
-            pass
-        return False
-    
-    def _photo_iso_in_range(self, path: str, iso_min: Optional[int], iso_max: Optional[int]) -> bool:
-        """Check if photo ISO is within specified range."""
-        try:
-            if 'paths' in self.meta_data and path in self.meta_data.get('paths', []):
-                idx = self.meta_data['paths'].index(path)
-                iso = self.meta_data.get('iso', [])[idx]
-                if iso is not None:
-                    if iso_min is not None and iso < iso_min:
-                        return False
-                    if iso_max is not None and iso > iso_max:
-                        return False
-                    return True
-        except Exception:
-            pass
-        return False
-    
-    def _photo_aperture_in_range(self, path: str, aperture_min: Optional[float], aperture_max: Optional[float]) -> bool:
-        """Check if photo aperture is within specified range."""
-        try:
-            if 'paths' in self.meta_data and path in self.meta_data.get('paths', []):
-                idx = self.meta_data['paths'].index(path)
-                f_number = self.meta_data.get('f_number', [])[idx]
-                if f_number is not None:
-                    if aperture_min is not None and f_number < aperture_min:
-                        return False
-                    if aperture_max is not None and f_number > aperture_max:
-                        return False
-                    return True
-        except Exception:
-            pass
-        return False
+    def _row_in(self, mask: np.ndarray, path: str) -> bool:
+        """Whether ``path`` has metadata and its row is set in ``mask``."""
+        row = self.meta_data.row_of(path) if self.meta_data is not None else None
+        return row is not None and bool(mask[row])
     
     def _rerank_combined_results(self, 
                                 results: List[SearchResult],
@@ -20,6 +20,9 @@ from adapters.fs_scanner import list_photos, safe_open_image
 
 logger = logging.getLogger(__name__)
 
+# Short side used when pre-checking that a photo decodes (JPEG draft mode makes this cheap)
+VALIDATE_DECODE_SIZE = 64
+
 
 @dataclass
 class IndexingStats:
@@ -325,7 +328,8 @@ class OptimizedIndexingService:
             """Safely load a single image."""
             i, path = i_p
             try:
-                img = safe_open_image(path)
+                # Only decodability is checked here; the embedder decodes again
+                img = safe_open_image(path, target_size=VALIDATE_DECODE_SIZE)
                 if img is not None:
                     if img.mode != 'RGB':
                         img = img.convert('RGB')
@@ -0,0 +1,485 @@
+"""
+QueryPlanner Service
+
+Compiles boolean search expressions into a plan evaluated over the whole
+library at once, replacing the per-photo RPN interpreter that server.py
+used to run for every search result.
+
+An expression such as ``camera:canon AND (tag:beach OR "sunset") NOT iso:>3200``
+is tokenised and parsed once. Each leaf becomes a boolean row mask aligned
+with ``store.state.paths``:
+
+- tag/rating: the label store's per-tag posting lists
+- person/filetype: photo sets resolved to rows once
+- camera/place and numeric EXIF fields: the columnar metadata store
+- mtime/date: the store's mtime array
+- free text, text:/caption:/ocr:: the FTS text index plus a vectorised
+  file-name match
+
+AND/OR/NOT are NumPy bitwise operations, so a complex expression over a large
+library costs a handful of array operations rather than one interpreter pass
+per photo.
+"""
+
+from __future__ import annotations
+
+import os
+import re
+import shlex
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+OPERATORS = ('AND', 'OR', 'NOT')
+PRECEDENCE = {'NOT': 3, 'AND': 2, 'OR': 1}
+
+STRING_FIELDS = ('camera', 'place')
+EXIF_NUMERIC_FIELDS = ('iso', 'fnumber', 'width', 'height', 'brightness', 'sharpness', 'exposure', 'focal')
+VIDEO_EXTS = ('.mp4', '.mov', '.mkv', '.avi', '.webm')
+# Fields _eval_term understands; any other ``word:`` is part of free text
+FIELDS = frozenset((
+    'text', 'caption', 'ocr', 'name', 'filename', 'filetype', 'ext', 'extension',
+    'tag', 'rating', 'person', 'has_text', 'date', 'size', 'mtime', 'duration',
+) + STRING_FIELDS + EXIF_NUMERIC_FIELDS)
+
+_NUMERIC_OP = re.compile(r'^\s*(>=|<=|==|>|<|=)?\s*(.+?)\s*$')
+_SIZE = re.compile(r'^(>=|<=|==|>|<|=)?(\d+(?:\.\d+)?)([kmg]?)b?$', re.IGNORECASE)
+_UNITS = {'': 1, 'k': 1024, 'm': 1024 ** 2, 'g': 1024 ** 3}
+
+
+# ---------------------------------------------------------------------------
+# Parsing
+# ---------------------------------------------------------------------------
+
+@dataclass(frozen=True)
+class Term:
+    """Leaf: ``field:value`` (field None for free text)."""
+    field: Optional[str]
+    value: str
+
+
+@dataclass(frozen=True)
+class Not:
+    child: 'Node'
+
+
+@dataclass(frozen=True)
+class And:
+    children: Tuple['Node', ...]
+
+
+@dataclass(frozen=True)
+class Or:
+    children: Tuple['Node', ...]
+
+
+@dataclass(frozen=True)
+class Const:
+    value: bool
+
+
+Node = Union[Term, Not, And, Or, Const]
+
+
+def tokenize(query: str) -> List[str]:
+    """Split a query, keeping quoted phrases together and parentheses separate.
+
+    Only upper-case AND/OR/NOT are operators; "dog and cat" is plain text.
+    """
+    try:
+        raw = shlex.split(query or '')
+    except ValueError:
+        raw = (query or '').split()
+    tokens: List[str] = []
+    for tok in raw:
+        # "(camera:canon" / "beach)" -> "(", "camera:canon" / "beach", ")"
+        while tok.startswith('(') and len(tok) > 1:
+            tokens.append('(')
+            tok = tok[1:]
+        closing = 0
+        while tok.endswith(')') and len(tok) > 1:
+            closing += 1
+            tok = tok[:-1]
+        tokens.append(tok)
+        tokens.extend(')' * closing)
+    return tokens
+
+
+def is_expression(tokens: Sequence[str]) -> bool:
+    """True when the tokens use boolean operators, grouping or field terms.
+
+    Plain natural-language queries are left to semantic ranking.
+    """
+    return any(t in OPERATORS or t in ('(', ')') or _field_of(t) is not None for t in tokens)
+
+
+def _field_of(token: str) -> Optional[str]:
+    if ':' not in token:
+        return None
+    field = token.split(':', 1)[0].lower()
+    return field if field in FIELDS else None
+
+
+def to_rpn(tokens: Sequence[str]) -> List[str]:
+    """Shunting-yard conversion of infix tokens to Reverse Polish Notation."""
+    output: List[str] = []
+    stack: List[str] = []
+    for tok in tokens:
+        if tok in OPERATORS:
+            while stack and stack[-1] != '(' and PRECEDENCE.get(stack[-1], 0) >= PRECEDENCE[tok]:
+                output.append(stack.pop())
+            stack.append(tok)
+        elif tok == '(':
+            stack.append(tok)
+        elif tok == ')':
+            while stack and stack[-1] != '(':
+                output.append(stack.pop())
+            if stack:
+                stack.pop()
+        else:
+            output.append(tok)
+    while stack:
+        op = stack.pop()
+        if op != '(':
+            output.append(op)
+    return output
+
+
+def _leaf(token: str) -> Term:
+    field = _field_of(token)
+    if field is None:
+        return Term(None, token.strip())
+    value = token.split(':', 1)[1].strip().strip('"').strip("'")
+    return Term(field, value)
+
+
+def compile_query(query: Union[str, Sequence[str]]) -> Optional[Node]:
+    """Parse ``query`` once into a plan tree; None for an empty query.
+
+    Missing operands evaluate to False; operands left over at the end are
+    combined with AND (``camera:canon iso:>800`` means both).
+    """
+    tokens = tokenize(query) if isinstance(query, str) else list(query)
+    if not tokens:
+        return None
+    stack: List[Node] = []
+    false = Const(False)
+    for tok in to_rpn(tokens):
+        if tok == 'NOT':
+            stack.append(Not(stack.pop() if stack else false))
+        elif tok in ('AND', 'OR'):
+            b = stack.pop() if stack else false
+            a = stack.pop() if stack else false
+            cls = And if tok == 'AND' else Or
+            # Flatten chains so evaluation is one reduction per level
+            parts: List[Node] = []
+            for side in (a, b):
+                parts.extend(side.children if isinstance(side, cls) else (side,))
+            stack.append(cls(tuple(parts)))
+        else:
+            stack.append(_leaf(tok))
+    if not stack:
+        return None
+    return stack[0] if len(stack) == 1 else And(tuple(stack))
+
+
+# ---------------------------------------------------------------------------
+# Library columns
+# ---------------------------------------------------------------------------
+
+class LibraryView:
+    """Row-aligned lookups over one IndexStore, each built on first use.
+
+    Path-derived columns (row ids, names, extensions, mtimes, file sizes)
+    live as long as the view, i.e. until the next index save. File sizes are
+    read on first use and can therefore lag a file edited since; ``size:``
+    catches up once the photo is re-indexed. Lookups backed by files that
+    change independently of the index (tags, EXIF, text) are dropped by
+    ``refresh()``.
+    """
+
+    VOLATILE = ('tags', 'exif', 'text_index')
+
+    def __init__(self, store) -> None:
+        self.store = store
+        self.paths: List[str] = list(store.state.paths or [])
+        self.n = len(self.paths)
+        self._cache: Dict[str, object] = {}
+
+    def refresh(self) -> 'LibraryView':
+        for key in self.VOLATILE:
+            self._cache.pop(key, None)
+        return self
+
+    def _memo(self, key: str, build: Callable[[], object]):
+        if key not in self._cache:
+            self._cache[key] = build()
+        return self._cache[key]
+
+    def none(self) -> np.ndarray:
+        return np.zeros(self.n, dtype=bool)
+
+    def row_of(self) -> Dict[str, int]:
+        return self._memo('row_of', lambda: {p: i for i, p in enumerate(self.paths)})
+
+    def rows_for(self, paths) -> np.ndarray:
+        """Mask of the rows whose path is in ``paths``."""
+        mask = self.none()
+        rows = self.row_of()
+        idx = [rows[p] for p in paths if p in rows]
+        if idx:
+            mask[np.asarray(idx, dtype=np.int64)] = True
+        return mask
+
+    def names(self) -> np.ndarray:
+        return self._memo('names', lambda: np.char.lower(np.asarray([Path(p).name for p in self.paths], dtype=str)))
+
+    def extensions(self) -> np.ndarray:
+        return self._memo('ext', lambda: np.asarray([os.path.splitext(p)[1].lower() for p in self.paths], dtype=object))
+
+    def mtimes(self) -> np.ndarray:
+        def _build():
+            mt = np.asarray(self.store.state.mtimes or [], dtype=float)
+            return mt if len(mt) == self.n else np.full(self.n, np.nan)
+        return self._memo('mtime', _build)
+
+    def exif(self):
+        def _build():
+            from infra.metadata_columns import columns_for_store
+            try:
+                return columns_for_store(self.store)
+            except Exception:
+                return None
+        return self._memo('exif', _build)
+
+    def tag_rows(self, tag: str) -> np.ndarray:
+        """Mask of the rows carrying ``tag``, from the tag's posting list."""
+        postings: Dict[str, np.ndarray] = self._memo('tags', dict)
+        if tag not in postings:
+            from infra.tags import paths_with_tags
+            postings[tag] = self.rows_for(paths_with_tags(self.store.index_dir, [tag]))
+        return postings[tag]
+
+    def text_index(self):
+        def _build():
+            try:
+                from infra.text_index import text_index_for_store
+                return text_index_for_store(self.store)
+            except Exception:
+                return None
+        return self._memo('text_index', _build)
+
+    def sizes(self) -> np.ndarray:
+        def _build():
+            out = np.full(self.n, np.nan)
+            for i, p in enumerate(self.paths):
+                try:
+                    out[i] = os.stat(p).st_size
+                except OSError:
+                    pass
+            return out
+        return self._memo('size', _build)
+
+
+_views: Dict[str, Tuple[tuple, LibraryView]] = {}
+_views_lock = threading.Lock()
+
+
+def view_for(store) -> LibraryView:
+    """Shared LibraryView for ``store``, rebuilt when its index files change."""
+    key = str(store.index_dir)
+    stamp = (store.generation(), len(store.state.paths or []))
+    with _views_lock:
+        cached = _views.get(key)
+        if cached is not None and cached[0] == stamp and cached[1].store is store:
+            view = cached[1]
+        else:
+            view = LibraryView(store)
+            _views[key] = (stamp, view)
+    return view.refresh()
+
+
+# ---------------------------------------------------------------------------
+# Leaf evaluation
+# ---------------------------------------------------------------------------
+
+def _compare(values: np.ndarray, op: str, target: float) -> np.ndarray:
+    with np.errstate(invalid='ignore'):
+        if op == '>=':
+            return values >= target
+        if op == '<=':
+            return values <= target
+        if op == '>':
+            return values > target
+        if op == '<':
+            return values < target
+        return np.abs(values - target) < 1e-6
+
+
+def _parse_numeric(value: str) -> Tuple[Optional[str], Optional[float]]:
+    m = _NUMERIC_OP.match(value or '')
+    if not m:
+        return None, None
+    op = m.group(1) or '='
+    try:
+        return ('=' if op == '==' else op), float(m.group(2))
+    except ValueError:
+        return None, None
+
+
+def _text_mask(view: LibraryView, value: str, fields: Sequence[str], include_names: bool) -> np.ndarray:
+    """Rows whose OCR/caption text matches ``value`` (word prefix) or whose file name contains it."""
+    mask = view.none()
+    if not value:
+        return mask
+    index = view.text_index()
+    if index is not None and fields:
+        try:
+            mask |= view.rows_for(p for p, _ in index.search(value, fields=list(fields)))
+        except Exception:
+            pass
+    if include_names and view.n:
+        mask |= np.char.find(view.names(), value.lower()) >= 0
+    return mask
+
+
+def _duration_mask(view: LibraryView, op: str, target: float) -> np.ndarray:
+    """Video durations are probed only for the rows that are videos."""
+    mask = view.none()
+    video_rows = np.flatnonzero(np.isin(view.extensions(), VIDEO_EXTS))
+    if not len(video_rows):
+        return mask
+    from adapters.video_processor import get_video_metadata
+    for r in video_rows:
+        try:
+            d = float((get_video_metadata(Path(view.paths[r])) or {}).get('duration') or 0.0)
+        except Exception:
+            continue
+        mask[r] = bool(_compare(np.asarray([d]), op, target)[0])
+    return mask
+
+
+def _eval_term(term: Term, view: LibraryView) -> np.ndarray:
+    field, value = term.field, term.value
+    if field is None or field == 'text':
+        return _text_mask(view, value, ('ocr', 'caption'), include_names=True)
+    if field == 'caption':
+        return _text_mask(view, value, ('caption',), include_names=False)
+    if field == 'ocr':
+        return _text_mask(view, value, ('ocr',), include_names=False)
+    if field in ('name', 'filename'):
+        return np.char.find(view.names(), value.lower()) >= 0 if view.n else view.none()
+    if field in ('filetype', 'ext', 'extension'):
+        return view.extensions() == '.' + value.lower().lstrip('.')
+    if field in ('tag', 'rating'):
+        return view.tag_rows(value if field == 'tag' else f'rating:{value}')
+    if field == 'person':
+        try:
+            from infra.faces import photos_for_person
+            return view.rows_for(photos_for_person(view.store.index_dir, value))
+        except Exception:
+            return view.none()
+    if field == 'has_text':
+        index = view.text_index()
+        if index is None or not view.store.ocr_texts_file.exists():
+            has = view.none()
+        else:
+            has = view.rows_for(index.paths_with_text('ocr'))
+        return has if value == '' or value.lower() in ('1', 'true', 'yes', 'y') else ~has
+    if field in STRING_FIELDS:
+        cols = view.exif()
+        return cols.contains(field, value) if cols is not None and value else view.none()
+    if field == 'date':
+        m = _NUMERIC_OP.match(value or '')
+        try:
+            op = (m.group(1) or '=') if m else '='
+            target = datetime.strptime(m.group(2), '%Y-%m-%d').timestamp() if m else None
+        except ValueError:
+            target = None
+        if target is None:
+            return view.none()
+        return _compare(view.mtimes(), '=' if op == '==' else op, target)
+    if field == 'size':
+        m = _SIZE.match(value.replace(' ', ''))
+        if not m:
+            return view.none()
+        op = m.group(1) or '='
+        return _compare(view.sizes(), '=' if op == '==' else op, float(m.group(2)) * _UNITS[m.group(3).lower()])
+    op, target = _parse_numeric(value)
+    if op is None:
+        return view.none()
+    if field == 'mtime':
+        return _compare(view.mtimes(), op, target)
+    if field in EXIF_NUMERIC_FIELDS:
+        cols = view.exif()
+        return _compare(cols.numeric(field), op, target) if cols is not None else view.none()
+    if field == 'duration':
+        return _duration_mask(view, op, target)
+    return view.none()
+
+
+def evaluate(plan: Optional[Node], view: LibraryView) -> np.ndarray:
+    """Evaluate a compiled plan to a boolean mask over ``view``'s rows."""
+    if plan is None:
+        return np.ones(view.n, dtype=bool)
+    leaves: Dict[Term, np.ndarray] = {}
+
+    def _eval(node: Node) -> np.ndarray:
+        if isinstance(node, Term):
+            if node not in leaves:
+                try:
+                    leaves[node] = np.asarray(_eval_term(node, view), dtype=bool)
+                except Exception:
+                    leaves[node] = view.none()
+            return leaves[node]
+        if isinstance(node, Const):
+            return np.full(view.n, node.value, dtype=bool)
+        if isinstance(node, Not):
+            return ~_eval(node.child)
+        parts = [_eval(c) for c in node.children]
+        return np.logical_and.reduce(parts) if isinstance(node, And) else np.logical_or.reduce(parts)
+
+    return _eval(plan)
+
+
+def expression_subset(store, query: str) -> Optional[List[int]]:
+    """Row ids satisfying the boolean expression in ``query``, for ``subset=``.
+
+    None when ``query`` is not an expression. Passing the rows to the store
+    search applies the expression before ranking, so a restrictive expression
+    still fills the page instead of thinning out the semantic top-k.
+    """
+    tokens = tokenize(query or '')
+    if not tokens or not is_expression(tokens):
+        return None
+    return np.flatnonzero(evaluate(compile_query(tokens), view_for(store))).tolist()
+
+
+def filter_results(store, results: List, query: str) -> List:
+    """Keep the results whose photo satisfies the boolean expression in ``query``.
+
+    Queries without operators, grouping or ``field:value`` terms are returned
+    unchanged.
+    """
+    tokens = tokenize(query)
+    if not tokens or not is_expression(tokens):
+        return results
+    view = view_for(store)
+    mask = evaluate(compile_query(tokens), view)
+    rows = view.row_of()
+    out = []
+    for r in results:
+        i = rows.get(str(r.path))
+        if i is not None and mask[i]:
+            out.append(r)
+    return out
+
+
+__all__ = [
+    "And", "Const", "LibraryView", "Not", "Or", "Term",
+    "compile_query", "evaluate", "expression_subset", "view_for", "filter_results", "is_expression", "to_rpn", "tokenize",
+]
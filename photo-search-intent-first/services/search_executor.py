@@ -32,8 +32,12 @@ class SearchMode:
 class SearchExecutor:
     """Service for executing semantic searches with multiple modes."""
     
-    def execute_search(self, store, embedder, unified_req: UnifiedSearchRequest) -> List:
-        """Perform the core semantic search operation with all search modes."""
+    def execute_search(self, store, embedder, unified_req: UnifiedSearchRequest,
+                       subset: Optional[List[int]] = None) -> List:
+        """Perform the core semantic search operation with all search modes.
+
+        ``subset`` restricts ranking to those store rows (a pre-compiled filter).
+        """
         try:
             # Extract legacy parameters for compatibility
             legacy_params = unified_req.to_legacy_param_dict()
@@ -46,15 +50,15 @@ class SearchExecutor:
             
             # Execute search based on mode
             if search_mode == SearchMode.FAST:
-                return self._execute_fast_search(store, embedder, query_value, legacy_params)
+                return self._execute_fast_search(store, embedder, query_value, legacy_params, subset)
             elif search_mode == SearchMode.CAPTIONS:
-                return self._execute_caption_search(store, embedder, query_value, legacy_params)
+                return self._execute_caption_search(store, embedder, query_value, legacy_params, subset)
             elif search_mode == SearchMode.OCR:
-                return self._execute_ocr_search(store, embedder, query_value, legacy_params)
+                return self._execute_ocr_search(store, embedder, query_value, legacy_params, subset)
             elif search_mode == SearchMode.REGULAR:
-                return self._execute_regular_search(store, embedder, query_value, unified_req, legacy_params)
+                return self._execute_regular_search(store, embedder, query_value, unified_req, legacy_params, subset)
             elif search_mode == SearchMode.ALL_PHOTOS:
-                return self._execute_all_photos_search(store)
+                return self._execute_all_photos_search(store, subset)
             else:
                 raise ValueError(f"Unknown search mode: {search_mode}")
                 
@@ -79,10 +83,11 @@ class SearchExecutor:
         else:
             return SearchMode.REGULAR
     
-    def _execute_fast_search(self, store, embedder, query_value: str, legacy_params: Dict[str, Any]) -> List:
+    def _execute_fast_search(self, store, embedder, query_value: str, legacy_params: Dict[str, Any],
+                             subset: Optional[List[int]] = None) -> List:
         """Execute search using fast indexing."""
         try:
-            from infra.fast_index_manager import FastIndexManager
+            from infra.fast_index import FastIndexManager
             fim = FastIndexManager(store)
             
             top_k_value = legacy_params.get("top_k", 48)
@@ -92,59 +97,42 @@ class SearchExecutor:
                 embedder, query_value, 
                 top_k=top_k_value, 
                 use_fast=True, 
-                fast_kind_hint=fast_kind_value
+                fast_kind_hint=fast_kind_value,
+                subset=subset,
             )
             return results
         except Exception:
             # Fallback to regular search mode
-            return self._execute_regular_search_fallback(store, embedder, query_value, legacy_params)
+            return self._execute_regular_search_fallback(store, embedder, query_value, legacy_params, subset)
     
-    def _execute_caption_search(self, store, embedder, query_value: str, legacy_params: Dict[str, Any]) -> List:
+    def _execute_caption_search(self, store, embedder, query_value: str, legacy_params: Dict[str, Any],
+                                subset: Optional[List[int]] = None) -> List:
         """Execute search using captions."""
         top_k_value = legacy_params.get("top_k", 48)
-        return store.search_with_captions(embedder, query_value, top_k_value)
+        return store.search_with_captions(embedder, query_value, top_k_value, subset=subset)
     
-    def _execute_ocr_search(self, store, embedder, query_value: str, legacy_params: Dict[str, Any]) -> List:
+    def _execute_ocr_search(self, store, embedder, query_value: str, legacy_params: Dict[str, Any],
+                            subset: Optional[List[int]] = None) -> List:
         """Execute search using OCR text."""
         top_k_value = legacy_params.get("top_k", 48)
-        return store.search_with_ocr(embedder, query_value, top_k_value)
+        return store.search_with_ocr(embedder, query_value, top_k_value, subset=subset)
     
     def _execute_regular_search(self, store, embedder, query_value: str, 
-                              unified_req: UnifiedSearchRequest, legacy_params: Dict[str, Any]) -> List:
+                              unified_req: UnifiedSearchRequest, legacy_params: Dict[str, Any],
+                              subset: Optional[List[int]] = None) -> List:
         """Execute regular embedding-based search."""
         top_k_value = legacy_params.get("top_k", 48)
-        use_captions_value = bool(legacy_params.get("use_captions"))
-        use_fast_value = bool(legacy_params.get("use_fast"))
-        fast_kind_value = legacy_params.get("fast_kind")
-        use_ocr_value = bool(legacy_params.get("use_ocr"))
-        
-        return store.search(
-            embedder,
-            query_value,
-            top_k=top_k_value,
-            similarity_threshold=unified_req.similarity_threshold,
-            use_captions=use_captions_value,
-            use_fast=use_fast_value,
-            fast_kind=fast_kind_value,
-            use_ocr=use_ocr_value,
-        )
+        return store.search(embedder, query_value, top_k=top_k_value, subset=subset)
     
-    def _execute_regular_search_fallback(self, store, embedder, query_value: str, legacy_params: Dict[str, Any]) -> List:
+    def _execute_regular_search_fallback(self, store, embedder, query_value: str, legacy_params: Dict[str, Any],
+                                         subset: Optional[List[int]] = None) -> List:
         """Fallback regular search when fast search fails."""
         top_k_value = legacy_params.get("top_k", 48)
-        use_captions_value = bool(legacy_params.get("use_captions"))
-        use_ocr_value = bool(legacy_params.get("use_ocr"))
-        
-        return store.search(
-            embedder,
-            query_value,
-            top_k=top_k_value,
-            use_captions=use_captions_value,
-            use_fast=False,  # Explicitly disable fast search for fallback
-            use_ocr=use_ocr_value,
-        )
+        return store.search(embedder, query_value, top_k=top_k_value, subset=subset)
     
-    def _execute_all_photos_search(self, store) -> List[SearchResult]:
-        """Return all indexed photos when no query is provided."""
+    def _execute_all_photos_search(self, store, subset: Optional[List[int]] = None) -> List[SearchResult]:
+        """Return all indexed photos (the ``subset`` rows, if given) when no query is provided."""
         paths = store.state.paths or []
-        return [SearchResult(path=Path(p), score=1.0) for p in paths]
\ No newline at end of file
+        if subset is not None:
+            paths = [paths[i] for i in subset]
+        return [SearchResult(path=Path(p), score=1.0) for p in paths]
@@ -0,0 +1,160 @@
+"""
+Thumbnail serving that never touches the embeddings.
+
+A gallery page fires one ``GET /thumb`` per photo. The handlers used to load
+the whole search index (embeddings included) and rebuild a path -> mtime dict
+for every request. This service keeps only what a thumbnail lookup needs:
+
+- a per-folder path -> mtime map read from ``paths.json`` and revalidated
+  with a single ``stat``;
+- the cache key of each thumbnail (``infra.thumbs._thumb_name``), which is
+  also its HTTP validator, since it changes whenever the photo's indexed
+  mtime or the requested size does;
+- request coalescing, so concurrent requests for the same uncached
+  thumbnail decode the photo once while the others wait for the result.
+"""
+import json
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from infra.thumbs import _thumb_name, _thumbs_dir, get_or_create_thumb
+
+# Index created by the default local provider, preferred by the fallback scan
+PREFERRED_INDEX = "st-clip-ViT-B-32"
+
+
+@dataclass(frozen=True)
+class Thumb:
+    path: Path
+    etag: str
+    mtime: float
+
+
+class _MtimeIndex:
+    """path -> mtime for one folder, reloaded when its ``paths.json`` changes."""
+
+    def __init__(self, index_dir: Path, folder: Optional[Path] = None) -> None:
+        self.index_dir = index_dir
+        # With PS_APPDATA_DIR the folder's own .photo_index is a separate base
+        self.bases = [index_dir.parent]
+        if folder is not None and folder / ".photo_index" != index_dir.parent:
+            self.bases.append(folder / ".photo_index")
+        self.source: Optional[Path] = None
+        self.stamp: Optional[Tuple[int, int]] = None
+        self.mtimes: Dict[str, float] = {}
+
+    def _candidates(self):
+        yield self.index_dir / "paths.json"
+        # Fall back to any sibling index (e.g. built by another provider)
+        for base in self.bases:
+            yield base / PREFERRED_INDEX / "paths.json"
+            try:
+                subs = sorted(base.iterdir())
+            except OSError:
+                continue
+            for sub in subs:
+                if sub.is_dir():
+                    yield sub / "paths.json"
+
+    @staticmethod
+    def _stat(path: Optional[Path]) -> Optional[Tuple[int, int]]:
+        if path is None:
+            return None
+        try:
+            st = path.stat()
+        except OSError:
+            return None
+        return st.st_mtime_ns, st.st_size
+
+    def refresh(self) -> None:
+        default = self.index_dir / "paths.json"
+        if (
+            self.source is not None
+            and self._stat(self.source) == self.stamp
+            and (self.source == default or self._stat(default) is None)
+        ):
+            return
+        for cand in self._candidates():
+            stamp = self._stat(cand)
+            if stamp is None:
+                continue
+            try:
+                data = json.loads(cand.read_text(encoding="utf-8"))
+            except Exception:
+                continue
+            paths = data.get("paths", []) or []
+            if not paths:
+                continue
+            mtimes = data.get("mtimes", []) or []
+            self.mtimes = {str(p): float(mtimes[i]) if i < len(mtimes) else 0.0 for i, p in enumerate(paths)}
+            self.source, self.stamp = cand, stamp
+            return
+        self.source, self.stamp, self.mtimes = None, None, {}
+
+
+class ThumbnailService:
+    """Resolves, generates and caches photo thumbnails for HTTP serving."""
+
+    def __init__(self, wait_timeout: float = 30.0):
+        self.wait_timeout = wait_timeout
+        self._lock = threading.Lock()
+        self._index_dirs: Dict[str, Path] = {}
+        self._mtimes: Dict[str, _MtimeIndex] = {}
+        self._inflight: Dict[str, threading.Event] = {}
+        self.stats = {"hits": 0, "generated": 0, "coalesced": 0}
+
+    def index_dir(self, folder: Path) -> Path:
+        """Index directory whose ``thumbs/`` holds the folder's thumbnails."""
+        key = str(folder)
+        with self._lock:
+            d = self._index_dirs.get(key)
+        if d is None:
+            # Only resolves the directory; nothing is loaded
+            from infra.index_store import IndexStore
+            d = IndexStore(folder).index_dir
+            with self._lock:
+                self._index_dirs[key] = d
+        return d
+
+    def mtime_of(self, folder: Path, path: str) -> float:
+        """Indexed mtime of ``path`` (0.0 when the photo is not indexed)."""
+        d = self.index_dir(folder)
+        with self._lock:
+            idx = self._mtimes.get(str(d))
+            if idx is None:
+                idx = self._mtimes[str(d)] = _MtimeIndex(d, Path(folder))
+            idx.refresh()
+            return idx.mtimes.get(path, 0.0)
+
+    def get(self, folder: Path, path: str, size: int = 256) -> Optional[Thumb]:
+        """Return the cached thumbnail for ``path``, generating it at most once."""
+        index_dir = self.index_dir(folder)
+        mtime = self.mtime_of(folder, path)
+        name = _thumb_name(Path(path), mtime, size)
+        thumb = Thumb(path=_thumbs_dir(index_dir) / name, etag=name.rsplit(".", 1)[0], mtime=mtime)
+        if thumb.path.exists():
+            self.stats["hits"] += 1
+            return thumb
+
+        with self._lock:
+            event = self._inflight.get(name)
+            leader = event is None
+            if leader:
+                event = self._inflight[name] = threading.Event()
+        if not leader:
+            self.stats["coalesced"] += 1
+            event.wait(self.wait_timeout)
+            return thumb if thumb.path.exists() else None
+        try:
+            created = get_or_create_thumb(index_dir, Path(path), mtime, size=size)
+            self.stats["generated"] += 1
+            return thumb if created is not None and created.exists() else None
+        finally:
+            with self._lock:
+                self._inflight.pop(name, None)
+            event.set()
+
+
+thumbnail_service = ThumbnailService()
@@ -0,0 +1,125 @@
+import json
+import os
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+
+from infra import ann_handles
+from infra.index_store import IndexStore
+
+
+class _Embedder:
+    def __init__(self, q):
+        self.q = q
+
+    def embed_text(self, query):
+        return self.q
+
+
+def _fake_hnswlib(loads):
+    class Index:
+        def __init__(self, space, dim):
+            self.dim = dim
+
+        def load_index(self, path):
+            loads.append(path)
+            self.E = np.load(path + ".npy")
+
+        def set_ef(self, ef):
+            self.ef = ef
+
+        def knn_query(self, q, k):
+            sims = self.E @ q
+            order = np.argsort(-sims)[:k]
+            return order[None, :], (1.0 - sims[order])[None, :]
+
+    return SimpleNamespace(Index=Index)
+
+
+def test_hnsw_handle_is_resident_until_rebuilt(tmp_path: Path, monkeypatch) -> None:
+    loads = []
+    lib = _fake_hnswlib(loads)
+    monkeypatch.setattr(ann_handles, "ann_library", lambda kind: lib if kind == "hnsw" else None)
+    ann_handles.invalidate()
+
+    store = IndexStore(tmp_path)
+    E = np.eye(4, dtype=np.float32)
+    store.state.paths = [str(tmp_path / f"{i}.jpg") for i in range(4)]
+    store.state.embeddings = E
+
+    def write_index(matrix):
+        np.save(str(store.hnsw_file) + ".npy", matrix)
+        store.hnsw_file.write_bytes(os.urandom(len(loads) + 8))
+        store.hnsw_meta_file.write_text(json.dumps({"dim": 4, "size": len(matrix)}))
+
+    write_index(E)
+    emb = _Embedder(np.array([0, 0, 1, 0], dtype=np.float32))
+    for _ in range(3):
+        assert str(store.search_hnsw(emb, "q", top_k=1)[0].path).endswith("2.jpg")
+    assert len(loads) == 1
+    assert store.hnsw_status()["size"] == 4
+
+    # The rebuilt artifact (rows reversed) is picked up on the next query
+    write_index(E[::-1].copy())
+    assert str(store.search_hnsw(emb, "q", top_k=1)[0].path).endswith("1.jpg")
+    assert len(loads) == 2
+    ann_handles.invalidate()
+
+
+def test_missing_artifacts_are_not_cached(tmp_path: Path) -> None:
+    meta = tmp_path / "x.meta.json"
+    assert ann_handles.read_meta(meta) is None
+    meta.write_text(json.dumps({"dim": 3}))
+    assert ann_handles.read_meta(meta) == {"dim": 3}
+    assert ann_handles.open_handle("hnsw", tmp_path / "x.index", meta) is None
+
+
+class _RowsOnly:
+    """Embedding matrix that only allows gathering rows, never a full matmul."""
+
+    def __init__(self, E):
+        self.E = E
+        self.gathered = []
+        self.shape = E.shape
+
+    def __len__(self):
+        return len(self.E)
+
+    def __getitem__(self, rows):
+        self.gathered.append(len(rows))
+        return self.E[rows]
+
+
+def test_fast_search_reranks_only_candidates(tmp_path: Path, monkeypatch) -> None:
+    from infra import fast_index
+
+    loads = []
+    lib = _fake_hnswlib(loads)
+    monkeypatch.setattr(ann_handles, "ann_library", lambda kind: lib if kind == "hnsw" else None)
+    monkeypatch.setattr(fast_index, "ann_library", ann_handles.ann_library)
+    ann_handles.invalidate()
+
+    rng = np.random.default_rng(0)
+    E = rng.normal(size=(200, 8)).astype(np.float32)
+    E /= np.linalg.norm(E, axis=1, keepdims=True)
+    store = IndexStore(tmp_path)
+    store.state.paths = [str(tmp_path / f"{i}.jpg") for i in range(200)]
+    np.save(str(store.hnsw_file) + ".npy", E)
+    store.hnsw_file.write_bytes(b"x")
+    store.hnsw_meta_file.write_text(json.dumps({"dim": 8, "size": 200}))
+    rows = _RowsOnly(E)
+    store.state.embeddings = rows
+
+    emb = _Embedder(E[7])
+    res, meta = fast_index.FastIndexManager(store).search(emb, "q", top_k=5, use_fast=True, oversample=3.0, ef=80)
+    assert meta["backend"] == "hnsw"
+    assert str(res[0].path).endswith("7.jpg") and len(res) == 5
+    assert rows.gathered == [15]
+    assert meta["ann"]["candidates"] == 15 and meta["ann"]["ef"] == 80
+    assert {"ann_ms", "rerank_ms"} <= set(meta["ann"])
+
+    store.state.embeddings = E
+    _, meta = fast_index.FastIndexManager(store).search(emb, "q", top_k=5, use_fast=True, measure_recall=True)
+    assert meta["ann"]["recall"] == 1.0
+    ann_handles.invalidate()
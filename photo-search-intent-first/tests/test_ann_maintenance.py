@@ -0,0 +1,184 @@
+import json
+import threading
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+
+from infra import ann_handles, ann_maintenance
+from infra.index_store import IndexStore
+
+
+class _Hnsw:
+    """hnswlib stand-in persisting labels, vectors and deletions to an .npz file."""
+
+    def __init__(self, space, dim):
+        self.labels = np.zeros(0, dtype=np.int64)
+        self.E = np.zeros((0, dim), dtype=np.float32)
+        self.deleted = np.zeros(0, dtype=bool)
+
+    def init_index(self, max_elements, ef_construction, M):
+        pass
+
+    def add_items(self, data, ids=None):
+        ids = np.arange(len(self.labels), len(self.labels) + len(data)) if ids is None else np.asarray(ids)
+        self.labels = np.concatenate([self.labels, ids])
+        self.E = np.vstack([self.E, data])
+        self.deleted = np.concatenate([self.deleted, np.zeros(len(data), dtype=bool)])
+
+    def mark_deleted(self, label):
+        self.deleted[self.labels == label] = True
+
+    def set_ef(self, ef):
+        pass
+
+    def get_current_count(self):
+        return len(self.labels)
+
+    def save_index(self, path):
+        with open(path, "wb") as f:
+            np.savez(f, labels=self.labels, E=self.E, deleted=self.deleted)
+
+    def load_index(self, path, max_elements=0):
+        data = np.load(path)
+        self.labels, self.E, self.deleted = data["labels"], data["E"], data["deleted"]
+
+    def knn_query(self, q, k):
+        sims = np.where(self.deleted, -np.inf, self.E @ q)
+        order = np.argsort(-sims)[:k]
+        return self.labels[order][None, :], (1.0 - sims[order])[None, :]
+
+
+class _Annoy:
+    def __init__(self, dim, metric):
+        self.items = {}
+
+    def add_item(self, i, v):
+        self.items[i] = np.asarray(v, dtype=np.float32)
+
+    def build(self, trees):
+        pass
+
+    def save(self, path):
+        with open(path, "wb") as f:
+            np.save(f, np.stack([self.items[i] for i in sorted(self.items)]))
+
+    def load(self, path):
+        self.items = dict(enumerate(np.load(path)))
+        return True
+
+    def get_nns_by_vector(self, v, k, search_k=-1, include_distances=False):
+        ids = sorted(self.items, key=lambda i: -float(self.items[i] @ np.asarray(v)))[:k]
+        return ids, [float(np.sqrt(max(0.0, 2 - 2 * float(self.items[i] @ np.asarray(v))))) for i in ids]
+
+
+class _Embedder:
+    def __init__(self):
+        self.q = None
+
+    def embed_text(self, query):
+        return self.q
+
+
+def _store(tmp_path: Path, monkeypatch, n: int = 6) -> IndexStore:
+    libs = {"hnsw": SimpleNamespace(Index=_Hnsw), "annoy": SimpleNamespace(AnnoyIndex=_Annoy)}
+    monkeypatch.setattr(ann_handles, "ann_library", lambda kind: libs.get(kind))
+    ann_handles.invalidate()
+    store = IndexStore(tmp_path)
+    store.state.paths = [str(tmp_path / f"{i}.jpg") for i in range(n)]
+    store.state.mtimes = [0.0] * n
+    store.state.embeddings = np.eye(8, dtype=np.float32)[:n].copy()
+    store.save()
+    return store
+
+
+def _upsert(store: IndexStore, drop: str, add: str, vector: np.ndarray) -> None:
+    keep = [i for i, p in enumerate(store.state.paths) if not p.endswith(drop)]
+    store.state.paths = [store.state.paths[i] for i in keep] + [add]
+    store.state.mtimes = [0.0] * len(store.state.paths)
+    store.state.embeddings = np.vstack([store.state.embeddings[keep], vector[None, :]])
+    store.save()
+
+
+def test_hnsw_follows_upserts_and_deletes(tmp_path: Path, monkeypatch) -> None:
+    store = _store(tmp_path, monkeypatch)
+    assert store.build_hnsw()
+    new = np.zeros(8, dtype=np.float32)
+    new[7] = 1.0
+    _upsert(store, "2.jpg", str(tmp_path / "new.jpg"), new)
+
+    status = store.hnsw_status()
+    assert not status["stale"] and status["deleted"] == 1 and status["size"] == 6
+    emb = _Embedder()
+    emb.q = new
+    results, info = store.ann_search("hnsw", emb, "q", top_k=1)
+    assert results[0].path.name == "new.jpg" and info["backend"] == "hnsw"
+
+    # Labels were remapped: 3.jpg moved from row 3 to row 2
+    emb.q = np.eye(8, dtype=np.float32)[3]
+    assert store.ann_search("hnsw", emb, "q", top_k=1)[0][0].path.name == "3.jpg"
+    emb.q = np.eye(8, dtype=np.float32)[2]
+    assert all(r.path.name != "2.jpg" for r in store.ann_search("hnsw", emb, "q", top_k=6)[0])
+
+    # An artifact that missed a generation is never served
+    meta = ann_handles.read_meta(store.hnsw_meta_file)
+    store.hnsw_meta_file.write_text(json.dumps({**meta, "generation": -5}))
+    assert store.hnsw_status()["stale"]
+    assert store.ann_search("hnsw", emb, "q", top_k=1)[1]["fallback"]
+
+
+def test_annoy_delta_is_searched_then_rebuilt(tmp_path: Path, monkeypatch) -> None:
+    store = _store(tmp_path, monkeypatch)
+    assert store.build_annoy(trees=3)
+    new = np.zeros(8, dtype=np.float32)
+    new[7] = 1.0
+    _upsert(store, "0.jpg", str(tmp_path / "new.jpg"), new)
+
+    status = store.annoy_status()
+    assert status["delta"] == 1 and status["deleted"] == 1 and not status["stale"]
+    emb = _Embedder()
+    emb.q = new
+    results, info = store.ann_search("annoy", emb, "q", top_k=1)
+    assert results[0].path.name == "new.jpg" and info["delta"] == 1
+
+    monkeypatch.setattr(ann_maintenance, "REBUILD_MIN", 0)
+    monkeypatch.setattr(ann_maintenance, "REBUILD_RATIO", 0.0)
+    _upsert(store, "1.jpg", str(tmp_path / "newer.jpg"), np.eye(8, dtype=np.float32)[6])
+    for t in threading.enumerate():
+        if t.name.startswith("ann-rebuild"):
+            t.join()
+    status = store.annoy_status()
+    assert not status.get("delta") and status["size"] == 6 and not status["stale"]
+    assert not ann_maintenance.labels_file(store.ann_file).exists()
+    assert store.ann_search("annoy", emb, "q", top_k=1)[0][0].path.name == "new.jpg"
+
+
+def test_rebuild_keeps_serving_the_old_index_until_the_swap(tmp_path: Path, monkeypatch) -> None:
+    store = _store(tmp_path, monkeypatch)
+    assert store.build_hnsw()
+    _upsert(store, "2.jpg", str(tmp_path / "new.jpg"), np.eye(8, dtype=np.float32)[7])
+    emb = _Embedder()
+    emb.q = np.eye(8, dtype=np.float32)[3]
+    seen = []
+
+    class _Probe(_Hnsw):
+        def init_index(self, max_elements, ef_construction, M):
+            # Mid-build: the old index and its label map still answer together
+            seen.append(store.ann_search("hnsw", emb, "q", top_k=1)[0][0].path.name)
+
+    monkeypatch.setattr(ann_handles, "ann_library", lambda kind: SimpleNamespace(Index=_Probe) if kind == "hnsw" else None)
+    assert store.build_hnsw()
+    assert seen == ["3.jpg"]
+    assert not ann_maintenance.labels_file(store.hnsw_file).exists()
+    assert not ann_maintenance.staging_file(store.hnsw_file).exists()
+    assert store.ann_search("hnsw", emb, "q", top_k=1)[0][0].path.name == "3.jpg"
+
+
+def test_background_faiss_rebuild_keeps_requested_factory(tmp_path: Path, monkeypatch) -> None:
+    store = _store(tmp_path, monkeypatch)
+    store.faiss_file.write_bytes(b"")
+    store.faiss_meta_file.write_text(json.dumps({"factory": "IVF16,Flat", "requested_factory": "IVF16,Flat", "target_recall": 0.8}))
+    calls = []
+    monkeypatch.setattr(IndexStore, "build_faiss", lambda self, factory="auto", target_recall=0.95: calls.append((factory, target_recall)) or True)
+    store._rebuild_ann_in_background("faiss").join()
+    assert calls == [("IVF16,Flat", 0.8)]
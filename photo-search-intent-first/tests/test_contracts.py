@@ -149,8 +149,11 @@ class TestShareRouterContracts:
         assert "shares" in data
         assert isinstance(data["shares"], list)
     
-    def test_share_create_structure(self, temp_photo_dir):
+    def test_share_create_structure(self, temp_photo_dir, tmp_path, monkeypatch):
         """Verify POST /share returns expected structure."""
+        # Keep the share record out of the repo's api/shares
+        import infra.shares
+        monkeypatch.setattr(infra.shares, "SHARES_DIR", tmp_path / "shares")
         payload = {
             "dir": temp_photo_dir,
             "paths": ["test.jpg"],
@@ -0,0 +1,48 @@
+import os
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+from infra import curation_analysis
+from infra.curation_analysis import analyze_photos
+
+
+def _photos(root: Path, n: int) -> list:
+    rng = np.random.default_rng(0)
+    paths = []
+    for i in range(n):
+        p = root / f"p{i}.jpg"
+        Image.fromarray(rng.integers(0, 255, (48, 64, 3), dtype=np.uint8)).save(p)
+        paths.append(str(p))
+    return paths
+
+
+def test_results_are_cached_by_path_and_stamp(tmp_path: Path, monkeypatch) -> None:
+    paths = _photos(tmp_path, 5)
+    cache = tmp_path / "cache"
+    first = analyze_photos(paths + [str(tmp_path / "gone.jpg")], cache_dir=cache, workers=1, chunk_size=2)
+    assert first[-1] is None
+    assert first[0]["metadata"]["file_info"]["dimensions"] == {"width": 64, "height": 48}
+    assert 0 <= first[0]["quality"]["overall"] <= 100
+
+    seen = []
+    monkeypatch.setattr(curation_analysis, "_analyze_one", lambda p, q: seen.append(p) or None)
+    os.utime(paths[3], (1, 1))
+    again = analyze_photos(paths, cache_dir=cache, workers=1)
+    # Only the edited photo is analysed again
+    assert seen == [paths[3]]
+    assert again[:3] == first[:3] and again[4] == first[4]
+    # Metadata-only results do not satisfy a later quality run
+    assert analyze_photos(paths[:1], quality=False, cache_dir=cache)[0]["quality"] is None
+
+
+def test_parallel_run_reports_progress_and_stops_early(tmp_path: Path, monkeypatch) -> None:
+    paths = _photos(tmp_path, 12)
+    monkeypatch.setattr(curation_analysis, "MIN_PARALLEL_FILES", 4)
+    progress = []
+    rows = analyze_photos(paths, cache_dir=tmp_path / "c1", workers=2, chunk_size=3, on_progress=lambda d, r: progress.append(d))
+    assert all(r is not None for r in rows) and progress == [0, 3, 6, 9, 12]
+
+    rows = analyze_photos(paths, cache_dir=tmp_path / "c2", workers=1, chunk_size=4, on_progress=lambda d, r: d < 4)
+    assert [r is not None for r in rows] == [True] * 4 + [False] * 8
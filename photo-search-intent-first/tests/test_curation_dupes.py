@@ -0,0 +1,86 @@
+import os
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+from infra.curation_dupes import UnionFind, cosine_pairs, exact_duplicate_groups, find_duplicate_groups, min_cosine
+from infra.index_store import IndexStore
+
+
+def _write(path: Path, data: bytes) -> str:
+    path.write_bytes(data)
+    return str(path)
+
+
+def test_exact_groups_use_size_then_prefix_then_full_hash(tmp_path: Path) -> None:
+    big = os.urandom(200_000)
+    a = _write(tmp_path / "a.bin", big)
+    b = _write(tmp_path / "b.bin", big)
+    # Same size and prefix, different tail
+    c = _write(tmp_path / "c.bin", big[:-1] + bytes([big[-1] ^ 1]))
+    d = _write(tmp_path / "d.bin", b"small")
+    e = _write(tmp_path / "e.bin", b"small")
+    f = _write(tmp_path / "f.bin", b"other")
+    missing = str(tmp_path / "missing.bin")
+    assert exact_duplicate_groups([a, d, c, b, missing, e, f]) == [[a, b], [d, e]]
+
+
+def test_unreadable_files_are_warned_about_once(tmp_path: Path, caplog) -> None:
+    # Directories stat fine but fail to open, like files without read access
+    x, y = tmp_path / "x", tmp_path / "y"
+    x.mkdir()
+    y.mkdir()
+    missing = str(tmp_path / "missing.bin")
+    with caplog.at_level("WARNING", logger="infra.curation_dupes"):
+        assert exact_duplicate_groups([str(x), str(y), missing]) == []
+    warned = [r for r in caplog.records if r.name == "infra.curation_dupes"]
+    assert all(r.levelname == "WARNING" for r in warned)
+    assert len(warned) == 3
+    for p in (str(x), str(y), missing):
+        assert sum(p + ":" in r.getMessage() for r in warned) == 1
+
+
+def test_cosine_pairs_and_union_find() -> None:
+    rng = np.random.default_rng(0)
+    E = rng.normal(size=(2500, 16)).astype(np.float32)
+    E[1500] = E[3] * 2 + 1e-3
+    E[2400] = E[1500]
+    i, j = cosine_pairs(E, 0.999)
+    assert sorted(zip(i.tolist(), j.tolist())) == [(3, 1500), (3, 2400), (1500, 2400)]
+    uf = UnionFind(5)
+    uf.union(4, 2)
+    uf.union(2, 0)
+    assert uf.groups() == [[0, 2, 4]]
+    uf = UnionFind(6)
+    uf.union(5, 3)
+    uf.union(4, 1)
+    uf.union(4, 2)
+    assert uf.groups() == [[1, 2, 4], [3, 5]]
+    assert min_cosine(85) == 0.95
+
+
+def test_find_duplicate_groups_uses_embeddings_and_falls_back_to_hashes(tmp_path: Path) -> None:
+    grad = np.tile(np.linspace(0, 255, 64, dtype=np.uint8), (64, 1))
+    near_y = grad.T.copy()
+    near_y[0, 0] ^= 1
+    paths = []
+    for name, img in [("x.png", grad), ("y.png", grad.T), ("z.png", 255 - grad), ("w.png", near_y)]:
+        Image.fromarray(img).save(tmp_path / name)
+        paths.append(str(tmp_path / name))
+    copy = _write(tmp_path / "x_copy.png", Path(paths[0]).read_bytes())
+
+    store = IndexStore(tmp_path, index_key="dummy")
+    store.state.paths = paths[:3]
+    store.state.mtimes = [os.stat(p).st_mtime for p in paths[:3]]
+    # x and z look alike to the embedder; y is unrelated
+    store.state.embeddings = np.array([[1, 0, 0], [0, 1, 0], [0.99, 0.1, 0]], dtype=np.float32)
+
+    groups = find_duplicate_groups(paths + [copy], 85, store=store)
+    # x/z by embedding, x/copy by content; w has no embedding yet and joins
+    # its indexed near-copy y by hash
+    assert groups == [[paths[0], paths[2], copy], [paths[1], paths[3]]]
+    # Two embedded photos are not merged by hash when their embeddings differ
+    store.state.embeddings[2] = [0, 0, 1]
+    assert find_duplicate_groups(paths[:3], 85, store=store) == []
+    assert find_duplicate_groups([paths[1], paths[3]], 85) == [[paths[1], paths[3]]]
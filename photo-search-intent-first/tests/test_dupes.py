@@ -0,0 +1,81 @@
+from pathlib import Path
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from infra import dupes
+
+
+def _brute_pairs(h: np.ndarray, r: int) -> set:
+    return {
+        (i, j)
+        for i in range(len(h))
+        for j in range(i + 1, len(h))
+        if bin(int(h[i]) ^ int(h[j])).count("1") <= r
+    }
+
+
+def test_hamming_pairs_matches_brute_force() -> None:
+    rng = np.random.default_rng(3)
+    base = rng.integers(0, 2**63, size=150, dtype=np.uint64)
+    # Near copies with a few flipped bits, plus exact duplicates
+    flips = [np.uint64(1) << np.uint64(b) for b in rng.integers(0, 64, size=(150, 4)).ravel()]
+    near = base.copy()
+    for k in range(4):
+        near ^= np.asarray(flips[k::4], dtype=np.uint64)
+    h = np.concatenate([base, near, base[:10]])
+    for r in (0, 3, 5, 12):
+        got = set(zip(*(a.tolist() for a in dupes.hamming_pairs(h, r))))
+        assert got == _brute_pairs(h, r)
+    # Both search strategies are exercised: multi-index for small radii, all-pairs otherwise
+    assert dupes._plan(100_000, 5) is not None
+    assert dupes._plan(50, 40) is None
+    # A single full-width chunk probes masks up to bit 63
+    got = set(zip(*(a.tolist() for a in dupes._mih_pairs(h, 1, 1))))
+    assert got == _brute_pairs(h, 1)
+
+
+def _photo(path: Path, shift: int = 0, colour: int = 200) -> str:
+    img = Image.new("RGB", (640, 480), (20, 20, 20))
+    draw = ImageDraw.Draw(img)
+    draw.rectangle([100 + shift, 80, 380 + shift, 300], fill=(colour, colour, colour))
+    draw.ellipse([400, 250, 600, 450], fill=(90, 140, 220))
+    img.save(path, quality=90)
+    return str(path)
+
+
+def test_build_reuses_unchanged_photos_and_groups_lookalikes(tmp_path: Path, monkeypatch) -> None:
+    index_dir = tmp_path / "index"
+    a = _photo(tmp_path / "a.jpg")
+    b = _photo(tmp_path / "b.jpg", shift=2)
+    other = tmp_path / "c.jpg"
+    Image.radial_gradient("L").resize((640, 480)).convert("RGB").save(other)
+    broken = tmp_path / "d.jpg"
+    broken.write_bytes(b"not an image")
+    paths = [a, b, str(other), str(broken), str(tmp_path / "gone.jpg")]
+
+    assert dupes.build_hashes(index_dir, paths, workers=1) == 3
+    stored_paths, hashes = dupes.load_hashes(index_dir)
+    assert stored_paths == paths[:3] and hashes.shape == (3, 3) and hashes.dtype == np.uint64
+
+    for algo in dupes.ALGOS:
+        assert dupes.find_lookalikes(index_dir, max_distance=5, algo=algo) == [[a, b]]
+
+    calls = []
+    real = dupes.hash_images
+    monkeypatch.setattr(dupes, "hash_images", lambda ps: calls.append(list(ps)) or real(ps))
+    assert dupes.build_hashes(index_dir, paths, workers=1) == 0
+    assert calls == [[str(broken)]]
+
+
+def test_build_with_mtimes_drops_deleted_photos(tmp_path: Path) -> None:
+    index_dir = tmp_path / "index"
+    a = _photo(tmp_path / "a.jpg")
+    b = _photo(tmp_path / "b.jpg", shift=2)
+    mtimes = [Path(a).stat().st_mtime, Path(b).stat().st_mtime]
+    assert dupes.build_hashes(index_dir, [a, b], mtimes=mtimes, workers=1) == 2
+
+    # The caller's index still lists b with its old mtime
+    Path(b).unlink()
+    assert dupes.build_hashes(index_dir, [a, b], mtimes=mtimes, workers=1) == 0
+    assert dupes.load_hashes(index_dir)[0] == [a]
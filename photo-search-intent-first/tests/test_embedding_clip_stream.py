@@ -0,0 +1,64 @@
+import threading
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+from adapters.embedding_clip import ClipEmbedding
+
+
+class _Model:
+    device = "cpu"
+
+    def __init__(self) -> None:
+        self.batches = []
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return 3
+
+    def encode(self, images, batch_size=None, **kwargs):
+        self.batches.append(len(images))
+        return np.array([[im.width, im.height, im.getpixel((0, 0))[0]] for im in images], dtype=np.float32)
+
+
+def _embedder() -> ClipEmbedding:
+    emb = ClipEmbedding.__new__(ClipEmbedding)
+    emb.model = _Model()
+    emb._index_id = "test"
+    return emb
+
+
+def _photos(root: Path, n: int):
+    paths = []
+    for i in range(n):
+        p = root / f"{i}.png"
+        Image.new("RGB", (1000, 800), (i * 10, 0, 0)).save(p)
+        paths.append(p)
+    return paths
+
+
+def test_stream_keeps_order_and_downscales(tmp_path: Path) -> None:
+    paths = _photos(tmp_path, 9)
+    paths.insert(3, tmp_path / "missing.png")
+    emb = _embedder()
+    events = []
+    out = emb.embed_images(paths, batch_size=4, progress_cb=events.append)
+    assert out.shape == (10, 3)
+    assert not out[3].any()
+    assert out[[0, 4, 9], 2].tolist() == [0.0, 30.0, 80.0]
+    assert out[0, :2].tolist() == [420.0, 336.0]
+    assert sum(emb.model.batches) == 9 and max(emb.model.batches) <= 4
+    phases = [e["phase"] for e in events]
+    assert phases[0] == "load_start" and phases[-1] == "encode_done"
+
+
+def test_inflight_cap_forces_small_batches_and_stop_returns_zeros(tmp_path: Path) -> None:
+    paths = _photos(tmp_path, 6)
+    emb = _embedder()
+    out = emb.embed_images(paths, batch_size=16, max_inflight_mb=1)
+    assert max(emb.model.batches) <= 2
+    assert out[:, 2].tolist() == [0.0, 10.0, 20.0, 30.0, 40.0, 50.0]
+
+    stop = threading.Event()
+    stop.set()
+    assert not emb.embed_images(paths, stop_event=stop).any()
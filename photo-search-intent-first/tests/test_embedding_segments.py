@@ -0,0 +1,134 @@
+import json
+from pathlib import Path
+
+import numpy as np
+
+from infra import embedding_segments as seg
+from infra.index_store import IndexStore
+
+
+def _seed(root: Path, n: int = 10, dim: int = 4) -> IndexStore:
+    store = IndexStore(root, index_key="dummy")
+    store.state.paths = [f"p{i}.jpg" for i in range(n)]
+    store.state.mtimes = [0.0] * n
+    store.state.embeddings = np.arange(n * dim, dtype=np.float32).reshape(n, dim)
+    store.save()
+    return store
+
+
+def test_canonical_layout_loads_as_memmap(tmp_path: Path) -> None:
+    _seed(tmp_path)
+    store = IndexStore(tmp_path, index_key="dummy")
+    store.load()
+    assert isinstance(store.state.embeddings, np.memmap)
+    assert store.state.embeddings.shape == (10, 4)
+    assert not store.embeddings_file.exists()
+
+
+def test_incremental_save_writes_only_changed_rows(tmp_path: Path) -> None:
+    store = IndexStore(tmp_path, index_key="dummy")
+    store.max_dead_ratio = 1.0  # keep the fragmented layout for inspection
+    _seed(tmp_path)
+    store.load()
+    store.state.embeddings[3] = -1.0
+    store.state.embeddings = np.vstack([store.state.embeddings, np.ones((2, 4), dtype=np.float32)])
+    store.state.paths += ["a.jpg", "b.jpg"]
+    store.state.mtimes += [0.0, 0.0]
+    keep = [i for i in range(12) if i != 5]
+    store.state.embeddings = store.state.embeddings[keep]
+    store.state.paths = [store.state.paths[i] for i in keep]
+    store.state.mtimes = [store.state.mtimes[i] for i in keep]
+    store.save()
+
+    manifest = seg.read_manifest(store.index_dir)
+    assert [s["rows"] for s in manifest["segments"]] == [10, 3]
+    assert manifest["tombstones"] == [3, 5]
+
+    again = IndexStore(tmp_path, index_key="dummy")
+    again.load()
+    assert again.state.paths == store.state.paths
+    assert np.array_equal(again.state.embeddings, store.state.embeddings)
+
+
+def test_compaction_merges_segments_and_preserves_order(tmp_path: Path) -> None:
+    store = IndexStore(tmp_path, index_key="dummy")
+    store.max_dead_ratio = 1.0
+    _seed(tmp_path)
+    store.load()
+    store.state.embeddings[0] = 7.0
+    store.save()
+    expected = np.array(store.state.embeddings)
+
+    assert store.compact() is True
+    manifest = seg.read_manifest(store.index_dir)
+    assert seg.is_canonical(manifest)
+    assert len(list((store.index_dir / seg.SEGMENTS_DIR).glob("seg-*.emb"))) == 1
+
+    fresh = IndexStore(tmp_path, index_key="dummy")
+    fresh.load()
+    assert np.array_equal(fresh.state.embeddings, expected)
+
+    # A writer holding a pre-compaction snapshot still saves incrementally
+    store.state.embeddings[1] = 9.0
+    store.save()
+    manifest = seg.read_manifest(store.index_dir)
+    assert [s["rows"] for s in manifest["segments"]] == [10, 1]
+
+
+
+def test_load_rejects_paths_from_a_different_save(tmp_path: Path) -> None:
+    store = _seed(tmp_path)
+    assert seg.read_manifest(store.index_dir)["paths_digest"] == seg.paths_digest(store.state.paths)
+    assert not list(store.index_dir.glob("*.tmp"))
+
+    # Same row count, different order: a paths.json renamed in ahead of its manifest
+    swapped = list(reversed(store.state.paths))
+    store.paths_file.write_text(json.dumps({"paths": swapped, "mtimes": [0.0] * 10}))
+    torn = IndexStore(tmp_path, index_key="dummy")
+    torn.load()
+    assert torn.state.paths == []
+    assert torn.state.embeddings is None
+
+    # Compaction carries the digest over
+    store.max_dead_ratio = 1.0
+    store.state.embeddings = np.array(store.state.embeddings)
+    store.state.embeddings[0] = 7.0
+    store.save()
+    assert store.compact() is True
+    assert seg.read_manifest(store.index_dir)["paths_digest"] == seg.paths_digest(store.state.paths)
+    fresh = IndexStore(tmp_path, index_key="dummy")
+    fresh.load()
+    assert fresh.state.paths == store.state.paths
+
+class _Text:
+    def __init__(self, vec: np.ndarray) -> None:
+        self.vec = vec.astype(np.float32)
+
+    def embed_text(self, query: str) -> np.ndarray:
+        return self.vec
+
+
+def test_search_scores_match_single_matvec(tmp_path: Path) -> None:
+    rng = np.random.default_rng(0)
+    store = IndexStore(tmp_path, index_key="dummy")
+    store.state.paths = [f"p{i}.jpg" for i in range(50)]
+    store.state.mtimes = [0.0] * 50
+    store.state.embeddings = rng.normal(size=(50, 8)).astype(np.float32)
+    store.save()
+    T = rng.normal(size=(50, 8)).astype(np.float32)
+    np.save(store.ocr_embeds_file, T)
+    q = rng.normal(size=8)
+    emb = _Text(q)
+
+    res = store.search(emb, "x", top_k=5, subset=list(range(10, 30)))
+    exact = store.state.embeddings @ emb.vec
+    assert [r.path.name for r in res] == [f"p{i}.jpg" for i in 10 + np.argsort(-exact[10:30])[:5]]
+    assert np.allclose([r.score for r in res], np.sort(exact[10:30])[::-1][:5])
+
+    fused = store.search_with_ocr(emb, "x", top_k=3, weight_img=0.3, weight_ocr=0.7)
+    want = 0.3 * exact + 0.7 * (T @ emb.vec)
+    assert np.allclose([r.score for r in fused], np.sort(want)[::-1][:3])
+    # The OCR matrix stays resident between queries
+    cached = store._aux[store.ocr_embeds_file.name][1]
+    store.search_with_ocr(emb, "x", top_k=3)
+    assert store._aux[store.ocr_embeds_file.name][1] is cached
@@ -166,32 +166,31 @@ class TestEnhancedSearchService:
         assert any("/photos/landscape/mountain2.jpg" in str(r.path) for r in results)
     
     def test_style_similarity_search(self, enhanced_search_service):
-        """Test style similarity search functionality."""
-        # For this test, we'll mock the visual feature extraction
-        with patch.object(enhanced_search_service, '_extract_visual_features') as mock_extract:
-            # Mock the feature extraction to return simple arrays
-            mock_extract.return_value = {
-                'color_histogram': np.array([0.1, 0.2, 0.3, 0.4]),
-                'texture_features': np.array([0.5, 0.6]),
-                'dominant_colors': np.array([[100, 150, 200], [50, 75, 100]]),
-                'shape': (224, 224)
-            }
-            
-            # Also mock the similarity methods
-            with patch.object(enhanced_search_service, '_color_similarity', return_value=0.8):
-                with patch.object(enhanced_search_service, '_texture_similarity', return_value=0.7):
-                    # Test with a reference photo path
-                    reference_path = "/photos/trip1/photo1.jpg"
-                    results = enhanced_search_service.style_similarity_search(
-                        reference_path=reference_path,
-                        top_k=5
-                    )
-                    
-                    # Should return some results
-                    assert isinstance(results, list)
-                    # Should not include the reference photo itself
-                    assert not any(str(r.path) == reference_path for r in results)
-    
+        """Test style similarity search over the precomputed style matrix."""
+        from infra.style_index import FEATURE_DIM, HIST_DIM, StyleIndex
+
+        store = enhanced_search_service.store
+        # Identical embeddings, so only the style features separate the photos
+        store.state.embeddings = np.ones((len(store.state.paths), 512), dtype=np.float32)
+        rng = np.random.default_rng(0)
+        matrix = rng.random((len(store.state.paths), FEATURE_DIM)).astype(np.float32)
+        matrix[:, :HIST_DIM] /= matrix[:, :HIST_DIM].sum(axis=1, keepdims=True)
+        matrix[4] = matrix[0]  # person2 shares the reference photo's style
+        matrix[6] = np.nan  # unreadable photo
+        index = StyleIndex(list(store.state.paths), list(store.state.mtimes), matrix)
+
+        reference_path = "/photos/trip1/photo1.jpg"
+        with patch("services.enhanced_search.style_index_for_store", return_value=index), \
+                patch("services.enhanced_search.style_features") as extract:
+            results = enhanced_search_service.style_similarity_search(reference_path=reference_path, top_k=5)
+            # The reference is indexed: its stored features are used, nothing is decoded
+            extract.assert_not_called()
+
+        assert len(results) == 5
+        assert str(results[0].path) == "/photos/portrait/person2.jpg"
+        assert not any(str(r.path) in (reference_path, "/photos/landscape/mountain2.jpg") for r in results)
+        assert [r.score for r in results] == sorted((r.score for r in results), reverse=True)
+
     def test_combined_search(self, enhanced_search_service):
         """Test combined search functionality."""
         # Mock an embedder for semantic search
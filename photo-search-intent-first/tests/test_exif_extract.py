@@ -0,0 +1,51 @@
+import json
+import os
+from pathlib import Path
+
+from PIL import Image
+
+from infra import exif_extract
+from infra.metadata_columns import load_columns
+
+
+def _photo(path: Path, model: str, iso: int) -> str:
+    img = Image.new("RGB", (32, 24), (120, 80, 40))
+    exif = Image.Exif()
+    exif[0x0110] = model  # Model
+    exif.get_ifd(0x8769)[0x8827] = iso  # ISOSpeedRatings
+    img.save(path, exif=exif.tobytes())
+    return str(path)
+
+
+def test_build_reuses_unchanged_files(tmp_path: Path, monkeypatch) -> None:
+    paths = [_photo(tmp_path / f"p{i}.jpg", f"Cam {i}", 100 * (i + 1)) for i in range(4)]
+    index_dir = tmp_path / "index"
+    index_dir.mkdir()
+
+    out = exif_extract.build_exif_index(index_dir, paths, workers=1)
+    assert out["camera"] == ["Cam 0", "Cam 1", "Cam 2", "Cam 3"]
+    assert out["iso"] == [100, 200, 300, 400]
+    assert out["width"] == [32] * 4
+    assert json.loads((index_dir / "metadata_status.json").read_text())["state"] == "complete"
+
+    calls = []
+    real = exif_extract.extract_exif
+    monkeypatch.setattr(exif_extract, "extract_exif", lambda p: calls.append(p) or real(p))
+    _photo(tmp_path / "p2.jpg", "Replaced", 800)
+    os.utime(paths[2], (1_000_000, 1_000_000))
+    again = exif_extract.build_exif_index(index_dir, paths, workers=1)
+    assert calls == [paths[2]]
+    assert again["camera"] == ["Cam 0", "Cam 1", "Replaced", "Cam 3"]
+    assert again["iso"] == [100, 200, 800, 400]
+    assert json.loads((index_dir / "metadata_status.json").read_text())["reused"] == 3
+    assert load_columns(index_dir).distinct("camera") == ["Cam 0", "Cam 1", "Cam 3", "Replaced"]
+
+
+def test_parallel_extraction_matches_serial(tmp_path: Path, monkeypatch) -> None:
+    paths = [_photo(tmp_path / f"p{i}.jpg", f"Cam {i % 3}", 100) for i in range(10)]
+    (tmp_path / "a").mkdir()
+    (tmp_path / "b").mkdir()
+    serial = exif_extract.build_exif_index(tmp_path / "a", paths, workers=1)
+    monkeypatch.setattr(exif_extract, "MIN_PARALLEL_FILES", 0)
+    parallel = exif_extract.build_exif_index(tmp_path / "b", paths, workers=2, chunk_size=3)
+    assert parallel == serial
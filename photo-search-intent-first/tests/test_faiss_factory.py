@@ -0,0 +1,123 @@
+import pickle
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+
+from infra import ann_handles, ann_maintenance, faiss_factory
+from infra.index_store import IndexStore
+
+
+class _Index:
+    """IVF stand-in: with ``nprobe`` p only rows with ``row % 8 < p`` are visited."""
+
+    trains: list = []
+
+    def __init__(self, spec):
+        self.spec = spec
+        self.is_trained = "IVF" not in spec
+        self.nprobe = 1
+        self.E = np.zeros((0, 0), dtype=np.float32)
+
+    def train(self, x):
+        _Index.trains.append(len(x))
+        self.is_trained = True
+
+    def add(self, x):
+        self.E = x.copy() if self.E.size == 0 else np.vstack([self.E, x])
+
+    def add_with_ids(self, x, ids):
+        assert np.array_equal(ids, np.arange(len(self.E), len(self.E) + len(x)))
+        self.add(x)
+
+    def search(self, Q, k):
+        visible = np.arange(len(self.E)) % 8 < self.nprobe
+        S = np.where(visible[None, :], Q @ self.E.T, -np.inf)
+        I = np.argsort(-S, axis=1)[:, :k]
+        return np.take_along_axis(S, I, axis=1), I
+
+
+class _ParameterSpace:
+    def set_index_parameter(self, index, name, value):
+        setattr(index, name, value)
+
+
+def _fake_faiss(trains):
+    _Index.trains = trains
+    return SimpleNamespace(
+        METRIC_INNER_PRODUCT=0,
+        index_factory=lambda dim, spec, metric: _Index(spec),
+        ParameterSpace=_ParameterSpace,
+        write_index=lambda index, path: Path(path).write_bytes(pickle.dumps(index)),
+        read_index=lambda path, *flags: pickle.loads(Path(path).read_bytes()),
+    )
+
+
+def test_factory_tiers_follow_library_size() -> None:
+    assert faiss_factory.choose_factory(5_000, 512) == "Flat"
+    assert faiss_factory.choose_factory(100_000, 512) == "HNSW32"
+    assert faiss_factory.choose_factory(300_000, 512) == "IVF2190,Flat"
+    assert faiss_factory.choose_factory(1_000_000, 512) == "OPQ64,IVF4000,PQ64"
+    previous = {"factory": "IVF2190,Flat", "dim": 512, "trained_for": 300_000}
+    # Trained state stays in use until the library doubles
+    assert faiss_factory.choose_factory(400_000, 512, previous) == "IVF2190,Flat"
+    assert faiss_factory.choose_factory(1_000_000, 512, previous).startswith("OPQ")
+    assert faiss_factory.training_size("IVF4000,Flat", 1_000_000) == 200_000
+
+
+def test_build_tunes_and_reuses_training(tmp_path: Path, monkeypatch) -> None:
+    trains = []
+    lib = _fake_faiss(trains)
+    monkeypatch.setattr(ann_handles, "ann_library", lambda kind: lib if kind == "faiss" else None)
+    ann_handles.invalidate()
+
+    store = IndexStore(tmp_path)
+    rng = np.random.default_rng(0)
+    E = rng.normal(size=(400, 8)).astype(np.float32)
+    store.state.paths = [str(tmp_path / f"{i}.jpg") for i in range(len(E))]
+    store.state.embeddings = E / np.linalg.norm(E, axis=1, keepdims=True)
+
+    assert store.build_faiss(factory="IVF16,Flat")
+    meta = store.faiss_status()
+    curve = meta["report"]["curve"]
+    assert trains == [400] and meta["family"] == "ivf" and not meta["reused_training"]
+    assert [c["value"] for c in curve] == [1, 2, 4, 8, 16]
+    assert curve[0]["recall"] < 0.95 and curve[-1]["recall"] == 1.0
+    assert meta["search_params"] == {"nprobe": 8}
+
+    handle = ann_handles.open_handle("faiss", store.faiss_file, store.faiss_meta_file)
+    handle.index.nprobe = 1
+    rows, _ = handle.query(store.state.embeddings[5], 1)
+    assert rows == [5] and handle.index.nprobe == 8
+
+    assert store.build_faiss(factory="IVF16,Flat")
+    assert trains == [400] and store.faiss_status()["reused_training"]
+
+
+def test_rebuild_swaps_index_labels_and_meta_together(tmp_path: Path, monkeypatch) -> None:
+    lib = _fake_faiss([])
+    monkeypatch.setattr(ann_handles, "ann_library", lambda kind: lib if kind == "faiss" else None)
+    ann_handles.invalidate()
+    store = IndexStore(tmp_path)
+    store.state.paths = [str(tmp_path / f"{i}.jpg") for i in range(64)]
+    store.state.embeddings = np.eye(64, dtype=np.float32)
+    assert store.build_faiss(factory="Flat")
+    # Labels carried forward by an upsert: ANN label 0 now lives at row 1
+    labels = ann_maintenance.labels_file(store.faiss_file)
+    np.save(labels, np.array([1, 0] + list(range(2, 64)), dtype=np.int64))
+    emb = SimpleNamespace(embed_text=lambda q: store.state.embeddings[0])
+    assert store.search_faiss(emb, "q", top_k=1)[0].path.name == "1.jpg"
+
+    real_tune = faiss_factory.tune
+    seen = []
+
+    def _tune(*args, **kwargs):
+        # Training and tuning run while the old index is still being served
+        seen.append(labels.exists() and store.search_faiss(emb, "q", top_k=1)[0].path.name)
+        return real_tune(*args, **kwargs)
+
+    monkeypatch.setattr(faiss_factory, "tune", _tune)
+    assert store.build_faiss(factory="Flat")
+    assert seen == ["1.jpg"] and not labels.exists()
+    assert store.search_faiss(emb, "q", top_k=1)[0].path.name == "0.jpg"
+    assert store.faiss_status()["requested_factory"] == "Flat"
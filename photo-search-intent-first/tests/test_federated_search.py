@@ -0,0 +1,47 @@
+import json
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+
+from infra.federated_search import federated_search
+from infra.filter_mask import compile_filter_mask
+from infra.index_store import IndexStore
+
+
+def _store(root: Path, n: int, seed: int) -> IndexStore:
+    root.mkdir()
+    rng = np.random.default_rng(seed)
+    store = IndexStore(root, index_key="dummy")
+    store.state.paths = [str(root / f"p{i}.jpg") for i in range(n)]
+    store.state.mtimes = [float(i) for i in range(n)]
+    E = rng.normal(size=(n, 8)).astype(np.float32)
+    store.state.embeddings = E / np.linalg.norm(E, axis=1, keepdims=True)
+    store.save()
+    return store
+
+
+def test_merge_matches_concatenated_search(tmp_path: Path) -> None:
+    stores = [_store(tmp_path / f"s{i}", n, i) for i, n in enumerate((30, 5, 17))]
+    q = np.random.default_rng(9).normal(size=8).astype(np.float32)
+
+    E = np.vstack([s.state.embeddings for s in stores])
+    paths = [p for s in stores for p in s.state.paths]
+    sims = E @ q
+    expected = [paths[i] for i in np.argsort(-sims)[:10]]
+
+    out = federated_search(stores, q, 10)
+    assert [str(r.path) for r in out] == expected
+    assert [r.score for r in out] == sorted((r.score for r in out), reverse=True)
+    assert len(federated_search(stores, q, 500)) == 52
+
+
+def test_per_store_filters_apply_before_merge(tmp_path: Path) -> None:
+    a, b = _store(tmp_path / "a", 10, 1), _store(tmp_path / "b", 10, 2)
+    (a.index_dir / "tags.json").write_text(json.dumps({a.state.paths[3]: ["x"]}))
+    (b.index_dir / "tags.json").write_text(json.dumps({b.state.paths[7]: ["x"], b.state.paths[8]: ["x"]}))
+    q = np.ones(8, dtype=np.float32)
+
+    req = SimpleNamespace(tags=["x"])
+    out = federated_search([a, b], q, 12, mask_for=lambda s: compile_filter_mask(s, req))
+    assert sorted(str(r.path) for r in out) == sorted([a.state.paths[3], b.state.paths[7], b.state.paths[8]])
@@ -0,0 +1,78 @@
+import json
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+
+from infra.fast_index import FastIndexManager
+from infra.filter_mask import compile_filter_mask, mask_subset
+from infra.index_store import IndexStore
+
+
+class _Emb:
+    def embed_text(self, query: str) -> np.ndarray:
+        v = np.zeros(4, dtype=np.float32)
+        v[0] = 1.0
+        return v
+
+
+def _store(root: Path, n: int = 20) -> IndexStore:
+    store = IndexStore(root, index_key="dummy")
+    store.state.paths = [str(root / f"p{i}.jpg") for i in range(n)]
+    store.state.mtimes = [float(i) for i in range(n)]
+    E = np.zeros((n, 4), dtype=np.float32)
+    E[:, 0] = np.linspace(1.0, 0.0, n)
+    E[:, 1] = 1.0
+    store.state.embeddings = E
+    store.save()
+    return store
+
+
+def _req(**kw):
+    return SimpleNamespace(**kw)
+
+
+def test_no_filters_compiles_to_none(tmp_path: Path) -> None:
+    store = _store(tmp_path)
+    assert compile_filter_mask(store, _req(tags=[], favorites_only=False)) is None
+
+
+def test_tags_favorites_dates_and_exif(tmp_path: Path) -> None:
+    store = _store(tmp_path)
+    p = store.state.paths
+    (store.index_dir / "tags.json").write_text(json.dumps({p[2]: ["beach"], p[5]: ["beach", "sun"], p[9]: ["sun"]}))
+    (store.index_dir / "collections.json").write_text(json.dumps({"Favorites": [p[5], p[9]]}))
+    exif = {
+        "paths": [p[2], p[5], p[9], p[12]],
+        "iso": [100, 800, 3200, "400"],
+        "camera": ["Canon EOS R5", "Sony A7", "canon g7x", None],
+    }
+    (store.index_dir / "exif_index.json").write_text(json.dumps(exif))
+
+    assert mask_subset(compile_filter_mask(store, _req(tags=["beach"]))) == [2, 5]
+    assert mask_subset(compile_filter_mask(store, _req(tags=["sun"], favorites_only=True))) == [5, 9]
+    assert mask_subset(compile_filter_mask(store, _req(date_from=3.0, date_to=6.0))) == [3, 4, 5, 6]
+    assert mask_subset(compile_filter_mask(store, _req(camera="canon"))) == [2, 9]
+    # Non-integer ISO values are treated as missing
+    assert mask_subset(compile_filter_mask(store, _req(iso_min=200))) == [5, 9]
+    # OCR text filter with no OCR data matches nothing
+    assert mask_subset(compile_filter_mask(store, _req(has_text=True))) == []
+
+
+def test_fast_manager_respects_filter_subset(tmp_path: Path) -> None:
+    store = _store(tmp_path)
+    fim = FastIndexManager(store)
+    res, meta = fim.search(_Emb(), "q", top_k=3, use_fast=True, subset=[])
+    assert res == [] and meta["strategy"] == "empty_filter"
+    res, _ = fim.search(_Emb(), "q", top_k=3, use_fast=False, subset=[7, 3, 15])
+    assert [r.path.name for r in res] == ["p3.jpg", "p7.jpg", "p15.jpg"]
+
+
+def test_ann_filtered_search_keeps_only_subset_rows(tmp_path: Path) -> None:
+    store = _store(tmp_path, n=40)
+    store.build_hnsw()
+    fim = FastIndexManager(store)
+    subset = list(range(1, 40, 2))
+    res, meta = fim.search(_Emb(), "q", top_k=3, use_fast=True, subset=subset)
+    assert meta["strategy"] == "ann_oversampled" and meta["backend"] == "hnsw"
+    assert [r.path.name for r in res] == ["p1.jpg", "p3.jpg", "p5.jpg"]
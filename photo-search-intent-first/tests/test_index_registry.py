@@ -0,0 +1,59 @@
+from pathlib import Path
+
+import numpy as np
+
+from infra.index_registry import IndexRegistry
+from infra.index_store import IndexStore
+
+
+def _write_index(root: Path, n: int, dim: int = 8, key: str = "dummy") -> IndexStore:
+    store = IndexStore(root, index_key=key)
+    store.state.paths = [str(root / f"p{i}.jpg") for i in range(n)]
+    store.state.mtimes = [float(i) for i in range(n)]
+    rng = np.random.default_rng(n)
+    E = rng.normal(size=(n, dim)).astype(np.float32)
+    store.state.embeddings = E / np.linalg.norm(E, axis=1, keepdims=True)
+    store.save()
+    return store
+
+
+def test_registry_keeps_store_resident(tmp_path: Path) -> None:
+    _write_index(tmp_path, 5)
+    reg = IndexRegistry(budget_bytes=0)
+    a = reg.get(tmp_path, "dummy")
+    b = reg.get(tmp_path, "dummy")
+    assert a is b
+    assert len(a.state.paths) == 5
+    st = reg.stats()
+    assert st["misses"] == 1 and st["hits"] == 1 and st["entries"] == 1
+
+
+def test_registry_reloads_after_writer_saves(tmp_path: Path) -> None:
+    _write_index(tmp_path, 3)
+    reg = IndexRegistry(budget_bytes=0)
+    first = reg.get(tmp_path, "dummy")
+    assert len(first.state.paths) == 3
+    # A separate writer rewrites the index on disk
+    _write_index(tmp_path, 7)
+    second = reg.get(tmp_path, "dummy")
+    assert second is not first
+    assert len(second.state.paths) == 7
+    # The old snapshot stays intact for in-flight readers
+    assert len(first.state.paths) == 3
+    assert reg.stats()["reloads"] == 1
+
+
+def test_registry_evicts_lru_over_budget(tmp_path: Path) -> None:
+    a_dir, b_dir = tmp_path / "a", tmp_path / "b"
+    a_dir.mkdir(); b_dir.mkdir()
+    _write_index(a_dir, 50, dim=64)
+    _write_index(b_dir, 50, dim=64)
+    one = IndexStore(a_dir, index_key="dummy")
+    one.load()
+    reg = IndexRegistry(budget_bytes=one.memory_usage() + 1)
+    reg.get(a_dir, "dummy")
+    reg.get(b_dir, "dummy")
+    st = reg.stats()
+    assert st["entries"] == 1
+    assert st["evictions"] == 1
+    assert reg.invalidate(b_dir) == 1
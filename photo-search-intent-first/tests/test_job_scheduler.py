@@ -0,0 +1,271 @@
+import threading
+import time
+
+from api.scheduler.job_scheduler import JobPriority, LightweightJobScheduler, current_cancel_token, current_job_id
+
+
+def _wait_for(scheduler, job_id, status, timeout=5.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        st = scheduler.get_job_status(job_id)
+        if st and st["status"] == status:
+            return st
+        time.sleep(0.005)
+    raise AssertionError(f"{job_id} never reached {status}: {scheduler.get_job_status(job_id)}")
+
+
+def test_priority_order_and_latency_histograms() -> None:
+    s = LightweightJobScheduler(max_workers=1)
+    try:
+        gate = threading.Event()
+        order = []
+        blocker = s.submit_function(gate.wait, name="blocker")
+        _wait_for(s, blocker, "running")
+        low = s.submit_function(order.append, "low", priority=JobPriority.LOW)
+        high = s.submit_function(order.append, "high", priority=JobPriority.HIGH)
+        gate.set()
+        _wait_for(s, low, "completed")
+        _wait_for(s, high, "completed")
+        assert order == ["high", "low"]
+        stats = s.get_queue_stats()
+        assert stats["completed"] == 3
+        assert stats["queue_latency"]["count"] == 3
+        assert stats["run_time"]["count"] == 3
+    finally:
+        s.shutdown()
+
+
+def test_class_limit_runs_one_job_at_a_time() -> None:
+    s = LightweightJobScheduler(max_workers=3, class_limits={"embedding": 1})
+    try:
+        active, peak = [0], [0]
+        lock = threading.Lock()
+
+        def job():
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.02)
+            with lock:
+                active[0] -= 1
+
+        ids = [s.submit_function(job, job_class="embedding") for _ in range(4)]
+        for jid in ids:
+            _wait_for(s, jid, "completed")
+        assert peak[0] == 1
+    finally:
+        s.shutdown()
+
+
+def test_cancel_running_job_cooperatively() -> None:
+    s = LightweightJobScheduler(max_workers=1)
+    try:
+        def loop():
+            token = current_cancel_token()
+            while True:
+                token.raise_if_cancelled()
+                time.sleep(0.005)
+
+        jid = s.submit_function(loop)
+        _wait_for(s, jid, "running")
+        assert s.cancel_job(jid)
+        _wait_for(s, jid, "cancelled")
+        assert s.get_queue_stats()["cancelled"] == 1
+        assert not s.cancel_job(jid)
+    finally:
+        s.shutdown()
+
+
+def test_ram_budget_keeps_large_model_jobs_apart() -> None:
+    from api.scheduler.job_scheduler import JobClass
+
+    s = LightweightJobScheduler(max_workers=4, ram_budget_mb=6000)
+    try:
+        s.register_job_class(JobClass("model", ram_mb=4000))
+        s.register_job_class(JobClass("small", ram_mb=500))
+        active, peak = [0], [0]
+        lock = threading.Lock()
+
+        def model_job():
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.03)
+            with lock:
+                active[0] -= 1
+            return "done"
+
+        ids = [s.submit_function(model_job, job_class="model") for _ in range(3)]
+        small = s.submit_function(lambda: "small", job_class="small")
+        assert s.wait(small, timeout=5).status == "completed"
+        for jid in ids:
+            assert s.wait(jid, timeout=5).result == "done"
+        assert peak[0] == 1
+        assert s.run(model_job, job_class="model") == "done"
+        assert s.get_queue_stats()["resources"]["ram_mb"] == 0
+    finally:
+        s.shutdown()
+
+
+def test_job_waiting_for_ram_is_not_overtaken_by_smaller_jobs() -> None:
+    from api.scheduler.job_scheduler import JobClass
+
+    s = LightweightJobScheduler(max_workers=4, ram_budget_mb=6000)
+    try:
+        s.register_job_class(JobClass("big", ram_mb=4000))
+        s.register_job_class(JobClass("small", ram_mb=2500))
+        gate = threading.Event()
+        started = []
+        first = s.submit_function(lambda: gate.wait(5), job_class="small")
+        _wait_for(s, first, "running")
+        big = s.submit_function(started.append, "big", job_class="big")
+        # Fits beside the running job, but would keep the big one waiting
+        late = s.submit_function(started.append, "small", job_class="small", priority=JobPriority.LOW)
+        time.sleep(0.05)
+        assert s.get_job_status(late)["status"] == "pending"
+        gate.set()
+        _wait_for(s, big, "completed")
+        _wait_for(s, late, "completed")
+        assert started == ["big", "small"]
+    finally:
+        s.shutdown()
+
+
+def test_process_executor_runs_in_spawn_pool_and_cancels_queued_work() -> None:
+    import operator
+    import os
+    from api.scheduler.job_scheduler import JobClass
+
+    s = LightweightJobScheduler(max_workers=2, process_workers=1)
+    try:
+        s.register_job_class(JobClass("cpu", executor="process"))
+        assert s.run(operator.mul, 6, 7, job_class="cpu") == 42
+        # The work ran in a child process, not on the worker thread
+        assert s.run(os.getpid, job_class="cpu") != os.getpid()
+
+        # The pool's only process is busy, so the second job waits inside it
+        busy = s.submit_function(time.sleep, 1.0, job_class="cpu")
+        _wait_for(s, busy, "running")
+        queued = s.submit_function(operator.mul, 2, 3, job_class="cpu")
+        _wait_for(s, queued, "running")
+        assert s.cancel_job(queued)
+        _wait_for(s, queued, "cancelled")
+        assert s.wait(busy, timeout=10).status == "completed"
+        # The pool still takes work after a cancellation
+        assert s.run(operator.add, 1, 1, job_class="cpu") == 2
+    finally:
+        s.shutdown()
+
+
+def test_index_request_returns_job_id_before_indexing_finishes(tmp_path, monkeypatch) -> None:
+    import api.scheduler.job_scheduler as js
+    import usecases.index_photos as uc
+    from api.utils import _submit_index
+
+    s = LightweightJobScheduler(max_workers=1)
+    monkeypatch.setattr(js, "get_job_scheduler", lambda: s)
+    try:
+        gate = threading.Event()
+        seen = []
+
+        def fake_index(folder, batch_size=32, embedder=None, job_id=None, cancel=None):
+            seen.append((job_id, current_job_id()))
+            # Indexing checks the job's cancel token between batches
+            assert cancel == current_cancel_token().raise_if_cancelled
+            gate.wait(5)
+            return 1, 0, 1
+
+        monkeypatch.setattr(uc, "index_photos", fake_index)
+        jid = _submit_index(tmp_path, 8, None)
+        _wait_for(s, jid, "running")
+        # The caller already has the id while the job is still indexing
+        gate.set()
+        _wait_for(s, jid, "completed")
+        # Progress events and the job status share one id
+        assert seen == [(jid, jid)]
+        assert current_job_id() is None
+    finally:
+        s.shutdown()
+
+
+
+def test_ocr_request_returns_job_id_and_status_carries_result(tmp_path, monkeypatch) -> None:
+    import api.scheduler.job_scheduler as js
+    from api.utils import _submit_ocr
+
+    class FakeStore:
+        root = tmp_path
+        index_dir = tmp_path
+
+        def build_ocr(self, emb, languages=None, cancel=None):
+            assert cancel == current_cancel_token().raise_if_cancelled
+            gate.wait(5)
+            return 3
+
+    s = LightweightJobScheduler(max_workers=1)
+    monkeypatch.setattr(js, "get_job_scheduler", lambda: s)
+    try:
+        gate = threading.Event()
+        jid = _submit_ocr(FakeStore(), None, ["en"])
+        _wait_for(s, jid, "running")
+        assert s.get_job_status(jid).get("result") is None
+        gate.set()
+        _wait_for(s, jid, "completed")
+        assert s.get_job_status(jid)["result"] == {"updated": 3}
+    finally:
+        s.shutdown()
+
+def _wait_for_cancel(marker):
+    """Process-pool job: signal start, then poll the cancel flag."""
+    from pathlib import Path as _Path
+    _Path(marker).touch()
+    token = current_cancel_token()
+    deadline = time.time() + 20
+    while time.time() < deadline:
+        token.raise_if_cancelled()
+        time.sleep(0.01)
+    return "not cancelled"
+
+
+def test_running_process_job_sees_cancellation(tmp_path) -> None:
+    from api.scheduler.job_scheduler import JobClass
+
+    s = LightweightJobScheduler(max_workers=1, process_workers=1)
+    try:
+        s.register_job_class(JobClass("cpu", executor="process"))
+        marker = tmp_path / "started"
+        jid = s.submit_function(_wait_for_cancel, str(marker), job_class="cpu")
+        deadline = time.time() + 30
+        while not marker.exists() and time.time() < deadline:
+            time.sleep(0.01)
+        assert marker.exists()
+        assert s.cancel_job(jid)
+        assert s.wait(jid, timeout=10).status == "cancelled"
+    finally:
+        s.shutdown()
+
+
+def test_index_upsert_stops_between_batches_when_cancelled(tmp_path) -> None:
+    import numpy as np
+    import pytest
+    from api.scheduler.job_scheduler import CancelToken, JobCancelled
+    from domain.models import Photo
+    from infra.index_store import IndexStore
+
+    token = CancelToken()
+    batches = []
+
+    class _Emb:
+        def embed_images(self, paths, batch_size=32):
+            batches.append(len(paths))
+            token.cancel()
+            return np.ones((len(paths), 4), dtype=np.float32)
+
+    photos = [Photo(path=tmp_path / f"{i}.jpg", mtime=1.0) for i in range(6)]
+    store = IndexStore(tmp_path, index_key="dummy")
+    with pytest.raises(JobCancelled):
+        store.upsert(_Emb(), photos, batch_size=2, cancel=token.raise_if_cancelled)
+    assert batches == [2]
+    fresh = IndexStore(tmp_path, index_key="dummy")
+    fresh.load()
+    assert not fresh.state.paths
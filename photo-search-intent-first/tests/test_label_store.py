@@ -0,0 +1,81 @@
+import json
+import os
+import threading
+from pathlib import Path
+
+from infra.collections import add_to_collection, collection_paths, delete_collection, load_collections, remove_from_collection
+from infra.label_store import TAG, LabelStore, existing_label_store
+from infra.tags import add_tags, all_tags, load_tags, paths_with_tags, remove_tags, save_tags, set_tags, tag_counts
+
+
+def test_legacy_json_migrates_and_mutations_are_incremental(tmp_path: Path) -> None:
+    (tmp_path / "tags.json").write_text(json.dumps({"/a.jpg": ["beach", "sun"], "/b.jpg": ["beach"], "/c.jpg": []}))
+    (tmp_path / "collections.json").write_text(json.dumps({"Favorites": ["/b.jpg", "/a.jpg"], "Empty": []}))
+
+    assert load_tags(tmp_path) == {"/a.jpg": ["beach", "sun"], "/b.jpg": ["beach"]}
+    assert load_collections(tmp_path) == {"Empty": [], "Favorites": ["/b.jpg", "/a.jpg"]}
+
+    assert add_tags(tmp_path, ["/a.jpg", "/c.jpg"], ["sun"]) == 1
+    assert paths_with_tags(tmp_path, ["beach", "sun"]) == {"/a.jpg"}
+    assert tag_counts(tmp_path) == {"beach": 2, "sun": 2}
+    assert set_tags(tmp_path, ["/b.jpg", "/c.jpg"], ["new"]) == 2
+    assert remove_tags(tmp_path, ["/a.jpg", "/c.jpg"], ["sun"]) == 1
+    # A tag disappears from the tag list with its last photo
+    assert all_tags(tmp_path) == ["beach", "new"]
+
+    assert add_to_collection(tmp_path, "Favorites", ["/a.jpg", "/c.jpg"]) == 1
+    assert collection_paths(tmp_path, "Favorites") == ["/b.jpg", "/a.jpg", "/c.jpg"]
+    assert remove_from_collection(tmp_path, "Favorites", ["/b.jpg"]) == 1
+    assert delete_collection(tmp_path, "Empty") and not delete_collection(tmp_path, "Empty")
+
+    # save_tags keeps working for whole-map callers
+    tmap = load_tags(tmp_path)
+    tmap["/a.jpg"] = ["only"]
+    save_tags(tmp_path, tmap)
+    assert load_tags(tmp_path) == {"/a.jpg": ["only"], "/b.jpg": ["new"], "/c.jpg": ["new"]}
+
+    # The legacy file is migrated once; touching or restoring it later must
+    # not replace the edits made since
+    os.utime(tmp_path / "tags.json")
+    (tmp_path / "collections.json").write_text(json.dumps({"Other": ["/z.jpg"]}))
+    assert load_tags(tmp_path) == {"/a.jpg": ["only"], "/b.jpg": ["new"], "/c.jpg": ["new"]}
+    assert LabelStore(tmp_path).sync_legacy(TAG) is False
+    assert "Other" not in load_collections(tmp_path)
+
+
+def test_concurrent_batches_do_not_lose_updates(tmp_path: Path) -> None:
+    def work(i: int) -> None:
+        for j in range(25):
+            add_tags(tmp_path, [f"/p{j}.jpg"], [f"t{i}"])
+
+    threads = [threading.Thread(target=work, args=(i,)) for i in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert tag_counts(tmp_path) == {f"t{i}": 25 for i in range(6)}
+    # A second handle on the same file (another process) sees the same data
+    assert LabelStore(tmp_path).by_path(TAG, ["/p3.jpg"])["/p3.jpg"] == [f"t{i}" for i in range(6)]
+
+
+def test_legacy_file_appearing_after_first_use_is_ignored(tmp_path: Path) -> None:
+    add_tags(tmp_path, ["/a.jpg"], ["kept"])
+    (tmp_path / "tags.json").write_text(json.dumps({"/b.jpg": ["copied"]}))
+    assert load_tags(tmp_path) == {"/a.jpg": ["kept"]}
+
+
+def test_readers_do_not_create_files(tmp_path: Path) -> None:
+    assert load_tags(tmp_path) == {} and load_collections(tmp_path) == {}
+    assert existing_label_store(tmp_path) is None
+    assert list(tmp_path.iterdir()) == []
+
+
+def test_batch_replace_reports_paths_changed(tmp_path: Path) -> None:
+    from api.routers.batch import api_batch_tag
+    from infra.index_store import IndexStore
+
+    index_dir = IndexStore(tmp_path).index_dir
+    set_tags(index_dir, ["/a.jpg"], ["sun"])
+    out = api_batch_tag(body={"dir": str(tmp_path), "paths": ["/a.jpg", "/b.jpg"], "tags": ["sun"], "operation": "replace"})
+    # /a.jpg already had exactly these tags
+    assert out["updated"] == 1 and out["processed"] == 2
@@ -0,0 +1,56 @@
+import json
+from pathlib import Path
+
+import numpy as np
+
+from infra.metadata_columns import load_columns, write_columns
+
+
+def _data():
+    return {
+        "paths": ["a.jpg", "b.jpg", "c.jpg", "d.jpg"],
+        "camera": ["Canon EOS R5", "", "canon g7x", None],
+        "place": ["", "", "", ""],
+        "iso": [100, None, 3200, "400"],
+        "fnumber": [2.8, 1.8, None, 8.0],
+        "gps_heading": [10.0, 370.0, None, 180.0],
+    }
+
+
+def test_write_and_load_typed_columns(tmp_path: Path) -> None:
+    write_columns(tmp_path, _data())
+    cols = load_columns(tmp_path)
+    assert cols is not None and len(cols) == 4
+    assert isinstance(cols.numeric("iso"), np.memmap)
+    assert cols.numeric("iso").dtype == np.float64
+    assert np.isnan(cols.numeric("iso")[3])  # malformed ISO counts as missing
+    assert cols.codes("camera")[1][0] == ""
+    assert cols.distinct("camera") == ["Canon EOS R5", "canon g7x"]
+    assert cols.distinct("place") == []
+    assert np.flatnonzero(cols.contains("camera", "CANON")).tolist() == [0, 2]
+    assert np.flatnonzero(cols.range("fnumber", 2.0, 8.0)).tolist() == [0, 3]
+    assert cols.value("iso", 0) == 100 and cols.value("iso", 1) is None
+    assert cols.value("camera", 1) == ""
+    # Cached per process until the files change
+    assert load_columns(tmp_path) is cols
+
+
+def test_legacy_json_is_converted_and_aligned(tmp_path: Path) -> None:
+    (tmp_path / "exif_index.json").write_text(json.dumps(_data()))
+    cols = load_columns(tmp_path)
+    assert cols is not None
+    assert (tmp_path / "exif_columns" / "manifest.json").exists()
+
+    view = cols.aligned(["d.jpg", "x.jpg", "a.jpg"])
+    assert view.numeric("fnumber")[[0, 2]].tolist() == [8.0, 2.8]
+    assert np.isnan(view.numeric("fnumber")[1])
+    assert view.text("camera").tolist() == ["", "", "Canon EOS R5"]
+
+    # A newer exif_index.json replaces the columns on the next load
+    data = _data()
+    data["camera"][1] = "Sony A7"
+    (tmp_path / "exif_index.json").write_text(json.dumps(data) + " ")
+    fresh = load_columns(tmp_path)
+    assert fresh is not cols
+    assert "Sony A7" in fresh.distinct("camera")
+    assert len(list((tmp_path / "exif_columns").glob("g*"))) == 1
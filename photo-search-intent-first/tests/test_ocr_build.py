@@ -0,0 +1,102 @@
+import json
+import sys
+import types
+from pathlib import Path
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from infra import ocr_build
+
+
+def _blank(path: Path) -> str:
+    Image.new("RGB", (640, 480), (90, 140, 200)).save(path)
+    return str(path)
+
+
+def _texty(path: Path) -> str:
+    img = Image.new("RGB", (640, 480), (255, 255, 255))
+    draw = ImageDraw.Draw(img)
+    for y in range(40, 440, 24):
+        draw.text((20, y), "INVOICE 2024 TOTAL DUE 1234.56 PAID", fill=(0, 0, 0))
+    img.save(path)
+    return str(path)
+
+
+class _Reader:
+    calls: list = []
+
+    def __init__(self, languages, gpu=False):
+        self.languages = languages
+
+    def readtext(self, path, detail=0):
+        _Reader.calls.append(path)
+        return ["text", Path(path).stem]
+
+
+def _fake_easyocr(monkeypatch) -> None:
+    _Reader.calls = []
+    monkeypatch.setitem(sys.modules, "easyocr", types.SimpleNamespace(Reader=_Reader))
+    monkeypatch.setattr(ocr_build, "_reader", None)
+
+
+def test_prepass_skips_flat_photos(tmp_path: Path) -> None:
+    assert not ocr_build.looks_like_text(_blank(tmp_path / "sky.png"))
+    assert ocr_build.looks_like_text(_texty(tmp_path / "doc.png"))
+    assert ocr_build.looks_like_text(str(tmp_path / "missing.jpg"))
+
+
+def test_run_ocr_reuses_previous_and_checkpoint(tmp_path: Path, monkeypatch) -> None:
+    _fake_easyocr(monkeypatch)
+    paths = [_texty(tmp_path / f"d{i}.png") for i in range(3)] + [_blank(tmp_path / "sky.png")]
+    (tmp_path / "ocr_checkpoint.json").write_text(
+        json.dumps({"languages": ["en"], "texts": {paths[1]: "from checkpoint"}}), encoding="utf-8"
+    )
+
+    texts, updated = ocr_build.run_ocr(tmp_path, paths, ["en"], previous={paths[0]: "cached"}, workers=1)
+    assert texts == ["cached", "from checkpoint", "text d2", ""]
+    assert updated == 2
+    assert _Reader.calls == [paths[2]]
+    status = json.loads((tmp_path / "ocr_status.json").read_text())
+    assert status["state"] == "complete" and status["skipped"] == 1
+    saved = json.loads((tmp_path / "ocr_checkpoint.json").read_text())
+    assert saved["texts"][paths[2]] == "text d2"
+
+    ocr_build.finish(tmp_path)
+    assert not (tmp_path / "ocr_checkpoint.json").exists()
+
+
+def test_run_ocr_stops_between_chunks_and_keeps_the_checkpoint(tmp_path: Path, monkeypatch) -> None:
+    import pytest
+
+    _fake_easyocr(monkeypatch)
+    paths = [_texty(tmp_path / f"d{i}.png") for i in range(4)]
+
+    class Stop(Exception):
+        pass
+
+    def cancel():
+        if _Reader.calls:
+            raise Stop()
+
+    with pytest.raises(Stop):
+        ocr_build.run_ocr(tmp_path, paths, ["en"], workers=1, chunk_size=2, cancel=cancel)
+    assert _Reader.calls == paths[:2]
+    saved = json.loads((tmp_path / "ocr_checkpoint.json").read_text())
+    assert sorted(saved["texts"]) == paths[:2]
+
+
+def test_embed_ocr_texts_batches_distinct_strings() -> None:
+    class Embedder:
+        batches: list = []
+
+        def embed_texts(self, texts):
+            self.batches.append(list(texts))
+            return np.ones((len(texts), 3), dtype=np.float32) * np.arange(1, len(texts) + 1)[:, None]
+
+    emb = Embedder()
+    out = ocr_build.embed_ocr_texts(emb, ["a", "", "b", "a"], 3, batch_size=1)
+    assert emb.batches == [["a"], ["b"]]
+    assert out.shape == (4, 3) and out.dtype == np.float32
+    assert not out[1].any()
+    assert np.array_equal(out[0], out[3])
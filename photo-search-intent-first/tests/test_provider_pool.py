@@ -0,0 +1,52 @@
+import threading
+import time
+
+import numpy as np
+
+from adapters.provider_pool import ProviderPool
+
+
+class _Provider:
+    index_id = "fake"
+
+    def __init__(self) -> None:
+        self.texts = []
+
+    def embed_text(self, query: str) -> np.ndarray:
+        self.texts.append(query)
+        return np.zeros(4, dtype=np.float32)
+
+
+def test_concurrent_gets_load_once() -> None:
+    pool = ProviderPool()
+    loads = []
+
+    def factory():
+        loads.append(1)
+        time.sleep(0.1)
+        return _Provider()
+
+    out = []
+    threads = [threading.Thread(target=lambda: out.append(pool.get("clip", "m", None, factory))) for _ in range(5)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(loads) == 1 and len({id(p) for p in out}) == 1
+    assert pool.get("clip", "m", "cpu", factory) is not out[0]
+
+    stats = {s["device"]: s for s in pool.stats()}
+    assert stats["auto"]["uses"] == 5 and stats["auto"]["load_seconds"] >= 0.1
+
+
+def test_warm_up_and_unload() -> None:
+    pool = ProviderPool()
+    p = pool.get("transformers", "a", None, _Provider)
+    pool.get("transformers", "b", None, _Provider)
+    assert pool.warm_up([p])[0]["ok"] and p.texts == ["warm up"]
+    assert [s["warmed"] for s in pool.stats()] == [True, False]
+
+    assert pool.unload(model="a") == 1
+    assert [s["model"] for s in pool.stats()] == ["b"]
+    assert pool.get("transformers", "a", None, _Provider) is not p
+    assert pool.unload() == 2 and pool.stats() == []
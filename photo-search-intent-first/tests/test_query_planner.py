@@ -0,0 +1,104 @@
+import json
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+
+from infra.index_store import IndexStore
+from services.query_planner import (
+    And, Not, Or, Term, compile_query, evaluate, expression_subset, filter_results, is_expression, tokenize, view_for,
+)
+
+
+def _store(root: Path) -> IndexStore:
+    store = IndexStore(root, index_key="dummy")
+    names = ["beach_sunset.jpg", "city.png", "beach_dog.jpg", "receipt.jpg", "clip.mp4"]
+    store.state.paths = [str(root / n) for n in names]
+    store.state.mtimes = [1_600_000_000.0 + i * 86_400 for i in range(len(names))]
+    store.state.embeddings = np.eye(len(names), 4, dtype=np.float32)
+    store.save()
+    p = store.state.paths
+    (store.index_dir / "tags.json").write_text(json.dumps({p[0]: ["beach", "rating:5"], p[2]: ["beach"], p[3]: ["docs"]}))
+    exif = {"paths": p, "camera": ["Canon R5", "Sony A7", "canon g7x", "", ""], "iso": [100, 3200, 800, 400, None]}
+    (store.index_dir / "exif_index.json").write_text(json.dumps(exif))
+    return store
+
+
+def test_compile_flattens_and_respects_precedence() -> None:
+    plan = compile_query("(tag:beach OR tag:city) AND NOT iso:>1000 AND camera:canon")
+    assert plan == And((
+        Or((Term("tag", "beach"), Term("tag", "city"))),
+        Not(Term("iso", ">1000")),
+        Term("camera", "canon"),
+    ))
+    assert compile_query("camera:canon iso:>=800") == And((Term("camera", "canon"), Term("iso", ">=800")))
+    assert tokenize('(tag:"new york" OR x)') == ["(", "tag:new york", "OR", "x", ")"]
+    assert not is_expression(tokenize("dog on the beach"))
+    assert is_expression(tokenize("dog NOT cat"))
+    for plain in ("dog and cat", "beach or mountains", "kids not wearing hats"):
+        assert not is_expression(tokenize(plain))
+
+
+def test_evaluate_combines_library_masks(tmp_path: Path) -> None:
+    store = _store(tmp_path)
+    view = view_for(store)
+
+    def rows(q):
+        return np.flatnonzero(evaluate(compile_query(q), view)).tolist()
+
+    assert rows("tag:beach") == [0, 2]
+    assert rows("rating:5") == [0]
+    assert rows("camera:canon AND iso:<=800") == [0, 2]
+    assert rows("tag:beach AND NOT iso:>500") == [0]
+    assert rows("filetype:png OR filetype:mp4") == [1, 4]
+    assert rows("name:beach NOT dog") == [0]
+    assert rows("mtime:>=1600172800") == [2, 3, 4]
+    assert rows("date:<2020-09-15") == [0, 1]
+    assert rows("bogus:1") == []
+
+    results = [SimpleNamespace(path=Path(p), score=1.0) for p in reversed(store.state.paths)]
+    assert [r.path.name for r in filter_results(store, results, "tag:beach")] == ["beach_dog.jpg", "beach_sunset.jpg"]
+    assert filter_results(store, results, "a dog on the beach") == results
+    # Lower-case connectives in natural language are not operators
+    assert filter_results(store, results, "beach and dog") == results
+    # A colon after an unknown word is free text, not a field filter
+    assert filter_results(store, results, "note: receipts") == results
+    assert rows("name:beach AND note:dog") == []
+    assert rows("name:beach AND beach_dog") == [2]
+
+
+def test_file_sizes_are_read_once_per_index_generation(tmp_path: Path, monkeypatch) -> None:
+    import services.query_planner as qp
+
+    store = _store(tmp_path)
+    for i, p in enumerate(store.state.paths):
+        Path(p).write_bytes(b"x" * (1024 * (i + 1)))
+    photos = set(store.state.paths)
+    stats = []
+    real_stat = qp.os.stat
+    monkeypatch.setattr(qp.os, "stat", lambda p, *a, **k: (p in photos and stats.append(p)) or real_stat(p, *a, **k))
+
+    def rows(q):
+        return np.flatnonzero(evaluate(compile_query(q), view_for(store))).tolist()
+
+    assert rows("size:>=3kb") == [2, 3, 4]
+    assert rows("size:<2kb") == [0]
+    assert len(stats) == len(store.state.paths)
+    # A re-index starts a new generation, so sizes are read again
+    store.save()
+    assert rows("size:<2kb") == [0]
+    assert len(stats) == 2 * len(store.state.paths)
+
+
+def test_expression_subset_is_applied_before_ranking(tmp_path: Path) -> None:
+    from services.search_executor import SearchExecutor
+
+    store = _store(tmp_path)
+    emb = SimpleNamespace(embed_text=lambda q: np.array([1, 0, 0, 0], dtype=np.float32))
+    req = SimpleNamespace(to_legacy_param_dict=lambda: {"query": "tag:docs OR tag:none", "top_k": 1})
+    # The only tagged photo is nowhere near the semantic top-1
+    subset = expression_subset(store, "tag:docs OR tag:none")
+    assert subset == [3]
+    out = SearchExecutor().execute_search(store, emb, req, subset=subset)
+    assert [r.path.name for r in out] == ["receipt.jpg"]
+    assert expression_subset(store, "a photo of a receipt") is None
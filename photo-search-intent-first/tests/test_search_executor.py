@@ -121,7 +121,7 @@ def test_execute_caption_search():
     
     assert results == mock_results
     mock_store.search_with_captions.assert_called_once_with(
-        mock_embedder, "test query", 10
+        mock_embedder, "test query", 10, subset=None
     )
 
 
@@ -139,7 +139,7 @@ def test_execute_ocr_search():
     
     assert results == mock_results
     mock_store.search_with_ocr.assert_called_once_with(
-        mock_embedder, "test query", 10
+        mock_embedder, "test query", 10, subset=None
     )
 
 
@@ -162,7 +162,7 @@ def test_execute_regular_search():
     }
     
     results = executor._execute_regular_search(
-        mock_store, mock_embedder, "test query", mock_unified_req, legacy_params
+        mock_store, mock_embedder, "test query", mock_unified_req, legacy_params, subset=[2, 5]
     )
     
     assert results == mock_results
@@ -170,11 +170,7 @@ def test_execute_regular_search():
         mock_embedder,
         "test query",
         top_k=10,
-        similarity_threshold=0.5,
-        use_captions=False,
-        use_fast=False,
-        fast_kind=None,
-        use_ocr=False
+        subset=[2, 5],
     )
 
 
@@ -0,0 +1,65 @@
+import os
+from pathlib import Path
+
+import numpy as np
+from PIL import Image
+
+from infra import style_index
+from infra.index_store import IndexStore
+from services.enhanced_search import EnhancedSearchService
+
+
+def _photo(path: Path, color, stripes: bool = False) -> str:
+    arr = np.zeros((300, 400, 3), dtype=np.uint8)
+    arr[:] = color
+    if stripes:
+        arr[:, ::8] = 255
+    Image.fromarray(arr).save(path)
+    return str(path)
+
+
+def _store(tmp_path: Path, paths) -> IndexStore:
+    store = IndexStore(tmp_path)
+    store.state.paths = list(paths)
+    store.state.mtimes = [os.path.getmtime(p) if os.path.exists(p) else 0.0 for p in paths]
+    store.state.embeddings = np.eye(len(paths), dtype=np.float32)
+    return store
+
+
+def test_build_is_incremental(tmp_path: Path, monkeypatch) -> None:
+    paths = [_photo(tmp_path / f"{i}.png", (i * 40, 10, 10)) for i in range(3)]
+    store = _store(tmp_path, paths + [str(tmp_path / "missing.png")])
+    index = style_index.style_index_for_store(store)
+    assert index.matrix.shape == (4, style_index.FEATURE_DIM)
+    assert np.isnan(index.matrix[3]).all()
+    assert np.allclose(index.matrix[:3, :style_index.HIST_DIM].sum(axis=1), 1.0)
+
+    calls = []
+    real = style_index.style_features
+    monkeypatch.setattr(style_index, "style_features", lambda p: calls.append(p) or real(p))
+    style_index._cache.clear()
+    store.state.mtimes[1] += 10
+    again = style_index.style_index_for_store(store)
+    # Unreadable rows are remembered too; only the modified photo is decoded
+    assert calls == [paths[1]]
+    assert np.array_equal(again.matrix[:3], index.matrix[:3])
+    calls.clear()
+    style_index.style_index_for_store(store)
+    assert calls == []
+
+
+def test_style_search_ranks_by_precomputed_features(tmp_path: Path) -> None:
+    ref = _photo(tmp_path / "ref.png", (200, 30, 30), stripes=True)
+    near = _photo(tmp_path / "near.png", (205, 30, 30), stripes=True)
+    flat = _photo(tmp_path / "flat.png", (200, 30, 30))
+    far = _photo(tmp_path / "far.png", (20, 120, 220))
+    store = _store(tmp_path, [ref, far, flat, near])
+    service = EnhancedSearchService(store)
+
+    results = service.style_similarity_search(ref, top_k=3, style_weight=1.0)
+    assert [str(r.path) for r in results] == [near, flat, far]
+    assert results[0].score > results[1].score > results[2].score
+
+    # An unindexed reference is featurised on the fly
+    outside = _photo(tmp_path / "outside.png", (20, 120, 220))
+    assert str(service.style_similarity_search(outside, top_k=1, style_weight=1.0)[0].path) == far
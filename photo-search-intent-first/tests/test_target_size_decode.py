@@ -0,0 +1,40 @@
+from pathlib import Path
+
+from PIL import Image
+
+from adapters.fs_scanner import safe_open_image
+from infra.thumbs import get_or_create_face_thumb, get_or_create_thumb
+
+
+def _save(path: Path, size=(2400, 1600), fmt=None) -> Path:
+    img = Image.new("RGB", size, (200, 30, 30))
+    # A distinct block so face crops can be checked
+    img.paste((10, 220, 10), (1200, 800, 1600, 1200))
+    img.save(path, format=fmt)
+    return path
+
+
+def test_target_size_never_undershoots(tmp_path: Path) -> None:
+    jpg = _save(tmp_path / "a.jpg")
+    png = _save(tmp_path / "b.png")
+    assert safe_open_image(jpg).size == (2400, 1600)
+    for p in (jpg, png):
+        img = safe_open_image(p, target_size=300)
+        assert img.mode == "RGB"
+        assert min(img.size) >= 300 and img.size[0] < 2400
+    # Targets larger than the image leave it untouched
+    assert safe_open_image(png, target_size=5000).size == (2400, 1600)
+    assert safe_open_image(tmp_path / "missing.jpg", target_size=300) is None
+
+
+def test_thumbnails_use_reduced_decode(tmp_path: Path) -> None:
+    src = _save(tmp_path / "a.jpg")
+    index_dir = tmp_path / "index"
+    thumb = get_or_create_thumb(index_dir, src, 1.0, size=256)
+    with Image.open(thumb) as t:
+        assert max(t.size) == 256
+
+    face = get_or_create_face_thumb(index_dir, src, 1.0, (1200, 800, 400, 400), size=64)
+    with Image.open(face) as f:
+        r, g, b = f.convert("RGB").getpixel((f.width // 2, f.height // 2))
+        assert g > 150 and r < 80
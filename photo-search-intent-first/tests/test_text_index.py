@@ -0,0 +1,85 @@
+import json
+from pathlib import Path
+from types import SimpleNamespace
+
+from infra.text_index import TextIndex, TextLookup, text_index_for_store
+
+
+def _write_texts(path: Path, texts: dict) -> None:
+    path.write_text(json.dumps({"paths": list(texts), "texts": list(texts.values())}))
+
+
+def test_search_ranks_prefixes_and_follows_incremental_updates(tmp_path: Path) -> None:
+    idx = TextIndex(tmp_path)
+    assert idx.update("ocr", {
+        "/p/receipt.jpg": "Total amount due 42.00 thank you",
+        "/p/sign.jpg": "Stop",
+        "/p/menu.jpg": "Café menu: espresso, amount varies",
+    }) == 3
+    idx.update("caption", {"/p/sign.jpg": "a red stop sign at a crossing"})
+
+    assert {p for p, _ in idx.search("amou")} == {"/p/receipt.jpg", "/p/menu.jpg"}
+    # Diacritics fold, terms must all match, field and path filters apply
+    assert [p for p, _ in idx.search("cafe espresso")] == ["/p/menu.jpg"]
+    assert [p for p, _ in idx.search("sign", fields=["ocr"])] == []
+    assert [p for p, _ in idx.search("crossing", fields=["caption"])] == ["/p/sign.jpg"]
+    assert [p for p, _ in idx.search("amount", paths=["/p/menu.jpg"])] == ["/p/menu.jpg"]
+    # FTS syntax in user input is treated as text
+    assert idx.search('stop" OR "x') == idx.search("stop x")
+
+    # Only changed rows are rewritten; a complete source drops missing paths
+    assert idx.update("ocr", {"/p/receipt.jpg": "Total amount due 42.00 thank you"}) == 0
+    idx.update("ocr", {"/p/sign.jpg": "Stop", "/p/menu.jpg": "Closed"}, complete=True)
+    assert idx.search("amount") == []
+    assert [p for p, _ in idx.search("stop")] == ["/p/sign.jpg"]
+    assert idx.texts("ocr", ["/p/receipt.jpg", "/p/menu.jpg"]) == {"/p/menu.jpg": "Closed"}
+
+
+def test_store_sync_snippets_and_lookup(tmp_path: Path) -> None:
+    store = SimpleNamespace(
+        index_dir=tmp_path,
+        ocr_texts_file=tmp_path / "ocr_texts.json",
+        cap_texts_file=tmp_path / "cap_texts.json",
+    )
+    long_text = "lorem ipsum " * 40 + "invoice number 1234 " + "dolor sit " * 40
+    _write_texts(store.ocr_texts_file, {"/p/a.jpg": long_text, "/p/b.jpg": "  hello\n  world ", "/p/c.jpg": ""})
+
+    idx = text_index_for_store(store)
+    assert idx.paths_with_text("ocr") == ["/p/a.jpg", "/p/b.jpg"]
+    snips = idx.snippets(["/p/a.jpg", "/p/b.jpg", "/p/missing.jpg"], limit=20)
+    assert snips == {"/p/a.jpg": "lorem ipsum lorem ip", "/p/b.jpg": "hello world"}
+    around = idx.snippets(["/p/a.jpg"], query="invoice", limit=60)["/p/a.jpg"]
+    assert "invoice" in around and len(around) <= 60
+
+    lookup = TextLookup(idx, "ocr").prefetch(["/p/b.jpg", "/p/c.jpg"])
+    assert lookup.get("/p/b.jpg") == "  hello\n  world " and lookup.get("/p/c.jpg", "") == ""
+    assert "/p/c.jpg" not in lookup and len(lookup) == 2
+
+    # A rewritten texts file is picked up on next use without a rebuild
+    _write_texts(store.ocr_texts_file, {"/p/b.jpg": "goodbye"})
+    assert [p for p, _ in text_index_for_store(store).search("goodbye")] == ["/p/b.jpg"]
+    assert idx.search("invoice") == []
+
+
+def test_every_library_photo_is_searchable_by_name(tmp_path: Path) -> None:
+    paths = ["/p/IMG_0001.jpg", "/p/beach_party.jpg", "/p/receipt.jpg"]
+    store = SimpleNamespace(
+        index_dir=tmp_path,
+        ocr_texts_file=tmp_path / "ocr_texts.json",
+        cap_texts_file=tmp_path / "cap_texts.json",
+        state=SimpleNamespace(paths=paths),
+        generation=lambda: (1,),
+    )
+    _write_texts(store.ocr_texts_file, {"/p/receipt.jpg": "total due"})
+    idx = text_index_for_store(store)
+    assert idx.count() == 3
+    assert [p for p, _ in idx.search("beach", fields=["name"])] == ["/p/beach_party.jpg"]
+    assert [p for p, _ in idx.search("img_0001")] == ["/p/IMG_0001.jpg"]
+    # A complete source with no text for a photo keeps its row
+    _write_texts(store.ocr_texts_file, {"/p/receipt.jpg": ""})
+    assert [p for p, _ in text_index_for_store(store).search("receipt")] == ["/p/receipt.jpg"]
+
+    store.state.paths = paths[1:]
+    store.generation = lambda: (2,)
+    text_index_for_store(store)
+    assert idx.count() == 2 and idx.search("img_0001") == []
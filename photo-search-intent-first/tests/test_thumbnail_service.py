@@ -0,0 +1,66 @@
+import json
+import threading
+import time
+from pathlib import Path
+
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from api.utils import _thumb_response
+from infra.index_store import IndexStore
+from services import thumbnail_service as ts
+
+
+def _library(tmp_path: Path):
+    photo = tmp_path / "a.jpg"
+    Image.new("RGB", (800, 600), (10, 120, 200)).save(photo)
+    index_dir = IndexStore(tmp_path).index_dir
+    (index_dir / "paths.json").write_text(json.dumps({"paths": [str(photo)], "mtimes": [123.0]}))
+    return photo, index_dir
+
+
+def test_concurrent_requests_generate_once(tmp_path: Path, monkeypatch) -> None:
+    photo, index_dir = _library(tmp_path)
+    calls = []
+    real = ts.get_or_create_thumb
+
+    def slow(*args, **kwargs):
+        calls.append(args)
+        time.sleep(0.2)
+        return real(*args, **kwargs)
+
+    monkeypatch.setattr(ts, "get_or_create_thumb", slow)
+    monkeypatch.setattr(IndexStore, "load", lambda self: (_ for _ in ()).throw(AssertionError("index loaded")))
+    service = ts.ThumbnailService()
+    out = []
+    threads = [threading.Thread(target=lambda: out.append(service.get(tmp_path, str(photo), 128))) for _ in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(calls) == 1 and calls[0][2] == 123.0
+    assert len({t.path for t in out}) == 1 and out[0].path.parent == index_dir / "thumbs"
+    assert service.stats["coalesced"] == 5
+    assert service.get(tmp_path, str(photo), 128) == out[0]
+    assert service.stats["hits"] == 1
+
+
+def test_thumb_response_validators(tmp_path: Path) -> None:
+    photo, _ = _library(tmp_path)
+    service = ts.ThumbnailService()
+    app = FastAPI()
+
+    @app.get("/thumb")
+    def thumb(request: Request, v: str = None):
+        t = service.get(tmp_path, str(photo), 128)
+        return _thumb_response(t, request.headers.get("if-none-match"), versioned=bool(v))
+
+    client = TestClient(app)
+    first = client.get("/thumb")
+    assert first.status_code == 200 and first.headers["cache-control"] == "no-cache"
+    etag = first.headers["etag"]
+    again = client.get("/thumb", headers={"If-None-Match": etag})
+    assert again.status_code == 304 and not again.content
+    assert "immutable" in client.get("/thumb?v=1").headers["cache-control"]
@@ -1265,7 +1265,7 @@ with tab_preflight:
         store_d = IndexStore(Path(photo_dir), index_key=getattr(emb, 'index_id', None))
         store_d.load()
         with st.spinner("Crunching quick matches…"):
-            built = build_hashes(store_d.index_dir, store_d.state.paths or [])
+            built = build_hashes(store_d.index_dir, store_d.state.paths or [], mtimes=store_d.state.mtimes)
             groups = find_lookalikes(store_d.index_dir, max_distance=sim)
         st.caption(f"Updated {built} photos. Found {len(groups)} look‑alike groups.")
         if groups:
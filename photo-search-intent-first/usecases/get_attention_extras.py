@@ -5,26 +5,26 @@ from pathlib import Path
 from typing import Dict, Any
 
 from infra.index_store import IndexStore
-from infra.dupes import find_lookalikes, build_hashes, _group_id, load_resolved, save_resolved
+from infra.dupes import find_lookalikes, build_hashes, has_hashes, _group_id, load_resolved, save_resolved
 
 
 def duplicates(folder: Path, max_distance: int = 5, rebuild: bool = False) -> Dict[str, Any]:
     store = IndexStore(folder)
     store.load()  # only to get index_dir
     # Optionally (re)build hashes if not present or requested
-    hashes_file = store.index_dir / 'hashes.json'
-    if rebuild or not hashes_file.exists():
+    if rebuild or not has_hashes(store.index_dir):
         # Build using whatever paths are present in index store; if index not built yet, nothing will happen
         if store.paths_file.exists():
             try:
                 data = (store.paths_file.read_text())
                 import json
-                paths = json.loads(data).get("paths", [])
+                saved = json.loads(data)
+                paths, mtimes = saved.get("paths", []), saved.get("mtimes")
             except Exception:
-                paths = []
+                paths, mtimes = [], None
         else:
-            paths = []
-        build_hashes(store.index_dir, paths)
+            paths, mtimes = [], None
+        build_hashes(store.index_dir, paths, mtimes=mtimes)
     groups = find_lookalikes(store.index_dir, max_distance=max_distance)
     resolved = set(load_resolved(store.index_dir))
     out = []
@@ -5,6 +5,7 @@ from adapters.fs_scanner import list_photos
 from infra.storage_factory import create_index_store, initialize_storage_sync
 from adapters.provider_factory import get_provider
 from adapters.jobs_bridge import JobsBridge
+from infra.style_index import build_style_index
 import json, time, uuid
 
 
@@ -16,9 +17,11 @@ def index_photos(
     openai_api_key: Optional[str] = None,
     embedder=None,
     job_id: Optional[str] = None,
+    cancel=None,
 ) -> Tuple[int, int, int]:
     """Build or update the photo index for a folder.
 
+    ``cancel`` is called between embedding batches and may raise to stop.
     Returns (new_count, updated_count, total_count)
     """
     embedder = embedder or get_provider(provider, hf_token=hf_token, openai_api_key=openai_api_key)
@@ -122,8 +125,13 @@ def index_photos(
             pass
 
     try:
-        new_count, updated_count = store.upsert(embedder, photos, batch_size=batch_size, progress=_progress)
+        new_count, updated_count = store.upsert(embedder, photos, batch_size=batch_size, progress=_progress, cancel=cancel)
         total = len(store.state.paths)
+        # Style features for style similarity search; only new/changed photos are decoded
+        try:
+            build_style_index(store.index_dir, store.state.paths, store.state.mtimes)
+        except Exception:
+            pass
         # Mark completion
         try:
             status = {
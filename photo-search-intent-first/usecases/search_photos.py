@@ -2,6 +2,8 @@ from pathlib import Path
 from typing import List, Optional
 
 from domain.models import SearchResult
+from infra.config import config
+from infra.index_registry import get_index_store
 from infra.storage_factory import create_index_store, initialize_storage_sync
 from adapters.provider_factory import get_provider
 
@@ -16,7 +18,12 @@ def search_photos(
     embedder=None,
 ) -> List[SearchResult]:
     embedder = embedder or get_provider(provider, hf_token=hf_token, openai_api_key=openai_api_key)
-    store = create_index_store(folder, index_key=getattr(embedder, 'index_id', None))
-    initialize_storage_sync(store)
-    store.load()
+    index_key = getattr(embedder, 'index_id', None)
+    if config.storage_backend.lower() == "sqlite":
+        store = create_index_store(folder, index_key=index_key)
+        initialize_storage_sync(store)
+        store.load()
+    else:
+        # File-backed indexes stay resident between calls
+        store = get_index_store(folder, index_key=index_key)
     return store.search(embedder, query, top_k=top_k)
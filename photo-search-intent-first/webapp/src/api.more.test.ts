@@ -25,9 +25,9 @@ const mockFetch = (data: unknown) =>
 
 describe("api endpoints (more)", () => {
 	it("posts index with batch size and tokens", async () => {
-		const spy = mockFetch({ new: 1, updated: 2, total: 3 });
+		const spy = mockFetch({ ok: true, job_id: "job-1" });
 		const out = await apiIndex("/dir", "local", 32, "hf", "oai");
-		expect(out.total).toBe(3);
+		expect(out.job_id).toBe("job-1");
 		const [url, init] = spy.mock.calls[0];
 		expect(String(url)).toMatch(/\/index$/);
 		expect(JSON.parse(init?.body)).toMatchObject({
@@ -103,11 +103,19 @@ describe("api endpoints (more)", () => {
 			kind: "faiss",
 		});
 		spy.mockRestore();
-		spy = mockFetch({});
-		await apiBuildOCR("/d", "local", ["eng"], "hf", "oai");
+		// One payload answers both the submit and the job status poll
+		spy = mockFetch({
+			ok: true,
+			job_id: "job-2",
+			status: "completed",
+			result: { updated: 4 },
+		});
+		const ocr = await apiBuildOCR("/d", "local", ["eng"], "hf", "oai");
 		expect(JSON.parse(spy.mock.calls[0][1]?.body)).toMatchObject({
 			languages: ["eng"],
 		});
+		expect(String(spy.mock.calls[1][0])).toMatch(/\/jobs\/job-2\/status$/);
+		expect(ocr.updated).toBe(4);
 		spy.mockRestore();
 	});
 
@@ -525,7 +525,7 @@ export async function apiIndex(
   hfToken?: string,
   openaiKey?: string
 ) {
-  return post<{ new: number; updated: number; total: number }>("/index", {
+  return post<{ ok: boolean; job_id: string }>("/index", {
     dir,
     provider,
     batch_size: batchSize,
@@ -1108,13 +1108,18 @@ export async function apiBuildOCR(
   hfToken?: string,
   openaiKey?: string
 ) {
-  return post<{ updated: number }>("/ocr/build", {
-    dir,
-    provider,
-    languages,
-    hf_token: hfToken,
-    openai_key: openaiKey,
-  });
+  // The server queues the build and answers with a job id; wait for its result
+  const { job_id } = await post<{ ok: boolean; job_id: string }>(
+    "/ocr/build",
+    {
+      dir,
+      provider,
+      languages,
+      hf_token: hfToken,
+      openai_key: openaiKey,
+    }
+  );
+  return apiWaitForJob<{ updated: number }>(job_id);
 }
 
 export async function apiLookalikes(dir: string, maxDistance = 5) {
@@ -1560,10 +1565,13 @@ export async function apiOcrStatus(dir: string) {
 }
 
 export async function apiBuildFaces(dir: string, provider: string) {
-  return post<{ updated: number; faces: number; clusters: number }>(
+  const { job_id } = await post<{ ok: boolean; job_id: string }>(
     "/faces/build",
     { dir, provider }
   );
+  return apiWaitForJob<{ updated: number; faces: number; clusters: number }>(
+    job_id
+  );
 }
 
 export async function apiFacesClusters(dir: string) {
@@ -1985,6 +1993,36 @@ export async function apiCancelJob(jobId: string) {
   return post<{ ok: boolean }>("/jobs/cancel", { job_id: jobId });
 }
 
+export type JobStatus<T = unknown> = {
+  id: string;
+  name: string;
+  status: string;
+  error?: string | null;
+  progress?: number | null;
+  result?: T | null;
+};
+
+export async function apiJobStatus<T = unknown>(jobId: string) {
+  const r = await apiFetch(`/jobs/${encodeURIComponent(jobId)}/status`);
+  if (!r.ok) throw new Error(await r.text());
+  return r.json() as Promise<JobStatus<T>>;
+}
+
+// Poll a scheduler job until it finishes; resolves with its result
+export async function apiWaitForJob<T>(
+  jobId: string,
+  intervalMs = 1000
+): Promise<T> {
+  for (;;) {
+    const st = await apiJobStatus<T>(jobId);
+    if (st.status === "completed") return st.result as T;
+    if (st.status === "failed" || st.status === "cancelled") {
+      throw new Error(st.error || `Job ${st.status}`);
+    }
+    await new Promise((resolve) => setTimeout(resolve, intervalMs));
+  }
+}
+
 export async function apiModelStatus(): Promise<{
   ok: boolean;
   models: Record<
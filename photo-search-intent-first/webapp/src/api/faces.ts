@@ -1,4 +1,5 @@
 import { API_BASE, post } from "./base";
+import { waitForJob } from "./operations";
 
 export interface FaceCluster {
   id: string;
@@ -22,13 +23,17 @@ export interface FacePhotosResponse {
 }
 
 /**
- * Build face index for the specified directory
+ * Build face index for the specified directory (queued as a job, then awaited)
  */
 export async function buildFaces(
   dir: string,
   provider: string
 ): Promise<BuildFacesResponse> {
-  return post<BuildFacesResponse>("/faces/build", { dir, provider });
+  const { job_id } = await post<{ ok: boolean; job_id: string }>(
+    "/faces/build",
+    { dir, provider }
+  );
+  return waitForJob<BuildFacesResponse>(job_id);
 }
 
 /**
@@ -59,6 +59,37 @@ export async function getOperationHistory(
 	>(`/operations/history?dir=${encodeURIComponent(dir)}&limit=${limit}`);
 }
 
+export interface JobStatusResponse<T = unknown> {
+	id: string;
+	name: string;
+	status: string;
+	error?: string | null;
+	progress?: number | null;
+	result?: T | null;
+}
+
+export async function getJobStatus<T = unknown>(
+	jobId: string,
+): Promise<JobStatusResponse<T>> {
+	return get<JobStatusResponse<T>>(
+		`/jobs/${encodeURIComponent(jobId)}/status`,
+	);
+}
+
+/**
+ * Poll a scheduler job until it finishes and resolve with its result
+ */
+export async function waitForJob<T>(jobId: string, intervalMs = 1000): Promise<T> {
+	for (;;) {
+		const st = await getJobStatus<T>(jobId);
+		if (st.status === "completed") return st.result as T;
+		if (st.status === "failed" || st.status === "cancelled") {
+			throw new Error(st.error || `Job ${st.status}`);
+		}
+		await new Promise((resolve) => setTimeout(resolve, intervalMs));
+	}
+}
+
 // Export convenience functions that maintain backward compatibility
 export async function apiOperationStatus(dir: string, operation: string) {
 	return getOperationStatus({ dir, operation });